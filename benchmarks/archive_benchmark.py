@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+Measures the throughput of packaging bundles: `shazar`, including tar files streamed from stdin, `bndl` for each input
+format, `docker_unpack` and `oci_image_unpack`, as well as DEFLATE compression of a tree with
+`zip_utils.write_deflated` and with `ZipFile.write`, and the repeated parsing of a bundle.conf with and without
+`hocon_utils.parse_string`.
+
+Synthetic fixtures are generated locally: many small files, a few huge files, tar files of many small members and of a
+single huge member, a multi-layer `docker save` tarball and an OCI image layout. Each case is run in its own process
+so that its peak RSS can be measured, and with its own temp dir so that the peak disk usage of its temp files can be
+measured. The results are written as JSON so that runs can be compared across commits, e.g.:
+
+    python3 benchmarks/archive_benchmark.py --output before.json
+    git checkout my-branch
+    python3 benchmarks/archive_benchmark.py --fixtures-dir /tmp/fixtures --output after.json
+"""
+
+import argparse
+import datetime
+import hashlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, REPO_DIR)
+
+from conductr_cli import bndl_main, hocon_utils, shazar_main, zip_utils  # noqa: E402
+from conductr_cli.bndl_docker import docker_unpack  # noqa: E402
+from conductr_cli.bndl_oci import oci_image_unpack  # noqa: E402
+from pyhocon import ConfigFactory  # noqa: E402
+
+BUNDLE_CONF = b'''name = "benchmark"
+compatibilityVersion = "1"
+system = "benchmark"
+systemVersion = "1"
+version = "1"
+nrOfCpus = 0.1
+memory = 134217728
+diskSpace = 134217728
+roles = ["web"]
+components {
+  benchmark {
+    description = "benchmark"
+    file-system-type = "universal"
+    start-command = ["benchmark/bin/benchmark"]
+    endpoints {}
+  }
+}
+'''
+
+DOCKER_IMAGE_NAME = 'benchmark'
+DOCKER_IMAGE_TAG = 'latest'
+
+DISK_USAGE_SAMPLE_INTERVAL = 0.05  # seconds
+
+# The number of times the bundle.conf is parsed by the HOCON cases, as by the several steps of a command
+HOCON_PARSE_REPEATS = 1000
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Measures the throughput of packaging bundles')
+    parser.add_argument('--fixtures-dir',
+                        help='The dir of the generated fixtures, which are reused if they already exist. '
+                             'Defaults to a temporary dir that is removed afterwards')
+    parser.add_argument('--output',
+                        help='The file to write the results to as JSON, defaults to stdout')
+    parser.add_argument('--case',
+                        help='The case to run, may be given several times. Defaults to all cases',
+                        dest='cases',
+                        action='append',
+                        choices=sorted(CASES))
+    parser.add_argument('--small-files',
+                        help='The number of files of the many small files fixture, defaults to 10000',
+                        type=int,
+                        default=10000)
+    parser.add_argument('--small-file-size',
+                        help='The size in bytes of each small file, defaults to 4096',
+                        type=int,
+                        default=4096)
+    parser.add_argument('--huge-files',
+                        help='The number of files of the huge files fixture, defaults to 2',
+                        type=int,
+                        default=2)
+    parser.add_argument('--huge-file-size',
+                        help='The size in bytes of each huge file, defaults to 268435456',
+                        type=int,
+                        default=256 * 1024 * 1024)
+    parser.add_argument('--tar-members',
+                        help='The number of members of the many members tar fixture, defaults to 50000',
+                        type=int,
+                        default=50000)
+    parser.add_argument('--tar-huge-member-size',
+                        help='The size in bytes of the member of the huge member tar fixture, defaults to 1073741824',
+                        type=int,
+                        default=1024 * 1024 * 1024)
+    parser.add_argument('--deflate-small-files',
+                        help='The number of files of the deflate small files fixture, defaults to 50000',
+                        type=int,
+                        default=50000)
+    parser.add_argument('--deflate-tree-size',
+                        help='The size in bytes of the deflate tree fixture, defaults to 1073741824',
+                        type=int,
+                        default=1024 * 1024 * 1024)
+    parser.add_argument('--deflate-tree-file-size',
+                        help='The size in bytes of each file of the deflate tree fixture, defaults to 4194304',
+                        type=int,
+                        default=4 * 1024 * 1024)
+    parser.add_argument('--docker-layers',
+                        help='The number of layers of the docker image fixture, defaults to 4',
+                        type=int,
+                        default=4)
+    parser.add_argument('--run-case',
+                        help=argparse.SUPPRESS)
+    return parser
+
+
+def run(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.run_case:
+        return run_case(args.run_case, args.fixtures_dir)
+
+    fixtures_dir = args.fixtures_dir if args.fixtures_dir else tempfile.mkdtemp(prefix='archive-benchmark-')
+
+    try:
+        create_fixtures(fixtures_dir, args)
+
+        results = {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'created': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'cases': [measure_case(name, fixtures_dir) for name in (args.cases or sorted(CASES))]
+        }
+    finally:
+        if not args.fixtures_dir:
+            shutil.rmtree(fixtures_dir)
+
+    results_data = json.dumps(results, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(results_data)
+    else:
+        print(results_data)
+
+    return 0
+
+
+def measure_case(name, fixtures_dir):
+    """
+    Runs a case in a new process with its own temp dir, sampling the size of the temp dir while the case runs.
+    """
+    temp_dir = tempfile.mkdtemp(prefix='archive-benchmark-{}-'.format(name))
+    peak_temp_disk = [0]
+    done = threading.Event()
+
+    def sample_disk_usage():
+        while not done.wait(DISK_USAGE_SAMPLE_INTERVAL):
+            peak_temp_disk[0] = max(peak_temp_disk[0], dir_size(temp_dir))
+
+    sampler = threading.Thread(target=sample_disk_usage, daemon=True)
+
+    try:
+        sampler.start()
+
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '--run-case', name, '--fixtures-dir', fixtures_dir],
+            stdin=subprocess.DEVNULL,
+            env=dict(os.environ, TMPDIR=temp_dir)
+        )
+    except subprocess.CalledProcessError as e:
+        # A failing case is recorded rather than aborting the other cases; its traceback is already on stderr
+        print('{}: failed with exit code {}'.format(name, e.returncode), file=sys.stderr)
+
+        return {'name': name, 'error': 'exit code {}'.format(e.returncode)}
+    finally:
+        done.set()
+        sampler.join()
+        shutil.rmtree(temp_dir)
+
+    result = json.loads(output.decode('UTF-8').splitlines()[-1])
+    result['peakTempDiskBytes'] = peak_temp_disk[0]
+
+    print('{name}: {durationSeconds:.3f}s, {megabytesPerSecond:.1f} MB/s'.format(**result), file=sys.stderr)
+
+    return result
+
+
+def run_case(name, fixtures_dir):
+    input_bytes, case = CASES[name](fixtures_dir)
+
+    start = time.perf_counter()
+    case()
+    duration = time.perf_counter() - start
+
+    print(json.dumps({
+        'name': name,
+        'inputBytes': input_bytes,
+        'durationSeconds': round(duration, 6),
+        'megabytesPerSecond': round(input_bytes / duration / 1000000, 3),
+        'peakRssBytes': peak_rss()
+    }))
+
+    return 0
+
+
+def peak_rss():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS. The children are the workers of `--compress`
+    scale = 1 if sys.platform == 'darwin' else 1024
+
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * scale
+
+
+def invoke_main(main, argv):
+    try:
+        main.run(argv)
+    except SystemExit as e:
+        if e.code:
+            raise RuntimeError('{} exited with {}'.format(argv, e.code))
+
+
+def shazar_case(fixture, *args):
+    def case_for(fixtures_dir):
+        source = os.path.join(fixtures_dir, fixture)
+
+        return path_size(source), lambda: invoke_main(shazar_main, list(args) + ['-o', os.devnull, source])
+
+    return case_for
+
+
+def shazar_stdin_case(fixture, *args):
+    """
+    Runs `shazar --tar` with the tar file read from stdin, as in `tar -c . | shazar`, and the zip file written to a
+    device which can't seek, as to a pipe.
+    """
+    def case_for(fixtures_dir):
+        source = os.path.join(fixtures_dir, fixture)
+
+        def case():
+            stdin = sys.stdin
+
+            with open(source, 'rb') as tar_data:
+                sys.stdin = io.TextIOWrapper(tar_data)
+
+                try:
+                    invoke_main(shazar_main, list(args) + ['--tar', '-o', os.devnull])
+                finally:
+                    sys.stdin = stdin
+
+        return path_size(source), case
+
+    return case_for
+
+
+def bndl_case(fixture, bndl_format, *args):
+    def case_for(fixtures_dir):
+        source = os.path.join(fixtures_dir, fixture)
+
+        return path_size(source), lambda: invoke_main(
+            bndl_main, list(args) + ['--format', bndl_format, '-o', os.devnull, source]
+        )
+
+    return case_for
+
+
+def docker_unpack_case(fixtures_dir):
+    source = os.path.join(fixtures_dir, 'docker-image.tar')
+
+    def case():
+        destination = os.path.join(tempfile.mkdtemp(), 'image')
+
+        with tarfile.open(source, mode='r') as tar:
+            docker_unpack(destination, tar, is_dir=False, maybe_name=DOCKER_IMAGE_NAME, maybe_tag=DOCKER_IMAGE_TAG)
+
+    return path_size(source), case
+
+
+def oci_image_unpack_case(fixtures_dir):
+    source = os.path.join(fixtures_dir, 'oci-image')
+
+    def case():
+        oci_image_unpack(os.path.join(tempfile.mkdtemp(), 'image'), source, is_dir=True)
+
+    return path_size(source), case
+
+
+def deflate_case(fixture, parallel):
+    def case_for(fixtures_dir):
+        source = os.path.join(fixtures_dir, fixture)
+        entries = [(path, os.path.relpath(path, fixtures_dir)) for path in walk_files(source)]
+
+        def case():
+            with tempfile.TemporaryFile() as output, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                if parallel:
+                    zip_utils.write_deflated(zip_file, entries)
+                else:
+                    for path, name in entries:
+                        zip_file.write(path, name)
+
+        return path_size(source), case
+
+    return case_for
+
+
+def hocon_parse_case(parse_string):
+    def case_for(fixtures_dir):
+        content = BUNDLE_CONF.decode('UTF-8')
+
+        def case():
+            for _ in range(HOCON_PARSE_REPEATS):
+                parse_string(content)
+
+        return len(BUNDLE_CONF) * HOCON_PARSE_REPEATS, case
+
+    return case_for
+
+
+CASES = {
+    'shazar-small-files': shazar_case('small-files'),
+    'shazar-small-files-compress': shazar_case('small-files', '--compress'),
+    'shazar-huge-files': shazar_case('huge-files'),
+    'shazar-tar': shazar_case('small-files.tar', '--tar'),
+    'shazar-tar-stdin-many-members': shazar_stdin_case('many-members.tar'),
+    'shazar-tar-stdin-huge-member': shazar_stdin_case('huge-member.tar'),
+    'bndl-bundle-small-files': bndl_case('small-files', 'bundle'),
+    'bndl-bundle-huge-files': bndl_case('huge-files', 'bundle'),
+    'bndl-bundle-zip': bndl_case('small-files.zip', 'bundle', '--env', 'BENCHMARK=1'),
+    'bndl-configuration': bndl_case('configuration', 'configuration'),
+    'bndl-docker': bndl_case('docker-image.tar', 'docker'),
+    'bndl-oci-image': bndl_case('oci-image', 'oci-image', '--image-tag', DOCKER_IMAGE_TAG),
+    'docker-unpack': docker_unpack_case,
+    'oci-image-unpack': oci_image_unpack_case,
+    'deflate-small-files-serial': deflate_case('deflate-small-files', parallel=False),
+    'deflate-small-files-parallel': deflate_case('deflate-small-files', parallel=True),
+    'deflate-tree-serial': deflate_case('deflate-tree', parallel=False),
+    'deflate-tree-parallel': deflate_case('deflate-tree', parallel=True),
+    'hocon-parse-cached': hocon_parse_case(hocon_utils.parse_string),
+    'hocon-parse-uncached': hocon_parse_case(ConfigFactory.parse_string)
+}
+
+
+def create_fixtures(fixtures_dir, args):
+    """
+    Creates the fixtures which don't exist yet within `fixtures_dir`.
+    """
+    def create(name, create_fixture):
+        path = os.path.join(fixtures_dir, name)
+
+        if not os.path.exists(path):
+            print('Creating fixture {}..'.format(name), file=sys.stderr)
+            create_fixture(path)
+
+        return path
+
+    small_files_dir = create('small-files', lambda path: create_files_dir(path, args.small_files,
+                                                                          args.small_file_size))
+    create('huge-files', lambda path: create_files_dir(path, args.huge_files, args.huge_file_size))
+    create('small-files.tar', lambda path: create_tar(path, small_files_dir))
+    create('small-files.zip', lambda path: invoke_main(shazar_main, ['-o', path, small_files_dir]))
+    create('configuration', create_configuration_dir)
+    create('many-members.tar', lambda path: create_members_tar(path, args.tar_members, args.small_file_size))
+    create('huge-member.tar', lambda path: create_members_tar(path, 1, args.tar_huge_member_size))
+    create('deflate-small-files', lambda path: create_files_dir(path, args.deflate_small_files, args.small_file_size))
+    create('deflate-tree', lambda path: create_files_dir(path, args.deflate_tree_size // args.deflate_tree_file_size,
+                                                         args.deflate_tree_file_size))
+    docker_image = create('docker-image.tar', lambda path: create_docker_image(path, args))
+    create('oci-image', lambda path: create_oci_image(path, docker_image))
+
+
+def create_files_dir(path, count, size):
+    os.makedirs(os.path.join(path, 'benchmark', 'lib'))
+
+    with open(os.path.join(path, 'benchmark', 'bundle.conf'), 'wb') as file:
+        file.write(BUNDLE_CONF)
+
+    for index in range(count):
+        write_random_file(os.path.join(path, 'benchmark', 'lib', 'file-{:06d}'.format(index)), size)
+
+
+def create_configuration_dir(path):
+    os.makedirs(path)
+
+    with open(os.path.join(path, 'bundle.conf'), 'wb') as file:
+        file.write(b'name = "benchmark"\n')
+
+    with open(os.path.join(path, 'runtime-config.sh'), 'wb') as file:
+        file.write(b'export BENCHMARK=1\n')
+
+
+def create_tar(path, source_dir):
+    with tarfile.open(path, mode='w') as tar:
+        tar.add(source_dir, arcname=os.path.basename(source_dir))
+
+
+def create_members_tar(path, count, size):
+    with tarfile.open(path, mode='w') as tar:
+        add_member(tar, 'benchmark/bundle.conf', BUNDLE_CONF)
+
+        for index in range(count):
+            add_random_member(tar, 'benchmark/lib/file-{:06d}'.format(index), size)
+
+
+def create_docker_image(path, args):
+    """
+    Creates a tarball in the format of `docker save`, where each layer holds a share of the small files and one of the
+    layers also holds a huge file.
+    """
+    layers = []
+    diff_ids = []
+    files_per_layer = max(1, args.small_files // args.docker_layers)
+
+    with tarfile.open(path, mode='w') as image:
+        for layer_index in range(args.docker_layers):
+            with tempfile.TemporaryFile() as layer_data:
+                with tarfile.open(fileobj=layer_data, mode='w') as layer:
+                    for index in range(files_per_layer):
+                        add_random_member(layer, 'opt/benchmark/layer-{}/file-{:06d}'.format(layer_index, index),
+                                          args.small_file_size)
+
+                    if layer_index == 0:
+                        add_random_member(layer, 'opt/benchmark/huge-file', args.huge_file_size)
+
+                layer_data.seek(0)
+                layer_digest = hashlib.sha256()
+                for chunk in iter(lambda: layer_data.read(1024 * 1024), b''):
+                    layer_digest.update(chunk)
+
+                layer_id = layer_digest.hexdigest()
+                layers.append('{}/layer.tar'.format(layer_id))
+                diff_ids.append('sha256:{}'.format(layer_id))
+
+                # Like `docker save`, each layer dir also holds the legacy metadata of the layer
+                add_member(image, '{}/VERSION'.format(layer_id), b'1.0')
+                add_member(image, '{}/json'.format(layer_id), json.dumps({'id': layer_id}).encode('UTF-8'))
+
+                layer_data.seek(0)
+                layer_info = image.gettarinfo(arcname=layers[-1], fileobj=layer_data)
+                image.addfile(layer_info, layer_data)
+
+        config_data = json.dumps({
+            'created': '2017-06-01T00:00:00Z',
+            'architecture': 'amd64',
+            'os': 'linux',
+            'config': {
+                'Cmd': ['/opt/benchmark/bin/benchmark'],
+                'Env': ['PATH=/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin'],
+                'ExposedPorts': {'9000/tcp': {}}
+            },
+            'rootfs': {'type': 'layers', 'diff_ids': diff_ids},
+            'history': [{'created': '2017-06-01T00:00:00Z'} for _ in diff_ids]
+        }).encode('UTF-8')
+        config_name = '{}.json'.format(hashlib.sha256(config_data).hexdigest())
+
+        add_member(image, config_name, config_data)
+        add_member(image, 'manifest.json', json.dumps([{
+            'Config': config_name,
+            'RepoTags': ['{}:{}'.format(DOCKER_IMAGE_NAME, DOCKER_IMAGE_TAG)],
+            'Layers': layers
+        }]).encode('UTF-8'))
+
+
+def create_oci_image(path, docker_image):
+    with tarfile.open(docker_image, mode='r') as tar:
+        docker_unpack(path, tar, is_dir=False, maybe_name=DOCKER_IMAGE_NAME, maybe_tag=DOCKER_IMAGE_TAG)
+
+
+def add_member(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = 1496275200
+    tar.addfile(info, io.BytesIO(data))
+
+
+def add_random_member(tar, name, size):
+    with tempfile.TemporaryFile() as data:
+        write_random_data(data, size)
+        data.seek(0)
+
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = 1496275200
+        tar.addfile(info, data)
+
+
+def write_random_file(path, size):
+    with open(path, 'wb') as file:
+        write_random_data(file, size)
+
+
+def write_random_data(file, size):
+    # Half random and half zeros, so that compression has some work to do
+    remaining = size
+
+    while remaining > 0:
+        chunk_size = min(remaining, 1024 * 1024)
+        half = chunk_size // 2
+        file.write(os.urandom(half) + bytes(chunk_size - half))
+        remaining -= chunk_size
+
+
+def walk_files(path):
+    for (dir_path, dir_names, file_names) in os.walk(path):
+        for file_name in sorted(file_names):
+            yield os.path.join(dir_path, file_name)
+
+
+def path_size(path):
+    return dir_size(path) if os.path.isdir(path) else os.path.getsize(path)
+
+
+def dir_size(path):
+    size = 0
+
+    for (dir_path, dir_names, file_names) in os.walk(path):
+        for file_name in file_names:
+            try:
+                size += os.lstat(os.path.join(dir_path, file_name)).st_size
+            except OSError:
+                # The file was removed while the dir was walked
+                pass
+
+    return size
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL).decode('UTF-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    sys.exit(run())
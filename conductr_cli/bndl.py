@@ -1,4 +1,5 @@
 from conductr_cli import bndl_main, main_handler
+import multiprocessing
 
 
 def main_method():
@@ -10,4 +11,6 @@ def run():
 
 
 if __name__ == '__main__':
+    # Lets the processes that compress zip entries start when running as a native executable
+    multiprocessing.freeze_support()
     run()
@@ -1,4 +1,4 @@
-from conductr_cli import bndl_oci, validation
+from conductr_cli import bndl_oci, hocon_utils, validation
 from conductr_cli.bndl_oci import oci_image_bundle_conf, oci_image_unpack
 from conductr_cli.bndl_docker import docker_unpack
 from conductr_cli.bndl_utils import \
@@ -13,13 +13,19 @@ from conductr_cli.bndl_utils import \
     find_bundle_conf_dir, \
     first_mtime, \
     load_bundle_args_into_conf, \
-    zip_extract_with_dates
+    zip_find_bundle_conf_dir, \
+    zip_first_mtime, \
+    zip_to_tar, \
+    zip_to_zip
 from conductr_cli.bundle_validation import validate_bundle_conf
-from conductr_cli.constants import BNDL_PEEK_SIZE, IO_CHUNK_SIZE, SHAZAR_TIMESTAMP_MIN
-from conductr_cli.shazar_main import dir_to_zip, write_with_digest
+from conductr_cli.constants import BNDL_PEEK_SIZE, DEFAULT_BUILD_CACHE_DIR, IO_CHUNK_SIZE, SHAZAR_TIMESTAMP_MIN
+from conductr_cli.incremental_build import IncrementalBuild
+from conductr_cli.shazar_main import dir_to_zip, write_zip_with_digest
+from functools import partial
 from io import BufferedReader, BytesIO
 from pyhocon import ConfigException, ConfigFactory, HOCONConverter
 import arrow
+import hashlib
 import logging
 import os
 import shutil
@@ -60,6 +66,9 @@ def bndl_create(args):
     input_dir = temp_dir
     component_name = 'component'
     component_dir = os.path.join(temp_dir, component_name)
+    source_zip_file = None
+    source_zip_dir = ''
+    source_is_dir = False
     mtime = None
     bundle_conf_data = b''
     runtime_conf_data = b''
@@ -131,18 +140,19 @@ def bndl_create(args):
                 with open(os.path.join(temp_dir, 'bundle.conf'), 'wb') as bundle_conf_fileobj:
                     shutil.copyfileobj(buff_in, bundle_conf_fileobj)
             elif not args.source and data_is_zip(peek):
-                with tempfile.NamedTemporaryFile() as temp:
-                    shutil.copyfileobj(buff_in, temp)
-                    temp.seek(0)
-                    zip_extract_with_dates(temp, temp_dir)
+                source_zip_path = os.path.join(temp_dir, 'source.zip')
+                with open(source_zip_path, 'wb') as source_zip_fileobj:
+                    shutil.copyfileobj(buff_in, source_zip_fileobj)
+                source_zip_file = zipfile.ZipFile(source_zip_path)
             elif not args.source and data_is_tar(peek):
                 with tarfile.open(fileobj=buff_in, mode='r|') as tar:
                     tar.extractall(temp_dir)
             elif os.path.isdir(args.source):
-                os.rmdir(temp_dir)
-                shutil.copytree(args.source, temp_dir)
+                # The bundle is built from the source directory in place, without modifying it
+                input_dir = args.source
+                source_is_dir = True
             elif os.path.isfile(args.source) and zipfile.is_zipfile(args.source):
-                zip_extract_with_dates(args.source, temp_dir)
+                source_zip_file = zipfile.ZipFile(args.source)
             elif os.path.isfile(args.source) and tarfile.is_tarfile(args.source):
                 with tarfile.open(args.source) as tar:
                     tar.extractall(temp_dir)
@@ -153,20 +163,31 @@ def bndl_create(args):
                 log.error('bndl: Not a ConductR Bundle')
                 return 2
 
-            input_dir = find_bundle_conf_dir(temp_dir)
-
-            bundle_conf_path = os.path.join(input_dir, 'bundle.conf')
             bundle_conf_data = None
-            if os.path.exists(bundle_conf_path):
-                with open(bundle_conf_path, 'rb') as bundle_conf_fileobj:
-                    bundle_conf_data = bundle_conf_fileobj.read()
-                os.unlink(bundle_conf_path)
 
-            runtime_conf_path = os.path.join(input_dir, 'runtime-config.sh')
+            if source_zip_file is not None:
+                # The entries of a zip are copied as is rather than being extracted, see `zip_to_zip` below
+                source_zip_dir = zip_find_bundle_conf_dir(source_zip_file)
+                source_zip_names = source_zip_file.namelist()
+
+                if source_zip_dir + 'bundle.conf' in source_zip_names:
+                    bundle_conf_data = source_zip_file.read(source_zip_dir + 'bundle.conf')
+
+                if source_zip_dir + 'runtime-config.sh' in source_zip_names:
+                    runtime_conf_str = source_zip_file.read(source_zip_dir + 'runtime-config.sh').decode('UTF-8')
+            else:
+                input_dir = find_bundle_conf_dir(input_dir)
 
-            if os.path.exists(runtime_conf_path):
-                with open(runtime_conf_path, 'r') as runtime_conf_fileobj:
-                    runtime_conf_str = runtime_conf_fileobj.read()
+                bundle_conf_path = os.path.join(input_dir, 'bundle.conf')
+                if os.path.exists(bundle_conf_path):
+                    with open(bundle_conf_path, 'rb') as bundle_conf_fileobj:
+                        bundle_conf_data = bundle_conf_fileobj.read()
+
+                runtime_conf_path = os.path.join(input_dir, 'runtime-config.sh')
+
+                if os.path.exists(runtime_conf_path):
+                    with open(runtime_conf_path, 'r') as runtime_conf_fileobj:
+                        runtime_conf_str = runtime_conf_fileobj.read()
 
         for env in args.envs if hasattr(args, 'envs') else []:
             if runtime_conf_str:
@@ -178,14 +199,21 @@ def bndl_create(args):
 
         if not args.name:
                 try:
-                    bundle_conf = ConfigFactory.parse_string(bundle_conf_data.decode('UTF-8'))
+                    bundle_conf = hocon_utils.parse_string(bundle_conf_data.decode('UTF-8'))
 
                     if 'name' in bundle_conf:
                         args.name = bundle_conf['name']
                 except:
                     pass  # ignore exceptions - we'll catch the bad config below
 
-        mtime = first_mtime(input_dir, SHAZAR_TIMESTAMP_MIN) if mtime is None else mtime
+        # bundle.conf and runtime-config.sh are replaced by the entries that are written for them below
+        conf_file_names = {'bundle.conf', 'runtime-config.sh'} if runtime_conf_data else {'bundle.conf'}
+        excludes = {os.path.join(input_dir, file_name) for file_name in conf_file_names}
+
+        if mtime is None and source_zip_file is not None:
+            mtime = zip_first_mtime(source_zip_file, source_zip_dir, SHAZAR_TIMESTAMP_MIN, excludes=['bundle.conf'])
+        elif mtime is None:
+            mtime = first_mtime(input_dir, SHAZAR_TIMESTAMP_MIN, excludes=[os.path.join(input_dir, 'bundle.conf')])
 
         if process_oci:
             if args.name:
@@ -227,7 +255,7 @@ def bndl_create(args):
 
         if bundle_conf_data:
             try:
-                bundle_conf = ConfigFactory.parse_string(bundle_conf_data.decode('UTF-8'))
+                bundle_conf = hocon_utils.parse_string(bundle_conf_data.decode('UTF-8'))
             except ConfigException:
                 log.error('bndl: Unable to parse bundle.conf')
                 return 1
@@ -246,40 +274,78 @@ def bndl_create(args):
         archive_name = bundle_conf['name'] if 'name' in bundle_conf else 'bundle'
         bundle_conf_name = os.path.join(archive_name, 'bundle.conf')
 
-        if runtime_conf_data:
-            runtime_conf_name = os.path.join(input_dir, 'runtime-config.sh')
+        # Files that aren't in the input dir, i.e. the rewritten bundle.conf and runtime-config.sh
+        conf_entries = [(bundle_conf_name, bundle_conf_data)]
 
-            with open(runtime_conf_name, 'wb') as runtime_conf_fileobj:
-                runtime_conf_fileobj.write(runtime_conf_data)
+        if runtime_conf_data:
+            conf_entries.append((os.path.join(archive_name, 'runtime-config.sh'), runtime_conf_data))
 
         if args.use_shazar:
-            with tempfile.NamedTemporaryFile() as zip_file_data:
-                with zipfile.ZipFile(zip_file_data, 'w') as zip_file:
-                    bundle_conf_zinfo = zipfile.ZipInfo(filename=bundle_conf_name, date_time=time.localtime(mtime)[:6])
-                    bundle_conf_zinfo.external_attr = 0o644 << 16
-                    zip_file.writestr(bundle_conf_zinfo, bundle_conf_data)
-                    dir_to_zip(input_dir, zip_file, archive_name, mtime)
-
-                zip_file_data.flush()
-                zip_file_data.seek(0)
-
-                write_with_digest(zip_file_data, output)
+            compress = args.compress if hasattr(args, 'compress') else False
+            incremental = args.incremental if hasattr(args, 'incremental') else False
+
+            if incremental and source_is_dir:
+                incremental_build = IncrementalBuild(DEFAULT_BUILD_CACHE_DIR, 'bndl', input_dir, {
+                    'archiveName': archive_name,
+                    'mtime': mtime,
+                    'compress': compress,
+                    'confEntries': [[conf_name, hashlib.sha256(conf_data).hexdigest()]
+                                    for conf_name, conf_data in conf_entries]
+                }, excludes, followlinks=True)
+            else:
+                incremental_build = None
+
+            def write_entries(zip_file):
+                for conf_name, conf_data in conf_entries:
+                    conf_zinfo = zipfile.ZipInfo(filename=conf_name, date_time=time.localtime(mtime)[:6])
+                    conf_zinfo.external_attr = 0o644 << 16
+                    if compress:
+                        conf_zinfo.compress_type = zipfile.ZIP_DEFLATED
+                    zip_file.writestr(conf_zinfo, conf_data)
+
+                if source_zip_file is not None:
+                    zip_to_zip(source_zip_file, source_zip_dir, zip_file, archive_name, mtime, conf_file_names)
+                else:
+                    dir_to_zip(input_dir, zip_file, archive_name, mtime, compress=compress, excludes=excludes,
+                               incremental_build=incremental_build, followlinks=True)
+
+            if incremental_build is not None:
+                incremental_build.build(output, partial(write_zip_with_digest, write_entries=write_entries))
+            else:
+                write_zip_with_digest(output, write_entries)
         else:
-            with tarfile.open(fileobj=output, mode='w|') as tar:
-                info = tarfile.TarInfo(name=bundle_conf_name)
-                info.size = len(bundle_conf_data)
-                info.mtime = mtime
-                tar.addfile(tarinfo=info, fileobj=BytesIO(bundle_conf_data))
-
-                for (dir_path, dir_names, file_names) in os.walk(input_dir):
-                    for file_name in file_names:
-                        path = os.path.join(dir_path, file_name)
-                        name = os.path.join(archive_name, os.path.relpath(path, start=input_dir))
-                        os.utime(path, (mtime, mtime))
-                        tar.add(path, arcname=name)
+            with tarfile.open(fileobj=output, mode='w|', dereference=True) as tar:
+                for conf_name, conf_data in conf_entries:
+                    info = tarfile.TarInfo(name=conf_name)
+                    info.size = len(conf_data)
+                    info.mtime = mtime
+                    tar.addfile(tarinfo=info, fileobj=BytesIO(conf_data))
+
+                if source_zip_file is not None:
+                    zip_to_tar(source_zip_file, source_zip_dir, tar, archive_name, mtime, conf_file_names)
+                else:
+                    for (dir_path, dir_names, file_names) in os.walk(input_dir, followlinks=True):
+                        for file_name in file_names:
+                            path = os.path.join(dir_path, file_name)
+
+                            if path in excludes:
+                                continue
+
+                            info = tar.gettarinfo(path, arcname=os.path.join(archive_name,
+                                                                             os.path.relpath(path, start=input_dir)))
+                            info.mtime = mtime
+
+                            if info.isreg():
+                                with open(path, 'rb') as file:
+                                    tar.addfile(tarinfo=info, fileobj=file)
+                            else:
+                                tar.addfile(tarinfo=info)
 
         output.flush()
 
         return 0
     finally:
+        if source_zip_file is not None:
+            source_zip_file.close()
+
         shutil.rmtree(temp_dir)
@@ -1,4 +1,6 @@
 from conductr_cli.bndl_utils import DigestReaderWriter, file_write_bytes
+from conductr_cli.constants import BNDL_LAYER_WORKERS
+from concurrent.futures import ThreadPoolExecutor
 import gzip
 import hashlib
 import json
@@ -180,124 +182,178 @@ def docker_config_to_oci_image(manifest, config, sizes, layers_to_digests):
 
 
 def docker_unpack(destination, data, is_dir, maybe_name, maybe_tag):
-    temp_dir = tempfile.mkdtemp()
+    """
+    Converts a Docker image in the format of `docker save` into an OCI image at `destination`. Each layer is
+    written once, directly into the blobs of the OCI image, and hashed as it's written. The layers of a directory
+    are converted on a pool of threads.
 
-    try:
-        os.makedirs(os.path.join(destination, 'blobs/sha256'))
-        os.makedirs(os.path.join(destination, 'refs'))
+    :param data: a directory when `is_dir`, otherwise an open `TarFile`, which may be a stream
+    :return: the name of the image, or None if `data` holds no image matching `maybe_name` and `maybe_tag`
+    """
+    blobs_dir = os.path.join(destination, 'blobs/sha256')
+
+    os.makedirs(blobs_dir)
+    os.makedirs(os.path.join(destination, 'refs'))
+
+    file_write_bytes(os.path.join(destination, 'oci-layout'), '{"imageLayoutVersion": "1.0.0"}'.encode('UTF-8'))
+
+    if is_dir:
+        return docker_unpack_dir(destination, blobs_dir, data, maybe_name, maybe_tag)
+    else:
+        return docker_unpack_tar(destination, blobs_dir, data, maybe_name, maybe_tag)
+
+
+def docker_unpack_dir(destination, blobs_dir, dir, maybe_name, maybe_tag):
+    contents_dir = docker_find_contents_dir(dir)
+
+    if contents_dir is None:
+        return None
+
+    manifest = docker_find_manifest(contents_dir, maybe_name, maybe_tag)
+
+    if manifest is None:
+        return None
+
+    # Layers may be symlinks to the layers of other images, so each file is only converted once
+    layer_paths = {layer: os.path.realpath(os.path.join(contents_dir, layer)) for layer in manifest['Layers']}
+    unique_layer_paths = sorted(set(layer_paths.values()))
+
+    def layer_path_to_blob(path):
+        with open(path, 'rb') as fileobj:
+            return docker_layer_to_blob(blobs_dir, fileobj)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(BNDL_LAYER_WORKERS, len(unique_layer_paths)))) as executor:
+        blobs = dict(zip(unique_layer_paths, executor.map(layer_path_to_blob, unique_layer_paths)))
 
-        file_write_bytes(os.path.join(destination, 'oci-layout'), '{"imageLayoutVersion": "1.0.0"}'.encode('UTF-8'))
+    sizes = {digest: size for digest, size in blobs.values()}
+    layers_to_digests = {layer: blobs[path][0] for layer, path in layer_paths.items()}
 
+    return docker_write_oci_image(destination, contents_dir, manifest, sizes, layers_to_digests)
+
+
+def docker_unpack_tar(destination, blobs_dir, tar, maybe_name, maybe_tag):
+    # The tar may be a stream, so the layers are converted as they're read, before the manifest is known. The other
+    # files are small and are extracted to a temp dir to be read afterwards.
+    temp_dir = tempfile.mkdtemp()
+
+    try:
         layers_to_digests = {}
         symlinks = {}
-        digests = {}
         sizes = {}
 
-        def handle_entry(name, fileobj, isdir, isfile, issym, top):
-            parent_dir = os.path.dirname(name)
-            immediate_parent_dir = os.path.basename(parent_dir)
-
-            if parent_dir != top:
-                os.makedirs(os.path.join(temp_dir, 'layers', parent_dir), exist_ok=True)
-
-            file_name = os.path.basename(name)
-
-            if isdir:
-                os.makedirs(os.path.join(temp_dir, 'layers', file_name))
-            elif isfile and parent_dir == top:
-                with open(os.path.join(temp_dir, file_name), 'wb') as dest:
-                    shutil.copyfileobj(fileobj, dest)
-            elif issym and file_name == 'layer.tar':
-                if fileobj.startswith('../'):
-                    symlinks[os.path.join(immediate_parent_dir, file_name)] = fileobj[3:]
-                else:
-                    symlinks[os.path.join(immediate_parent_dir, file_name)] = fileobj
-            elif isfile and file_name == 'layer.tar':
-                dest_path = os.path.join(temp_dir, 'layers', parent_dir, 'data')
-
-                with open(dest_path, 'wb') as dest_file:
-                    dest_file_digest = DigestReaderWriter(dest_file)
-
-                    # TODO investigate if below is still the case
-                    # bundles are packaged into zips, so we don't want to compress, but OCI tooling
-                    # as of 2017-03-14 is broken for plain tar files; they must be gzip
-
-                    with gzip.GzipFile(fileobj=dest_file_digest, mode='wb', compresslevel=0, mtime=0) as dest:
-                        shutil.copyfileobj(fileobj, dest)
-
-                    dest_file_hexdigest = dest_file_digest.digest_out.hexdigest()
-                    dest_file_size = dest_file_digest.size_out
-                    digests[dest_file_hexdigest] = dest_path
-                    sizes[dest_file_hexdigest] = dest_file_size
-                    layers_to_digests[os.path.join(immediate_parent_dir, file_name)] = dest_file_hexdigest
-
-                os.renames(dest_path, '{}/blobs/sha256/{}'.format(destination, dest_file_hexdigest))
-            else:
-                with open(os.path.join(temp_dir, 'layers', parent_dir, file_name), 'wb') as dest:
-                    shutil.copyfileobj(fileobj, dest)
+        for entry in tar:
+            name = os.path.normpath(entry.name)
 
-        if is_dir:
-            for base, dirs, files in os.walk(data):
-                for file in files:
-                    name = os.path.join(base, file)
+            if os.path.isabs(name) or name.startswith('..'):
+                continue
 
-                    with open(name, 'rb') as fileobj:
-                        handle_entry(name, fileobj, isdir=False, isfile=True, issym=False, top=data)
-        else:
-            for entry in data:
-                if entry.isfile():
-                    handle_entry(entry.name, data.extractfile(entry), isdir=False, isfile=True, issym=False, top='')
-                elif entry.issym():
-                    handle_entry(entry.name, entry.linkname, isdir=False, isfile=False, issym=True, top='')
+            layer = os.path.join(os.path.basename(os.path.dirname(name)), os.path.basename(name))
+
+            if entry.issym() and os.path.basename(name) == 'layer.tar':
+                symlinks[layer] = entry.linkname[3:] if entry.linkname.startswith('../') else entry.linkname
+            elif entry.isfile() and os.path.basename(name) == 'layer.tar':
+                digest, size = docker_layer_to_blob(blobs_dir, tar.extractfile(entry))
+                sizes[digest] = size
+                layers_to_digests[layer] = digest
+            elif entry.isfile():
+                path = os.path.join(temp_dir, name)
+
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+                with open(path, 'wb') as dest:
+                    shutil.copyfileobj(tar.extractfile(entry), dest)
 
         for key in symlinks:
             layers_to_digests[key] = layers_to_digests[symlinks[key]]
 
-        contents_dir = None
-
-        for base, dirs, files in os.walk(temp_dir):
-            if 'manifest.json' in files:
-                contents_dir = base
-                break
+        contents_dir = docker_find_contents_dir(temp_dir)
 
         if contents_dir is None:
             return None
-        else:
-            with open(os.path.join(contents_dir, 'manifest.json'), 'r') as manifest_file:
-                manifests = json.load(manifest_file)
-                manifest = None
-
-                for m in manifests:
-                    if m['RepoTags'] and \
-                            any(t for t in m['RepoTags'] if docker_image_name_matches(maybe_name, maybe_tag, t)):
-                        manifest = m
-                        break
-
-                if manifest is None:
-                    return None
-                else:
-                    image_name, image_tag = docker_parse_image_name(manifest['RepoTags'][0])
-
-                    with open(os.path.join(contents_dir, manifest['Config'])) as config_file:
-                        config = json.load(config_file)
-
-                        oci_spec = docker_config_to_oci_image(manifest, config, sizes, layers_to_digests)
-
-                        file_write_bytes(
-                            '{}/blobs/sha256/{}'.format(destination, oci_spec['config_digest']),
-                            oci_spec['config']
-                        )
-
-                        file_write_bytes(
-                            '{}/blobs/sha256/{}'.format(destination, oci_spec['manifest_digest']),
-                            oci_spec['manifest']
-                        )
-
-                        file_write_bytes(
-                            '{}/refs/{}'.format(destination, image_tag),
-                            oci_spec['refs']
-                        )
-
-                    return image_name
+
+        manifest = docker_find_manifest(contents_dir, maybe_name, maybe_tag)
+
+        if manifest is None:
+            return None
+
+        return docker_write_oci_image(destination, contents_dir, manifest, sizes, layers_to_digests)
     finally:
         shutil.rmtree(temp_dir)
+
+
+def docker_layer_to_blob(blobs_dir, fileobj):
+    """
+    Writes a layer to `blobs_dir` as a blob named after its digest. The blob is written to a temp file within
+    `blobs_dir` while it's hashed, and then renamed, so its data is only written once.
+
+    :return: tuple of the hex digest and size of the blob
+    """
+    fd, temp_path = tempfile.mkstemp(dir=blobs_dir, prefix='.layer')
+    replaced = False
+
+    try:
+        with os.fdopen(fd, 'wb') as dest_file:
+            dest_file_digest = DigestReaderWriter(dest_file)
+
+            # TODO investigate if below is still the case
+            # bundles are packaged into zips, so we don't want to compress, but OCI tooling
+            # as of 2017-03-14 is broken for plain tar files; they must be gzip
+
+            with gzip.GzipFile(fileobj=dest_file_digest, mode='wb', compresslevel=0, mtime=0) as dest:
+                shutil.copyfileobj(fileobj, dest)
+
+        dest_file_hexdigest = dest_file_digest.digest_out.hexdigest()
+
+        os.replace(temp_path, os.path.join(blobs_dir, dest_file_hexdigest))
+        replaced = True
+    finally:
+        # The temp file is also removed if the copy is interrupted, e.g. by a KeyboardInterrupt
+        if not replaced:
+            os.remove(temp_path)
+
+    return dest_file_hexdigest, dest_file_digest.size_out
+
+
+def docker_find_contents_dir(dir):
+    for base, dirs, files in os.walk(dir):
+        if 'manifest.json' in files:
+            return base
+
+    return None
+
+
+def docker_find_manifest(contents_dir, maybe_name, maybe_tag):
+    with open(os.path.join(contents_dir, 'manifest.json'), 'r') as manifest_file:
+        manifests = json.load(manifest_file)
+
+    for m in manifests:
+        if m['RepoTags'] and any(t for t in m['RepoTags'] if docker_image_name_matches(maybe_name, maybe_tag, t)):
+            return m
+
+    return None
+
+
+def docker_write_oci_image(destination, contents_dir, manifest, sizes, layers_to_digests):
+    image_name, image_tag = docker_parse_image_name(manifest['RepoTags'][0])
+
+    with open(os.path.join(contents_dir, manifest['Config'])) as config_file:
+        config = json.load(config_file)
+
+    oci_spec = docker_config_to_oci_image(manifest, config, sizes, layers_to_digests)
+
+    file_write_bytes(
+        '{}/blobs/sha256/{}'.format(destination, oci_spec['config_digest']),
+        oci_spec['config']
+    )
+
+    file_write_bytes(
+        '{}/blobs/sha256/{}'.format(destination, oci_spec['manifest_digest']),
+        oci_spec['manifest']
+    )
+
+    file_write_bytes(
+        '{}/refs/{}'.format(destination, image_tag),
+        oci_spec['refs']
+    )
+
+    return image_name
@@ -536,6 +536,20 @@ def build_parser():
                         dest='use_shazar',
                         action='store_false')
 
+    parser.add_argument('--compress',
+                        help='If enabled, the entries of a bundle run through shazar are compressed with DEFLATE\n'
+                             'on all cores',
+                        default=False,
+                        dest='compress',
+                        action='store_true')
+
+    parser.add_argument('--incremental',
+                        help='If enabled, a bundle of a directory run through shazar is built incrementally,\n'
+                             'copying the unchanged files from the bundle of its previous build',
+                        default=False,
+                        dest='incremental',
+                        action='store_true')
+
     parser.add_argument('-o', '--output',
                         nargs='?',
                         help='The target output file\n'
@@ -1,5 +1,5 @@
 from pyhocon import HOCONConverter, ConfigFactory, ConfigTree
-from conductr_cli.bndl_utils import create_check_hocon
+from conductr_cli.bndl_utils import create_check_hocon, file_link_or_copy
 from conductr_cli.constants import BNDL_DEFAULT_CHECK_RETRY_COUNT, BNDL_DEFAULT_CHECK_RETRY_DELAY
 import json
 import os
@@ -100,20 +100,68 @@ def oci_image_extract_manifest_config(dir, tag):
 
 
 def oci_image_unpack(destination, data, is_dir):
-    temp_dir = tempfile.mkdtemp()
+    """
+    Imports an OCI image layout into `destination`. The blobs of a directory are hard linked rather than copied where
+    possible, see `file_link_or_copy`, and a tar is extracted within `destination` so its files are only written once.
+
+    :param data: a directory when `is_dir`, otherwise an open `TarFile`, which may be a stream
+    :return: True if `data` holds an OCI image layout, possibly within a sub directory
+    """
+    if is_dir:
+        return oci_image_import_dir(destination, data)
+    else:
+        return oci_image_extract_tar(destination, data)
+
+
+def oci_image_find_layout_dir(dir):
+    for base, dirs, files in os.walk(dir, followlinks=True):
+        if 'oci-layout' in files or 'refs' in dirs:
+            return base
+
+    return None
 
-    try:
-        if is_dir:
-            shutil.copytree(data, os.path.join(temp_dir, 'image'))
-        else:
-            data.extractall(temp_dir)
 
-        for base, dirs, files in os.walk(temp_dir):
-            if 'oci-layout' in files or 'refs' in dirs:
-                os.renames(base, destination)
-                return True
+def oci_image_import_dir(destination, dir):
+    layout_dir = oci_image_find_layout_dir(dir)
 
+    if layout_dir is None:
         return False
+
+    for base, dirs, files in os.walk(layout_dir, followlinks=True):
+        rel_path = os.path.relpath(base, layout_dir)
+        dest_base = os.path.normpath(os.path.join(destination, rel_path))
+        is_blobs_dir = rel_path.split(os.sep)[0] == 'blobs'
+
+        os.makedirs(dest_base, exist_ok=True)
+
+        for file_name in files:
+            # Blobs are named after their digest, so they're never written to. The other files are small.
+            if is_blobs_dir:
+                file_link_or_copy(os.path.join(base, file_name), os.path.join(dest_base, file_name))
+            else:
+                shutil.copy2(os.path.join(base, file_name), os.path.join(dest_base, file_name))
+
+    return True
+
+
+def oci_image_extract_tar(destination, tar):
+    # The layout may be within a sub directory of the tar, which is only known once the tar has been read. Extracting
+    # within `destination` means that the layout is then moved into place by renaming rather than by copying.
+    os.makedirs(destination, exist_ok=True)
+
+    extract_dir = tempfile.mkdtemp(dir=destination, prefix='.extract')
+
+    try:
+        tar.extractall(extract_dir)
+
+        layout_dir = oci_image_find_layout_dir(extract_dir)
+
+        if layout_dir is None:
+            return False
+
+        for name in os.listdir(layout_dir):
+            os.rename(os.path.join(layout_dir, name), os.path.join(destination, name))
+
+        return True
     finally:
-        if os.path.isdir(temp_dir):
-            shutil.rmtree(temp_dir)
+        shutil.rmtree(extract_dir)
@@ -1,9 +1,16 @@
-from conductr_cli.constants import BNDL_IGNORE_TAGS, MAGIC_NUMBER_TAR, MAGIC_NUMBER_TAR_OFFSET, MAGIC_NUMBERS_ZIP
+from conductr_cli import hocon_utils, zip_utils
+from conductr_cli.constants import BNDL_IGNORE_TAGS, MAGIC_NUMBER_GZIP, MAGIC_NUMBER_TAR, MAGIC_NUMBER_TAR_OFFSET, \
+    MAGIC_NUMBERS_ZIP
 from enum import Enum
 from pyhocon import ConfigFactory, ConfigTree
 import hashlib
 import os
+import posixpath
 import re
+import shutil
+import stat
+import sys
+import tarfile
 import time
 import zipfile
 
@@ -68,12 +75,37 @@ class ApplicationType(Enum):
             }
 
 
+# The formats detected by `detect_format_dir`, keyed by the real path and modification time of the directory. The
+# markers are entries of the directory itself, so adding or removing one changes its modification time.
+detected_dir_formats = {}
+
+# `docker save <image>` starts with a hex digest tar dir entry, and `docker save <image>:<tag>` with a json tar file
+# entry. The tar header pads the name with NUL bytes.
+DOCKER_SAVE_DIR_PATTERN = re.compile(b'[0-9a-f]{64}/')
+DOCKER_SAVE_CONFIG_PATTERN = re.compile(b'[0-9a-f]{64}[.]json')
+
+# The ioctl which clones a file, i.e. _IOW(0x94, 9, int), see ioctl_ficlone(2)
+LINUX_FICLONE = 0x40049409
+
+# Control characters which don't occur in text, i.e. all but tab, line feed, form feed and carriage return
+BINARY_DATA_PATTERN = re.compile(b'[\x00-\x08\x0b\x0e-\x1f\x7f]')
+
+
 def detect_format_dir(dir):
     """
-    Detects the format of a directory on disk.
+    Detects the format of a directory on disk. The result is cached per directory.
     :param dir:
     :return: one of 'BndlFormat.DOCKER', 'BndlFormat.OCI_IMAGE', 'BndlFormat.BUNDLE'
     """
+    key = (os.path.realpath(dir), os.stat(dir).st_mtime_ns)
+
+    if key not in detected_dir_formats:
+        detected_dir_formats[key] = detect_format_dir_entries(dir)
+
+    return detected_dir_formats[key]
+
+
+def detect_format_dir_entries(dir):
     if os.path.isfile(os.path.join(dir, 'oci-layout')) and \
             os.path.isdir(os.path.join(dir, 'refs')) and \
             os.path.isdir(os.path.join(dir, 'blobs')):
@@ -91,51 +123,67 @@ def detect_format_stream(initial_chunk):
     but does work pretty well with detecting `docker save` streams. OCI detection may need
     to be expanded as the tooling matures.
 
+    The cheap checks of magic numbers and markers come first, so that binary data is never
+    parsed as HOCON. Only text is checked for being a bundle.conf.
+
     :param initial_chunk:
     :return: one of 'BndlFormat.DOCKER', 'BndlFormat.OCI_IMAGE', 'BndlFormat.BUNDLE' or None
     """
-
-    def try_match(pattern, slice):
-        try:
-            return not not re.match(pattern, slice.decode('UTF-8'))
-        except UnicodeError:
-            # we're attempting to decode binary data as UTF8 to check for certain markers,
-            # but it's possible we aren't actually given UTF8 data so in that case the
-            # decode calls above will throw a UnicodeError.
-
-            return False
-
-    if try_match('^[0-9a-f]{64}[/]', initial_chunk[0:65]):
+    if initial_chunk == b'':
+        return None
+    elif DOCKER_SAVE_DIR_PATTERN.match(initial_chunk):
         # docker save <image>
         return BndlFormat.DOCKER
-    elif try_match('^[0-9a-f]{64}[.]json$', initial_chunk[0:69]):
+    elif DOCKER_SAVE_CONFIG_PATTERN.fullmatch(initial_chunk[0:69]):
         # docker save <image>:<tag>
         return BndlFormat.DOCKER
+    elif data_is_zip(initial_chunk):
+        return BndlFormat.BUNDLE
+    elif data_is_gzip(initial_chunk):
+        # The markers below can't be seen within compressed data, and bndl doesn't decompress streams
+        return None
     elif b'/oci-layout\x00\x00\x00' in initial_chunk and b'/refs/\x00\x00\x00' in initial_chunk:
         # tar c on an oci folder (somewhat unreliable)
         return BndlFormat.OCI_IMAGE
     elif b'/manifest.json\x00\x00\x00' in initial_chunk and b'/layer.tar\x00\x00\x00' in initial_chunk:
         # tar c on a docker folder (somewhat unreliable)
         return BndlFormat.DOCKER
-    elif b'\x00' not in initial_chunk and initial_chunk != b'' and data_is_bundle_conf(initial_chunk):
-        return BndlFormat.BUNDLE
-    elif data_is_zip(initial_chunk):
-        return BndlFormat.BUNDLE
     elif data_is_tar(initial_chunk):
         # TAR marker
         return BndlFormat.BUNDLE
+    elif data_is_bundle_conf(initial_chunk):
+        return BndlFormat.BUNDLE
     else:
         return None
 
 
 def data_is_bundle_conf(data):
+    """
+    Detects if a chunk of data is a bundle.conf, i.e. text which parses as HOCON. Binary
+    data is rejected without parsing it.
+    :param data: the bundle.conf, at most `BNDL_PEEK_SIZE` bytes of it
+    :return: True if bundle.conf
+    """
+    if BINARY_DATA_PATTERN.search(data):
+        return False
+
     try:
-        ConfigFactory.parse_string(data.decode('UTF-8'))
+        hocon_utils.parse_string(data.decode('UTF-8'))
         return True
     except:
         return False
 
 
+def data_is_gzip(data):
+    """
+    Detects if an initial chunk of data from a stream indicates the stream is gzip compressed.
+    This is determined by gzip's magic number.
+    :param data: first chunk from a gzip stream
+    :return: True if gzip
+    """
+    return data.startswith(MAGIC_NUMBER_GZIP)
+
+
 def data_is_tar(data):
     """
     Detects if an initial 1KB+ chunk of data from a stream indicates the stream
@@ -405,31 +453,141 @@ def file_write_string(file_path, data):
         f.writelines(data)
 
 
+def file_link_or_copy(src, dest):
+    """
+    Creates `dest` with the contents of the file `src` without copying its data where possible. `dest` is a hard link
+    to `src` if the file system allows it, otherwise a clone of `src` if the file system supports cloning, e.g. btrfs
+    or XFS, otherwise a copy. Either way `src` must not be modified through `dest`.
+    """
+    try:
+        os.link(src, dest)
+        return
+    except OSError:
+        pass
+
+    if not file_clone(src, dest):
+        shutil.copy2(src, dest)
+
+
+def file_clone(src, dest):
+    """
+    Clones the file `src` as `dest` using the FICLONE ioctl of Linux, so that the two share their data until either is
+    modified.
+    :return: True if cloned, False if the file system or platform doesn't support it
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+
+    import fcntl
+
+    with open(src, 'rb') as src_file, open(dest, 'wb') as dest_file:
+        try:
+            fcntl.ioctl(dest_file.fileno(), LINUX_FICLONE, src_file.fileno())
+        except OSError:
+            cloned = False
+        else:
+            cloned = True
+
+    if cloned:
+        shutil.copystat(src, dest)
+    else:
+        os.remove(dest)
+
+    return cloned
+
+
 def find_bundle_conf_dir(dir):
-    for dir_path, dir_names, file_names in os.walk(dir):
+    for dir_path, dir_names, file_names in os.walk(dir, followlinks=True):
         for file_name in file_names:
             if file_name == 'bundle.conf' or file_name == 'runtime-config.sh':
                 return dir_path
     return dir
 
 
-def first_mtime(path, default=0):
-    for (dir_path, dir_names, file_names) in os.walk(path):
+def first_mtime(path, default=0, excludes=()):
+    for (dir_path, dir_names, file_names) in os.walk(path, followlinks=True):
         for file_name in file_names:
-            return os.path.getmtime(os.path.join(dir_path, file_name))
+            file_path = os.path.join(dir_path, file_name)
+
+            if file_path not in excludes:
+                return os.path.getmtime(file_path)
+
+    return default
+
+
+def zip_find_bundle_conf_dir(zip_file):
+    """
+    Same as `find_bundle_conf_dir` for the entries of a `ZipFile`.
+
+    :return: the name of the dir within the zip file, with a trailing slash, or an empty string for its root
+    """
+    conf_dirs = [posixpath.dirname(info.filename) for info in zip_file.infolist()
+                 if posixpath.basename(info.filename) in ('bundle.conf', 'runtime-config.sh')]
+
+    # `os.walk` visits the shallowest dirs first
+    conf_dir = min(conf_dirs, key=lambda dir: dir.count('/') if dir else -1, default='')
+
+    return conf_dir + '/' if conf_dir else ''
+
+
+def zip_dir_entries(zip_file, dir):
+    """
+    :return: list of tuples of the `ZipInfo` of each file within `dir` of `zip_file` and its name relative to `dir`
+    """
+    return [(info, info.filename[len(dir):]) for info in zip_file.infolist()
+            if info.filename.startswith(dir) and not info.filename.endswith('/')]
+
+
+def zip_first_mtime(zip_file, dir, default=0, excludes=()):
+    """
+    Same as `first_mtime` for the files within `dir` of `zip_file`, as they'd be extracted by `zip_extract_with_dates`.
+    """
+    for info, name in sorted(zip_dir_entries(zip_file, dir), key=lambda entry: entry[1].count('/')):
+        if name not in excludes:
+            return time.mktime(info.date_time + (0, 0, -1))
 
     return default
 
 
+def zip_to_zip(source_zip_file, source_dir, zip_file, archive_name, mtime, excludes=()):
+    """
+    Copies the files within `source_dir` of `source_zip_file` into `archive_name` of `zip_file` with the modification
+    time `mtime`. The compressed data of the files is copied as is, so only the headers are rewritten.
+    """
+    for info, name in zip_dir_entries(source_zip_file, source_dir):
+        if name not in excludes:
+            zinfo = zipfile.ZipInfo(posixpath.join(archive_name, name), time.localtime(mtime)[:6])
+            zinfo.external_attr = (stat.S_IFREG | zip_entry_mode(info)) << 16
+            zip_utils.copy_compressed(zip_file, zinfo, source_zip_file, info)
+
+
+def zip_to_tar(source_zip_file, source_dir, tar, archive_name, mtime, excludes=()):
+    """
+    Same as `zip_to_zip`, except that the files are decompressed into `tar`.
+    """
+    for info, name in zip_dir_entries(source_zip_file, source_dir):
+        if name not in excludes:
+            tar_info = tarfile.TarInfo(posixpath.join(archive_name, name))
+            tar_info.size = info.file_size
+            tar_info.mtime = mtime
+            tar_info.mode = zip_entry_mode(info)
+
+            with source_zip_file.open(info) as file:
+                tar.addfile(tarinfo=tar_info, fileobj=file)
+
+
+def zip_entry_mode(zinfo):
+    # Preserve bits 0-8 only: rwxrwxrwx
+    return zinfo.external_attr >> 16 & 0x1FF
+
+
 def zip_extract_with_dates(zip_file, into):
     with zipfile.ZipFile(file=zip_file, mode='r') as zip:
         for info in zip.infolist():
             zip.extract(info, into)
             t = time.mktime(info.date_time + (0, 0, -1))
             os.utime(os.path.join(into, info.filename), (t, t))
-            # Preserve bits 0-8 only: rwxrwxrwx
-            mode = info.external_attr >> 16 & 0x1FF
-            os.chmod(os.path.join(into, info.filename), mode)
+            os.chmod(os.path.join(into, info.filename), zip_entry_mode(info))
 
 
 class DigestReaderWriter(object):
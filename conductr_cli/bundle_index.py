@@ -0,0 +1,135 @@
+from conductr_cli import bundle_utils, settings_utils
+from conductr_cli.constants import BUNDLE_INDEX_FILE_NAME
+import os
+import tempfile
+import threading
+
+# The index is a JSON file within the CLI settings dir holding the metadata of bundle files, keyed by the real path of
+# a bundle file. An entry is only used while the size and modification time of the file are unchanged, so repeated
+# operations on cached bundles don't need to scan the zip or read the digest trailer again. Files within the temp dir,
+# e.g. the bundles which bndl creates for a single load, are used once and so aren't indexed.
+#
+# The index is disabled until `configure` is called.
+
+INDEX_VERSION = 2
+
+index_file = None
+index_entries = None
+index_lock = threading.RLock()
+
+
+def configure(cli_settings_dir):
+    global index_file, index_entries
+
+    with index_lock:
+        index_file = os.path.join(cli_settings_dir, BUNDLE_INDEX_FILE_NAME) if cli_settings_dir else None
+        index_entries = None
+
+
+def metadata(bundle_path):
+    """
+    Returns the indexed metadata of a bundle file, indexing the file if required.
+
+    :param bundle_path: the path of the bundle file
+    :return: dict with the `conf`, `digest` and `length` of the bundle, or None if the index is disabled or the file
+             is within the temp dir
+    """
+    if index_file is None:
+        return None
+
+    key = os.path.realpath(bundle_path)
+
+    if is_temp_file(key):
+        return None
+
+    stat = os.stat(key)
+
+    with index_lock:
+        entry = load_entries().get(key)
+
+    if entry is not None and entry['size'] == stat.st_size and entry['mtimeNs'] == stat.st_mtime_ns:
+        return entry
+
+    entry = create_entry(key, stat)
+
+    with index_lock:
+        entries = load_entries()
+        entries[key] = entry
+        save_entries(entries)
+
+    return entry
+
+
+def conf(bundle_path):
+    entry = metadata(bundle_path)
+
+    return bundle_utils.conf(bundle_path) if entry is None else entry['conf']
+
+
+def digest_extract_and_open(bundle_path):
+    """
+    Same as `bundle_utils.digest_extract_and_open`, with the digest and length of the bundle taken from the index.
+    """
+    entry = metadata(bundle_path)
+
+    if entry is None:
+        return bundle_utils.digest_extract_and_open(bundle_path)
+
+    input = open(bundle_path, 'rb')
+
+    if entry['digest'] is not None:
+        digest = tuple(entry['digest'])
+        return bundle_utils.FileWindow(input, entry['length'], digest), digest
+    else:
+        return input, None
+
+
+def remove(bundle_paths):
+    if index_file is None:
+        return
+
+    with index_lock:
+        entries = load_entries()
+        removed = [entries.pop(os.path.realpath(path), None) for path in bundle_paths]
+
+        if any(entry is not None for entry in removed):
+            save_entries(entries)
+
+
+def create_entry(bundle_path, stat):
+    bundle_conf = bundle_utils.conf(bundle_path)
+
+    with open(bundle_path, 'rb') as input:
+        digest, length = bundle_utils.digest_extract(input)
+
+    return {
+        'size': stat.st_size,
+        'mtimeNs': stat.st_mtime_ns,
+        'conf': bundle_conf,
+        'digest': None if digest is None else list(digest),
+        'length': length
+    }
+
+
+def is_temp_file(path):
+    temp_dir = os.path.join(os.path.realpath(tempfile.gettempdir()), '')
+
+    return path.startswith(temp_dir)
+
+
+def load_entries():
+    global index_entries
+
+    if index_entries is None:
+        index = settings_utils.read_json_settings_file(index_file, INDEX_VERSION)
+        index_entries = index.get('bundles', {}) if index is not None else {}
+
+    return index_entries
+
+
+def save_entries(entries):
+    # Entries of files which no longer exist, e.g. bundles removed from the cache, are dropped
+    for path in [path for path in entries if not os.path.isfile(path)]:
+        del entries[path]
+
+    settings_utils.write_json_settings_file_atomically(index_file, INDEX_VERSION, {'bundles': entries}, 'bundle index')
@@ -21,6 +21,21 @@ def count_installations(bundle_id, args):
     return 0
 
 
+def count_all_installations(args):
+    """
+    Counts the installations of every bundle with a single request.
+
+    :return: dict of bundle id to its number of installations
+    """
+    bundles_url = conduct_url.url('bundles', args)
+    response = conduct_request.get(args.dcos_mode, conduct_url.conductr_host(args), bundles_url,
+                                   auth=args.conductr_auth, verify=args.server_verification_file)
+    response.raise_for_status()
+    bundles = json.loads(response.text)
+
+    return dict((bundle['bundleId'], len(bundle.get('bundleInstallations', []))) for bundle in bundles)
+
+
 def wait_for_uninstallation(bundle_id, args):
     return wait_for_condition(bundle_id, is_uninstalled, 'uninstalled', args)
 
@@ -29,6 +44,53 @@ def wait_for_installation(bundle_id, args):
     return wait_for_condition(bundle_id, is_installed, 'installed', args)
 
 
+def wait_for_installations(bundle_ids, args):
+    """
+    Waits for all of the `bundle_ids` to be installed, using a single event stream and a single request per check
+    regardless of the number of bundles.
+    """
+    log = logging.getLogger(__name__)
+    start_time = datetime.now()
+
+    def pending_bundle_ids():
+        installations = count_all_installations(args)
+        return [bundle_id for bundle_id in bundle_ids if not is_installed(installations.get(bundle_id, 0))]
+
+    pending = pending_bundle_ids()
+    if not pending:
+        log.info('Bundles are installed')
+        return
+    else:
+        sse_heartbeat_count_after_event = 0
+
+        log.info('{} bundle(s) waiting to be installed'.format(len(pending)))
+        bundle_events_url = conduct_url.url('bundles/events', args)
+        sse_events = sse_client.get_events(args.dcos_mode, conduct_url.conductr_host(args), bundle_events_url,
+                                           auth=args.conductr_auth, verify=args.server_verification_file)
+        for event in sse_events:
+            sse_heartbeat_count_after_event += 1
+
+            elapsed = (datetime.now() - start_time).total_seconds()
+            if elapsed > args.wait_timeout:
+                raise WaitTimeoutError('Bundles {} waiting to be installed'.format(', '.join(pending)))
+
+            # Check for installed bundles every 3 heartbeats from the last received event.
+            if event.event or (sse_heartbeat_count_after_event % 3 == 0):
+                if event.event:
+                    sse_heartbeat_count_after_event = 0
+
+                still_pending = pending_bundle_ids()
+                for bundle_id in pending:
+                    if bundle_id not in still_pending:
+                        log.info('Bundle {} installed'.format(bundle_id))
+
+                pending = still_pending
+                if not pending:
+                    return
+
+        raise WaitTimeoutError('Bundles {} waiting to be installed'.format(', '.join(pending)))
+
+
 def wait_for_condition(bundle_id, condition, condition_name, args):
     log = logging.getLogger(__name__)
     start_time = datetime.now()
@@ -1,6 +1,7 @@
-from conductr_cli.constants import DIGEST_TRAIL_SIZE, IO_CHUNK_SIZE
+from conductr_cli.constants import DIGEST_TRAIL_SIZE
+from conductr_cli.exceptions import MalformedBundleError
+import hashlib
 import os
-import tempfile
 from zipfile import ZipFile
 
 
@@ -19,36 +20,38 @@ def digest_extract_and_open(path):
     Inspects a given `path` for a digest marker at the end of the file and returns
     an open file object that will not include the digest.
 
+    The trailer is located by reading the last `DIGEST_TRAIL_SIZE` bytes of the file. When a digest is present,
+    the returned object is a `FileWindow` over the original file that ends where the trailer starts, so no
+    data is copied. The window verifies the data against the digest as it is read.
+
     :param path:
     :return: file object without digest, possible digest
     """
 
     input = open(path, 'rb')
-    input.seek(
-        -DIGEST_TRAIL_SIZE,
-        os.SEEK_END
-    )
-    digest, trailer_starts, trailer_len = digest_calculate(input.read())
-    input.seek(0)
+    digest, length = digest_extract(input)
 
-    if trailer_len > 0:
-        output = tempfile.NamedTemporaryFile()
-        reader = DigestedRead(input)
-        done = False
+    if digest is not None:
+        return FileWindow(input, length, digest), digest
+    else:
+        return input, None
 
-        while not done:
-            chunk = reader.read(IO_CHUNK_SIZE)
 
-            if chunk:
-                output.write(chunk)
-            else:
-                done = True
+def digest_extract(input):
+    """
+    Inspects an open, seekable file object for a digest marker at the end of the file by reading the last
+    `DIGEST_TRAIL_SIZE` bytes. The file object is positioned at its start afterwards.
 
-        output.seek(0)
+    :param input:
+    :return: possible digest, length of the data without the digest marker
+    """
 
-        return output, digest
-    else:
-        return input, None
+    size = input.seek(0, os.SEEK_END)
+    input.seek(max(0, size - DIGEST_TRAIL_SIZE))
+    digest, trailer_starts, trailer_len = digest_calculate(input.read())
+    input.seek(0)
+
+    return digest, size if digest is None else size - trailer_len
 
 
 def digest_calculate(data):
@@ -116,3 +119,94 @@ class DigestedRead(object):
                 self.buffer = b''
 
                 return return_value
+
+
+class FileWindow(object):
+    """
+    A read-only, seekable view over the first `length` bytes of an open binary file.
+
+    The remaining number of bytes is exposed as `len`, which is what `MultipartEncoder` uses to size
+    a part. `fileno` is deliberately not exposed, as that would cause the full file size to be used instead.
+
+    If a `digest` is provided, data is hashed as it is read sequentially from the start of the window. Reading the
+    final chunk raises a `MalformedBundleError` if the data doesn't match the digest, so an upload streaming from
+    the window is aborted before it completes.
+    """
+
+    def __init__(self, fileobj, length, digest=None):
+        self.fileobj = fileobj
+        self.length = length
+        self.digest = digest
+        self.position = 0
+        self.hasher = self.create_hasher()
+
+    @property
+    def name(self):
+        return self.fileobj.name
+
+    @property
+    def len(self):
+        return self.length - self.position
+
+    def create_hasher(self):
+        return hashlib.sha256() if self.digest is not None and self.digest[0] == 'sha-256' else None
+
+    def read(self, size=-1):
+        remaining = self.length - self.position
+
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+
+        self.fileobj.seek(self.position)
+        data = self.fileobj.read(size)
+        self.position += len(data)
+
+        if self.hasher is not None and data:
+            self.hasher.update(data)
+
+            if self.position == self.length:
+                self.verify()
+
+        return data
+
+    def verify(self):
+        hex_digest = self.hasher.hexdigest()
+        self.hasher = None
+
+        if hex_digest != self.digest[1]:
+            raise MalformedBundleError('Digest mismatch for {}: expected {}/{} but the data has {}/{}'
+                                       .format(self.name, self.digest[0], self.digest[1], self.digest[0], hex_digest))
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self.position + offset
+        elif whence == os.SEEK_END:
+            position = self.length + offset
+        else:
+            raise ValueError('Invalid whence ({})'.format(whence))
+
+        position = min(max(0, position), self.length)
+
+        if position == 0:
+            self.hasher = self.create_hasher()
+        elif position != self.position:
+            # Data is no longer read sequentially, so it can't be verified
+            self.hasher = None
+
+        self.position = position
+
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        self.fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
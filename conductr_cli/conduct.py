@@ -1,5 +1,6 @@
 from conductr_cli import main_handler
 import certifi
+import multiprocessing
 import sys
 import os
 
@@ -40,4 +41,6 @@ def run():
 
 
 if __name__ == '__main__':
+    # Lets the processes that compress zip entries start when running as a native executable
+    multiprocessing.freeze_support()
     run()
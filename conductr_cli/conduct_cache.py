@@ -0,0 +1,62 @@
+from conductr_cli import resolve_cache, screen_utils
+from conductr_cli.bytes_util import natural_size
+from conductr_cli.conduct_info_common import DISPLAY_PADDING
+import logging
+
+
+SUPPORTED_ACTIONS = ['stats', 'prune', 'verify']
+
+
+def cache(args):
+    """`conduct cache` command"""
+
+    log = logging.getLogger(__name__)
+    cache_dirs = [args.bundle_resolve_cache_dir, args.configuration_resolve_cache_dir]
+
+    resolve_cache.configure(args.cli_settings_dir, args.cache_max_size)
+
+    if args.action == 'stats':
+        display_stats(log, resolve_cache.stats(cache_dirs), args.cache_max_size)
+
+    elif args.action == 'prune':
+        removed, freed = resolve_cache.prune(cache_dirs, args.cache_max_size)
+
+        for path in removed:
+            log.verbose('Removed {}'.format(path))
+
+        log.screen('Removed {} file(s), freeing {}'.format(len(removed), natural_size(freed, binary=True)))
+
+    elif args.action == 'verify':
+        verified, corrupt = resolve_cache.verify(cache_dirs)
+
+        for path, reason in corrupt:
+            log.warning('Removed corrupt file {}: {}'.format(path, reason))
+
+        log.screen('Verified {} file(s), {} corrupt'.format(verified, len(corrupt)))
+
+    return True
+
+
+def display_stats(log, dir_stats, max_size):
+    data = [{'dir': 'CACHE DIR', 'files': 'FILES', 'size': 'SIZE'}] + [
+        {
+            'dir': entry['dir'],
+            'files': entry['files'],
+            'size': natural_size(entry['size'], binary=True)
+        }
+        for entry in dir_stats
+    ] + [
+        {
+            'dir': 'total',
+            'files': sum(entry['files'] for entry in dir_stats),
+            'size': '{} of {}'.format(natural_size(sum(entry['size'] for entry in dir_stats), binary=True),
+                                      natural_size(max_size, binary=True))
+        }
+    ]
+
+    column_widths = dict(screen_utils.calc_column_widths(data), **{'padding': ' ' * DISPLAY_PADDING})
+    for row in data:
+        log.screen('''\
+{dir: <{dir_width}}{padding}\
+{files: >{files_width}}{padding}\
+{size: >{size_width}}'''.format(**dict(row, **column_widths)).rstrip())
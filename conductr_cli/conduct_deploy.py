@@ -1,4 +1,5 @@
-from conductr_cli import bundle_deploy_v2, bundle_deploy_v3, conduct_deploy_bintray, conduct_deploy_bundle, validation
+from conductr_cli import bundle_deploy_v2, bundle_deploy_v3, conduct_deploy_bintray, conduct_deploy_bundle, timings, \
+    validation
 import json
 import logging
 
@@ -41,11 +42,13 @@ def deploy(args):
         deployment_batch = json.loads(response.text)
         deployment_batch_id = deployment_batch['value']
         if not args.no_wait:
-            bundle_deploy_v3.wait_for_deployment_complete(deployment_batch_id, args)
+            with timings.phase('wait for deployment'):
+                bundle_deploy_v3.wait_for_deployment_complete(deployment_batch_id, args)
     else:
         deployment_id = response.text
         if not args.no_wait:
-            bundle_deploy_v2.wait_for_deployment_complete(deployment_id, args)
+            with timings.phase('wait for deployment'):
+                bundle_deploy_v2.wait_for_deployment_complete(deployment_id, args)
 
     return True
 
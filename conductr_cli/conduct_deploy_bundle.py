@@ -1,4 +1,5 @@
-from conductr_cli import bundle_utils, conduct_load, conduct_request, conduct_url, constants, resolver, validation
+from conductr_cli import bundle_index, conduct_load, conduct_request, conduct_url, constants, resolver, timings, \
+    validation
 from conductr_cli.bndl_utils import BndlFormat
 from conductr_cli.conduct_url import conductr_host
 from conductr_cli.exceptions import MalformedBundleError
@@ -18,16 +19,18 @@ def deploy(args):
 
     conduct_load.validate_cache_dir_permissions(bundle_resolve_cache_dir, configuration_cache_dir, log)
 
-    bundle_file_name, bundle_file = resolver.resolve_bundle(custom_settings,
-                                                            bundle_resolve_cache_dir,
-                                                            args.bundle,
-                                                            args.offline_mode)
+    with timings.phase('resolve bundle') as resolve_phase:
+        bundle_file_name, bundle_file = resolver.resolve_bundle(custom_settings,
+                                                                bundle_resolve_cache_dir,
+                                                                args.bundle,
+                                                                args.offline_mode)
+        resolve_phase.bytes = timings.file_size(bundle_file)
 
     if not conduct_load.is_bundle(bundle_file):
         bundle_fileobj = conduct_load.invoke_bndl(bundle_file)
         bundle_file = bundle_fileobj.name
 
-    bundle_conf = bundle_utils.conf(bundle_file)
+    bundle_conf = bundle_index.conf(bundle_file)
 
     if bundle_conf is None:
         raise MalformedBundleError('Unable to find bundle.conf within the bundle file')
@@ -35,9 +38,11 @@ def deploy(args):
     configuration_file_name, configuration_file = (None, None)
     if args.configuration is not None:
         log.info('Retrieving configuration..')
-        configuration_file_name, configuration_file = \
-            resolver.resolve_bundle_configuration(custom_settings, configuration_cache_dir,
-                                                  args.configuration, args.offline_mode)
+        with timings.phase('resolve configuration') as resolve_phase:
+            configuration_file_name, configuration_file = \
+                resolver.resolve_bundle_configuration(custom_settings, configuration_cache_dir,
+                                                      args.configuration, args.offline_mode)
+            resolve_phase.bytes = timings.file_size(configuration_file)
         if not conduct_load.is_bundle(configuration_file) or conduct_load.bndl_arguments_present(args):
             configuration_fileobj = conduct_load.invoke_bndl(configuration_file, BndlFormat.CONFIGURATION.value,
                                                              args, bundle_conf)
@@ -54,7 +59,7 @@ def deploy(args):
     bundle_file_name, bundle_open_file = conduct_load.open_bundle(bundle_file_name, bundle_file, bundle_conf)
     files = [('bundle', (bundle_file_name, bundle_open_file))]
     if configuration_file is not None:
-        open_configuration_file, config_digest = bundle_utils.digest_extract_and_open(configuration_file)
+        open_configuration_file, config_digest = bundle_index.digest_extract_and_open(configuration_file)
         if config_digest is not None and not configuration_file_name.endswith('-{}.zip'.format(config_digest)):
             configuration_file_name = 'config-{}.zip'.format(config_digest[1])
 
@@ -79,11 +84,12 @@ def deploy(args):
     deploy_uri = 'deployments?' + urllib.parse.urlencode(deploy_params)
     url = conduct_url.url(deploy_uri, args)
 
-    response = conduct_request.post(args.dcos_mode, conductr_host(args), url,
-                                    data=multipart,
-                                    auth=args.conductr_auth,
-                                    verify=args.server_verification_file,
-                                    headers={'Content-Type': multipart.content_type})
+    with timings.phase('upload', multipart.len):
+        response = conduct_request.post(args.dcos_mode, conductr_host(args), url,
+                                        data=multipart,
+                                        auth=args.conductr_auth,
+                                        verify=args.server_verification_file,
+                                        headers={'Content-Type': multipart.content_type})
     validation.raise_for_status_inc_3xx(response)
 
     return response
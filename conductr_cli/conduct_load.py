@@ -1,14 +1,19 @@
-from pyhocon import ConfigFactory, ConfigTree
+from pyhocon import ConfigTree
 from pyhocon.exceptions import ConfigMissingException
-from conductr_cli import bndl_main, bundle_utils, constants, screen_utils, validation
-from conductr_cli.exceptions import MalformedBundleError, InsecureFilePermissions
-from conductr_cli import resolver, bundle_installation
+from conductr_cli import bndl_main, bundle_utils, constants, hocon_utils, logging_setup, screen_utils, timings, \
+    validation
+from conductr_cli.exceptions import MalformedBundleError, InsecureFilePermissions, RangeRequestsNotSupportedError, \
+    WaitTimeoutError
+from conductr_cli import resolver, resolve_cache, bundle_index, bundle_installation
+from conductr_cli.conduct_info_common import DISPLAY_PADDING
 from conductr_cli.constants import DEFAULT_BUNDLE_RESOLVE_CACHE_DIR, \
-    DEFAULT_CONFIGURATION_RESOLVE_CACHE_DIR
+    DEFAULT_CONFIGURATION_RESOLVE_CACHE_DIR, LOAD_MANIFEST_RESOLVE_WORKERS
 from conductr_cli.bndl_utils import BndlFormat
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import partial
 from requests_toolbelt.multipart.encoder import MultipartEncoder, MultipartEncoderMonitor
 
+import copy
 import glob
 import io
 import os
@@ -21,7 +26,7 @@ import zipfile
 
 
 # A mapping of respected `bndl` arguments to their defaults
-from conductr_cli.control_protocol import load_bundle
+from conductr_cli.control_protocol import get_bundles, load_bundle
 
 BNDL_ARGS = {
     'endpoint_dicts': [],
@@ -65,7 +70,9 @@ KEEP_BUNDLE_VERSIONS = 1
 @validation.handle_bintray_resolution_error
 @validation.handle_bintray_credentials_error
 def load(args):
-    if args.api_version == '1':
+    if args.manifest:
+        return load_manifest(args)
+    elif args.api_version == '1':
         return load_v1(args)
     else:
         return load_v2(args)
@@ -81,30 +88,34 @@ def load_v1(args):
 
     validate_cache_dir_permissions(bundle_resolve_cache_dir, configuration_cache_dir, log)
 
-    initial_bundle_file_name, bundle_file = resolver.resolve_bundle(custom_settings, bundle_resolve_cache_dir,
-                                                                    args.bundle, args.offline_mode)
+    with timings.phase('resolve bundle') as resolve_phase:
+        initial_bundle_file_name, bundle_file = resolver.resolve_bundle(custom_settings, bundle_resolve_cache_dir,
+                                                                        args.bundle, args.offline_mode)
+        resolve_phase.bytes = timings.file_size(bundle_file)
 
     configuration_file_name, configuration_file = (None, None)
     if args.configuration is not None:
         log.info('Retrieving configuration..')
-        configuration_file_name, configuration_file = \
-            resolver.resolve_bundle_configuration(custom_settings, configuration_cache_dir,
-                                                  args.configuration, args.offline_mode)
+        with timings.phase('resolve configuration') as resolve_phase:
+            configuration_file_name, configuration_file = \
+                resolver.resolve_bundle_configuration(custom_settings, configuration_cache_dir,
+                                                      args.configuration, args.offline_mode)
+            resolve_phase.bytes = timings.file_size(configuration_file)
 
-    bundle_conf_text = bundle_utils.conf(bundle_file)
+    bundle_conf_text = bundle_index.conf(bundle_file)
 
-    bundle_conf = ConfigFactory.parse_string(bundle_conf_text)
+    bundle_conf = hocon_utils.parse_string(bundle_conf_text)
 
     bundle_file_name, bundle_open_file = open_bundle(initial_bundle_file_name, bundle_file, bundle_conf_text)
 
     overlay_bundle_conf = None if configuration_file is None else \
-        ConfigFactory.parse_string(bundle_utils.conf(configuration_file))
+        hocon_utils.parse_string(bundle_index.conf(configuration_file))
 
     with_bundle_configurations = partial(apply_to_configurations, bundle_conf, overlay_bundle_conf)
 
     files = get_payload(bundle_file_name, bundle_open_file, with_bundle_configurations)
     if configuration_file is not None:
-        open_configuration_file, config_digest = bundle_utils.digest_extract_and_open(configuration_file)
+        open_configuration_file, config_digest = bundle_index.digest_extract_and_open(configuration_file)
         files.append(('configuration', (configuration_file_name, open_configuration_file)))
 
     # TODO: Delete the bundle configuration file.
@@ -116,14 +127,16 @@ def load_v1(args):
 
     log.info('Loading bundle to ConductR..')
     multipart = create_multipart(log, files)
-    response_json = load_bundle(args, multipart)
+    with timings.phase('upload', multipart.len):
+        response_json = load_bundle(args, multipart)
 
     bundle_id = response_json['bundleId'] if args.long_ids else bundle_utils.short_id(response_json['bundleId'])
 
     if not args.no_wait:
-        bundle_installation.wait_for_installation(response_json['bundleId'], args)
+        with timings.phase('wait for installation'):
+            bundle_installation.wait_for_installation(response_json['bundleId'], args)
 
-    cleanup_old_bundles(bundle_resolve_cache_dir, bundle_file_name, excluded=bundle_file)
+    cleanup_old_bundles(bundle_resolve_cache_dir, bundle_file_name, excluded=[bundle_file])
 
     log.info('Bundle loaded.')
     if not args.disable_instructions:
@@ -198,7 +211,7 @@ def invoke_bndl(input, format=None, additional_args=None, bundle_conf=None):
         args.append(format)
 
     if additional_args is not None:
-        parsed_bundle_conf = ConfigFactory.parse_string(bundle_conf)
+        parsed_bundle_conf = hocon_utils.parse_string(bundle_conf)
         for arg in BNDL_ARGS:
             if hasattr(additional_args, arg):
                 arg_keys[arg] = getattr(additional_args, arg)
@@ -212,7 +225,9 @@ def invoke_bndl(input, format=None, additional_args=None, bundle_conf=None):
                             if first_component:
                                 entry['component'] = first_component
 
-    return_code = bndl_main.invoke(args, arg_keys)
+    with timings.phase('bndl') as bndl_phase:
+        return_code = bndl_main.invoke(args, arg_keys)
+        bndl_phase.bytes = timings.file_size(temp_file.name)
 
     if return_code != 0:
         sys.exit(return_code)
@@ -224,37 +239,105 @@ def load_v2(args):
     log = logging.getLogger(__name__)
 
     log.info('Retrieving bundle..')
-    custom_settings = args.custom_settings
     bundle_resolve_cache_dir = args.bundle_resolve_cache_dir
     configuration_cache_dir = args.configuration_resolve_cache_dir
 
     validate_cache_dir_permissions(bundle_resolve_cache_dir, configuration_cache_dir, log)
 
-    initial_bundle_file_name, bundle_file = resolver.resolve_bundle(custom_settings, bundle_resolve_cache_dir,
-                                                                    args.bundle, args.offline_mode)
+    bundle_file_name, bundle_file, bundle_stream, files = resolve_files(args, log)
+
+    loaded_bundle_id = find_loaded_bundle_id(args, files)
+    if loaded_bundle_id is not None:
+        log.info('Bundle already loaded to ConductR, skipping upload..')
+        close_files(files, bundle_stream)
+        response_json = {'bundleId': loaded_bundle_id}
+    else:
+        log.info('Loading bundle to ConductR..')
+        multipart = create_multipart(log, files)
+
+        response_json = upload_files(args, multipart, bundle_stream)
+
+    bundle_id = response_json['bundleId'] if args.long_ids else bundle_utils.short_id(response_json['bundleId'])
 
-    if not is_bundle(bundle_file):
-        bundle_fileobj = invoke_bndl(bundle_file)
-        bundle_file = bundle_fileobj.name
+    if not args.no_wait:
+        with timings.phase('wait for installation'):
+            bundle_installation.wait_for_installation(response_json['bundleId'], args)
 
-    bundle_conf = bundle_utils.conf(bundle_file)
+    cleanup_old_bundles(bundle_resolve_cache_dir, bundle_file_name, excluded=[bundle_file])
+
+    log.info('Bundle loaded.')
+    if not args.disable_instructions:
+        log.info('Start bundle with:        {} run{} {}'.format(args.command, args.cli_parameters, bundle_id))
+        log.info('Unload bundle with:       {} unload{} {}'.format(args.command, args.cli_parameters, bundle_id))
+        log.info('Print ConductR info with: {} info{}'.format(args.command, args.cli_parameters))
+        log.info('Print bundle info with:   {} info{} {}'.format(args.command, args.cli_parameters, bundle_id))
+
+    if not log.is_info_enabled() and log.is_quiet_enabled():
+        log.quiet(response_json['bundleId'])
+
+    return True
+
+
+def resolve_files(args, log):
+    """
+    Resolves the bundle and optional configuration given by `args`, and opens them for a multipart upload.
+
+    :return: bundle file name, bundle file, bundle stream if the bundle is streamed, multipart files
+    """
+    custom_settings = args.custom_settings
+    bundle_resolve_cache_dir = args.bundle_resolve_cache_dir
+    configuration_cache_dir = args.configuration_resolve_cache_dir
+
+    initial_bundle_file_name, bundle_stream = (None, None)
+    if args.stream_bundle:
+        with timings.phase('resolve bundle'):
+            initial_bundle_file_name, bundle_stream = resolver.stream_bundle(custom_settings, bundle_resolve_cache_dir,
+                                                                             args.bundle, args.offline_mode)
+
+        try:
+            if bundle_stream is not None and not zipfile.is_zipfile(bundle_stream):
+                log.info('Unable to stream {} as it is not a bundle'.format(args.bundle))
+                bundle_stream = None
+        except RangeRequestsNotSupportedError:
+            log.info('Unable to stream {} as the server does not support range requests'.format(args.bundle))
+            bundle_stream = None
+
+    if bundle_stream is not None:
+        bundle_file = bundle_stream.cached_file
+        bundle_conf = bundle_utils.conf(bundle_stream)
+    else:
+        with timings.phase('resolve bundle') as resolve_phase:
+            initial_bundle_file_name, bundle_file = resolver.resolve_bundle(custom_settings, bundle_resolve_cache_dir,
+                                                                            args.bundle, args.offline_mode)
+            resolve_phase.bytes = timings.file_size(bundle_file)
+
+        if not is_bundle(bundle_file):
+            bundle_fileobj = invoke_bndl(bundle_file)
+            bundle_file = bundle_fileobj.name
+
+        bundle_conf = bundle_index.conf(bundle_file)
 
     if bundle_conf is None:
         raise MalformedBundleError('Unable to find bundle.conf within the bundle file')
 
-    bundle_file_name, bundle_open_file = open_bundle(initial_bundle_file_name, bundle_file, bundle_conf)
+    if bundle_stream is not None:
+        bundle_file_name, bundle_open_file = open_bundle_stream(initial_bundle_file_name, bundle_stream, bundle_conf)
+    else:
+        bundle_file_name, bundle_open_file = open_bundle(initial_bundle_file_name, bundle_file, bundle_conf)
 
     configuration_file_name, configuration_file, bundle_conf_overlay = (None, None, None)
     if args.configuration is not None:
         log.info('Retrieving configuration..')
-        configuration_file_name, configuration_file = \
-            resolver.resolve_bundle_configuration(custom_settings, configuration_cache_dir,
-                                                  args.configuration, args.offline_mode)
+        with timings.phase('resolve configuration') as resolve_phase:
+            configuration_file_name, configuration_file = \
+                resolver.resolve_bundle_configuration(custom_settings, configuration_cache_dir,
+                                                      args.configuration, args.offline_mode)
+            resolve_phase.bytes = timings.file_size(configuration_file)
         if not is_bundle(configuration_file) or bndl_arguments_present(args):
             configuration_fileobj = invoke_bndl(configuration_file, BndlFormat.CONFIGURATION.value, args, bundle_conf)
             configuration_file = configuration_fileobj.name
             configuration_file_name = os.path.basename(configuration_file)
-        bundle_conf_overlay = bundle_utils.conf(configuration_file)
+        bundle_conf_overlay = bundle_index.conf(configuration_file)
     elif bndl_arguments_present(args):
         with tempfile.NamedTemporaryFile() as empty_file:
             os.utime(empty_file.name, (constants.SHAZAR_TIMESTAMP_MIN, constants.SHAZAR_TIMESTAMP_MIN))
@@ -268,7 +351,7 @@ def load_v2(args):
         files.append(('bundleConfOverlay', ('bundle.conf', string_io(bundle_conf_overlay))))
     files.append(('bundle', (bundle_file_name, bundle_open_file)))
     if configuration_file is not None:
-        open_configuration_file, config_digest = bundle_utils.digest_extract_and_open(configuration_file)
+        open_configuration_file, config_digest = bundle_index.digest_extract_and_open(configuration_file)
         if config_digest is not None and not configuration_file_name.endswith('-{}.zip'.format(config_digest)):
             configuration_file_name = 'config-{}.zip'.format(config_digest[1])
 
@@ -281,51 +364,279 @@ def load_v2(args):
     # if configuration_file and os.path.exists(configuration_file):
     #     os.remove(configuration_file)
 
-    log.info('Loading bundle to ConductR..')
-    multipart = create_multipart(log, files)
+    return bundle_file_name, bundle_file, bundle_stream, files
 
-    response_json = load_bundle(args, multipart)
 
-    bundle_id = response_json['bundleId'] if args.long_ids else bundle_utils.short_id(response_json['bundleId'])
+def upload_files(args, multipart, bundle_stream=None):
+    """
+    Uploads a multipart created from `resolve_files` to ConductR. A streamed bundle is only downloaded once its upload
+    starts, and is committed to the cache only once ConductR has accepted it.
+    """
+    try:
+        if bundle_stream is not None:
+            # Opened here rather than when resolving, so that the download doesn't idle while the upload waits for a
+            # slot when loading a manifest
+            bundle_stream.open_stream()
 
-    if not args.no_wait:
-        bundle_installation.wait_for_installation(response_json['bundleId'], args)
+        with timings.phase('upload', multipart.len):
+            response_json = load_bundle(args, multipart)
 
-    cleanup_old_bundles(bundle_resolve_cache_dir, bundle_file_name, excluded=bundle_file)
+        if bundle_stream is not None:
+            bundle_stream.commit()
 
-    log.info('Bundle loaded.')
-    if not args.disable_instructions:
-        log.info('Start bundle with:        {} run{} {}'.format(args.command, args.cli_parameters, bundle_id))
-        log.info('Unload bundle with:       {} unload{} {}'.format(args.command, args.cli_parameters, bundle_id))
-        log.info('Print ConductR info with: {} info{}'.format(args.command, args.cli_parameters))
-        log.info('Print bundle info with:   {} info{} {}'.format(args.command, args.cli_parameters, bundle_id))
+        return response_json
+    finally:
+        if bundle_stream is not None:
+            bundle_stream.close()
+
+
+def find_loaded_bundle_id(args, files, loaded_bundles=None):
+    """
+    Finds a bundle loaded to ConductR with the same bundle and configuration digests as the multipart `files`, in
+    which case the upload can be skipped. Files without a digest trailer are always uploaded.
+
+    :param loaded_bundles: the bundles of `GET /bundles`, retrieved from ConductR if not specified
+    :return: the id of the loaded bundle, or None if the files are to be uploaded
+    """
+    if args.force_upload:
+        return None
+
+    digests = dict((name, file.digest[1] if isinstance(file, bundle_utils.FileWindow) and file.digest else None)
+                   for name, (file_name, file) in files if name in ['bundle', 'configuration'])
+
+    bundle_digest = digests['bundle']
+    configuration_digest = digests.get('configuration')
+    if bundle_digest is None or ('configuration' in digests and configuration_digest is None):
+        return None
+
+    if loaded_bundles is None:
+        loaded_bundles = get_bundles(args)
+
+    for bundle in loaded_bundles:
+        if bundle.get('bundleDigest') == bundle_digest and \
+                (bundle.get('configurationDigest') or None) == configuration_digest:
+            return bundle['bundleId']
+
+    return None
+
+
+def close_files(files, bundle_stream=None):
+    for name, (file_name, file) in files:
+        file.close()
+
+    if bundle_stream is not None:
+        bundle_stream.close()
+
+
+def load_manifest(args):
+    """
+    Loads every bundle listed in the manifest file given by `args.bundle`.
+
+    Bundles are resolved on a thread pool and uploaded as soon as they are resolved, with at most `args.concurrency`
+    uploads at the same time. The installation of all bundles is then awaited on a single event stream.
+
+    The output of the concurrent tasks is suppressed, and the outcome of each bundle is displayed at the end instead.
+    Older versions of the bundles are removed from the cache once all uploads are done.
+    """
+    log = logging.getLogger(__name__)
+
+    if args.api_version == '1':
+        log.error('Loading a manifest of bundles requires ConductR API version 2')
+        return False
+
+    if args.configuration is not None:
+        log.error('A configuration cannot be specified when loading a manifest of bundles. '
+                  'Specify the configuration of each bundle in the manifest instead')
+        return False
+
+    entries = read_manifest(args.bundle)
+
+    if not entries:
+        log.error('The manifest {} does not contain any bundles'.format(args.bundle))
+        return False
+
+    validate_cache_dir_permissions(args.bundle_resolve_cache_dir, args.configuration_resolve_cache_dir, log)
+
+    log.info('Retrieving {} bundle(s)..'.format(len(entries)))
+
+    results = [{'bundle': bundle, 'bundle_id': None, 'status': None} for bundle, configuration in entries]
+
+    # A single snapshot of the loaded bundles is used to skip the upload of bundles that are already loaded
+    loaded_bundles = None if args.force_upload else get_bundles(args)
+
+    with ThreadPoolExecutor(max_workers=LOAD_MANIFEST_RESOLVE_WORKERS) as resolve_executor, \
+            ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as upload_executor:
+        resolve_futures = dict(
+            (resolve_executor.submit(resolve_manifest_entry, args, log, bundle, configuration), index)
+            for index, (bundle, configuration) in enumerate(entries)
+        )
+
+        resolved_files = {}
+        upload_futures = {}
+        for future in as_completed(resolve_futures):
+            index = resolve_futures[future]
+            try:
+                resolved = future.result()
+                resolved_files[index] = resolved[:2]
+                upload_futures[upload_executor.submit(upload_manifest_entry, args, resolved, loaded_bundles)] = index
+            except (Exception, SystemExit) as e:
+                results[index]['status'] = 'resolution failed: {}'.format(manifest_error_message(e))
+
+        for future in as_completed(upload_futures):
+            index = upload_futures[future]
+            try:
+                results[index]['bundle_id'] = future.result()
+                results[index]['status'] = 'loaded'
+            except (Exception, SystemExit) as e:
+                results[index]['status'] = 'upload failed: {}'.format(manifest_error_message(e))
+
+    # Every bundle of the manifest is excluded, as the name of one bundle may be the prefix of another
+    resolved_entries = sorted(resolved_files.items())
+    manifest_bundle_files = [bundle_file for index, (bundle_file_name, bundle_file) in resolved_entries]
+    for index, (bundle_file_name, bundle_file) in resolved_entries:
+        if results[index]['bundle_id'] is not None:
+            cleanup_old_bundles(args.bundle_resolve_cache_dir, bundle_file_name, excluded=manifest_bundle_files)
+
+    bundle_ids = [result['bundle_id'] for result in results if result['bundle_id'] is not None]
+
+    if bundle_ids and not args.no_wait:
+        try:
+            with timings.phase('wait for installation'):
+                bundle_installation.wait_for_installations(bundle_ids, args)
+            installed_bundle_ids = bundle_ids
+        except WaitTimeoutError:
+            installations = bundle_installation.count_all_installations(args)
+            installed_bundle_ids = [bundle_id for bundle_id in bundle_ids
+                                    if bundle_installation.is_installed(installations.get(bundle_id, 0))]
+
+        for result in results:
+            if result['bundle_id'] is not None:
+                result['status'] = 'installed' if result['bundle_id'] in installed_bundle_ids \
+                    else 'installation timed out'
+
+    display_manifest_results(args, results)
+
+    return all(result['bundle_id'] is not None for result in results) and \
+        all(result['status'] != 'installation timed out' for result in results)
+
+
+def read_manifest(path):
+    """
+    Reads a manifest of bundles to load. Each line holds a bundle, optionally followed by its configuration.
+    Empty lines and lines starting with `#` are ignored.
+
+    :param path: the path of the manifest, or `-` to read it from stdin
+    :return: list of tuples of bundle and configuration or `None`
+    """
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, 'r', encoding='utf-8') as manifest:
+            lines = manifest.read().splitlines()
+
+    entries = []
+    for line in lines:
+        parts = line.split()
+        if parts and not parts[0].startswith('#'):
+            entries.append((parts[0], parts[1] if len(parts) > 1 else None))
+
+    return entries
+
+
+def resolve_manifest_entry(args, log, bundle, configuration):
+    # The bndl arguments of `args` are modified while resolving, so every bundle gets its own copy
+    entry_args = copy.deepcopy(args)
+    entry_args.bundle = bundle
+    entry_args.configuration = configuration
+
+    with logging_setup.suppress_thread_output():
+        return resolve_files(entry_args, log)
+
+
+def upload_manifest_entry(args, resolved, loaded_bundles):
+    bundle_file_name, bundle_file, bundle_stream, files = resolved
+
+    with logging_setup.suppress_thread_output():
+        loaded_bundle_id = find_loaded_bundle_id(args, files, loaded_bundles)
+        if loaded_bundle_id is not None:
+            close_files(files, bundle_stream)
+            return loaded_bundle_id
+
+        # Progress bars of concurrent uploads would overwrite each other, hence no progress monitor
+        response_json = upload_files(args, MultipartEncoder(files), bundle_stream)
+
+        return response_json['bundleId']
+
+
+def manifest_error_message(error):
+    if isinstance(error, SystemExit):
+        return 'exit code {}'.format(error.code)
+    elif error.args:
+        return str(error.args[0])
+    else:
+        return type(error).__name__
+
+
+def display_manifest_results(args, results):
+    log = logging.getLogger(__name__)
 
     if not log.is_info_enabled() and log.is_quiet_enabled():
-        log.quiet(response_json['bundleId'])
+        for result in results:
+            if result['bundle_id'] is not None:
+                log.quiet(result['bundle_id'])
+        return
+
+    data = [
+        {
+            'id': '' if result['bundle_id'] is None else
+            result['bundle_id'] if args.long_ids else bundle_utils.short_id(result['bundle_id']),
+            'bundle': result['bundle'],
+            'status': result['status']
+        } for result in results
+    ]
+    data.insert(0, {'id': 'ID', 'bundle': 'BUNDLE', 'status': 'STATUS'})
 
-    return True
+    column_widths = dict(screen_utils.calc_column_widths(data), **{'padding': ' ' * DISPLAY_PADDING})
+    for row in data:
+        log.screen('''\
+{id: <{id_width}}{padding}\
+{bundle: <{bundle_width}}{padding}\
+{status}'''.format(**dict(row, **column_widths)).rstrip())
 
 
 def open_bundle(bundle_file_name, bundle_file, bundle_conf):
-    # The spec allows streaming from end to end but to reduce simplicity of implementation
-    # for now we use a temp file. It is possible someday to increase efficiency here by
-    # implementing a streaming zip library and http chunked responses to load this data right
-    # into ConductR.
+    # The digest trailer is excluded by a window over the bundle file itself, so the bundle is streamed
+    # into the multipart upload straight from disk without an intermediate copy.
+
+    with timings.phase('open bundle'):
+        bundle_open_file, digest = bundle_index.digest_extract_and_open(bundle_file)
+
+    return bundle_name_with_digest(bundle_file_name, digest, bundle_conf), bundle_open_file
+
+
+def open_bundle_stream(bundle_file_name, bundle_stream, bundle_conf):
+    # The digest trailer is located with a read of the end of the remote bundle, after which the bundle is
+    # read from start to end by a single request while it is uploaded, see `upload_files`.
+
+    digest, length = bundle_utils.digest_extract(bundle_stream)
+    bundle_open_file = bundle_utils.FileWindow(bundle_stream, length, digest)
+
+    return bundle_name_with_digest(bundle_file_name, digest, bundle_conf), bundle_open_file
 
-    bundle_open_file, digest = bundle_utils.digest_extract_and_open(bundle_file)
 
+def bundle_name_with_digest(bundle_file_name, digest, bundle_conf):
     if digest is None and bundle_file_name is None:
         raise MalformedBundleError('Unable to name bundle due to missing digest. '
                                    'Ensure file is produced with latest shazar')
     elif digest is not None:
-        parsed_bundle_conf = ConfigFactory.parse_string(bundle_conf)
+        parsed_bundle_conf = hocon_utils.parse_string(bundle_conf)
 
         if 'name' in parsed_bundle_conf:
             bundle_file_name = parsed_bundle_conf['name'] + '-' + digest[1] + '.zip'
         elif bundle_file_name is None:
             raise MalformedBundleError('Unable to name bundle. Add a "name" value to bundle.conf')
 
-    return bundle_file_name, bundle_open_file
+    return bundle_file_name
 
 
 def create_multipart(log, files):
@@ -367,19 +678,18 @@ def cleanup_old_bundles(cache_dir, bundle_file_name, excluded):
     bundle_name = '-'.join(bundle_name_parts[:-1])
 
     # List of bundle files having the same name and tag, sorted from oldest to latest.
-    # This list excludes the file specified as `excluded`, and normally the `excluded` file is the recently loaded
-    # bundle.
+    # This list excludes the files specified as `excluded`, and normally the `excluded` files are the recently loaded
+    # bundles.
     older_bundle_files = sorted([
         file
         for file in glob.glob('{}/*.zip'.format(cache_dir))
         if os.path.isfile(file) and
         os.path.basename(file).startswith(bundle_name) and
-        not is_same_path(file, excluded)
+        not any(is_same_path(file, excluded_file) for excluded_file in excluded)
     ], key=lambda f: os.path.getmtime(f))
 
     bundle_files_to_delete = older_bundle_files[:(-1 * KEEP_BUNDLE_VERSIONS)]
-    for file in bundle_files_to_delete:
-        os.remove(file)
+    resolve_cache.remove(bundle_files_to_delete)
 
 
 def is_same_path(a, b):
@@ -4,12 +4,14 @@ from conductr_cli import \
     bndl_main, conduct_agents, conduct_deploy, conduct_info, conduct_load, conduct_members, conduct_run, \
     conduct_service_names, conduct_stop, conduct_unload, version, conduct_logs, conduct_events, conduct_acls, \
     conduct_dcos, conduct_load_license, host, logging_setup, conduct_url, custom_settings, conductr_backup, \
-    conductr_restore
+    conductr_restore, bundle_index, conduct_cache, resolve_cache, timings
 from conductr_cli.constants import \
     DEFAULT_SCHEME, DEFAULT_PORT, DEFAULT_BASE_PATH, \
     DEFAULT_API_VERSION, DEFAULT_DCOS_SERVICE, DEFAULT_CLI_SETTINGS_DIR, \
     DEFAULT_CUSTOM_SETTINGS_FILE, DEFAULT_CUSTOM_PLUGINS_DIR, DEFAULT_BUNDLE_RESOLVE_CACHE_DIR, \
-    DEFAULT_CONFIGURATION_RESOLVE_CACHE_DIR, DEFAULT_WAIT_TIMEOUT, DEFAULT_OFFLINE_MODE, DEFAULT_LICENSE_DOWNLOAD_URL
+    DEFAULT_CONFIGURATION_RESOLVE_CACHE_DIR, DEFAULT_WAIT_TIMEOUT, DEFAULT_OFFLINE_MODE, DEFAULT_LICENSE_DOWNLOAD_URL, \
+    DEFAULT_LOAD_CONCURRENCY, DEFAULT_RESOLVE_CACHE_MAX_SIZE
+from conductr_cli.resolvers import bintray_index, docker_registry
 from dcos import config, constants
 
 from pathlib import Path
@@ -196,6 +198,22 @@ def add_follow_args(subparser, show_help=True):
                            action='store_true')
 
 
+def add_timings(sub_parser):
+    sub_parser.add_argument('--timings',
+                            default=False,
+                            dest='timings',
+                            action='store_true',
+                            help='Reports the time spent in each phase of the command, along with the number of\n'
+                                 'bytes moved and the throughput of the phase\n'
+                                 'Defaults to False')
+    sub_parser.add_argument('--timings-format',
+                            default='table',
+                            choices=['table', 'json'],
+                            dest='timings_format',
+                            help='The format of the timings report\n'
+                                 'Defaults to table')
+
+
 def add_offline_mode(sub_parser):
     sub_parser.add_argument('--offline',
                             default=DEFAULT_OFFLINE_MODE,
@@ -281,12 +299,39 @@ def build_parser(dcos_mode):
                              nargs='?',
                              default=None,
                              help='The optional configuration for the bundle')
+    load_parser.add_argument('--manifest',
+                             default=False,
+                             dest='manifest',
+                             action='store_true',
+                             help='Treats the bundle argument as a manifest file listing the bundles to load\n'
+                                  'Each line of the manifest holds a bundle, optionally followed by its configuration')
+    load_parser.add_argument('--concurrency',
+                             type=int,
+                             default=DEFAULT_LOAD_CONCURRENCY,
+                             dest='concurrency',
+                             help='The maximum number of bundles of a manifest to upload at the same time\n'
+                                  'Defaults to {}'.format(DEFAULT_LOAD_CONCURRENCY))
+    load_parser.add_argument('--stream',
+                             default=False,
+                             dest='stream_bundle',
+                             action='store_true',
+                             help='Loads a bundle from a http(s), S3 or Bintray URI into ConductR while it is being\n'
+                                  'downloaded rather than after the download has completed\n'
+                                  'Requires the server to support range requests')
+    load_parser.add_argument('--force-upload',
+                             default=False,
+                             dest='force_upload',
+                             action='store_true',
+                             help='Uploads the bundle even if ConductR already holds a bundle with the same bundle\n'
+                                  'and configuration digests\n'
+                                  'Defaults to False')
     add_offline_mode(load_parser)
     add_default_arguments(load_parser, dcos_mode)
     add_bundle_resolve_cache_dir(load_parser)
     add_configuration_resolve_cache_dir(load_parser)
     add_wait_timeout(load_parser)
     add_no_wait(load_parser)
+    add_timings(load_parser)
     bndl_main.add_conf_arguments(load_parser)
     load_parser.set_defaults(func=conduct_load.load)
 
@@ -308,6 +353,7 @@ def build_parser(dcos_mode):
     add_default_arguments(run_parser, dcos_mode)
     add_wait_timeout(run_parser)
     add_no_wait(run_parser)
+    add_timings(run_parser)
 
     # These are the arguments to display the bundle events and logs when error occurs during waiting for bundle scale.
     # As such, the help text for these arguments are not displayed.
@@ -344,6 +390,7 @@ def build_parser(dcos_mode):
     add_default_arguments(unload_parser, dcos_mode)
     add_wait_timeout(unload_parser)
     add_no_wait(unload_parser)
+    add_timings(unload_parser)
     unload_parser.set_defaults(func=conduct_unload.unload)
 
     # Sub-parser for `events` sub-command
@@ -416,6 +463,7 @@ def build_parser(dcos_mode):
     add_configuration_resolve_cache_dir(deploy_parser)
     add_wait_timeout(deploy_parser, wait_timeout=conduct_deploy.DEFAULT_WAIT_TIMEOUT)
     add_no_wait(deploy_parser)
+    add_timings(deploy_parser)
     bndl_main.add_conf_arguments(deploy_parser)
     add_long_ids(deploy_parser)
     deploy_parser.set_defaults(func=conduct_deploy.deploy)
@@ -509,6 +557,32 @@ def build_parser(dcos_mode):
 
     add_default_arguments(restore_parser, dcos_mode)
     restore_parser.set_defaults(func=conductr_restore.restore)
+
+    # Sub-parser for `cache` sub-command
+    cache_parser = subparsers.add_parser('cache',
+                                         help='Manage the cache of resolved bundles, bundle configurations\n'
+                                              'and Docker images',
+                                         formatter_class=argparse.RawTextHelpFormatter)
+    cache_parser.add_argument('action',
+                              choices=conduct_cache.SUPPORTED_ACTIONS,
+                              help='stats prints the number of files and size of each cache dir\n'
+                                   'prune evicts the least recently used files until the cache is within\n'
+                                   'the maximum size\n'
+                                   'verify removes cached files which don\'t match their digest')
+    cache_parser.add_argument('--max-size',
+                              type=int,
+                              default=DEFAULT_RESOLVE_CACHE_MAX_SIZE,
+                              dest='cache_max_size',
+                              help='The number of bytes the cache may hold before the least recently used\n'
+                                   'files are evicted\n'
+                                   'Defaults to {}, or the CONDUCTR_RESOLVE_CACHE_MAX_SIZE\n'
+                                   'environment variable if set'.format(DEFAULT_RESOLVE_CACHE_MAX_SIZE))
+    add_verbose(cache_parser)
+    add_quiet_flag(cache_parser)
+    add_cli_settings_dir(cache_parser)
+    add_bundle_resolve_cache_dir(cache_parser)
+    add_configuration_resolve_cache_dir(cache_parser)
+    cache_parser.set_defaults(func=conduct_cache.cache)
     return parser
 
 
@@ -581,7 +655,7 @@ def run(_args=[], configure_logging=True):
     else:
         # Offline functions are the functions which do not require network to run, e.g. `conduct version` or
         # `conduct setup-dcos`.
-        offline_functions = ['version', 'setup']
+        offline_functions = ['version', 'setup', 'cache']
 
         # Only setup network related args (i.e. host, bundle resolvers, basic auth, etc) for functions which requires
         # connectivity to ConductR.
@@ -621,6 +695,11 @@ def run(_args=[], configure_logging=True):
             args.cli_parameters = get_cli_parameters(args)
             args.custom_settings = custom_settings.load_from_file(args)
 
+            bundle_index.configure(vars(args).get('cli_settings_dir'))
+            docker_registry.configure(vars(args).get('cli_settings_dir'))
+            bintray_index.configure(vars(args).get('cli_settings_dir'))
+            resolve_cache.configure(vars(args).get('cli_settings_dir'))
+
             args.conductr_auth = custom_settings.load_conductr_credentials(args)
 
             # Ensure HTTPS is used if authentication is configured
@@ -643,6 +722,14 @@ def run(_args=[], configure_logging=True):
         if configure_logging:
             logging_setup.configure_logging(args)
 
+        timings_enabled = vars(args).get('timings', False)
+        if timings_enabled:
+            timings.enable()
+
         is_completed_without_error = args.func(args)
+
+        if timings_enabled:
+            timings.report(args.timings_format)
+
         if not is_completed_without_error:
             sys.exit(1)
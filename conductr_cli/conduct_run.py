@@ -1,4 +1,4 @@
-from conductr_cli import bundle_utils, bundle_scale, validation, control_protocol
+from conductr_cli import bundle_utils, bundle_scale, timings, validation, control_protocol
 import logging
 
 
@@ -15,14 +15,16 @@ def run(args):
         log.error('Affinity feature is only available for v1.1 onwards of ConductR')
         return
 
-    response_json = control_protocol.run_bundle(args)
+    with timings.phase('run request'):
+        response_json = control_protocol.run_bundle(args)
 
     bundle_id = response_json['bundleId'] if args.long_ids else bundle_utils.short_id(response_json['bundleId'])
 
     log.info('Bundle run request sent.')
 
     if not args.no_wait:
-        bundle_scale.wait_for_scale(response_json['bundleId'], args.scale, wait_for_is_active=True, args=args)
+        with timings.phase('wait for scale'):
+            bundle_scale.wait_for_scale(response_json['bundleId'], args.scale, wait_for_is_active=True, args=args)
 
     if not args.disable_instructions:
         log.info('Stop bundle with:         {} stop{} {}'.format(args.command, args.cli_parameters, bundle_id))
@@ -1,4 +1,4 @@
-from conductr_cli import conduct_request, conduct_url, validation, bundle_installation
+from conductr_cli import conduct_request, conduct_url, timings, validation, bundle_installation
 from conductr_cli.conduct_url import conductr_host
 import json
 import logging
@@ -13,8 +13,9 @@ def unload(args):
     log = logging.getLogger(__name__)
     path = 'bundles/{}'.format(args.bundle)
     url = conduct_url.url(path, args)
-    response = conduct_request.delete(args.dcos_mode, conductr_host(args), url, auth=args.conductr_auth,
-                                      verify=args.server_verification_file, timeout=DEFAULT_HTTP_TIMEOUT)
+    with timings.phase('unload request'):
+        response = conduct_request.delete(args.dcos_mode, conductr_host(args), url, auth=args.conductr_auth,
+                                          verify=args.server_verification_file, timeout=DEFAULT_HTTP_TIMEOUT)
     validation.raise_for_status_inc_3xx(response)
 
     if log.is_verbose_enabled():
@@ -24,7 +25,8 @@ def unload(args):
 
     response_json = json.loads(response.text)
     if not args.no_wait:
-        bundle_installation.wait_for_uninstallation(response_json['bundleId'], args)
+        with timings.phase('wait for uninstallation'):
+            bundle_installation.wait_for_uninstallation(response_json['bundleId'], args)
 
     if not args.disable_instructions:
         log.info('Print ConductR info with: {} info{}'.format(args.command, args.cli_parameters))
@@ -3,7 +3,6 @@ import json
 import logging
 import os
 import tempfile
-import zipfile
 from shutil import rmtree
 
 import requests
@@ -17,7 +16,7 @@ from conductr_cli.conduct_info_inspect import filter_bundles_by_id_or_name
 from conductr_cli.conduct_url import conductr_host
 from conductr_cli.exceptions import ConductBackupError
 from conductr_cli.http import DEFAULT_HTTP_TIMEOUT
-from conductr_cli.shazar_main import dir_to_zip, write_with_digest
+from conductr_cli.shazar_main import dir_to_zip, write_zip_with_digest
 
 
 @validation.handle_connection_error
@@ -74,13 +73,7 @@ def compress_backup(output_path, backup_directory):
         sys.exit(2)
 
     output_file = open(output_path, 'wb') if output_path else sys.stdout.buffer
-    with tempfile.NamedTemporaryFile() as zip_file_data:
-        with zipfile.ZipFile(zip_file_data, 'w') as zip_file:
-            dir_to_zip(backup_directory, zip_file, '.', None)
-        zip_file_data.flush()
-        zip_file_data.seek(0)
-
-        write_with_digest(zip_file_data, output_file)
+    write_zip_with_digest(output_file, lambda zip_file: dir_to_zip(backup_directory, zip_file, '.', None))
     output_file.flush()
 
 
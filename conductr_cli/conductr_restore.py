@@ -11,7 +11,7 @@ import sys
 
 from io import BytesIO
 
-from conductr_cli import control_protocol, bundle_utils, validation, conduct_load, bundle_scale
+from conductr_cli import control_protocol, bundle_index, validation, conduct_load, bundle_scale
 from conductr_cli.bundle_core_info import BundleCoreInfo
 from conductr_cli.exceptions import ConductRestoreError
 
@@ -87,21 +87,21 @@ def process_bundle(args, restore_directory, bundle_info: BundleCoreInfo):
     bundle = '{}.zip'.format(bundle_info.bundle_name_with_digest)
     bundle_path = os.path.join(restore_directory, bundle)
 
-    bundle_conf = bundle_utils.conf(bundle_path)
+    bundle_conf = bundle_index.conf(bundle_path)
     files.append(('bundleConf', ('bundle.conf', io.StringIO(bundle_conf))))
 
-    bundle_archive = open(bundle_path, 'rb')
+    bundle_archive, _ = bundle_index.digest_extract_and_open(bundle_path)
 
     if len(bundle_info.configuration_digest) != 0:
         configuration = '{}.zip'.format(bundle_info.bundle_name_with_configuration_digest)
         bundle_configuration_path = os.path.join(restore_directory, configuration)
 
-        bundle_conf_overlay = bundle_utils.conf(bundle_configuration_path)
+        bundle_conf_overlay = bundle_index.conf(bundle_configuration_path)
         files.append(('bundleConfOverlay', ('bundle.conf', io.StringIO(bundle_conf_overlay))))
 
         files.append(('bundle', (bundle, bundle_archive)))
 
-        configuration_archive = open(bundle_configuration_path, 'rb')
+        configuration_archive, _ = bundle_index.digest_extract_and_open(bundle_configuration_path)
         files.append(('configuration', (configuration, configuration_archive)))
     else:
         files.append(('bundle', (bundle, bundle_archive)))
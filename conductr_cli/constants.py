@@ -11,6 +11,9 @@ BNDL_PEEK_SIZE = 65536
 
 BNDL_IGNORE_TAGS = ['latest']
 
+# The maximum number of layers of a Docker image dir that bndl converts at the same time
+BNDL_LAYER_WORKERS = 8
+
 CONDUCTR_SCHEME = 'CONDUCTR_SCHEME'
 
 DEFAULT_SCHEME = os.getenv(CONDUCTR_SCHEME, 'http')
@@ -27,6 +30,7 @@ DEFAULT_BUNDLE_RESOLVE_CACHE_DIR = os.getenv('CONDUCTR_BUNDLE_RESOLVE_CACHE_DIR'
 DEFAULT_CONFIGURATION_RESOLVE_CACHE_DIR = os.getenv('CONDUCTR_CONFIGURATION_RESOLVE_CACHE_DIR',
                                                     '{}/configuration'
                                                     .format(DEFAULT_RESOLVE_CACHE_DIR))
+DEFAULT_BUILD_CACHE_DIR = os.getenv('CONDUCTR_BUILD_CACHE_DIR', '{}/build'.format(DEFAULT_RESOLVE_CACHE_DIR))
 DEFAULT_CUSTOM_SETTINGS_FILE = os.getenv('CONDUCTR_CUSTOM_SETTINGS_FILE',
                                          '{}/settings.conf'.format(DEFAULT_CLI_SETTINGS_DIR))
 DEFAULT_CUSTOM_PLUGINS_DIR = os.getenv('CONDUCTR_CUSTOM_PLUGINS_DIR',
@@ -52,6 +56,54 @@ DEFAULT_AUTH_TOKEN_FILE = os.path.abspath(os.getenv('CONDUCTR_AUTH_TOKEN_FILE',
                                                     '{}/.lightbend/auth-token'.format(os.path.expanduser('~'))))
 DEFAULT_WAIT_TIMEOUT = 60  # seconds
 
+# The number of seconds a cached Docker manifest is used without revalidating it with the registry. By default a
+# manifest is revalidated on every resolve, which is a single conditional request while the manifest is unchanged.
+DEFAULT_DOCKER_MANIFEST_TTL = int(os.getenv('CONDUCTR_DOCKER_MANIFEST_TTL', '0'))
+
+# The number of seconds the Bintray version of a bundle shorthand without a digest, e.g. `visualizer:v2`, is used
+# without resolving it again. A shorthand with both a tag and a digest always resolves to the same version, so it's
+# only resolved once.
+DEFAULT_BINTRAY_RESOLUTION_TTL = int(os.getenv('CONDUCTR_BINTRAY_RESOLUTION_TTL', '60'))
+
+# The number of bytes the resolve cache dirs may hold before the least recently used files are evicted, see
+# `resolve_cache`
+DEFAULT_RESOLVE_CACHE_MAX_SIZE = int(os.getenv('CONDUCTR_RESOLVE_CACHE_MAX_SIZE', str(10 * 1024 ** 3)))
+
+# Files of the resolve cache used within this many seconds aren't evicted, as another CLI invocation may be about to
+# read them
+RESOLVE_CACHE_EVICTION_GRACE = 600
+
+# The number of bundles that are uploaded at the same time when loading a manifest of bundles
+DEFAULT_LOAD_CONCURRENCY = 4
+
+# The number of bundles that are resolved at the same time when loading a manifest of bundles
+LOAD_MANIFEST_RESOLVE_WORKERS = 8
+
+# The number of blobs of a Docker image that are downloaded at the same time
+DOCKER_BLOB_FETCH_WORKERS = 4
+
+# The file within the CLI settings dir that indexes the metadata of bundle files
+BUNDLE_INDEX_FILE_NAME = 'bundle-index.json'
+
+# The file within the CLI settings dir that caches the tokens of Docker registries
+DOCKER_REGISTRY_TOKENS_FILE_NAME = 'docker-registry-tokens.json'
+
+# The file within the CLI settings dir that indexes the Bintray versions which bundle shorthands resolved to
+BINTRAY_RESOLUTION_INDEX_FILE_NAME = 'bintray-resolution-index.json'
+
+# The number of entries the Bintray resolution index keeps, see `bintray_index`
+BINTRAY_RESOLUTION_INDEX_MAX_ENTRIES = 1000
+
+# The file within the CLI settings dir that records the size and last use of the files in the resolve cache dirs
+RESOLVE_CACHE_FILE_NAME = 'resolve-cache.json'
+
+# The files within the build cache dir of an incremental build, see `incremental_build`
+INCREMENTAL_BUILD_MANIFEST_FILE_NAME = 'manifest.json'
+INCREMENTAL_BUILD_ARCHIVE_FILE_NAME = 'archive'
+
+# The number of parsed HOCON documents that are memoized by their content
+HOCON_PARSE_CACHE_SIZE = 64
+
 # Must be able to hold the digest value, name of algorithm, and newline character
 DIGEST_TRAIL_SIZE = 100
 
@@ -63,6 +115,18 @@ FEATURE_PROVIDE_LOGGING = 'logging'
 # When reading and writing to IO devices, buffer this many bytes at a time
 IO_CHUNK_SIZE = 32768
 
+# When compressing the entries of a zip file in parallel, larger files are compressed by the writing process so their
+# compressed data isn't held in memory
+DEFLATE_IN_PROCESS_SIZE = 4 * 1024 * 1024
+
+# When compressing the entries of a zip file in parallel, the maximum number of entries compressed ahead of the entry
+# being written
+DEFLATE_PENDING_ENTRIES = 64
+
+# When streaming a bundle while it is being resolved, download at most this many chunks of `IO_CHUNK_SIZE` bytes
+# ahead of the upload
+BUNDLE_STREAM_BUFFER_CHUNKS = 64
+
 # Time to wait when retrieving logs (in follow mode) results in an error
 LOGS_FOLLOW_ERROR_SLEEP_SECONDS = 10.0
 
@@ -75,7 +139,9 @@ SHAZAR_TIMESTAMP_MIN = 315705599
 # For auto-detection of input streams, per:
 # https://en.wikipedia.org/wiki/Tar_(computing)
 # https://en.wikipedia.org/wiki/Zip_(file_format)
+# https://en.wikipedia.org/wiki/Gzip
 
+MAGIC_NUMBER_GZIP = b'\x1f\x8b'
 MAGIC_NUMBER_TAR = b'ustar'
 MAGIC_NUMBER_TAR_OFFSET = 257
 MAGIC_NUMBERS_ZIP = [b'PK\x03\x04', b'PK\x05\x06', b'PK\x07\x08']
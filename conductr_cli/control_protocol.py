@@ -10,6 +10,8 @@ def load_bundle(args, multipart_files):
     log = logging.getLogger(__name__)
 
     url = conduct_url.url('bundles', args)
+    # Files opened with `bundle_utils.digest_extract_and_open` are verified against their digest while they are
+    # streamed. A mismatch raises a `MalformedBundleError` which aborts the request before the upload completes.
     response = conduct_request.post(args.dcos_mode, conductr_host(args), url,
                                     data=multipart_files,
                                     auth=args.conductr_auth,
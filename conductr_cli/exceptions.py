@@ -268,6 +268,22 @@ class DockerImageMalformedError(Exception):
         return repr(self.message)
 
 
+class DockerBlobDigestMismatchError(Exception):
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return repr(self.message)
+
+
+class RangeRequestsNotSupportedError(Exception):
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return repr(self.message)
+
+
 class ConductBackupError(Exception):
     def __init__(self, message, cause=None):
         self.message = message
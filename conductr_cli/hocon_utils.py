@@ -0,0 +1,40 @@
+from collections import OrderedDict
+from conductr_cli.constants import HOCON_PARSE_CACHE_SIZE
+from pyhocon import ConfigFactory
+import copy
+import hashlib
+import threading
+
+# Parsed documents by the SHA-256 of their content, from least to most recently used
+parse_cache = OrderedDict()
+parse_cache_lock = threading.Lock()
+
+
+def parse_string(content):
+    """
+    Parses a HOCON document in the same way as `ConfigFactory.parse_string`. The same bundle.conf is typically parsed
+    several times by a single command, so parsed documents are memoized by their content.
+
+    A copy of the memoized document is returned, so callers are free to modify it.
+
+    :param content: the HOCON document
+    :return: the parsed `ConfigTree`
+    """
+    key = hashlib.sha256(content.encode('UTF-8')).digest()
+
+    with parse_cache_lock:
+        config = parse_cache.get(key)
+
+        if config is not None:
+            parse_cache.move_to_end(key)
+
+    if config is None:
+        config = ConfigFactory.parse_string(content)
+
+        with parse_cache_lock:
+            parse_cache[key] = config
+
+            while len(parse_cache) > HOCON_PARSE_CACHE_SIZE:
+                parse_cache.popitem(last=False)
+
+    return copy.deepcopy(config)
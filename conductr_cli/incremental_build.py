@@ -0,0 +1,253 @@
+from conductr_cli import zip_utils
+from conductr_cli.constants import INCREMENTAL_BUILD_ARCHIVE_FILE_NAME, INCREMENTAL_BUILD_MANIFEST_FILE_NAME, \
+    IO_CHUNK_SIZE
+from functools import partial
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+
+# An incremental build keeps the archive which was last built from a source dir, together with a manifest of the
+# relative path, size, modification time, mode and CRC-32 of each file within the archive. The build is kept in its own
+# dir within the build cache dir, named after the digest of the command and the real path of the source dir.
+#
+# If the other inputs of the build and the files are unchanged, the archive is reused as is. Otherwise the compressed
+# data of the unchanged files is copied from the previous archive.
+
+MANIFEST_VERSION = 2
+
+
+class IncrementalBuild(object):
+    def __init__(self, cache_dir, command, source_dir, inputs, excludes=(), followlinks=False):
+        """
+        :param cache_dir: the build cache dir
+        :param command: the command which builds the archive, e.g. `bndl`
+        :param source_dir: the dir which is archived
+        :param inputs: JSON serializable value of the inputs of the build other than the files of `source_dir`,
+                       e.g. the archive name and the data of any entries which aren't files
+        :param excludes: the paths of files within `source_dir` which aren't archived
+        :param followlinks: True if symlinked dirs within `source_dir` are archived, as with `os.walk`
+        """
+        build_id = hashlib.sha256(json.dumps([command, os.path.realpath(source_dir)]).encode('UTF-8')).hexdigest()
+
+        self.source_dir = source_dir
+        self.inputs = inputs
+        self.excludes = excludes
+        self.followlinks = followlinks
+        self.build_dir = os.path.join(cache_dir, build_id)
+        self.manifest_file = os.path.join(self.build_dir, INCREMENTAL_BUILD_MANIFEST_FILE_NAME)
+        self.archive_file = os.path.join(self.build_dir, INCREMENTAL_BUILD_ARCHIVE_FILE_NAME)
+        self.previous_manifest = self.load_manifest()
+        self.previous_zip_file = None
+        self.files = {}
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if manifest.get('version') == MANIFEST_VERSION and os.path.isfile(self.archive_file):
+            return manifest
+        else:
+            return None
+
+    def build(self, output, write_archive):
+        """
+        Writes the archive to `output`, reusing the archive of the previous build if nothing has changed.
+
+        :param write_archive: function that's called with the file object to write the archive to, and which
+                              returns the hex digest of the archive
+        :return: the hex digest of the archive
+        """
+        log = logging.getLogger(__name__)
+
+        if self.is_unchanged():
+            try:
+                previous_archive = open(self.archive_file, 'rb')
+            except OSError as e:
+                log.debug('Unable to read the archive of the previous build {}: {}'.format(self.archive_file, e))
+                self.previous_manifest = None
+            else:
+                log.debug('Reusing the archive of the previous build of {}'.format(self.source_dir))
+
+                with previous_archive:
+                    return self.write_previous(previous_archive, output)
+
+        return self.write(output, write_archive)
+
+    def is_unchanged(self):
+        """
+        :return: True if the archive of the previous build can be reused, i.e. the inputs are the same and each file
+                 of the source dir has the same size, modification time and mode as before
+        """
+        if self.previous_manifest is None or self.previous_manifest['inputs'] != self.inputs:
+            return False
+
+        previous_files = self.previous_manifest['files']
+        file_count = 0
+
+        for (dir_path, dir_names, file_names) in os.walk(self.source_dir, followlinks=self.followlinks):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+
+                if path in self.excludes:
+                    continue
+
+                stat = os.stat(path)
+                previous_file = previous_files.get(os.path.relpath(path, start=self.source_dir))
+
+                if previous_file is None or \
+                        previous_file['size'] != stat.st_size or \
+                        previous_file['mtimeNs'] != stat.st_mtime_ns or \
+                        previous_file['mode'] != stat.st_mode:
+                    return False
+
+                file_count += 1
+
+        return file_count == len(previous_files)
+
+    def write_previous(self, previous_archive, output):
+        """
+        Writes the archive of the previous build to `output`.
+
+        :return: the hex digest of the archive
+        """
+        shutil.copyfileobj(previous_archive, output, IO_CHUNK_SIZE)
+
+        return self.previous_manifest['digest']
+
+    def write(self, output, write_archive):
+        """
+        Writes the archive to both `output` and the build cache dir, and saves the manifest of the build.
+        """
+        log = logging.getLogger(__name__)
+
+        try:
+            os.makedirs(self.build_dir, exist_ok=True)
+            fd, temp_file = tempfile.mkstemp(dir=self.build_dir,
+                                             prefix='.{}'.format(INCREMENTAL_BUILD_ARCHIVE_FILE_NAME))
+        except OSError as e:
+            # The build cache only saves work, so the archive is still built if it can't be written
+            log.debug('Unable to write to the build cache dir {}: {}'.format(self.build_dir, e))
+
+            return write_archive(output)
+
+        if self.previous_manifest is not None:
+            try:
+                self.previous_zip_file = zipfile.ZipFile(self.archive_file)
+            except (OSError, zipfile.BadZipFile) as e:
+                # Without the previous archive, all files are compressed again
+                log.debug('Unable to read the archive of the previous build {}: {}'.format(self.archive_file, e))
+
+        try:
+            with os.fdopen(fd, 'wb') as archive:
+                hex_digest = write_archive(TeeWriter(output, archive))
+        except Exception:
+            os.remove(temp_file)
+            raise
+        finally:
+            if self.previous_zip_file is not None:
+                self.previous_zip_file.close()
+                self.previous_zip_file = None
+
+        os.replace(temp_file, self.archive_file)
+        self.save_manifest(hex_digest)
+
+        return hex_digest
+
+    def write_file(self, zip_file, path, name, compress_type, mtime=None):
+        """
+        Writes a file of the source dir as the entry `name` of `zip_file`. If the file has the same size and CRC-32
+        as in the previous build, its compressed data is copied from the previous archive.
+        """
+        stat = os.stat(path)
+        rel_path = os.path.relpath(path, start=self.source_dir)
+        zinfo = zip_utils.create_zip_info(path, name, mtime)
+        zinfo.compress_type = compress_type
+
+        previous_zinfo = self.find_previous_zinfo(path, rel_path, stat, compress_type)
+
+        if previous_zinfo is not None:
+            zip_utils.copy_compressed(zip_file, zinfo, self.previous_zip_file, previous_zinfo)
+        else:
+            zip_utils.write_file_with_header_sizes(zip_file, zinfo, path)
+
+        self.files[rel_path] = {
+            'size': stat.st_size,
+            'mtimeNs': stat.st_mtime_ns,
+            'mode': stat.st_mode,
+            'crc32': zinfo.CRC,
+            'entry': name
+        }
+
+    def find_previous_zinfo(self, path, rel_path, stat, compress_type):
+        if self.previous_zip_file is None:
+            return None
+
+        previous_file = self.previous_manifest['files'].get(rel_path)
+
+        if previous_file is None or previous_file['size'] != stat.st_size or previous_file['mode'] != stat.st_mode:
+            return None
+
+        # A file which has only been touched has the same contents, so it's worth checking its CRC-32
+        if previous_file['mtimeNs'] != stat.st_mtime_ns and previous_file['crc32'] != file_crc32(path):
+            return None
+
+        try:
+            previous_zinfo = self.previous_zip_file.getinfo(previous_file['entry'])
+        except KeyError:
+            return None
+
+        return previous_zinfo if previous_zinfo.compress_type == compress_type else None
+
+    def save_manifest(self, hex_digest):
+        log = logging.getLogger(__name__)
+
+        fd, temp_file = tempfile.mkstemp(dir=self.build_dir, prefix='.{}'.format(INCREMENTAL_BUILD_MANIFEST_FILE_NAME))
+
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({
+                    'version': MANIFEST_VERSION,
+                    'inputs': self.inputs,
+                    'digest': hex_digest,
+                    'files': self.files
+                }, file)
+            os.replace(temp_file, self.manifest_file)
+        except OSError as e:
+            os.remove(temp_file)
+
+            # Without a manifest the next build is a full build, so failing to write it isn't an error
+            log.debug('Unable to write the incremental build manifest {}: {}'.format(self.manifest_file, e))
+
+
+class TeeWriter(object):
+    def __init__(self, output, copy):
+        self.output = output
+        self.copy = copy
+
+    def write(self, data):
+        self.output.write(data)
+        self.copy.write(data)
+
+        return len(data)
+
+    def flush(self):
+        self.output.flush()
+        self.copy.flush()
+
+
+def file_crc32(path):
+    crc = 0
+
+    with open(path, 'rb') as file:
+        for chunk in iter(partial(file.read, IO_CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+
+    return crc
@@ -1,6 +1,8 @@
 from conductr_cli.ansi_colors import RED, YELLOW, UNDERLINE, ENDC
+from contextlib import contextmanager
 import logging
 import sys
+import threading
 
 # Default python log levels
 LOG_LEVEL_DEBUG = logging.DEBUG
@@ -43,6 +45,36 @@ class LevelFilter(logging.Filter):
         return record.levelno == self.level
 
 
+# Per thread state of `suppress_thread_output`
+thread_output = threading.local()
+
+
+class SuppressedThreadFilter(logging.Filter):
+    """
+    Excludes the records below `threshold` which are logged by a thread within `suppress_thread_output`.
+    """
+    def __init__(self, threshold):
+        super().__init__()
+        self.threshold = threshold
+
+    def filter(self, record):
+        return record.levelno >= self.threshold or not getattr(thread_output, 'suppressed', False)
+
+
+@contextmanager
+def suppress_thread_output():
+    """
+    Suppresses the log messages below warning, including progress bars, which are logged by the current thread.
+    Used by tasks running concurrently, whose output would otherwise interleave on the terminal.
+    """
+    previous = getattr(thread_output, 'suppressed', False)
+    thread_output.suppressed = True
+    try:
+        yield
+    finally:
+        thread_output.suppressed = previous
+
+
 def verbose(self, message, *args, **kwargs):
     self.log(LOG_LEVEL_VERBOSE, message, *args, **kwargs)
 
@@ -153,6 +185,7 @@ def configure_logging(args, output=sys.stdout, err_output=sys.stderr):
     output_handler.setFormatter(formatter)
     output_handler.addFilter(ThresholdFilter(LOG_LEVEL_WARN))
     output_handler.addFilter(ExcludeLevelFilter(LOG_LEVEL_PROGRESS))
+    output_handler.addFilter(SuppressedThreadFilter(LOG_LEVEL_WARN))
     logger.addHandler(output_handler)
 
     # Progress logger should exclude all levels of logging except for LOG_LEVEL_PROGRESS
@@ -165,6 +198,7 @@ def configure_logging(args, output=sys.stdout, err_output=sys.stderr):
     progress_handler.setFormatter(logging.Formatter('%(message)s'))
     progress_handler.setLevel(LOG_LEVEL_PROGRESS)
     progress_handler.addFilter(LevelFilter(LOG_LEVEL_PROGRESS))
+    progress_handler.addFilter(SuppressedThreadFilter(LOG_LEVEL_WARN))
     logger.addHandler(progress_handler)
 
     warn_output_formatter = logging.Formatter('{}{}Warning{}: %(message)s'.format(YELLOW, UNDERLINE, ENDC))
@@ -0,0 +1,411 @@
+from conductr_cli import bundle_index, bundle_utils, settings_utils
+from conductr_cli.constants import DEFAULT_RESOLVE_CACHE_MAX_SIZE, IO_CHUNK_SIZE, RESOLVE_CACHE_EVICTION_GRACE, \
+    RESOLVE_CACHE_FILE_NAME
+from functools import partial
+import hashlib
+import logging
+import os
+import re
+import stat
+import threading
+import time
+
+# The resolve cache manages the files which resolvers keep in their cache dirs, i.e. bundles, bundle configurations
+# and the manifests, blobs and layers of Docker images. The size and last use of each file is recorded in a JSON file
+# within the CLI settings dir, keyed by the real path of the file. Once the recorded size exceeds the budget, the
+# least recently used files are evicted. Files which were in a cache dir before it was first used are recorded with
+# their modification time as their last use.
+#
+# Eviction is safe with concurrent CLI invocations. A file is renamed to a name private to the evicting process
+# before it is removed, so another process either finds the complete file, or doesn't find it and resolves it again.
+# Files used by the evicting process, or by any process within the last `RESOLVE_CACHE_EVICTION_GRACE` seconds, are
+# never evicted.
+#
+# The cache is unmanaged until `configure` is called.
+
+RECORDS_VERSION = 1
+
+# Files which belong to a cached file, named after it, which are evicted along with it
+COMPANION_SUFFIXES = ['.diff-id', '.validation']
+
+# Files which are being written, or which were left behind by an interrupted CLI invocation
+TEMP_SUFFIX = '.tmp'
+
+# Temp files which haven't been written to for this many seconds are removed by `prune`. Until then, an interrupted
+# download of a Docker blob is resumed from its temp file.
+STALE_TEMP_FILE_AGE = 24 * 60 * 60
+
+DOCKER_BLOB_FILE_PATTERN = re.compile('^docker-blob-sha256_([0-9a-f]{64})$')
+DOCKER_LAYER_FILE_PATTERN = re.compile('^docker-layer-sha256_[0-9a-f]{64}$')
+
+records_file = None
+records = None
+max_size = DEFAULT_RESOLVE_CACHE_MAX_SIZE
+used_files = set()
+records_lock = threading.RLock()
+
+
+def configure(cli_settings_dir, cache_max_size=DEFAULT_RESOLVE_CACHE_MAX_SIZE):
+    global records_file, records, max_size
+
+    with records_lock:
+        records_file = os.path.join(cli_settings_dir, RESOLVE_CACHE_FILE_NAME) if cli_settings_dir else None
+        records = None
+        max_size = cache_max_size
+        used_files.clear()
+
+
+def accessed(*paths):
+    """
+    Records the use of cached files, and evicts the least recently used files of the cache if its size exceeds the
+    budget. The files used by this CLI invocation are never evicted by it.
+
+    :param paths: the paths of files within a cache dir, which have been read from or written to the cache
+    """
+    if records_file is None:
+        return
+
+    now = time.time()
+
+    with records_lock:
+        current = load_records()
+
+        for path in paths:
+            key = os.path.realpath(path)
+
+            try:
+                size = os.path.getsize(key)
+            except OSError:
+                continue
+
+            adopt(current, os.path.dirname(key))
+            current['files'][key] = {'size': size, 'accessedAt': now}
+            used_files.add(key)
+
+        save_records(current)
+
+        if total_size(current['files'].values()) > max_size:
+            evict(current, max_size)
+
+
+def remove(paths):
+    """
+    Removes files from the cache, e.g. bundles which have been superseded by a newer version.
+    """
+    if records_file is None:
+        for path in paths:
+            os.remove(path)
+    else:
+        with records_lock:
+            current = load_records()
+            removed = []
+
+            for path in paths:
+                key = os.path.realpath(path)
+
+                if evict_file(key):
+                    current['files'].pop(key, None)
+                    removed.append(key)
+
+            save_records(current, removed)
+
+    bundle_index.remove(paths)
+
+
+def stats(cache_dirs):
+    """
+    :param cache_dirs: the cache dirs to include, in addition to the cache dirs used before
+    :return: list of dicts with the `dir`, number of `files` and `size` of each cache dir
+    """
+    with records_lock:
+        current = refreshed_records(cache_dirs)
+        dir_stats = []
+
+        for cache_dir in sorted(current['dirs']):
+            files = [record for path, record in current['files'].items() if os.path.dirname(path) == cache_dir]
+            dir_stats.append({'dir': cache_dir, 'files': len(files), 'size': total_size(files)})
+
+        return dir_stats
+
+
+def prune(cache_dirs, size_budget):
+    """
+    Evicts the least recently used files until the size of the cache is within `size_budget`, and removes temp files
+    and companion files which have been left behind.
+
+    :param cache_dirs: the cache dirs to include, in addition to the cache dirs used before
+    :param size_budget: the number of bytes the cache may hold
+    :return: tuple of the paths of the removed files and the number of bytes freed
+    """
+    log = logging.getLogger(__name__)
+
+    with records_lock:
+        current = refreshed_records(cache_dirs)
+        size_before = total_size(current['files'].values())
+        removed = evict(current, size_budget)
+        freed = size_before - total_size(current['files'].values())
+
+        now = time.time()
+
+        for cache_dir in sorted(current['dirs']):
+            for name, path, file_stat in scan_dir(cache_dir):
+                is_stale_temp = name.endswith(TEMP_SUFFIX) and file_stat.st_mtime < now - STALE_TEMP_FILE_AGE
+                is_orphan = any(name.endswith(suffix) and not os.path.isfile(path[:-len(suffix)])
+                                for suffix in COMPANION_SUFFIXES) and \
+                    file_stat.st_mtime < now - RESOLVE_CACHE_EVICTION_GRACE
+
+                if is_stale_temp or is_orphan:
+                    try:
+                        os.remove(path)
+                        removed.append(path)
+                        freed += file_stat.st_size
+                    except OSError as e:
+                        log.debug('Unable to remove {}: {}'.format(path, e))
+
+        return removed, freed
+
+
+def verify(cache_dirs):
+    """
+    Verifies the cached files against their digests, i.e. the Docker blobs and layers, and bundles with a digest
+    trailer. Corrupt files are removed, so that they are resolved again when they are next used.
+
+    :param cache_dirs: the cache dirs to include, in addition to the cache dirs used before
+    :return: tuple of the number of verified files, and a list of tuples of the path of each corrupt file and the
+             reason it is corrupt
+    """
+    with records_lock:
+        current = refreshed_records(cache_dirs)
+        paths = sorted(current['files'])
+        corrupt = []
+        removed = []
+
+        for path in paths:
+            reason = verify_file(path)
+
+            if reason is not None:
+                corrupt.append((path, reason))
+
+                if evict_file(path):
+                    del current['files'][path]
+                    removed.append(path)
+
+        save_records(current, removed)
+
+        if corrupt:
+            bundle_index.remove([path for path, reason in corrupt])
+
+        return len(paths), corrupt
+
+
+def verify_file(path):
+    name = os.path.basename(path)
+    docker_blob_match = DOCKER_BLOB_FILE_PATTERN.match(name)
+
+    if docker_blob_match:
+        expected_digest = docker_blob_match.group(1)
+        actual_digest = file_sha256(path)
+    elif DOCKER_LAYER_FILE_PATTERN.match(name) and os.path.isfile('{}.diff-id'.format(path)):
+        with open('{}.diff-id'.format(path), 'r', encoding='utf-8') as diff_id_file:
+            expected_digest = diff_id_file.read().split(':')[-1]
+
+        actual_digest = file_sha256(path)
+    elif name.endswith('.zip'):
+        with open(path, 'rb') as file:
+            digest, length = bundle_utils.digest_extract(file)
+
+        if digest is None or digest[0] != 'sha-256':
+            return None
+
+        expected_digest = digest[1]
+        actual_digest = file_sha256(path, length)
+    else:
+        return None
+
+    if expected_digest == actual_digest:
+        return None
+    else:
+        return 'expected digest {} but was {}'.format(expected_digest, actual_digest)
+
+
+def file_sha256(path, length=None):
+    digest = hashlib.sha256()
+    remaining = length
+
+    with open(path, 'rb') as file:
+        for chunk in iter(partial(file.read, IO_CHUNK_SIZE), b''):
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def evict(current, size_budget):
+    """
+    Evicts the least recently used files of `current` until their size is within `size_budget`.
+
+    :return: the paths of the evicted files
+    """
+    removed = []
+    remaining_size = total_size(current['files'].values())
+    evictable_before = time.time() - RESOLVE_CACHE_EVICTION_GRACE
+
+    for path, record in sorted(current['files'].items(), key=lambda item: item[1]['accessedAt']):
+        if remaining_size <= size_budget:
+            break
+
+        if path not in used_files and record['accessedAt'] < evictable_before and evict_file(path):
+            del current['files'][path]
+            removed.append(path)
+            remaining_size -= record['size']
+
+    if removed:
+        save_records(current, removed)
+        bundle_index.remove(removed)
+
+    return removed
+
+
+def evict_file(path):
+    """
+    Removes a cached file along with its companion files. The file is renamed first, which is atomic, so that
+    concurrent CLI invocations never read a partially removed file.
+
+    :return: True if the file is no longer in the cache
+    """
+    log = logging.getLogger(__name__)
+    evicted_path = '{}.evicted-{}{}'.format(path, os.getpid(), TEMP_SUFFIX)
+
+    try:
+        os.rename(path, evicted_path)
+    except FileNotFoundError:
+        # Evicted by another CLI invocation
+        return True
+    except OSError as e:
+        # E.g. on Windows, where a file which is open can't be renamed
+        log.debug('Unable to evict {}: {}'.format(path, e))
+        return False
+
+    for file in ['{}{}'.format(path, suffix) for suffix in COMPANION_SUFFIXES] + [evicted_path]:
+        try:
+            os.remove(file)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log.debug('Unable to remove {}: {}'.format(file, e))
+
+    return True
+
+
+def total_size(files):
+    return sum(record['size'] for record in files)
+
+
+def is_cache_file(name):
+    return not name.startswith('.') and \
+        not name.endswith(TEMP_SUFFIX) and \
+        not any(name.endswith(suffix) for suffix in COMPANION_SUFFIXES)
+
+
+def scan_dir(cache_dir):
+    """
+    :return: list of tuples of the name, path and `os.stat_result` of each regular file within `cache_dir`
+    """
+    # `os.scandir` isn't available prior to Python 3.5
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return []
+
+    files = []
+
+    for name in names:
+        path = os.path.join(cache_dir, name)
+
+        try:
+            file_stat = os.lstat(path)
+        except OSError:
+            # The file was removed after the dir was listed
+            continue
+
+        if stat.S_ISREG(file_stat.st_mode):
+            files.append((name, path, file_stat))
+
+    return files
+
+
+def adopt(current, cache_dir):
+    """
+    Records the files of a cache dir which hasn't been used before, with their modification time as their last use.
+    """
+    if cache_dir in current['dirs']:
+        return
+
+    for name, path, file_stat in scan_dir(cache_dir):
+        if is_cache_file(name) and path not in current['files']:
+            current['files'][path] = {'size': file_stat.st_size, 'accessedAt': file_stat.st_mtime}
+
+    current['dirs'].append(cache_dir)
+
+
+def refreshed_records(cache_dirs):
+    """
+    :return: the records including the files of `cache_dirs`, without the records of files which no longer exist, e.g.
+             files evicted by another CLI invocation
+    """
+    current = load_records()
+
+    for cache_dir in cache_dirs:
+        adopt(current, os.path.realpath(cache_dir))
+
+    missing = [path for path in current['files'] if not os.path.isfile(path)]
+
+    for path in missing:
+        del current['files'][path]
+
+    save_records(current, missing)
+
+    return current
+
+
+def load_records():
+    global records
+
+    if records is None:
+        records = read_records_file()
+
+    return records
+
+
+def read_records_file():
+    content = settings_utils.read_json_settings_file(records_file, RECORDS_VERSION)
+
+    if content is not None:
+        return {'dirs': content.get('dirs', []), 'files': content.get('files', {})}
+    else:
+        return {'dirs': [], 'files': {}}
+
+
+def save_records(current, removed=()):
+    # Other CLI invocations may have used files since the records were read, so their records are merged in, keeping
+    # the latest use of each file, except for the `removed` files. The files aren't checked for existence here, as
+    # that would make each use of the cache cost a stat of every cached file. Records of files removed by other CLI
+    # invocations are dropped by `refreshed_records`, or once the files are due to be evicted.
+    saved = read_records_file()
+    removed = set(removed)
+
+    for cache_dir in saved['dirs']:
+        if cache_dir not in current['dirs']:
+            current['dirs'].append(cache_dir)
+
+    for path, record in saved['files'].items():
+        if path in removed:
+            continue
+
+        if path not in current['files'] or current['files'][path]['accessedAt'] < record['accessedAt']:
+            current['files'][path] = record
+
+    settings_utils.write_json_settings_file_atomically(records_file, RECORDS_VERSION, current, 'resolve cache records')
@@ -45,6 +45,32 @@ def resolve_bundle(custom_settings, cache_dir, uri, offline_mode=False):
                                 bundle_resolution_errors)
 
 
+def stream_bundle(custom_settings, cache_dir, uri, offline_mode=False):
+    """
+    Opens a bundle for streaming using the first supported resolver that provides `stream_bundle()`. The bundle is
+    written to the cache while it is streamed.
+
+    A stream isn't returned if the bundle is already cached or no resolver is able to stream it. In that case the
+    bundle should be resolved with `resolve_bundle` instead.
+
+    :return: bundle file name, stream or `None`
+    """
+    if offline_mode:
+        return None, None
+
+    all_resolvers = resolver_chain(custom_settings, offline_mode)
+    supported_resolvers = filter_for_supported_resolvers(all_resolvers, uri)
+
+    for resolver in supported_resolvers:
+        if hasattr(resolver, 'stream_bundle'):
+            is_resolved, bundle_file_name, bundle_stream, error = resolver.stream_bundle(cache_dir, uri)
+
+            if is_resolved:
+                return bundle_file_name, bundle_stream
+
+    return None, None
+
+
 def resolve_bundle_configuration(custom_settings, cache_dir, uri, offline_mode=False):
     log = logging.getLogger(__name__)
 
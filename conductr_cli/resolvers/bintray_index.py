@@ -0,0 +1,109 @@
+from conductr_cli import settings_utils
+from conductr_cli.constants import BINTRAY_RESOLUTION_INDEX_FILE_NAME, BINTRAY_RESOLUTION_INDEX_MAX_ENTRIES, \
+    DEFAULT_BINTRAY_RESOLUTION_TTL
+import json
+import os
+import threading
+import time
+
+# The index maps the bundle shorthands which have been resolved through Bintray, i.e. their org, repo, package name,
+# tag and digest, to the version they resolved to. The cache file of a version follows from its download url, so a
+# cached bundle is found without any request to Bintray.
+#
+# A pinned shorthand, with both a tag and a digest, always resolves to the same version, so its entry is used for as
+# long as it's indexed. A floating shorthand resolves to the latest version of a tag or package, so its entry is only
+# used within `DEFAULT_BINTRAY_RESOLUTION_TTL` seconds of resolving it. The index keeps at most
+# `BINTRAY_RESOLUTION_INDEX_MAX_ENTRIES` entries, dropping those resolved least recently.
+#
+# The index is disabled until `configure` is called.
+
+INDEX_VERSION = 1
+
+index_file = None
+index_entries = None
+index_lock = threading.RLock()
+
+
+def configure(cli_settings_dir):
+    global index_file, index_entries
+
+    with index_lock:
+        index_file = os.path.join(cli_settings_dir, BINTRAY_RESOLUTION_INDEX_FILE_NAME) if cli_settings_dir else None
+        index_entries = None
+
+
+def resolved_version(org, repo, package_name, tag, digest):
+    """
+    :return: the indexed version of a bundle shorthand, or None if it isn't indexed or its entry has expired
+    """
+    if index_file is None:
+        return None
+
+    with index_lock:
+        entry = load_entries().get(index_key(org, repo, package_name, tag, digest))
+
+    if entry is not None and not is_expired(entry, time.time()):
+        return entry['resolvedVersion']
+    else:
+        return None
+
+
+def save_resolved_version(org, repo, package_name, tag, digest, version):
+    """
+    Indexes the version a bundle shorthand resolved to. The version is also indexed for the pinned shorthand of the
+    version, so that e.g. resolving `visualizer` answers `visualizer:v2-023f9da` as well.
+    """
+    if index_file is None:
+        return
+
+    now = time.time()
+
+    with index_lock:
+        entries = load_entries()
+        entries[index_key(org, repo, package_name, tag, digest)] = {
+            'resolvedVersion': version,
+            'resolvedAt': now,
+            'pinned': digest is not None
+        }
+
+        if digest is None and version.get('tag') is not None and version.get('digest') is not None:
+            entries[index_key(org, repo, package_name, version['tag'], version['digest'])] = {
+                'resolvedVersion': version,
+                'resolvedAt': now,
+                'pinned': True
+            }
+
+        save_entries(entries)
+
+
+def index_key(org, repo, package_name, tag, digest):
+    return json.dumps([org, repo, package_name, tag, digest])
+
+
+def is_expired(entry, now):
+    return not entry['pinned'] and entry['resolvedAt'] + DEFAULT_BINTRAY_RESOLUTION_TTL <= now
+
+
+def load_entries():
+    global index_entries
+
+    if index_entries is None:
+        index = settings_utils.read_json_settings_file(index_file, INDEX_VERSION)
+        index_entries = index.get('shorthands', {}) if index is not None else {}
+
+    return index_entries
+
+
+def save_entries(entries):
+    now = time.time()
+
+    for key in [key for key, entry in entries.items() if is_expired(entry, now)]:
+        del entries[key]
+
+    # Pinned entries never expire, so only the most recently resolved entries are kept
+    if len(entries) > BINTRAY_RESOLUTION_INDEX_MAX_ENTRIES:
+        for key in sorted(entries, key=lambda key: entries[key]['resolvedAt'])[:-BINTRAY_RESOLUTION_INDEX_MAX_ENTRIES]:
+            del entries[key]
+
+    settings_utils.write_json_settings_file_atomically(index_file, INDEX_VERSION, {'shorthands': entries},
+                                                       'Bintray resolution index')
@@ -1,6 +1,6 @@
 from conductr_cli.exceptions import MalformedBundleUriError, BintrayResolutionError, \
     BintrayCredentialsNotFoundError, MalformedBintrayCredentialsError
-from conductr_cli.resolvers import uri_resolver
+from conductr_cli.resolvers import bintray_index, uri_resolver
 from conductr_cli.resolvers.resolvers_util import is_local_file
 from conductr_cli.resolvers.schemes import SCHEME_BUNDLE
 from conductr_cli import bundle_shorthand
@@ -35,7 +35,7 @@ def resolve_bundle(cache_dir, uri):
         log.info(log_message('Resolving bundle', org, repo, package_name, tag, digest))
 
         bintray_auth = load_bintray_credentials(raise_error=False)
-        resolved_version = bintray_resolve_version(bintray_auth, org, repo, package_name, tag, digest)
+        resolved_version = resolve_version(bintray_auth, org, repo, package_name, tag, digest)
         return bintray_download_artefact(cache_dir, resolved_version, bintray_auth)
     except MalformedBundleUriError as e:
         return False, None, None, e
@@ -45,6 +45,33 @@ def resolve_bundle(cache_dir, uri):
         return False, None, None, e
 
 
+def stream_bundle(cache_dir, uri):
+    """
+    Opens a bundle published on Bintray for streaming. The version is resolved using the Bintray credentials, which
+    are passed on so that bundles from private repositories can be streamed as well.
+
+    :return: is_resolved, bundle file name, `RemoteFile`, error
+    """
+    log = logging.getLogger(__name__)
+
+    try:
+        urn, org, repo, package_name, tag, digest = bundle_shorthand.parse_bundle(uri)
+        log.info(log_message('Streaming bundle', org, repo, package_name, tag, digest))
+
+        bintray_auth = load_bintray_credentials(raise_error=False)
+        resolved_version = resolve_version(bintray_auth, org, repo, package_name, tag, digest)
+        if resolved_version:
+            return uri_resolver.stream_bundle(cache_dir, resolved_version['download_url'], bintray_auth)
+        else:
+            return False, None, None, None
+    except MalformedBundleUriError as e:
+        return False, None, None, e
+    except HTTPError as e:
+        return False, None, None, e
+    except ConnectionError as e:
+        return False, None, None, e
+
+
 def load_bundle_from_cache(cache_dir, uri):
     # When the supplied uri points to a local file, don't load from cache so file can be used as is.
     if is_local_file(uri, require_bundle_conf=True):
@@ -55,7 +82,7 @@ def load_bundle_from_cache(cache_dir, uri):
             urn, org, repo, package_name, tag, digest = bundle_shorthand.parse_bundle(uri)
             log.info(log_message('Loading bundle from cache', org, repo, package_name, tag, digest))
             bintray_auth = load_bintray_credentials(raise_error=False)
-            resolved_version = bintray_resolve_version(bintray_auth, org, repo, package_name, tag, digest)
+            resolved_version = resolve_version(bintray_auth, org, repo, package_name, tag, digest)
             if resolved_version:
                 return uri_resolver.load_bundle_from_cache(cache_dir, resolved_version['download_url'])
             else:
@@ -75,7 +102,7 @@ def resolve_bundle_configuration(cache_dir, uri):
         urn, org, repo, package_name, tag, digest = bundle_shorthand.parse_bundle_configuration(uri)
         log.info(log_message('Resolving bundle configuration', org, repo, package_name, tag, digest))
         bintray_auth = load_bintray_credentials(raise_error=False)
-        resolved_version = bintray_resolve_version(bintray_auth, org, repo, package_name, tag, digest)
+        resolved_version = resolve_version(bintray_auth, org, repo, package_name, tag, digest)
         return bintray_download_artefact(cache_dir, resolved_version, bintray_auth)
     except MalformedBundleUriError as e:
         return False, None, None, e
@@ -95,9 +122,7 @@ def load_bundle_configuration_from_cache(cache_dir, uri):
             urn, org, repo, package_name, tag, digest = bundle_shorthand.parse_bundle_configuration(uri)
             log.info(log_message('Loading bundle configuration from cache', org, repo, package_name, tag, digest))
             bintray_auth = load_bintray_credentials(raise_error=False)
-            resolved_version = bintray_resolve_version(bintray_auth,
-                                                       org, repo, package_name,
-                                                       tag, digest)
+            resolved_version = resolve_version(bintray_auth, org, repo, package_name, tag, digest)
             if resolved_version:
                 return uri_resolver.load_bundle_from_cache(cache_dir, resolved_version['download_url'])
             else:
@@ -192,6 +217,22 @@ def load_bintray_credentials(raise_error=True, disable_instructions=False):
             return BINTRAY_DOWNLOAD_REALM, data['user'], data['password']
 
 
+def resolve_version(bintray_auth, org, repo, package_name, tag, digest):
+    """
+    Same as `bintray_resolve_version`, answered from the resolution index without any request to Bintray if the
+    bundle shorthand has been resolved before, see `bintray_index`.
+    """
+    resolved_version = bintray_index.resolved_version(org, repo, package_name, tag, digest)
+
+    if resolved_version is None:
+        resolved_version = bintray_resolve_version(bintray_auth, org, repo, package_name, tag, digest)
+
+        if resolved_version:
+            bintray_index.save_resolved_version(org, repo, package_name, tag, digest, resolved_version)
+
+    return resolved_version
+
+
 def bintray_resolve_version(bintray_auth, org, repo, package_name,
                             tag=None, digest=None):
     if tag is None and digest is None:
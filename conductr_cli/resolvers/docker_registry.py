@@ -0,0 +1,124 @@
+from conductr_cli import settings_utils
+from conductr_cli.constants import DOCKER_REGISTRY_TOKENS_FILE_NAME
+from urllib.parse import urlparse
+import os
+import requests
+import threading
+import time
+
+# Requests to Docker registries share a keep-alive session per host, so that the manifest and blob requests of an
+# image reuse their connections.
+#
+# The bearer tokens of registries are cached by registry and repository scope until they expire. The tokens are kept
+# in a JSON file within the CLI settings dir so that they're reused across CLI invocations. Tokens are only kept in
+# memory until `configure` is called.
+
+TOKENS_VERSION = 1
+
+# The lifetime of a token which has no `expires_in`, per https://docs.docker.com/registry/spec/auth/token/
+DEFAULT_TOKEN_EXPIRES_IN = 60
+
+# A token is renewed this many seconds before it expires, so that it doesn't expire while in use
+TOKEN_EXPIRY_MARGIN = 10
+
+# The path of a registry API url is the prefix, the repository and one of the suffixes,
+# e.g. /v2/library/alpine/manifests/3.5
+REPOSITORY_PATH_PREFIX = '/v2/'
+REPOSITORY_PATH_SUFFIXES = ['/manifests/', '/blobs/']
+
+tokens_file = None
+tokens = None
+tokens_lock = threading.RLock()
+
+sessions = {}
+sessions_lock = threading.Lock()
+
+
+def configure(cli_settings_dir):
+    global tokens_file, tokens
+
+    with tokens_lock:
+        tokens_file = os.path.join(cli_settings_dir, DOCKER_REGISTRY_TOKENS_FILE_NAME) if cli_settings_dir else None
+        tokens = None
+
+
+def session(url):
+    """
+    :return: the keep-alive session for the host of `url`
+    """
+    host = urlparse(url).netloc
+
+    with sessions_lock:
+        if host not in sessions:
+            sessions[host] = requests.Session()
+
+        return sessions[host]
+
+
+def repository_scope(url):
+    """
+    :return: the pull scope of the repository of a registry API url, e.g. `repository:library/alpine:pull`, or None
+             if `url` isn't for a repository
+    """
+    path = urlparse(url).path
+
+    if path.startswith(REPOSITORY_PATH_PREFIX):
+        for suffix in REPOSITORY_PATH_SUFFIXES:
+            index = path.find(suffix, len(REPOSITORY_PATH_PREFIX))
+
+            if index >= 0:
+                return 'repository:{}:pull'.format(path[len(REPOSITORY_PATH_PREFIX):index])
+
+    return None
+
+
+def token(registry, scope):
+    """
+    :return: the cached token for `scope` of `registry`, or None if there's none which is still valid
+    """
+    with tokens_lock:
+        entry = load_tokens().get(token_key(registry, scope))
+
+    if entry is not None and entry['expiresAt'] - TOKEN_EXPIRY_MARGIN > time.time():
+        return entry['token']
+    else:
+        return None
+
+
+def save_token(registry, scope, token_value, expires_in=None):
+    with tokens_lock:
+        entries = load_tokens()
+        entries[token_key(registry, scope)] = {
+            'token': token_value,
+            'expiresAt': time.time() + (DEFAULT_TOKEN_EXPIRES_IN if expires_in is None else expires_in)
+        }
+        save_tokens(entries)
+
+
+def token_key(registry, scope):
+    return '{} {}'.format(registry, scope)
+
+
+def load_tokens():
+    global tokens
+
+    if tokens is None:
+        content = settings_utils.read_json_settings_file(tokens_file, TOKENS_VERSION) \
+            if tokens_file is not None else None
+        tokens = content.get('tokens', {}) if content is not None else {}
+
+    return tokens
+
+
+def save_tokens(entries):
+    if tokens_file is None:
+        return
+
+    now = time.time()
+
+    for key in [key for key, entry in entries.items() if entry['expiresAt'] <= now]:
+        del entries[key]
+
+    # The tokens are secrets, the file is only readable by the user
+    settings_utils.write_json_settings_file_atomically(tokens_file, TOKENS_VERSION, {'tokens': entries},
+                                                       'Docker registry tokens')
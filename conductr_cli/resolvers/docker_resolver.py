@@ -1,8 +1,11 @@
 import time
 from collections import OrderedDict
-from conductr_cli import screen_utils
-from conductr_cli.constants import IO_CHUNK_SIZE
-from conductr_cli.exceptions import DockerImageMalformedError
+from concurrent.futures import ThreadPoolExecutor
+from conductr_cli import resolve_cache, screen_utils
+from conductr_cli.bndl_utils import file_link_or_copy, file_write_bytes
+from conductr_cli.constants import DEFAULT_DOCKER_MANIFEST_TTL, DOCKER_BLOB_FETCH_WORKERS, IO_CHUNK_SIZE
+from conductr_cli.exceptions import DockerBlobDigestMismatchError, DockerImageMalformedError
+from conductr_cli.resolvers import docker_registry
 from conductr_cli.resolvers.schemes import SCHEME_BUNDLE
 from functools import partial
 from requests.auth import HTTPBasicAuth
@@ -16,6 +19,7 @@ import re
 import requests
 import shutil
 import tempfile
+import threading
 import www_authenticate
 
 
@@ -28,16 +32,16 @@ def supported_schemes():
 
 
 def get_with_token(ns, url, headers=None, raw=False, try_new_token=True):
-    if not hasattr(get_with_token, 'latest_token'):
-        get_with_token.latest_token = None
+    scope = docker_registry.repository_scope(url)
+    token = docker_registry.token(ns, scope)
 
     try:
         new_headers = headers.copy() if headers is not None else {}
 
-        if get_with_token.latest_token is not None:
-            new_headers['Authorization'] = 'Bearer {}'.format(get_with_token.latest_token)
+        if token is not None:
+            new_headers['Authorization'] = 'Bearer {}'.format(token)
 
-        response = requests.get(url, stream=raw, headers=new_headers)
+        response = docker_registry.session(url).get(url, stream=raw, headers=new_headers)
         response.raise_for_status()
 
         if raw:
@@ -45,6 +49,9 @@ def get_with_token(ns, url, headers=None, raw=False, try_new_token=True):
 
         return response
     except requests.exceptions.HTTPError as error:
+        # The connection of a streamed response is only returned to the session's pool once the response is closed
+        error.response.close()
+
         if error.response.status_code == 401 and 'Www-Authenticate' in error.response.headers and try_new_token:
             credentials = load_docker_credentials(ns)
             auth_info = www_authenticate.parse(error.response.headers['Www-Authenticate'])
@@ -63,11 +70,14 @@ def get_with_token(ns, url, headers=None, raw=False, try_new_token=True):
 
             token_url = '{}?{}'.format(auth_info['bearer']['realm'], urlencode(token_params))
 
-            token_response = requests.get(token_url, auth=auth)
+            token_response = docker_registry.session(token_url).get(token_url, auth=auth)
             token_response.raise_for_status()
             token_content = json.loads(token_response.text)
 
-            get_with_token.latest_token = token_content['token']
+            docker_registry.save_token(ns, scope,
+                                       token_content['token'] if 'token' in token_content
+                                       else token_content['access_token'],
+                                       token_content.get('expires_in'))
 
             return get_with_token(ns, url, headers, raw, try_new_token=False)
         else:
@@ -75,81 +85,273 @@ def get_with_token(ns, url, headers=None, raw=False, try_new_token=True):
 
 
 def fetch_blobs(cache_dir, url, ns, image, blobs, offline_mode):
+    """
+    Downloads the blobs which aren't in `cache_dir` yet, several at a time, with a progress bar for all of them.
+
+    :return: dict of the digest of each blob to its cache file, or None if a blob isn't cached and `offline_mode`
+    """
     log = logging.getLogger(__name__)
     files = {}
-    needs_retrieving = []
-    downloaded_size = 0
-    total_size = 0
+    needs_retrieving = OrderedDict()
 
     for blob in blobs:
         blob['cache_file'] = os.path.join(cache_dir, 'docker-blob-{}'.format(re.sub('\\W', '_', blob['digest'])))
         blob['cache_file_temp'] = '{}.tmp'.format(blob['cache_file'])
 
         if not os.path.isfile(blob['cache_file']):
-            needs_retrieving.append(strip_digest(blob['digest']))
-            total_size += blob['size']
+            needs_retrieving[blob['digest']] = blob
+
+        files[blob['digest']] = blob['cache_file']
 
     if len(needs_retrieving) > 0:
+        if offline_mode:
+            return None
+
         log.info('Retrieving Docker layers:')
-        for layer in needs_retrieving:
-            log.info('    {}'.format(layer))
+        for digest in needs_retrieving:
+            log.info('    {}'.format(strip_digest(digest)))
 
-    for blob in blobs:
-        cache_file = os.path.join(cache_dir, 'docker-blob-{}'.format(re.sub('\\W', '_', blob['digest'])))
-        cache_file_temp = '{}.tmp'.format(cache_file)
+        progress = BlobsProgress(sum(blob['size'] for blob in needs_retrieving.values()))
 
-        if not os.path.isfile(cache_file):
-            if offline_mode:
-                return None
+        with ThreadPoolExecutor(max_workers=min(DOCKER_BLOB_FETCH_WORKERS, len(needs_retrieving))) as executor:
+            futures = [executor.submit(fetch_blob, url, ns, image, blob, progress)
+                       for blob in needs_retrieving.values()]
+
+            for future in futures:
+                future.result()
+
+    return files
 
-            prev_time = 0.0
 
-            full_url = 'https://{}/v2/{}/{}/blobs/{}'.format(url, ns, image, blob['digest'])
-            response = get_with_token(url, full_url, raw=True)
-            with open(cache_file_temp, 'wb') as cache_fileobj:
-                for chunk in iter(partial(response.raw.read, IO_CHUNK_SIZE), b''):
-                    cache_fileobj.write(chunk)
+def fetch_blob(url, ns, image, blob, progress):
+    """
+    Downloads a blob to its cache file. The blob is written to the temp cache file first, and a temp cache file left
+    by an interrupted download is resumed with a range request. The blob is only renamed to its cache file once its
+    digest has been verified.
+    """
+    log = logging.getLogger(__name__)
+    full_url = 'https://{}/v2/{}/{}/blobs/{}'.format(url, ns, image, blob['digest'])
+    algorithm, expected_digest = blob['digest'].split(':', 1) if ':' in blob['digest'] else (None, None)
+    digest = hashlib.sha256()
+    # The blob is resumed at a byte offset, so it mustn't be decoded by the registry
+    headers = {'Accept-Encoding': 'identity'}
+    offset = os.path.getsize(blob['cache_file_temp']) if os.path.isfile(blob['cache_file_temp']) else 0
 
-                    if log.is_progress_enabled():
-                        downloaded_size += len(chunk)
-                        percent = (downloaded_size * 1.0) / total_size
-                        download_complete = percent >= 1.0
-                        now_time = time.time()
-                        if download_complete or now_time - prev_time >= 0.1:
-                            progress_bar_text = screen_utils.progress_bar(percent)
-                            log.progress(progress_bar_text, flush=download_complete)
-                            prev_time = now_time
+    if offset > 0:
+        with open(blob['cache_file_temp'], 'rb') as cache_fileobj:
+            for chunk in iter(partial(cache_fileobj.read, IO_CHUNK_SIZE), b''):
+                digest.update(chunk)
 
-            os.rename(cache_file_temp, cache_file)
+        headers['Range'] = 'bytes={}-'.format(offset)
 
-        files[blob['digest']] = cache_file
+    try:
+        response = get_with_token(url, full_url, headers=headers, raw=True)
+    except requests.exceptions.HTTPError as error:
+        # The temp cache file isn't a prefix of the blob, e.g. it's complete but was never verified
+        if offset > 0 and error.response is not None and error.response.status_code == 416:
+            os.remove(blob['cache_file_temp'])
 
-    return files
+            return fetch_blob(url, ns, image, blob, progress)
+        else:
+            raise error
+
+    try:
+        if offset > 0 and response.status_code == 206:
+            log.debug('Resuming the download of {} from {} bytes'.format(blob['digest'], offset))
+
+            progress.downloaded(offset)
+            mode = 'ab'
+        else:
+            digest = hashlib.sha256()
+            mode = 'wb'
+
+        with open(blob['cache_file_temp'], mode) as cache_fileobj:
+            for chunk in iter(partial(response.raw.read, IO_CHUNK_SIZE), b''):
+                cache_fileobj.write(chunk)
+                digest.update(chunk)
+                progress.downloaded(len(chunk))
+    finally:
+        response.close()
+
+    if algorithm == 'sha256' and digest.hexdigest() != expected_digest:
+        os.remove(blob['cache_file_temp'])
+
+        raise DockerBlobDigestMismatchError('{} - the downloaded blob has the digest sha256:{}'
+                                            .format(blob['digest'], digest.hexdigest()))
+
+    os.rename(blob['cache_file_temp'], blob['cache_file'])
+
+
+class BlobsProgress(object):
+    """
+    Displays the progress of blobs which are downloaded concurrently as a single progress bar.
+    """
+    def __init__(self, total_size):
+        self.total_size = total_size
+        self.downloaded_size = 0
+        self.prev_time = 0.0
+        self.lock = threading.Lock()
+
+    def downloaded(self, size):
+        log = logging.getLogger(__name__)
+
+        if not log.is_progress_enabled():
+            return
+
+        with self.lock:
+            self.downloaded_size += size
+            percent = (self.downloaded_size * 1.0) / self.total_size if self.total_size > 0 else 1.0
+            download_complete = percent >= 1.0
+            now_time = time.time()
+            if download_complete or now_time - self.prev_time >= 0.1:
+                progress_bar_text = screen_utils.progress_bar(percent)
+                log.progress(progress_bar_text, flush=download_complete)
+                self.prev_time = now_time
 
 
 def fetch_manifest(cache_dir, url, ns, image, manifest, offline_mode):
+    """
+    Returns the manifest of a tag or digest of an image. The manifest is cached together with its ETag or
+    Docker-Content-Digest, so that a cached manifest is revalidated with a conditional request and only downloaded
+    again if it has changed. A manifest validated within the last `DEFAULT_DOCKER_MANIFEST_TTL` seconds is used
+    without any request, as is a cached manifest referenced by its digest, which never changes.
+    """
     full_url = 'https://{}/v2/{}/{}/manifests/{}'.format(url, ns, image, manifest)
-    full_url_digest = hashlib.sha256(full_url.encode('UTF-8')).hexdigest()
-    cache_file = os.path.join(cache_dir, 'docker-manifest-{}'.format(full_url_digest))
+    cache_file = manifest_cache_file(cache_dir, full_url)
+    validation_file = '{}.validation'.format(cache_file)
 
-    if offline_mode:
+    if offline_mode or (manifest.startswith('sha256:') and os.path.isfile(cache_file)):
         if os.path.isfile(cache_file):
             with open(cache_file, 'r') as cache_fileobj:
                 return json.load(cache_fileobj)
         else:
             return None
     else:
-        response = get_with_token(url,
-                                  full_url,
-                                  headers={'Accept': 'application/vnd.docker.distribution.manifest.v2+json'})
+        validation = load_manifest_validation(cache_file, validation_file)
+        headers = {'Accept': 'application/vnd.docker.distribution.manifest.v2+json'}
+
+        if validation is not None:
+            if validation['validatedAt'] + DEFAULT_DOCKER_MANIFEST_TTL > time.time():
+                with open(cache_file, 'r') as cache_fileobj:
+                    return json.load(cache_fileobj)
+
+            headers['If-None-Match'] = validation['etag']
+
+        response = get_with_token(url, full_url, headers=headers)
         response.raise_for_status()
 
-        with open(cache_file, 'w', encoding="utf-8") as cache_fileobj:
-            cache_fileobj.write(response.text)
+        if validation is not None and response.status_code == 304:
+            if DEFAULT_DOCKER_MANIFEST_TTL > 0:
+                validation['validatedAt'] = time.time()
+                file_write_bytes(validation_file, json.dumps(validation).encode('UTF-8'))
+
+            with open(cache_file, 'r') as cache_fileobj:
+                return json.load(cache_fileobj)
+
+        # The validation of the previous manifest is removed first, so that it's never used for the new manifest
+        if os.path.isfile(validation_file):
+            os.remove(validation_file)
+
+        write_manifest_cache_file(cache_dir, cache_file, response.text)
+
+        etag = response.headers.get('ETag')
+        content_digest = response.headers.get('Docker-Content-Digest')
+
+        if etag is None and content_digest is not None:
+            # Registries use the quoted digest as the ETag of a manifest
+            etag = '"{}"'.format(content_digest)
+
+        if etag is not None:
+            file_write_bytes(validation_file, json.dumps({
+                'etag': etag,
+                'digest': content_digest,
+                'validatedAt': time.time()
+            }).encode('UTF-8'))
 
         return json.loads(response.text)
 
 
+def write_manifest_cache_file(cache_dir, cache_file, text):
+    # The manifest is replaced atomically, so that concurrent CLI invocations never read a partially written manifest
+    fd, cache_file_temp = tempfile.mkstemp(dir=cache_dir, prefix='docker-manifest-', suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as cache_fileobj:
+            cache_fileobj.write(text)
+
+        os.replace(cache_file_temp, cache_file)
+    except Exception:
+        os.remove(cache_file_temp)
+        raise
+
+
+def manifest_cache_file(cache_dir, full_url):
+    full_url_digest = hashlib.sha256(full_url.encode('UTF-8')).hexdigest()
+
+    return os.path.join(cache_dir, 'docker-manifest-{}'.format(full_url_digest))
+
+
+def load_manifest_validation(cache_file, validation_file):
+    if not os.path.isfile(cache_file):
+        return None
+
+    try:
+        with open(validation_file, 'r', encoding='utf-8') as validation_fileobj:
+            validation = json.load(validation_fileobj)
+    except (OSError, ValueError):
+        return None
+
+    return validation if 'etag' in validation and 'validatedAt' in validation else None
+
+
+def uncompressed_layer(cache_dir, layer, layer_file):
+    """
+    Returns the uncompressed layer of the blob `layer_file`. A gzip compressed layer is decompressed once into
+    `cache_dir`, next to the blob, together with the digest of the uncompressed layer, i.e. its diff id. The diff id
+    is only read by `conduct cache verify`, which checks the cached layer against it.
+
+    :return: the path of the uncompressed layer
+    """
+    if not layer['mediaType'].endswith('.gzip'):
+        return layer_file
+
+    cache_file = os.path.join(cache_dir, 'docker-layer-{}'.format(re.sub('\\W', '_', layer['digest'])))
+    diff_id_file = '{}.diff-id'.format(cache_file)
+
+    if os.path.isfile(cache_file) and os.path.isfile(diff_id_file):
+        return cache_file
+
+    digest = hashlib.sha256()
+    fd, cache_file_temp = tempfile.mkstemp(dir=cache_dir, prefix='docker-layer-', suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'wb') as layer_out_file, open(layer_file, 'rb') as layer_in_file:
+            with gzip.GzipFile(fileobj=layer_in_file, mode='rb') as gzip_file:
+                for chunk in iter(partial(gzip_file.read, IO_CHUNK_SIZE), b''):
+                    layer_out_file.write(chunk)
+                    digest.update(chunk)
+
+        os.replace(cache_file_temp, cache_file)
+    except Exception:
+        os.remove(cache_file_temp)
+        raise
+
+    # The diff id is written once the layer is in place, so that it's never left behind for a missing layer. A layer
+    # without a diff id is decompressed again. The diff id is replaced atomically, so that it's never read partially.
+    fd, diff_id_file_temp = tempfile.mkstemp(dir=cache_dir, prefix='docker-layer-', suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as diff_id_fileobj:
+            diff_id_fileobj.write('sha256:{}'.format(digest.hexdigest()))
+
+        os.replace(diff_id_file_temp, diff_id_file)
+    except Exception:
+        os.remove(diff_id_file_temp)
+        raise
+
+    return cache_file
+
+
 def strip_digest(value):
     try:
         return value[value.index(':') + 1:]
@@ -205,29 +407,25 @@ def do_resolve_bundle(cache_dir, uri, auth, offline_mode):
 
         layers = []
         layer_digests = []
+        cache_files = [manifest_cache_file(cache_dir, 'https://{}/v2/{}/{}/manifests/{}'.format(url, ns, image, tag))]
+        cache_files.extend(files.values())
 
         for layer in manifest['layers']:
-            layer_file = files[layer['digest']]
-            digest = hashlib.sha256()
             base_layer_digest = strip_digest(layer['digest'])
             layer_digests.append(base_layer_digest)
             base_layer_name = os.path.join(base_layer_digest, 'layer.tar')
             file_name = os.path.join(temp_dir, base_layer_name)
             os.makedirs(os.path.dirname(file_name))
 
-            with open(file_name, 'wb') as layer_out_file, open(layer_file, 'rb') as layer_in_file:
-                if layer['mediaType'].endswith('.gzip'):
-                    with gzip.GzipFile(fileobj=layer_in_file.raw, mode='rb') as gzip_file:
-                        for chunk in iter(partial(gzip_file.read, IO_CHUNK_SIZE), b''):
-                            layer_out_file.write(chunk)
-                            digest.update(chunk)
-                else:
-                    for chunk in iter(partial(layer_in_file.read, IO_CHUNK_SIZE), b''):
-                        layer_out_file.write(chunk)
-                        digest.update(chunk)
+            # The layer is only read from here on, so it's linked rather than copied
+            layer_file = uncompressed_layer(cache_dir, layer, files[layer['digest']])
+            file_link_or_copy(layer_file, file_name)
+            cache_files.append(layer_file)
 
             layers.append(base_layer_name)
 
+        resolve_cache.accessed(*cache_files)
+
         manifests_tag = []
         repositories = {}
 
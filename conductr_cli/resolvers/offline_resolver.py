@@ -1,3 +1,4 @@
+from conductr_cli import resolve_cache
 from conductr_cli.resolvers.schemes import SCHEME_BUNDLE, SCHEME_FILE
 import os
 import glob
@@ -42,6 +43,7 @@ def load_bundle_from_cache(cache_dir, uri):
             latest_bundle_file = max(cached_bundles, key=os.path.getctime)
             bundle_name = os.path.basename(latest_bundle_file)
             log.info('Retrieving from cache {}'.format(latest_bundle_file))
+            resolve_cache.accessed(latest_bundle_file)
             return True, bundle_name, latest_bundle_file, None
 
     return False, None, None, None
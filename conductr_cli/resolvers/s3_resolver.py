@@ -1,5 +1,6 @@
-from conductr_cli import screen_utils
+from conductr_cli import resolve_cache, screen_utils
 from conductr_cli.exceptions import S3InvalidArtefactError, S3MalformedUrlError
+from conductr_cli.resolvers import uri_resolver
 from conductr_cli.resolvers.schemes import SCHEME_S3
 from botocore.exceptions import ClientError, NoCredentialsError, ProfileNotFound
 from urllib.parse import urlparse
@@ -12,6 +13,9 @@ import time
 
 DATA_READ_CHUNK_SIZE = 128
 
+# Time in seconds for which the presigned url of a streamed bundle is valid
+STREAM_URL_EXPIRY = 3600
+
 
 def supported_schemes():
     return [SCHEME_S3]
@@ -21,6 +25,45 @@ def resolve_bundle(cache_dir, uri):
     return resolve_s3_object(cache_dir, uri)
 
 
+def stream_bundle(cache_dir, uri):
+    """
+    Opens a bundle in S3 for streaming, see `uri_resolver.stream_bundle`. The bundle is read through a presigned url,
+    so the S3 credentials themselves are never sent with the requests.
+
+    :return: is_resolved, bundle file name, `RemoteFile`, error
+    """
+    if not is_s3_url(uri):
+        return False, None, None, None
+
+    bucket_name, s3_key_name = s3_bucket_and_key_from_uri(uri)
+    if not bucket_name or not s3_key_name:
+        return False, None, None, None
+
+    artefact_file_name = os.path.basename(s3_key_name)
+    cached_file = os.path.join(cache_dir, artefact_file_name)
+    if os.path.exists(cached_file):
+        return False, None, None, None
+
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, mode=0o700)
+
+    try:
+        client = create_s3_client()
+        artefact = client.head_object(Bucket=bucket_name, Key=s3_key_name)
+
+        if artefact.get('ContentType') != 'application/zip' or artefact.get('ContentLength', 0) <= 0:
+            return False, None, None, None
+
+        url = client.generate_presigned_url('get_object',
+                                            Params={'Bucket': bucket_name, 'Key': s3_key_name},
+                                            ExpiresIn=STREAM_URL_EXPIRY)
+        remote_file = uri_resolver.RemoteFile(url, artefact['ContentLength'], cached_file, name=uri)
+
+        return True, artefact_file_name, remote_file, None
+    except (ClientError, NoCredentialsError) as e:
+        return False, None, None, e
+
+
 def load_bundle_from_cache(cache_dir, uri):
     return resolve_s3_object_from_cache(cache_dir, uri)
 
@@ -68,6 +111,7 @@ def resolve_s3_object_from_cache(cache_dir, uri):
         cached_artefact = os.path.join(cache_dir, artefact_name)
         if os.path.exists(cached_artefact):
             log.info('Retrieving from cache {}'.format(cached_artefact))
+            resolve_cache.accessed(cached_artefact)
             return True, artefact_name, cached_artefact, None
 
     return False, None, None, None
@@ -107,6 +151,7 @@ def download_from_s3(cache_dir, bucket_name, s3_key_name):
         log.info('Retrieving {}://{}{}'.format(SCHEME_S3, bucket_name, s3_key_name))
         save_artefact_data_to_file(artefact_size, artefact_data, cached_file_tmp)
         shutil.move(cached_file_tmp, cached_file)
+        resolve_cache.accessed(cached_file)
 
         return True, artefact_file_name, cached_file, None
     except (ClientError, S3InvalidArtefactError) as e:
@@ -0,0 +1,90 @@
+from conductr_cli.resolvers import bintray_index
+from conductr_cli.constants import DEFAULT_BINTRAY_RESOLUTION_TTL
+from conductr_cli.test.cli_test_case import SettingsFileTestCase
+from unittest.mock import patch, MagicMock
+import os
+
+
+class TestBintrayIndex(SettingsFileTestCase):
+    settings_module = bintray_index
+    settings_file_name = 'bintray-resolution-index.json'
+
+    resolved_version = {
+        'org': 'typesafe',
+        'repo': 'bundle',
+        'package_name': 'visualizer',
+        'tag': 'v2',
+        'digest': '023f9da',
+        'download_url': 'https://dl.bintray.com/typesafe/bundle/visualizer-v2-023f9da.zip'
+    }
+
+    def test_pinned(self):
+        with patch('time.time', MagicMock(return_value=1000.0)):
+            bintray_index.save_resolved_version('typesafe', 'bundle', 'visualizer', 'v2', '023f9da',
+                                                self.resolved_version)
+
+        # A pinned shorthand never expires, also in a new invocation of the CLI
+        bintray_index.configure(self.settings_dir)
+
+        with patch('time.time', MagicMock(return_value=1000.0 + 10 * DEFAULT_BINTRAY_RESOLUTION_TTL)):
+            self.assertEqual(self.resolved_version,
+                             bintray_index.resolved_version('typesafe', 'bundle', 'visualizer', 'v2', '023f9da'))
+            self.assertIsNone(bintray_index.resolved_version('typesafe', 'bundle', 'visualizer', 'v2', None))
+
+    def test_floating(self):
+        with patch('time.time', MagicMock(return_value=1000.0)):
+            bintray_index.save_resolved_version('typesafe', 'bundle', 'visualizer', None, None,
+                                                self.resolved_version)
+
+            self.assertEqual(self.resolved_version,
+                             bintray_index.resolved_version('typesafe', 'bundle', 'visualizer', None, None))
+
+        with patch('time.time', MagicMock(return_value=1000.0 + DEFAULT_BINTRAY_RESOLUTION_TTL)):
+            self.assertIsNone(bintray_index.resolved_version('typesafe', 'bundle', 'visualizer', None, None))
+
+            # The version the floating shorthand resolved to is indexed as pinned as well
+            self.assertEqual(self.resolved_version,
+                             bintray_index.resolved_version('typesafe', 'bundle', 'visualizer', 'v2', '023f9da'))
+
+    def test_expired_entries_dropped(self):
+        with patch('time.time', MagicMock(return_value=1000.0)):
+            bintray_index.save_resolved_version('typesafe', 'bundle', 'visualizer', 'v2', None, self.resolved_version)
+
+        with patch('time.time', MagicMock(return_value=1000.0 + DEFAULT_BINTRAY_RESOLUTION_TTL)):
+            bintray_index.save_resolved_version('typesafe', 'bundle', 'eslite', 'v1', 'abc', self.resolved_version)
+
+        shorthands = self.read_settings_file()['shorthands']
+
+        self.assertEqual(sorted([
+            '["typesafe", "bundle", "visualizer", "v2", "023f9da"]',
+            '["typesafe", "bundle", "eslite", "v1", "abc"]'
+        ]), sorted(shorthands))
+
+    def test_max_entries(self):
+        with patch('conductr_cli.resolvers.bintray_index.BINTRAY_RESOLUTION_INDEX_MAX_ENTRIES', 2):
+            for index, tag in enumerate(['v1', 'v2', 'v3']):
+                with patch('time.time', MagicMock(return_value=1000.0 + index)):
+                    bintray_index.save_resolved_version('typesafe', 'bundle', 'visualizer', tag, '023f9da',
+                                                        self.resolved_version)
+
+        # The pinned entry resolved least recently is dropped
+        self.assertEqual(sorted([
+            '["typesafe", "bundle", "visualizer", "v2", "023f9da"]',
+            '["typesafe", "bundle", "visualizer", "v3", "023f9da"]'
+        ]), sorted(self.read_settings_file()['shorthands']))
+
+    def test_unconfigured(self):
+        bintray_index.configure(None)
+
+        bintray_index.save_resolved_version('typesafe', 'bundle', 'visualizer', 'v2', '023f9da', self.resolved_version)
+
+        self.assertIsNone(bintray_index.resolved_version('typesafe', 'bundle', 'visualizer', 'v2', '023f9da'))
+        self.assertFalse(os.path.exists(self.settings_file))
+
+    def test_unreadable_index(self):
+        os.makedirs(self.settings_dir)
+
+        with open(self.settings_file, 'w') as file:
+            file.write('not json')
+
+        self.assertIsNone(bintray_index.resolved_version('typesafe', 'bundle', 'visualizer', 'v2', '023f9da'))
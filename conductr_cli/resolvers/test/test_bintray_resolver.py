@@ -1,7 +1,8 @@
 from unittest import TestCase
-from conductr_cli.test.cli_test_case import strip_margin
-from conductr_cli.resolvers import bintray_resolver
+from conductr_cli.test.cli_test_case import SettingsFileTestCase, strip_margin
+from conductr_cli.resolvers import bintray_index, bintray_resolver
 from conductr_cli.resolvers.schemes import SCHEME_BUNDLE
+from conductr_cli.constants import DEFAULT_BINTRAY_RESOLUTION_TTL
 from conductr_cli.exceptions import MalformedBundleUriError, BintrayResolutionError, MalformedBintrayCredentialsError, \
     BintrayCredentialsNotFoundError
 from requests.exceptions import HTTPError, ConnectionError
@@ -122,6 +123,61 @@ class TestResolveBundle(TestCase):
                                                         'v1', 'digest')
 
 
+class TestStreamBundle(TestCase):
+    bintray_auth = ('realm', 'username', 'password')
+
+    def test_bintray_version_found(self):
+        load_bintray_credentials_mock = MagicMock(return_value=self.bintray_auth)
+        parse_bundle_mock = MagicMock(return_value=('urn:x-bundle:', 'typesafe', 'bundle', 'bundle-name', 'v1', 'digest'))
+        bintray_resolve_version_mock = MagicMock(return_value={
+            'org': 'typesafe',
+            'repo': 'bundle',
+            'package_name': 'bundle-name',
+            'tag': 'v1',
+            'digest': 'digest',
+            'version': 'v1-digest',
+            'path': 'download.zip',
+            'download_url': 'https://dl.bintray.com/typesafe/bundle/download.zip'
+        })
+        stream_bundle_mock = MagicMock(return_value=(True, 'download.zip', 'mock remote file', None))
+
+        with patch('conductr_cli.resolvers.bintray_resolver.load_bintray_credentials', load_bintray_credentials_mock), \
+                patch('conductr_cli.bundle_shorthand.parse_bundle', parse_bundle_mock), \
+                patch('conductr_cli.resolvers.bintray_resolver.bintray_resolve_version', bintray_resolve_version_mock), \
+                patch('conductr_cli.resolvers.bintray_resolver.uri_resolver.stream_bundle', stream_bundle_mock):
+            result = bintray_resolver.stream_bundle('/cache-dir', 'bundle-name:v1')
+            self.assertEqual((True, 'download.zip', 'mock remote file', None), result)
+
+        load_bintray_credentials_mock.assert_called_with(raise_error=False)
+        bintray_resolve_version_mock.assert_called_with(self.bintray_auth, 'typesafe', 'bundle', 'bundle-name',
+                                                        'v1', 'digest')
+        stream_bundle_mock.assert_called_with('/cache-dir', 'https://dl.bintray.com/typesafe/bundle/download.zip',
+                                              self.bintray_auth)
+
+    def test_bintray_version_not_found(self):
+        load_bintray_credentials_mock = MagicMock(return_value=self.bintray_auth)
+        parse_bundle_mock = MagicMock(return_value=('urn:x-bundle:', 'typesafe', 'bundle', 'bundle-name', 'v1', 'digest'))
+        bintray_resolve_version_mock = MagicMock(return_value=None)
+        stream_bundle_mock = MagicMock()
+
+        with patch('conductr_cli.resolvers.bintray_resolver.load_bintray_credentials', load_bintray_credentials_mock), \
+                patch('conductr_cli.bundle_shorthand.parse_bundle', parse_bundle_mock), \
+                patch('conductr_cli.resolvers.bintray_resolver.bintray_resolve_version', bintray_resolve_version_mock), \
+                patch('conductr_cli.resolvers.bintray_resolver.uri_resolver.stream_bundle', stream_bundle_mock):
+            result = bintray_resolver.stream_bundle('/cache-dir', 'bundle-name:v1')
+            self.assertEqual((False, None, None, None), result)
+
+        stream_bundle_mock.assert_not_called()
+
+    def test_failure_malformed_bundle_uri(self):
+        error = MalformedBundleUriError('test only')
+        parse_bundle_mock = MagicMock(side_effect=error)
+
+        with patch('conductr_cli.bundle_shorthand.parse_bundle', parse_bundle_mock):
+            result = bintray_resolver.stream_bundle('/cache-dir', 'bundle-name:v1')
+            self.assertEqual((False, None, None, error), result)
+
+
 class TestResolveBundleConfiguration(TestCase):
     bintray_auth = ('realm', 'username', 'password')
     bintray_no_auth = (None, None, None)
@@ -412,6 +468,61 @@ class TestLoadBundleFromCache(TestCase):
                                                         'v1', 'digest')
 
 
+class TestLoadBundleFromCacheIndexed(SettingsFileTestCase):
+    settings_module = bintray_index
+    settings_file_name = 'bintray-resolution-index.json'
+    bintray_auth = ('realm', 'username', 'password')
+    resolved_version = {
+        'org': 'typesafe',
+        'repo': 'bundle',
+        'package_name': 'bundle-name',
+        'tag': 'v1',
+        'digest': 'digest',
+        'path': 'download.zip',
+        'download_url': 'https://dl.bintray.com/typesafe/bundle/download.zip'
+    }
+
+    def load_bundle_from_cache(self, uri, bintray_resolve_version_mock):
+        load_bundle_from_cache_mock = MagicMock(return_value=(True, 'bundle-name', 'mock bundle file', None))
+
+        with patch('conductr_cli.resolvers.bintray_resolver.load_bintray_credentials',
+                   MagicMock(return_value=self.bintray_auth)), \
+                patch('conductr_cli.resolvers.bintray_resolver.bintray_resolve_version', bintray_resolve_version_mock), \
+                patch('conductr_cli.resolvers.bintray_resolver.uri_resolver.load_bundle_from_cache',
+                      load_bundle_from_cache_mock):
+            result = bintray_resolver.load_bundle_from_cache('/cache-dir', uri)
+            self.assertEqual((True, 'bundle-name', 'mock bundle file', None), result)
+
+        load_bundle_from_cache_mock.assert_called_with('/cache-dir',
+                                                       'https://dl.bintray.com/typesafe/bundle/download.zip')
+
+    def test_pinned_answered_from_index(self):
+        bintray_resolve_version_mock = MagicMock(return_value=self.resolved_version)
+
+        self.load_bundle_from_cache('typesafe/bundle/bundle-name:v1-digest', bintray_resolve_version_mock)
+
+        # A new invocation of the CLI finds the cached bundle without any request to Bintray
+        bintray_index.configure(self.settings_dir)
+        self.load_bundle_from_cache('typesafe/bundle/bundle-name:v1-digest', bintray_resolve_version_mock)
+
+        bintray_resolve_version_mock.assert_called_once_with(self.bintray_auth, 'typesafe', 'bundle', 'bundle-name',
+                                                             'v1', 'digest')
+
+    def test_floating_resolved_after_ttl(self):
+        bintray_resolve_version_mock = MagicMock(return_value=self.resolved_version)
+
+        with patch('time.time', MagicMock(return_value=1000.0)):
+            self.load_bundle_from_cache('typesafe/bundle/bundle-name:v1', bintray_resolve_version_mock)
+            self.load_bundle_from_cache('typesafe/bundle/bundle-name:v1', bintray_resolve_version_mock)
+
+        self.assertEqual(1, bintray_resolve_version_mock.call_count)
+
+        with patch('time.time', MagicMock(return_value=1000.0 + DEFAULT_BINTRAY_RESOLUTION_TTL)):
+            self.load_bundle_from_cache('typesafe/bundle/bundle-name:v1', bintray_resolve_version_mock)
+
+        self.assertEqual(2, bintray_resolve_version_mock.call_count)
+
+
 class TestLoadBundleConfigurationFromCache(TestCase):
     bintray_auth = ('realm', 'username', 'password')
     bintray_no_auth = (None, None, None)
@@ -0,0 +1,72 @@
+from conductr_cli.resolvers import docker_registry
+from conductr_cli.test.cli_test_case import SettingsFileTestCase
+from unittest.mock import patch, MagicMock
+import os
+import stat
+
+
+class TestDockerRegistry(SettingsFileTestCase):
+    settings_module = docker_registry
+    settings_file_name = 'docker-registry-tokens.json'
+
+    def test_repository_scope(self):
+        self.assertEqual('repository:library/alpine:pull', docker_registry.repository_scope(
+            'https://registry.hub.docker.com/v2/library/alpine/manifests/3.5'))
+        self.assertEqual('repository:lightbend/images/conductr:pull', docker_registry.repository_scope(
+            'https://registry.hub.docker.com/v2/lightbend/images/conductr/blobs/sha256:abc'))
+        self.assertIsNone(docker_registry.repository_scope('https://auth.docker.io/token'))
+
+    def test_session_per_host(self):
+        session = docker_registry.session('https://registry.hub.docker.com/v2/library/alpine/manifests/3.5')
+
+        self.assertIs(session, docker_registry.session('https://registry.hub.docker.com/v2/library/alpine/blobs/abc'))
+        self.assertIsNot(session, docker_registry.session('https://auth.docker.io/token'))
+
+    def test_token(self):
+        with patch('time.time', MagicMock(return_value=1000.0)):
+            docker_registry.save_token('registry.hub.docker.com', 'repository:library/alpine:pull', 'abc', 300)
+
+            self.assertEqual('abc', docker_registry.token('registry.hub.docker.com', 'repository:library/alpine:pull'))
+            self.assertIsNone(docker_registry.token('registry.hub.docker.com', 'repository:library/redis:pull'))
+            self.assertIsNone(docker_registry.token('quay.io', 'repository:library/alpine:pull'))
+
+        # the token is renewed shortly before it expires
+        with patch('time.time', MagicMock(return_value=1295.0)):
+            self.assertIsNone(docker_registry.token('registry.hub.docker.com', 'repository:library/alpine:pull'))
+
+    def test_token_default_expiry(self):
+        with patch('time.time', MagicMock(return_value=1000.0)):
+            docker_registry.save_token('registry.hub.docker.com', 'repository:library/alpine:pull', 'abc')
+
+        with patch('time.time', MagicMock(return_value=1049.0)):
+            self.assertEqual('abc', docker_registry.token('registry.hub.docker.com', 'repository:library/alpine:pull'))
+
+        with patch('time.time', MagicMock(return_value=1051.0)):
+            self.assertIsNone(docker_registry.token('registry.hub.docker.com', 'repository:library/alpine:pull'))
+
+    def test_token_persisted(self):
+        docker_registry.save_token('registry.hub.docker.com', 'repository:library/alpine:pull', 'abc', 300)
+
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.settings_file).st_mode))
+
+        # as by a new invocation of the CLI
+        docker_registry.configure(self.settings_dir)
+
+        self.assertEqual('abc', docker_registry.token('registry.hub.docker.com', 'repository:library/alpine:pull'))
+
+    def test_expired_tokens_dropped(self):
+        with patch('time.time', MagicMock(return_value=1000.0)):
+            docker_registry.save_token('registry.hub.docker.com', 'repository:library/alpine:pull', 'abc', 60)
+
+        docker_registry.save_token('registry.hub.docker.com', 'repository:library/redis:pull', 'def', 60)
+
+        self.assertEqual(['registry.hub.docker.com repository:library/redis:pull'],
+                         list(self.read_settings_file()['tokens']))
+
+    def test_not_configured(self):
+        docker_registry.configure(None)
+
+        docker_registry.save_token('registry.hub.docker.com', 'repository:library/alpine:pull', 'abc', 300)
+
+        self.assertEqual('abc', docker_registry.token('registry.hub.docker.com', 'repository:library/alpine:pull'))
+        self.assertFalse(os.path.exists(self.settings_file))
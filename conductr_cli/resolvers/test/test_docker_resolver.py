@@ -1,7 +1,16 @@
-from conductr_cli.resolvers import docker_resolver
+from conductr_cli import logging_setup
+from conductr_cli.exceptions import DockerBlobDigestMismatchError
+from conductr_cli.resolvers import docker_registry, docker_resolver
 from conductr_cli.resolvers.schemes import SCHEME_BUNDLE
+from conductr_cli.test.cli_test_case import SettingsFileTestCase
+from io import BytesIO
 from unittest import TestCase
 from unittest.mock import call, patch, MagicMock
+import gzip
+import hashlib
+import os
+import requests
+import shutil
 import tempfile
 
 
@@ -103,6 +112,396 @@ class TestFetchManifest(TestCase):
                                              '9a2c1ec806514b9194c30491c02e9800254c73d998')
 
 
+class TestGetWithToken(SettingsFileTestCase):
+    settings_module = docker_registry
+    settings_file_name = 'docker-registry-tokens.json'
+
+    def test_token_reused(self):
+        manifest_url = 'https://registry.hub.docker.com/v2/library/alpine/manifests/3.5'
+        unauthorized = MagicMock(status_code=401, headers={
+            'Www-Authenticate': 'Bearer realm="https://auth.docker.io/token",service="registry.docker.io",'
+                                'scope="repository:library/alpine:pull"'
+        })
+        unauthorized.raise_for_status.side_effect = requests.exceptions.HTTPError(response=unauthorized)
+
+        registry_session = MagicMock()
+        registry_session.get.side_effect = [unauthorized, MagicMock(status_code=200), MagicMock(status_code=200)]
+        token_session = MagicMock()
+        token_session.get.return_value = MagicMock(text='{"token": "abc", "expires_in": 300}')
+
+        def session(url):
+            return token_session if url.startswith('https://auth.docker.io') else registry_session
+
+        with patch('conductr_cli.resolvers.docker_registry.session', MagicMock(side_effect=session)), \
+                patch('conductr_cli.resolvers.docker_resolver.load_docker_credentials', MagicMock(return_value=None)):
+            docker_resolver.get_with_token('registry.hub.docker.com', manifest_url)
+
+            # as by a new invocation of the CLI
+            docker_registry.configure(self.settings_dir)
+            docker_resolver.get_with_token('registry.hub.docker.com', manifest_url)
+
+        self.assertEqual(1, token_session.get.call_count)
+        self.assertEqual(
+            [
+                call(manifest_url, stream=False, headers={}),
+                call(manifest_url, stream=False, headers={'Authorization': 'Bearer abc'}),
+                call(manifest_url, stream=False, headers={'Authorization': 'Bearer abc'})
+            ],
+            registry_session.get.call_args_list
+        )
+
+        unauthorized.close.assert_called_once_with()
+
+    def test_error_response_closed(self):
+        blob_url = 'https://registry.hub.docker.com/v2/library/alpine/blobs/sha256:abc'
+        not_found = MagicMock(status_code=404, headers={})
+        not_found.raise_for_status.side_effect = requests.exceptions.HTTPError(response=not_found)
+
+        with patch('conductr_cli.resolvers.docker_registry.session',
+                   MagicMock(return_value=MagicMock(**{'get.return_value': not_found}))):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                docker_resolver.get_with_token('registry.hub.docker.com', blob_url, raw=True)
+
+        not_found.close.assert_called_once_with()
+
+
+class TestFetchBlobs(TestCase):
+    def setUp(self):  # noqa
+        logging_setup.configure_logging(MagicMock(**{}), MagicMock())
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.data = {}
+        self.blobs = []
+        self.responses = []
+
+        for data in [b'config', b'layer1' * 100, b'layer2' * 100]:
+            digest = 'sha256:{}'.format(hashlib.sha256(data).hexdigest())
+            self.data[digest] = data
+            self.blobs.append({'digest': digest, 'size': len(data)})
+
+        self.config_digest, self.layer1_digest, self.layer2_digest = [blob['digest'] for blob in self.blobs]
+
+        with open(self.cache_file(self.config_digest), 'wb') as cache_file:
+            cache_file.write(b'config')
+
+    def tearDown(self):  # noqa
+        shutil.rmtree(self.cache_dir)
+
+    def cache_file(self, digest):
+        return os.path.join(self.cache_dir, 'docker-blob-sha256_{}'.format(digest.split(':')[1]))
+
+    def blob_url(self, digest):
+        return 'https://registry.hub.docker.com/v2/library/alpine/blobs/{}'.format(digest)
+
+    def get_with_token(self, ns, url, headers=None, raw=False):
+        data = self.data[url.rsplit('/', 1)[1]]
+
+        if headers is not None and 'Range' in headers:
+            response = MagicMock(raw=BytesIO(data[int(headers['Range'][len('bytes='):-1]):]), status_code=206)
+        else:
+            response = MagicMock(raw=BytesIO(data), status_code=200)
+
+        self.responses.append(response)
+
+        return response
+
+    def fetch_blobs(self, get_with_token):
+        with patch('conductr_cli.resolvers.docker_resolver.get_with_token', get_with_token):
+            return docker_resolver.fetch_blobs(self.cache_dir, 'registry.hub.docker.com', 'library', 'alpine',
+                                               self.blobs, False)
+
+    def assert_cached(self, files):
+        self.assertEqual({blob['digest']: self.cache_file(blob['digest']) for blob in self.blobs}, files)
+
+        for digest, path in files.items():
+            with open(path, 'rb') as file:
+                self.assertEqual(self.data[digest], file.read())
+
+        self.assertEqual([], [name for name in os.listdir(self.cache_dir) if name.endswith('.tmp')])
+
+    def test_fetch_missing(self):
+        mock_get_with_token = MagicMock(side_effect=self.get_with_token)
+
+        self.assert_cached(self.fetch_blobs(mock_get_with_token))
+
+        self.assertEqual(
+            sorted([
+                call('registry.hub.docker.com', self.blob_url(self.layer1_digest),
+                     headers={'Accept-Encoding': 'identity'}, raw=True),
+                call('registry.hub.docker.com', self.blob_url(self.layer2_digest),
+                     headers={'Accept-Encoding': 'identity'}, raw=True)
+            ], key=str),
+            sorted(mock_get_with_token.call_args_list, key=str)
+        )
+
+        # The connections of the streamed responses are returned to the pool
+        for response in self.responses:
+            response.close.assert_called_once_with()
+
+    def test_fetch_error(self):
+        def get_with_token(ns, url, headers=None, raw=False):
+            if url.endswith(self.layer2_digest):
+                raise ConnectionError('test')
+            else:
+                return self.get_with_token(ns, url, headers, raw)
+
+        with self.assertRaises(ConnectionError):
+            self.fetch_blobs(MagicMock(side_effect=get_with_token))
+
+        self.assertFalse(os.path.exists(self.cache_file(self.layer2_digest)))
+
+    def test_resume(self):
+        with open('{}.tmp'.format(self.cache_file(self.layer1_digest)), 'wb') as cache_file:
+            cache_file.write(self.data[self.layer1_digest][:250])
+
+        mock_get_with_token = MagicMock(side_effect=self.get_with_token)
+
+        self.assert_cached(self.fetch_blobs(mock_get_with_token))
+
+        self.assertIn(
+            call('registry.hub.docker.com', self.blob_url(self.layer1_digest),
+                 headers={'Accept-Encoding': 'identity', 'Range': 'bytes=250-'}, raw=True),
+            mock_get_with_token.call_args_list
+        )
+
+    def test_resume_range_ignored(self):
+        with open('{}.tmp'.format(self.cache_file(self.layer1_digest)), 'wb') as cache_file:
+            cache_file.write(b'garbage')
+
+        def get_with_token(ns, url, headers=None, raw=False):
+            return MagicMock(raw=BytesIO(self.data[url.rsplit('/', 1)[1]]), status_code=200)
+
+        self.assert_cached(self.fetch_blobs(MagicMock(side_effect=get_with_token)))
+
+    def test_resume_range_not_satisfiable(self):
+        with open('{}.tmp'.format(self.cache_file(self.layer1_digest)), 'wb') as cache_file:
+            cache_file.write(self.data[self.layer1_digest] + b'garbage')
+
+        def get_with_token(ns, url, headers=None, raw=False):
+            if 'Range' in headers:
+                raise requests.exceptions.HTTPError(response=MagicMock(status_code=416))
+            else:
+                return self.get_with_token(ns, url, headers, raw)
+
+        self.assert_cached(self.fetch_blobs(MagicMock(side_effect=get_with_token)))
+
+    def test_digest_mismatch(self):
+        self.data[self.layer2_digest] = b'corrupted'
+
+        with self.assertRaises(DockerBlobDigestMismatchError):
+            self.fetch_blobs(MagicMock(side_effect=self.get_with_token))
+
+        self.assertFalse(os.path.exists(self.cache_file(self.layer2_digest)))
+        self.assertFalse(os.path.exists('{}.tmp'.format(self.cache_file(self.layer2_digest))))
+        self.assertTrue(os.path.exists(self.cache_file(self.layer1_digest)))
+
+        for response in self.responses:
+            response.close.assert_called_once_with()
+
+    def test_offline_mode(self):
+        mock_get_with_token = MagicMock()
+
+        with patch('conductr_cli.resolvers.docker_resolver.get_with_token', mock_get_with_token):
+            self.assertIsNone(docker_resolver.fetch_blobs(self.cache_dir, 'registry.hub.docker.com', 'library',
+                                                          'alpine', self.blobs, True))
+            self.assertEqual(
+                {self.config_digest: self.cache_file(self.config_digest)},
+                docker_resolver.fetch_blobs(self.cache_dir, 'registry.hub.docker.com', 'library', 'alpine',
+                                            self.blobs[:1], True)
+            )
+
+        mock_get_with_token.assert_not_called()
+
+
+class TestUncompressedLayer(TestCase):
+    def setUp(self):  # noqa
+        self.cache_dir = tempfile.mkdtemp()
+        self.layer_data = b'layer' * 1000
+        self.layer_file = os.path.join(self.cache_dir, 'docker-blob-sha256_abc')
+        self.layer = {'digest': 'sha256:abc', 'mediaType': 'application/vnd.docker.image.rootfs.diff.tar.gzip'}
+
+        with open(self.layer_file, 'wb') as layer_fileobj:
+            layer_fileobj.write(gzip.compress(self.layer_data))
+
+    def tearDown(self):  # noqa
+        shutil.rmtree(self.cache_dir)
+
+    def test_decompressed_once(self):
+        diff_id = 'sha256:{}'.format(hashlib.sha256(self.layer_data).hexdigest())
+        cache_file = os.path.join(self.cache_dir, 'docker-layer-sha256_abc')
+
+        self.assertEqual(cache_file, docker_resolver.uncompressed_layer(self.cache_dir, self.layer, self.layer_file))
+
+        with open(cache_file, 'rb') as cache_fileobj:
+            self.assertEqual(self.layer_data, cache_fileobj.read())
+
+        with open('{}.diff-id'.format(cache_file), 'r', encoding='utf-8') as diff_id_fileobj:
+            self.assertEqual(diff_id, diff_id_fileobj.read())
+
+        mock_gzip_file = MagicMock()
+
+        with patch('gzip.GzipFile', mock_gzip_file):
+            self.assertEqual(cache_file,
+                             docker_resolver.uncompressed_layer(self.cache_dir, self.layer, self.layer_file))
+
+        mock_gzip_file.assert_not_called()
+        self.assertEqual(['docker-blob-sha256_abc', 'docker-layer-sha256_abc', 'docker-layer-sha256_abc.diff-id'],
+                         sorted(os.listdir(self.cache_dir)))
+
+    def test_do_resolve_bundle_links_layers(self):
+        with open(os.path.join(self.cache_dir, 'docker-blob-sha256_config'), 'wb') as config_fileobj:
+            config_fileobj.write(b'{}')
+
+        manifest = {'config': {'digest': 'sha256:config'}, 'layers': [self.layer]}
+        files = {
+            'sha256:config': os.path.join(self.cache_dir, 'docker-blob-sha256_config'),
+            'sha256:abc': self.layer_file
+        }
+
+        with patch('conductr_cli.resolvers.docker_resolver.fetch_manifest', MagicMock(return_value=manifest)), \
+                patch('conductr_cli.resolvers.docker_resolver.fetch_blobs', MagicMock(return_value=files)):
+            resolved, bundle_name, image_dir, error = docker_resolver.do_resolve_bundle(self.cache_dir, 'alpine',
+                                                                                        None, True)
+
+        try:
+            self.assertTrue(resolved)
+            self.assertTrue(os.path.samefile(os.path.join(self.cache_dir, 'docker-layer-sha256_abc'),
+                                             os.path.join(image_dir, 'abc', 'layer.tar')))
+        finally:
+            shutil.rmtree(image_dir)
+
+    def test_uncompressed(self):
+        self.layer['mediaType'] = 'application/vnd.docker.image.rootfs.diff.tar'
+
+        self.assertEqual(self.layer_file,
+                         docker_resolver.uncompressed_layer(self.cache_dir, self.layer, self.layer_file))
+
+    def test_missing_diff_id(self):
+        # As left by a CLI invocation which was interrupted after the layer was in place
+        cache_file = os.path.join(self.cache_dir, 'docker-layer-sha256_abc')
+
+        with open(cache_file, 'wb') as cache_fileobj:
+            cache_fileobj.write(b'incomplete')
+
+        self.assertEqual(cache_file, docker_resolver.uncompressed_layer(self.cache_dir, self.layer, self.layer_file))
+
+        with open(cache_file, 'rb') as cache_fileobj:
+            self.assertEqual(self.layer_data, cache_fileobj.read())
+
+        with open('{}.diff-id'.format(cache_file), 'r', encoding='utf-8') as diff_id_fileobj:
+            self.assertEqual('sha256:{}'.format(hashlib.sha256(self.layer_data).hexdigest()), diff_id_fileobj.read())
+
+    def test_diff_id_write_failure(self):
+        cache_file = os.path.join(self.cache_dir, 'docker-layer-sha256_abc')
+        replace = os.replace
+
+        def replace_layer_only(src, dst):
+            if dst.endswith('.diff-id'):
+                raise OSError('disk full')
+            replace(src, dst)
+
+        with patch('os.replace', replace_layer_only), self.assertRaises(OSError):
+            docker_resolver.uncompressed_layer(self.cache_dir, self.layer, self.layer_file)
+
+        # The layer is decompressed again on the next invocation, as its diff id is missing
+        self.assertEqual(['docker-blob-sha256_abc', 'docker-layer-sha256_abc'], sorted(os.listdir(self.cache_dir)))
+        self.assertFalse(os.path.exists('{}.diff-id'.format(cache_file)))
+
+    def test_corrupt(self):
+        with open(self.layer_file, 'wb') as layer_fileobj:
+            layer_fileobj.write(b'not gzip')
+
+        with self.assertRaises(OSError):
+            docker_resolver.uncompressed_layer(self.cache_dir, self.layer, self.layer_file)
+
+        self.assertEqual(['docker-blob-sha256_abc'], os.listdir(self.cache_dir))
+
+
+class TestFetchManifestRevalidation(TestCase):
+    def setUp(self):  # noqa
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):  # noqa
+        shutil.rmtree(self.cache_dir)
+
+    def fetch_manifest(self, response, reference='3.5'):
+        mock_get_with_token = MagicMock(return_value=response)
+
+        with patch('conductr_cli.resolvers.docker_resolver.get_with_token', mock_get_with_token):
+            manifest = docker_resolver.fetch_manifest(self.cache_dir, 'registry.hub.docker.com', 'library', 'alpine',
+                                                      reference, False)
+
+        return manifest, mock_get_with_token
+
+    def test_unchanged(self):
+        manifest, mock_get_with_token = self.fetch_manifest(
+            MagicMock(status_code=200, text='{"schemaVersion": 2}', headers={'Docker-Content-Digest': 'sha256:abc'})
+        )
+
+        self.assertEqual({'schemaVersion': 2}, manifest)
+        self.assertNotIn('If-None-Match', mock_get_with_token.call_args[1]['headers'])
+
+        mock_open = MagicMock(side_effect=open)
+
+        with patch('builtins.open', mock_open):
+            manifest, mock_get_with_token = self.fetch_manifest(MagicMock(status_code=304, headers={}))
+
+        self.assertEqual({'schemaVersion': 2}, manifest)
+        self.assertEqual('"sha256:abc"', mock_get_with_token.call_args[1]['headers']['If-None-Match'])
+        self.assertEqual([], [args for args in mock_open.call_args_list if 'w' in args[0][1:2]])
+
+    def test_changed(self):
+        self.fetch_manifest(MagicMock(status_code=200, text='{"schemaVersion": 2}', headers={'ETag': '"one"'}))
+
+        manifest, mock_get_with_token = self.fetch_manifest(
+            MagicMock(status_code=200, text='{"schemaVersion": 3}', headers={'ETag': '"two"'})
+        )
+
+        self.assertEqual({'schemaVersion': 3}, manifest)
+        self.assertEqual('"one"', mock_get_with_token.call_args[1]['headers']['If-None-Match'])
+
+        manifest, mock_get_with_token = self.fetch_manifest(MagicMock(status_code=304, headers={}))
+
+        self.assertEqual({'schemaVersion': 3}, manifest)
+        self.assertEqual('"two"', mock_get_with_token.call_args[1]['headers']['If-None-Match'])
+
+    def test_ttl(self):
+        self.fetch_manifest(MagicMock(status_code=200, text='{"schemaVersion": 2}', headers={'ETag': '"one"'}))
+
+        with patch('conductr_cli.resolvers.docker_resolver.DEFAULT_DOCKER_MANIFEST_TTL', 3600):
+            manifest, mock_get_with_token = self.fetch_manifest(MagicMock())
+
+        self.assertEqual({'schemaVersion': 2}, manifest)
+        mock_get_with_token.assert_not_called()
+
+    def test_digest_reference(self):
+        digest = 'sha256:{}'.format('0' * 64)
+
+        self.fetch_manifest(MagicMock(status_code=200, text='{"schemaVersion": 2}', headers={}), digest)
+
+        # A manifest referenced by its digest never changes, so it's used regardless of the TTL and its validation
+        manifest, mock_get_with_token = self.fetch_manifest(MagicMock(), digest)
+
+        self.assertEqual({'schemaVersion': 2}, manifest)
+        mock_get_with_token.assert_not_called()
+
+    def test_write_failure(self):
+        self.fetch_manifest(MagicMock(status_code=200, text='{"schemaVersion": 2}', headers={'ETag': '"one"'}))
+
+        with patch('os.replace', MagicMock(side_effect=OSError('test'))), self.assertRaises(OSError):
+            self.fetch_manifest(MagicMock(status_code=200, text='{"schemaVersion": 3}', headers={'ETag': '"two"'}))
+
+        # The previous manifest is kept, without its validation, and no temp file is left behind
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+
+        manifest, mock_get_with_token = self.fetch_manifest(
+            MagicMock(status_code=200, text='{"schemaVersion": 3}', headers={'ETag': '"two"'})
+        )
+
+        self.assertEqual({'schemaVersion': 3}, manifest)
+        self.assertNotIn('If-None-Match', mock_get_with_token.call_args[1]['headers'])
+
+
 class TestSupportedSchemes(TestCase):
     def test_supported_schemes(self):
         self.assertEqual([SCHEME_BUNDLE], docker_resolver.supported_schemes())
@@ -96,6 +96,81 @@ class TestResolve(CliTestCase):
         mock_download_from_s3.assert_not_called()
 
 
+class TestStreamBundle(CliTestCase):
+    cache_dir = '/cache-dir'
+    bucket_name = 'myorg'
+    s3_key = 'bundle/weather/weather-v3-digest.zip'
+    valid_s3_url = 's3://{}/{}'.format(bucket_name, s3_key)
+
+    def test_success(self):
+        exists_mock = MagicMock(side_effect=[False, True])
+        s3_client = MagicMock(**{
+            'head_object.return_value': {'ContentLength': 1234, 'ContentType': 'application/zip'},
+            'generate_presigned_url.return_value': 'https://myorg.s3.amazonaws.com/weather-v3-digest.zip?sig=abc'
+        })
+        create_s3_client_mock = MagicMock(return_value=s3_client)
+
+        with patch('os.path.exists', exists_mock), \
+                patch('conductr_cli.resolvers.s3_resolver.create_s3_client', create_s3_client_mock):
+            is_resolved, bundle_file_name, bundle_stream, error = \
+                s3_resolver.stream_bundle(self.cache_dir, self.valid_s3_url)
+
+        self.assertTrue(is_resolved)
+        self.assertEqual('weather-v3-digest.zip', bundle_file_name)
+        self.assertEqual('https://myorg.s3.amazonaws.com/weather-v3-digest.zip?sig=abc', bundle_stream.url)
+        self.assertEqual(self.valid_s3_url, bundle_stream.name)
+        self.assertEqual(1234, bundle_stream.size)
+        self.assertEqual('/cache-dir/weather-v3-digest.zip', bundle_stream.cached_file)
+        self.assertIsNone(bundle_stream.auth)
+        self.assertIsNone(error)
+
+        s3_client.head_object.assert_called_once_with(Bucket=self.bucket_name, Key=self.s3_key)
+        s3_client.generate_presigned_url.assert_called_once_with('get_object',
+                                                                 Params={'Bucket': self.bucket_name,
+                                                                         'Key': self.s3_key},
+                                                                 ExpiresIn=s3_resolver.STREAM_URL_EXPIRY)
+
+    def test_cached(self):
+        exists_mock = MagicMock(return_value=True)
+        create_s3_client_mock = MagicMock()
+
+        with patch('os.path.exists', exists_mock), \
+                patch('conductr_cli.resolvers.s3_resolver.create_s3_client', create_s3_client_mock):
+            result = s3_resolver.stream_bundle(self.cache_dir, self.valid_s3_url)
+
+        self.assertEqual((False, None, None, None), result)
+        create_s3_client_mock.assert_not_called()
+
+    def test_not_zip(self):
+        exists_mock = MagicMock(side_effect=[False, True])
+        s3_client = MagicMock(**{
+            'head_object.return_value': {'ContentLength': 1234, 'ContentType': 'application/octet-stream'}
+        })
+        create_s3_client_mock = MagicMock(return_value=s3_client)
+
+        with patch('os.path.exists', exists_mock), \
+                patch('conductr_cli.resolvers.s3_resolver.create_s3_client', create_s3_client_mock):
+            result = s3_resolver.stream_bundle(self.cache_dir, self.valid_s3_url)
+
+        self.assertEqual((False, None, None, None), result)
+        s3_client.generate_presigned_url.assert_not_called()
+
+    def test_client_error(self):
+        exists_mock = MagicMock(side_effect=[False, True])
+        error = ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        s3_client = MagicMock(**{'head_object.side_effect': error})
+        create_s3_client_mock = MagicMock(return_value=s3_client)
+
+        with patch('os.path.exists', exists_mock), \
+                patch('conductr_cli.resolvers.s3_resolver.create_s3_client', create_s3_client_mock):
+            result = s3_resolver.stream_bundle(self.cache_dir, self.valid_s3_url)
+
+        self.assertEqual((False, None, None, error), result)
+
+    def test_non_s3_url(self):
+        self.assertEqual((False, None, None, None), s3_resolver.stream_bundle(self.cache_dir, 'http://example.org'))
+
+
 class TestLoadFromCache(CliTestCase):
     cache_dir = '/tmp'
     bucket_name = 'myorg'
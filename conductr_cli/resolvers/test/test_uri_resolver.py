@@ -1,11 +1,16 @@
 from unittest import TestCase
 from urllib.error import URLError
+from conductr_cli import bundle_utils
+from conductr_cli.exceptions import RangeRequestsNotSupportedError
+from conductr_cli.http import DEFAULT_HTTP_TIMEOUT
 from conductr_cli.resolvers import uri_resolver
 from conductr_cli.resolvers.schemes import SCHEME_FILE, SCHEME_HTTP, SCHEME_HTTPS
-from conductr_cli.test.cli_test_case import create_mock_logger
+from conductr_cli.test.cli_test_case import create_mock_logger, create_temp_bundle
+import hashlib
 import os
+import shutil
 
-from unittest.mock import call, patch, MagicMock
+from unittest.mock import call, patch, MagicMock, PropertyMock
 
 
 class TestResolveBundle(TestCase):
@@ -47,6 +52,7 @@ class TestResolveBundle(TestCase):
     def test_resolve_success_create_cache_dir(self):
         os_path_exists_mock = MagicMock(side_effect=[False, False])
         file_move_mock = MagicMock()
+        accessed_mock = MagicMock()
         os_chmod_mock = MagicMock()
         os_mkdirs_mock = MagicMock(return_value=())
         cache_path_mock = MagicMock(return_value='/bundle-cached-path')
@@ -59,6 +65,7 @@ class TestResolveBundle(TestCase):
                 patch('os.makedirs', os_mkdirs_mock), \
                 patch('os.chmod', os_chmod_mock), \
                 patch('shutil.move', file_move_mock), \
+                patch('conductr_cli.resolve_cache.accessed', accessed_mock), \
                 patch('conductr_cli.resolvers.uri_resolver.cache_path', cache_path_mock), \
                 patch('conductr_cli.resolvers.uri_resolver.get_url', get_url_mock), \
                 patch('conductr_cli.resolvers.uri_resolver.urlretrieve', urlretrieve_mock), \
@@ -75,6 +82,7 @@ class TestResolveBundle(TestCase):
         get_url_mock.assert_called_with('/bundle-url')
         urlretrieve_mock.assert_called_with('/bundle-url-resolved', '/bundle-cached-path.tmp')
         file_move_mock.assert_called_with('/bundle-cached-path.tmp', '/bundle-cached-path')
+        accessed_mock.assert_called_with('/bundle-cached-path')
 
         get_logger_mock.assert_called_with('conductr_cli.resolvers.uri_resolver')
         log_mock.info.assert_called_with('Retrieving /bundle-url-resolved')
@@ -548,3 +556,154 @@ class TestShowProgress(TestCase):
 class TestSupportedSchemes(TestCase):
     def test_supported_schemes(self):
         self.assertEqual([SCHEME_FILE, SCHEME_HTTP, SCHEME_HTTPS], uri_resolver.supported_schemes())
+
+
+class TestStreamBundle(TestCase):
+    def test_not_http(self):
+        self.assertEqual((False, None, None, None), uri_resolver.stream_bundle('/cache-dir', '/bundle-url'))
+
+    def test_cached(self):
+        os_path_exists_mock = MagicMock(return_value=True)
+        requests_head_mock = MagicMock()
+
+        with patch('os.path.exists', os_path_exists_mock), \
+                patch('requests.head', requests_head_mock):
+            result = uri_resolver.stream_bundle('/cache-dir', 'http://site.com/bundle.zip')
+
+        self.assertEqual((False, None, None, None), result)
+        os_path_exists_mock.assert_called_once_with('/cache-dir/bundle.zip')
+        requests_head_mock.assert_not_called()
+
+    def test_range_supported(self):
+        os_path_exists_mock = MagicMock(side_effect=[False, True])
+        response = MagicMock(url='http://site.com/bundle.zip', headers={'Accept-Ranges': 'bytes',
+                                                                        'Content-Length': '1234'})
+        requests_head_mock = MagicMock(return_value=response)
+
+        with patch('os.path.exists', os_path_exists_mock), \
+                patch('requests.head', requests_head_mock):
+            is_resolved, bundle_file_name, bundle_stream, error = \
+                uri_resolver.stream_bundle('/cache-dir', 'http://site.com/bundle.zip', ('realm', 'user', 'pass'))
+
+        self.assertTrue(is_resolved)
+        self.assertEqual('bundle.zip', bundle_file_name)
+        self.assertEqual('http://site.com/bundle.zip', bundle_stream.url)
+        self.assertEqual(1234, bundle_stream.size)
+        self.assertEqual('/cache-dir/bundle.zip', bundle_stream.cached_file)
+        self.assertEqual(('user', 'pass'), bundle_stream.auth)
+        self.assertIsNone(error)
+        requests_head_mock.assert_called_once_with('http://site.com/bundle.zip', auth=('user', 'pass'),
+                                                   allow_redirects=True, timeout=DEFAULT_HTTP_TIMEOUT)
+
+    def test_no_credentials(self):
+        os_path_exists_mock = MagicMock(side_effect=[False, True])
+        response = MagicMock(url='http://site.com/bundle.zip', headers={'Accept-Ranges': 'bytes',
+                                                                        'Content-Length': '1234'})
+        requests_head_mock = MagicMock(return_value=response)
+
+        with patch('os.path.exists', os_path_exists_mock), \
+                patch('requests.head', requests_head_mock):
+            is_resolved, bundle_file_name, bundle_stream, error = \
+                uri_resolver.stream_bundle('/cache-dir', 'http://site.com/bundle.zip', (None, None, None))
+
+        self.assertTrue(is_resolved)
+        self.assertIsNone(bundle_stream.auth)
+        requests_head_mock.assert_called_once_with('http://site.com/bundle.zip', auth=None,
+                                                   allow_redirects=True, timeout=DEFAULT_HTTP_TIMEOUT)
+
+    def test_redirected(self):
+        os_path_exists_mock = MagicMock(side_effect=[False, True])
+        response = MagicMock(url='https://cdn.com/bundle.zip?token=abc', headers={'Accept-Ranges': 'bytes',
+                                                                                  'Content-Length': '1234'})
+        requests_head_mock = MagicMock(return_value=response)
+
+        with patch('os.path.exists', os_path_exists_mock), \
+                patch('requests.head', requests_head_mock):
+            is_resolved, bundle_file_name, bundle_stream, error = \
+                uri_resolver.stream_bundle('/cache-dir', 'http://site.com/bundle.zip', ('realm', 'user', 'pass'))
+
+        # The redirect is followed by each request, so that the credentials aren't sent to the other host
+        self.assertTrue(is_resolved)
+        self.assertEqual('http://site.com/bundle.zip', bundle_stream.url)
+        self.assertEqual('http://site.com/bundle.zip', bundle_stream.name)
+
+    def test_range_not_supported(self):
+        os_path_exists_mock = MagicMock(side_effect=[False, True])
+        response = MagicMock(url='http://site.com/bundle.zip', headers={'Content-Length': '1234'})
+        requests_head_mock = MagicMock(return_value=response)
+
+        with patch('os.path.exists', os_path_exists_mock), \
+                patch('requests.head', requests_head_mock):
+            result = uri_resolver.stream_bundle('/cache-dir', 'http://site.com/bundle.zip')
+
+        self.assertEqual((False, None, None, None), result)
+
+
+class TestRemoteFile(TestCase):
+    def setUp(self):  # noqa
+        self.tmpdir, bundle_file = create_temp_bundle('name = "bundle"')
+
+        with open(bundle_file, 'rb') as file:
+            data = file.read()
+
+        self.data = data + ('\nsha-256/' + hashlib.sha256(data).hexdigest()).encode('UTF-8')
+        self.cached_file = os.path.join(self.tmpdir, 'cache', 'bundle.zip')
+        os.makedirs(os.path.dirname(self.cached_file))
+
+    def tearDown(self):  # noqa
+        shutil.rmtree(self.tmpdir)
+
+    def requests_get(self, url, auth=None, headers=None, stream=False, timeout=None):
+        if headers is None:
+            chunks = [self.data[i:i + 100] for i in range(0, len(self.data), 100)]
+            return MagicMock(status_code=200, iter_content=MagicMock(return_value=iter(chunks)))
+        else:
+            start, end = [int(v) for v in headers['Range'][len('bytes='):].split('-')]
+            return MagicMock(status_code=206, content=self.data[start:end + 1])
+
+    def test_stream_and_commit(self):
+        remote_file = uri_resolver.RemoteFile('http://site.com/bundle.zip', len(self.data), self.cached_file)
+
+        requests_get_mock = MagicMock(side_effect=self.requests_get)
+
+        with patch('requests.get', requests_get_mock):
+            self.assertEqual('name = "bundle"', bundle_utils.conf(remote_file))
+
+            digest, length = bundle_utils.digest_extract(remote_file)
+            window = bundle_utils.FileWindow(remote_file, length, digest)
+
+            # The download only starts once the stream is opened
+            self.assertTrue(all(kwargs.get('headers') for args, kwargs in requests_get_mock.call_args_list))
+
+            remote_file.open_stream()
+            data = window.read()
+            remote_file.commit()
+            remote_file.close()
+
+        self.assertEqual(self.data[:length], data)
+
+        with open(self.cached_file, 'rb') as file:
+            self.assertEqual(self.data, file.read())
+
+        self.assertFalse(os.path.exists('{}.tmp'.format(self.cached_file)))
+
+    def test_range_ignored(self):
+        remote_file = uri_resolver.RemoteFile('http://site.com/bundle.zip', len(self.data), self.cached_file)
+        response = MagicMock(status_code=200)
+        type(response).content = PropertyMock(side_effect=AssertionError('content downloaded'))
+
+        with patch('requests.get', MagicMock(return_value=response)):
+            self.assertRaises(RangeRequestsNotSupportedError, remote_file.read, 10)
+
+        response.close.assert_called_once_with()
+
+    def test_stream_not_committed(self):
+        remote_file = uri_resolver.RemoteFile('http://site.com/bundle.zip', len(self.data), self.cached_file)
+
+        with patch('requests.get', self.requests_get):
+            stream = remote_file.open_stream()
+            stream.read(10)
+            remote_file.close()
+
+        self.assertFalse(os.path.exists(self.cached_file))
+        self.assertFalse(os.path.exists('{}.tmp'.format(self.cached_file)))
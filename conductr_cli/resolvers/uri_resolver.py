@@ -6,11 +6,20 @@ from pathlib import Path
 
 import time
 
-from conductr_cli import screen_utils
+from conductr_cli import resolve_cache, screen_utils
+from conductr_cli.constants import BUNDLE_STREAM_BUFFER_CHUNKS, IO_CHUNK_SIZE
+from conductr_cli.exceptions import RangeRequestsNotSupportedError
+from conductr_cli.http import DEFAULT_HTTP_TIMEOUT
 from conductr_cli.resolvers.resolvers_util import is_local_file
+from requests.exceptions import RequestException
+import contextlib
+import io
 import os
 import logging
+import queue
+import requests
 import shutil
+import threading
 import urllib
 
 
@@ -48,6 +57,7 @@ def resolve_file(cache_dir, uri, auth=None, require_bundle_conf=True, raise_erro
 
         os.chmod(tmp_download_path, 0o600)
         shutil.move(tmp_download_path, cached_file)
+        resolve_cache.accessed(cached_file)
         return True, file_name, cached_file, None
     except URLError as e:
         if raise_error:
@@ -56,6 +66,48 @@ def resolve_file(cache_dir, uri, auth=None, require_bundle_conf=True, raise_erro
             return False, None, None, e
 
 
+def stream_bundle(cache_dir, uri, auth=None):
+    """
+    Opens a bundle from a http(s) `uri` so that it can be uploaded while it is being downloaded. This is only possible
+    if the bundle isn't cached yet and the server supports range requests, as the bundle.conf and digest are read
+    from the end of the file before streaming it.
+
+    :param cache_dir: the directory where the bundle is cached once it has been streamed
+    :param uri: the bundle uri
+    :param auth: optional tuple of realm, username and password
+    :return: is_resolved, bundle file name, `RemoteFile`, error
+    """
+    parsed = urlparse(uri, scheme='file')
+    if parsed.scheme != SCHEME_HTTP and parsed.scheme != SCHEME_HTTPS:
+        return False, None, None, None
+
+    cached_file = cache_path(cache_dir, uri)
+    if os.path.exists(cached_file):
+        return False, None, None, None
+
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, mode=0o700)
+
+    file_name, file_url = get_url(uri)
+    # Credentials that couldn't be loaded come as a tuple of Nones, which must not be sent as basic auth
+    request_auth = None if not auth or auth[1] is None or auth[2] is None else (auth[1], auth[2])
+
+    try:
+        response = requests.head(file_url, auth=request_auth, allow_redirects=True, timeout=DEFAULT_HTTP_TIMEOUT)
+        response.raise_for_status()
+    except RequestException as e:
+        return False, None, None, e
+
+    if response.headers.get('Accept-Ranges') != 'bytes' or 'Content-Length' not in response.headers:
+        return False, None, None, None
+
+    # The original url is requested rather than the url it redirects to, so that requests drops the credentials when
+    # it follows a redirect to another host, e.g. a CDN
+    remote_file = RemoteFile(file_url, int(response.headers['Content-Length']), cached_file, request_auth)
+
+    return True, file_name, remote_file, None
+
+
 def load_bundle_from_cache(cache_dir, uri):
     # When the supplied uri is a local filesystem, don't load from cache so file can be used as is
     parsed = urlparse(uri, scheme='file')
@@ -68,6 +120,7 @@ def load_bundle_from_cache(cache_dir, uri):
         if os.path.exists(cached_file):
             bundle_name = os.path.basename(cached_file)
             log.info('Retrieving from cache {}'.format(cached_file))
+            resolve_cache.accessed(cached_file)
             return True, bundle_name, cached_file, None
         else:
             return False, None, None, None
@@ -149,3 +202,202 @@ def show_progress(log, bundle_url):
             prev_time = now_time
 
     return continue_logging
+
+
+class RemoteFile(object):
+    """
+    A read-only, seekable file object for a http(s) resource that supports range requests. Reads are served from a
+    block fetched with a single range request, which suits the few small reads needed to locate a zip's central
+    directory or a digest trailer. A read raises a `RangeRequestsNotSupportedError` if the server ignores the range.
+
+    Once `open_stream` has been called, the whole resource is read sequentially with a single request instead, and
+    `commit` moves the streamed data into the cache.
+    """
+
+    def __init__(self, url, size, cached_file, auth=None, name=None):
+        self.url = url
+        self.file_name = url if name is None else name
+        self.size = size
+        self.cached_file = cached_file
+        self.auth = auth
+        self.position = 0
+        self.block_start = 0
+        self.block = b''
+        self.stream = None
+
+    @property
+    def name(self):
+        return self.file_name
+
+    def read(self, size=-1):
+        if self.stream is not None:
+            return self.stream.read(size)
+
+        end = self.size if size is None or size < 0 else min(self.size, self.position + size)
+
+        if self.position >= end:
+            return b''
+
+        if self.position < self.block_start or end > self.block_start + len(self.block):
+            self.block_start = self.position
+            self.block = self.read_range(self.position, max(end, min(self.size, self.position + IO_CHUNK_SIZE)))
+
+        data = self.block[self.position - self.block_start:end - self.block_start]
+        self.position += len(data)
+
+        return data
+
+    def read_range(self, start, end):
+        response = requests.get(self.url,
+                                auth=self.auth,
+                                headers={'Range': 'bytes={}-{}'.format(start, end - 1)},
+                                stream=True,
+                                timeout=DEFAULT_HTTP_TIMEOUT)
+
+        with contextlib.closing(response):
+            response.raise_for_status()
+
+            # A server may ignore the range and respond with the whole resource instead, which isn't downloaded
+            if response.status_code != 206:
+                raise RangeRequestsNotSupportedError('{} does not support range requests'.format(self.name))
+
+            return response.content
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if self.stream is not None:
+            return self.stream.seek(offset, whence)
+
+        if whence == os.SEEK_SET:
+            self.position = offset
+        elif whence == os.SEEK_CUR:
+            self.position += offset
+        elif whence == os.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError('Invalid whence ({})'.format(whence))
+
+        return self.position
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position if self.stream is None else self.stream.tell()
+
+    def open_stream(self):
+        self.stream = RemoteFileStream(self)
+
+        return self.stream
+
+    def commit(self):
+        self.stream.commit()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+
+
+class RemoteFileStream(object):
+    """
+    Sequentially reads a `RemoteFile` with a single request. A background thread downloads ahead of the reader into a
+    queue bounded by `BUNDLE_STREAM_BUFFER_CHUNKS`, and writes each chunk to a temporary file next to the cached file.
+
+    The temporary file only replaces the cached file once `commit` is called, and is removed on `close` otherwise.
+    """
+
+    def __init__(self, remote_file):
+        self.remote_file = remote_file
+        self.tmp_download_path = '{}.tmp'.format(remote_file.cached_file)
+        self.position = 0
+        self.buffer = b''
+        self.done = False
+        self.committed = False
+        self.chunks = queue.Queue(maxsize=BUNDLE_STREAM_BUFFER_CHUNKS)
+        self.closed = threading.Event()
+
+        self.response = requests.get(remote_file.url, auth=remote_file.auth, stream=True, timeout=DEFAULT_HTTP_TIMEOUT)
+        self.response.raise_for_status()
+
+        if os.path.exists(self.tmp_download_path):
+            os.remove(self.tmp_download_path)
+
+        self.tmp_file = open(self.tmp_download_path, 'wb')
+        os.chmod(self.tmp_download_path, 0o600)
+
+        self.thread = threading.Thread(target=self.download, daemon=True)
+        self.thread.start()
+
+    @property
+    def name(self):
+        return self.remote_file.name
+
+    def download(self):
+        try:
+            for chunk in self.response.iter_content(IO_CHUNK_SIZE):
+                self.tmp_file.write(chunk)
+
+                if not self.put(chunk):
+                    return
+
+            self.tmp_file.flush()
+            self.put(b'')
+        except Exception as e:
+            self.put(e)
+
+    def put(self, item):
+        while not self.closed.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def read(self, size=-1):
+        while not self.done and (size is None or size < 0 or len(self.buffer) < size):
+            chunk = self.chunks.get()
+
+            if isinstance(chunk, Exception):
+                raise chunk
+            elif chunk:
+                self.buffer += chunk
+            else:
+                self.done = True
+
+        if size is None or size < 0:
+            size = len(self.buffer)
+
+        data = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        self.position += len(data)
+
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence != os.SEEK_SET or offset != self.position:
+            raise io.UnsupportedOperation('{} can only be read sequentially'.format(self.name))
+
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def commit(self):
+        while not self.done:
+            self.read(IO_CHUNK_SIZE)
+
+        self.thread.join()
+        self.tmp_file.close()
+        shutil.move(self.tmp_download_path, self.remote_file.cached_file)
+        resolve_cache.accessed(self.remote_file.cached_file)
+        self.committed = True
+
+    def close(self):
+        self.closed.set()
+        self.response.close()
+        self.thread.join()
+        self.tmp_file.close()
+
+        if not self.committed and os.path.exists(self.tmp_download_path):
+            os.remove(self.tmp_download_path)
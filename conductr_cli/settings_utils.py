@@ -0,0 +1,51 @@
+import json
+import logging
+import os
+import tempfile
+
+
+def read_json_settings_file(path, version):
+    """
+    Reads a JSON file within the CLI settings dir which was written by `write_json_settings_file_atomically`.
+
+    :param path: the path of the file
+    :param version: the version of the content expected
+    :return: the content of the file, or None if the file doesn't exist, can't be read or has another version
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            content = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    return content if isinstance(content, dict) and content.get('version') == version else None
+
+
+def write_json_settings_file_atomically(path, version, content, description):
+    """
+    Writes `content` and its `version` as a JSON file within the CLI settings dir. The file is replaced atomically, so
+    concurrent CLI invocations never read a partially written file, and it's only readable by the user.
+
+    The files which are written this way only save work, so failing to write them isn't an error and is only logged.
+
+    :param path: the path of the file
+    :param version: the version of the content
+    :param content: dict with the content of the file
+    :param description: what the file holds, for the log message if the file can't be written
+    """
+    log = logging.getLogger(__name__)
+    settings_dir = os.path.dirname(path)
+
+    try:
+        os.makedirs(settings_dir, exist_ok=True)
+
+        fd, temp_file = tempfile.mkstemp(dir=settings_dir, prefix='.{}'.format(os.path.basename(path)))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(dict(content, version=version), file)
+            os.replace(temp_file, path)
+        except OSError:
+            os.remove(temp_file)
+            raise
+    except OSError as e:
+        log.debug('Unable to write the {} {}: {}'.format(description, path, e))
@@ -1,12 +1,14 @@
 import argcomplete
 import argparse
 from functools import partial
-from conductr_cli import logging_setup
-from conductr_cli.constants import IO_CHUNK_SIZE, SHAZAR_TIMESTAMP_MIN
+from conductr_cli import logging_setup, zip_utils
+from conductr_cli.constants import DEFAULT_BUILD_CACHE_DIR, IO_CHUNK_SIZE, SHAZAR_TIMESTAMP_MIN
+from conductr_cli.incremental_build import IncrementalBuild
 import hashlib
 import logging
 import os
 import shutil
+import stat
 import sys
 import tarfile
 import tempfile
@@ -43,6 +45,17 @@ def build_parser():
                         default='.',
                         help="When provided with a directory name to package, "
                              "the directory to write the bundle to, defaults to '.'")
+    parser.add_argument('--compress',
+                        help='If provided, entries are compressed with DEFLATE on all cores',
+                        default=False,
+                        dest='compress',
+                        action='store_true')
+    parser.add_argument('--incremental',
+                        help='If provided, a directory is archived incrementally, copying the unchanged files from '
+                             'the archive of its previous build',
+                        default=False,
+                        dest='incremental',
+                        action='store_true')
     parser.add_argument('--tar',
                         help='If provided, source is decoded as a tar file',
                         default=False,
@@ -59,64 +72,83 @@ def shazar(args):
     log = logging.getLogger(__name__)
 
     source_is_tar = args.source is None or args.tar
+    source_base_name = None if source_is_tar else os.path.basename(args.source.rstrip('\\/'))
+    compression = zipfile.ZIP_DEFLATED if args.compress else zipfile.ZIP_STORED
 
-    with tempfile.NamedTemporaryFile() as zip_file_data:
-        source_base_name = None
-
-        with zipfile.ZipFile(zip_file_data, 'w') as zip_file:
-            if source_is_tar:
-                try:
-                    with tarfile.open(fileobj=sys.stdin.buffer, mode='r|') \
-                            if args.source is None else tarfile.open(args.source, mode='r') as tar:
-                        tar_to_zip(tar, zip_file)
-
-                except tarfile.ReadError:
-                    log.error('shazar: input must be in tar format')
-                    sys.exit(2)
-            else:
-                source_base_name = os.path.basename(args.source.rstrip('\\/'))
-
-                if os.path.isdir(args.source):
-                    dir_to_zip(args.source, zip_file, source_base_name)
-                else:
-                    zip_file.write(args.source, source_base_name)
-
-        zip_file_data.seek(0)
-
-        # Per UNIX conventions, if given "-" as a filename that's a way of saying to use stdout. This solves the
-        # use-case of outputting to stdout despite giving `shazar` a `source` argument.
-
-        if args.output == '-' or (args.output is None and source_base_name is None):
-            write_with_digest(zip_file_data, sys.stdout.buffer)
-        elif args.output is not None:
-            # write directly to the file here so writing to device nodes like e.g. /dev/null is supported
-            with open(args.output, 'wb') as file:
-                write_with_digest(zip_file_data, file)
+    if args.incremental and not source_is_tar and os.path.isdir(args.source):
+        incremental_build = IncrementalBuild(DEFAULT_BUILD_CACHE_DIR, 'shazar', args.source,
+                                             {'name': source_base_name, 'compress': args.compress})
+    else:
+        incremental_build = None
+
+    def write_entries(zip_file):
+        if source_is_tar:
+            try:
+                with tarfile.open(fileobj=sys.stdin.buffer, mode='r|') \
+                        if args.source is None else tarfile.open(args.source, mode='r') as tar:
+                    tar_to_zip(tar, zip_file)
+
+            except tarfile.ReadError:
+                log.error('shazar: input must be in tar format')
+                sys.exit(2)
+        elif os.path.isdir(args.source):
+            dir_to_zip(args.source, zip_file, source_base_name, compress=args.compress,
+                       incremental_build=incremental_build)
+        else:
+            zip_file.write(args.source, source_base_name)
+
+    def write_archive(output):
+        if incremental_build is not None:
+            return incremental_build.build(output, partial(write_zip_with_digest,
+                                                           write_entries=write_entries, compression=compression))
         else:
-            with tempfile.NamedTemporaryFile(delete=False) as file:
-                hex_digest = write_with_digest(zip_file_data, file)
+            return write_zip_with_digest(output, write_entries, compression)
+
+    # Per UNIX conventions, if given "-" as a filename that's a way of saying to use stdout. This solves the
+    # use-case of outputting to stdout despite giving `shazar` a `source` argument.
 
-                dest = args.output if args.output is not None else os.path.join(
-                    args.output_dir,
-                    '{}-{}.zip'.format(source_base_name, hex_digest)
-                )
+    if args.output == '-' or (args.output is None and source_base_name is None):
+        write_archive(sys.stdout.buffer)
+    elif args.output is not None:
+        # write directly to the file here so writing to device nodes like e.g. /dev/null is supported
+        with open(args.output, 'wb') as file:
+            write_archive(file)
+    else:
+        with tempfile.NamedTemporaryFile(delete=False) as file:
+            hex_digest = write_archive(file)
+
+        dest = os.path.join(args.output_dir, '{}-{}.zip'.format(source_base_name, hex_digest))
 
-            shutil.move(file.name, dest)
+        shutil.move(file.name, dest)
 
-            if not source_is_tar:
-                sys.stdout.write(dest + os.linesep)
+        sys.stdout.write(dest + os.linesep)
 
 
-def dir_to_zip(dir, zip_file, source_base_name, mtime=None):
-    for (dir_path, dir_names, file_names) in os.walk(dir):
+def dir_to_zip(dir, zip_file, source_base_name, mtime=None, compress=False, excludes=(), incremental_build=None,
+               followlinks=False):
+    entries = []
+
+    for (dir_path, dir_names, file_names) in os.walk(dir, followlinks=followlinks):
         for file_name in file_names:
             path = os.path.join(dir_path, file_name)
             name = os.path.join(source_base_name, os.path.relpath(path, start=dir))
 
-            if mtime is not None:
-                os.utime(path, (mtime, mtime))
+            if path not in excludes:
+                entries.append((path, name))
+
+    if incremental_build is not None:
+        compress_type = zipfile.ZIP_DEFLATED if compress else zip_file.compression
 
+        for path, name in entries:
+            incremental_build.write_file(zip_file, path, name, compress_type, mtime)
+    elif compress:
+        zip_utils.write_deflated(zip_file, entries, mtime)
+    elif mtime is None:
+        for path, name in entries:
             zip_file.write(path, name)
+    else:
+        for path, name in entries:
+            zip_utils.write_file(zip_file, path, name, zip_file.compression, mtime)
 
 
 def tar_to_zip(tar, zip_file):
@@ -126,11 +158,13 @@ def tar_to_zip(tar, zip_file):
         mtime_to_use = max(entry.mtime, SHAZAR_TIMESTAMP_MIN)
 
         if entry.isfile():
-            with tempfile.NamedTemporaryFile() as entry_file:
-                shutil.copyfileobj(tar.extractfile(entry), entry_file)
-                entry_file.flush()
-                os.utime(entry_file.name, (mtime_to_use, mtime_to_use))
-                zip_file.write(entry_file.name, entry.name)
+            # Named and with the mode as when entries were extracted to a temp file and written with `ZipFile.write`,
+            # so that the digest of a tar input is unchanged
+            info = zipfile.ZipInfo(zip_utils.entry_name(entry.name), date_time=time.localtime(mtime_to_use)[:6])
+            info.external_attr = (stat.S_IFREG | 0o600) << 16
+            info.compress_type = zip_file.compression
+            info.file_size = entry.size
+            zip_utils.write_stream(zip_file, info, tar.extractfile(entry))
         elif entry.isdir():
             info = zipfile.ZipInfo(entry.name + '/', date_time=time.localtime(mtime_to_use))
             info.create_system = 0
@@ -140,6 +174,73 @@ def tar_to_zip(tar, zip_file):
             sys.exit(1)
 
 
+class DigestWriter(object):
+    """
+    A file object that writes to `output`, followed by the sha-256 digest of the data written. The digest is computed
+    as the data is written, so the digest writer can't seek, and the sizes of each entry of a zip file written to it
+    must be known before its header is written, see `zip_utils.HeaderSizesZipFile`.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.digest = hashlib.sha256()
+        self.position = 0
+
+    def write(self, data):
+        self.output.write(data)
+        self.digest.update(data)
+        self.position += len(data)
+
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def seekable(self):
+        return False
+
+    def flush(self):
+        self.output.flush()
+
+    def write_digest(self):
+        hex_digest = self.digest.hexdigest()
+
+        self.output.write(('\nsha-256/' + hex_digest).encode('UTF-8'))
+
+        return hex_digest
+
+
+def write_zip_with_digest(output, write_entries, compression=zipfile.ZIP_STORED):
+    """
+    Writes a zip file to `output` in a single pass, followed by the digest of the zip file. The zip file is hashed as
+    it's written, also if `output` is a regular file, as the header of each entry is written with its sizes rather than
+    rewritten once its data has been written.
+
+    :param output: the file object to write to, which need not be seekable
+    :param write_entries: function that's called with the `zip_utils.HeaderSizesZipFile` to write the entries of the
+                          zip file
+    :param compression: the default compression of the entries
+    :return: the hex digest of the zip file
+    """
+    if sys.version_info < (3, 5):
+        # Prior to Python 3.5 a `ZipFile` can only be written to a seekable file
+        with tempfile.NamedTemporaryFile() as zip_file_data:
+            with zipfile.ZipFile(zip_file_data, 'w', compression) as zip_file:
+                write_entries(zip_file)
+
+            zip_file_data.flush()
+            zip_file_data.seek(0)
+
+            return write_with_digest(zip_file_data, output)
+    else:
+        digest_writer = DigestWriter(output)
+
+        with zip_utils.HeaderSizesZipFile(digest_writer, 'w', compression) as zip_file:
+            write_entries(zip_file)
+
+        return digest_writer.write_digest()
+
+
 def write_with_digest(input, output):
     digest = hashlib.sha256()
 
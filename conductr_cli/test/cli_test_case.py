@@ -1,3 +1,4 @@
+import json
 import os
 import shutil
 import tempfile
@@ -85,6 +86,34 @@ class CliTestCase(TestCase):
         return bytes(out)
 
 
+class SettingsFileTestCase(CliTestCase):
+    """
+    Provides a temporary CLI settings dir to the tests of a module which keeps a JSON file within it, e.g.
+    `bundle_index`. The module is configured with `settings_dir` before each test and unconfigured after it.
+    """
+
+    settings_module = None
+    settings_file_name = None
+
+    def setUp(self):  # noqa
+        self.tmpdir = os.path.realpath(tempfile.mkdtemp())
+        self.settings_dir = os.path.join(self.tmpdir, 'settings')
+        self.settings_file = os.path.join(self.settings_dir, self.settings_file_name)
+
+        self.configure(self.settings_dir)
+
+    def tearDown(self):  # noqa
+        self.configure(None)
+        shutil.rmtree(self.tmpdir)
+
+    def configure(self, settings_dir):
+        self.settings_module.configure(settings_dir)
+
+    def read_settings_file(self):
+        with open(self.settings_file, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+
 def strip_margin(string, margin_char='|'):
     return '\n'.join([line[line.find(margin_char) + 1:] for line in string.split('\n')])
 
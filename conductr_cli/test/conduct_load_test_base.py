@@ -89,7 +89,7 @@ class ConductLoadTestBase(CliTestCase):
                                        headers={'Content-Type': self.multipart_content_type, 'Host': '127.0.0.1'})
         wait_for_installation_mock.assert_called_with(self.bundle_id, input_args)
         cleanup_old_bundles_mock.assert_called_with(self.bundle_resolve_cache_dir, self.bundle_file_name,
-                                                    excluded=self.bundle_file)
+                                                    excluded=[self.bundle_file])
 
         self.assertEqual(self.default_output(), self.output(stdout))
 
@@ -130,7 +130,7 @@ class ConductLoadTestBase(CliTestCase):
                                        headers={'Content-Type': self.multipart_content_type, 'Host': '127.0.0.1'})
         wait_for_installation_mock.assert_called_with(self.bundle_id, input_args)
         cleanup_old_bundles_mock.assert_called_with(self.bundle_resolve_cache_dir, self.bundle_file_name,
-                                                    excluded=self.bundle_file)
+                                                    excluded=[self.bundle_file])
 
         self.assertEqual(self.default_output(command=self.default_args['command']), self.output(stdout))
 
@@ -171,7 +171,7 @@ class ConductLoadTestBase(CliTestCase):
                                        headers={'Content-Type': self.multipart_content_type, 'Host': '127.0.0.1'})
         wait_for_installation_mock.assert_called_with(self.bundle_id, input_args)
         cleanup_old_bundles_mock.assert_called_with(self.bundle_resolve_cache_dir, self.bundle_file_name,
-                                                    excluded=self.bundle_file)
+                                                    excluded=[self.bundle_file])
 
         self.assertEqual(self.default_output(verbose=self.default_response), self.output(stdout))
 
@@ -211,7 +211,7 @@ class ConductLoadTestBase(CliTestCase):
                                        headers={'Content-Type': self.multipart_content_type, 'Host': '127.0.0.1'})
         wait_for_installation_mock.assert_called_with(self.bundle_id, input_args)
         cleanup_old_bundles_mock.assert_called_with(self.bundle_resolve_cache_dir, self.bundle_file_name,
-                                                    excluded=self.bundle_file)
+                                                    excluded=[self.bundle_file])
 
         self.assertEqual('45e0c477d3e5ea92aa8d85c0d8f3e25c\n', self.output(stdout))
 
@@ -251,7 +251,7 @@ class ConductLoadTestBase(CliTestCase):
                                        headers={'Content-Type': self.multipart_content_type, 'Host': '127.0.0.1'})
         wait_for_installation_mock.assert_called_with(self.bundle_id, input_args)
         cleanup_old_bundles_mock.assert_called_with(self.bundle_resolve_cache_dir, self.bundle_file_name,
-                                                    excluded=self.bundle_file)
+                                                    excluded=[self.bundle_file])
 
         self.assertEqual(self.default_output(bundle_id='45e0c477d3e5ea92aa8d85c0d8f3e25c'), self.output(stdout))
 
@@ -292,7 +292,7 @@ class ConductLoadTestBase(CliTestCase):
                                        headers={'Content-Type': self.multipart_content_type, 'Host': '127.0.0.1'})
         wait_for_installation_mock.assert_called_with(self.bundle_id, input_args)
         cleanup_old_bundles_mock.assert_called_with(self.bundle_resolve_cache_dir, self.bundle_file_name,
-                                                    excluded=self.bundle_file)
+                                                    excluded=[self.bundle_file])
 
         self.assertEqual(
             self.default_output(params=cli_parameters),
@@ -335,7 +335,7 @@ class ConductLoadTestBase(CliTestCase):
                                        headers={'Content-Type': self.multipart_content_type, 'Host': '127.0.0.1'})
         wait_for_installation_mock.assert_called_with(self.bundle_id, input_args)
         cleanup_old_bundles_mock.assert_called_with(self.bundle_resolve_cache_dir, self.bundle_file_name,
-                                                    excluded=self.bundle_file)
+                                                    excluded=[self.bundle_file])
 
         self.assertEqual(
             self.default_output(params=cli_parameters),
@@ -379,7 +379,7 @@ class ConductLoadTestBase(CliTestCase):
                                        headers={'Content-Type': self.multipart_content_type, 'Host': '127.0.0.1'})
         wait_for_installation_mock.assert_called_with(self.bundle_id, input_args)
         cleanup_old_bundles_mock.assert_called_with(self.bundle_resolve_cache_dir, self.bundle_file_name,
-                                                    excluded=self.bundle_file)
+                                                    excluded=[self.bundle_file])
 
         self.assertEqual(self.default_output(), self.output(stdout))
 
@@ -416,7 +416,7 @@ class ConductLoadTestBase(CliTestCase):
                                        verify=self.server_verification_file,
                                        headers={'Content-Type': self.multipart_content_type, 'Host': '127.0.0.1'})
         cleanup_old_bundles_mock.assert_called_with(self.bundle_resolve_cache_dir, self.bundle_file_name,
-                                                    excluded=self.bundle_file)
+                                                    excluded=[self.bundle_file])
 
         self.assertEqual(self.default_output(), self.output(stdout))
 
@@ -455,7 +455,7 @@ class ConductLoadTestBase(CliTestCase):
                                        verify=self.server_verification_file,
                                        headers={'Content-Type': self.multipart_content_type, 'Host': '127.0.0.1'})
         cleanup_old_bundles_mock.assert_called_with(self.bundle_resolve_cache_dir, self.bundle_file_name,
-                                                    excluded=self.bundle_file)
+                                                    excluded=[self.bundle_file])
 
         self.assertEqual(self.default_output(), self.output(stdout))
 
@@ -893,6 +893,209 @@ class TestBndlCreate(CliTestCase):
         finally:
             shutil.rmtree(temp_dir)
 
+    def test_bundle_dir_not_modified(self):
+        temp_dir = tempfile.mkdtemp()
+
+        try:
+            os.mkdir(os.path.join(temp_dir, 'lib'))
+
+            source_files = {
+                'bundle.conf': b'name = "testing"',
+                'runtime-config.sh': b'export MY_ENV=hello',
+                'lib/app.jar': b'app'
+            }
+
+            for name, data in source_files.items():
+                path = os.path.join(temp_dir, name)
+
+                with open(path, 'wb') as file:
+                    file.write(data)
+
+                os.utime(path, (1600000000, 1600000000) if name == 'bundle.conf' else (1500000000, 1500000000))
+
+            with tempfile.NamedTemporaryFile() as file_out:
+                args = create_attributes_object({
+                    'name': None,
+                    'format': BndlFormat.BUNDLE,
+                    'source': temp_dir,
+                    'output': file_out.name,
+                    'use_shazar': True,
+                    'envs': ['ENV1=123'],
+                    'validation_excludes': ['required'],
+                    'with_defaults': None
+                })
+
+                with patch('sys.stdin', MagicMock(**{'buffer': BytesIO(b'')})):
+                    self.assertEqual(bndl_create.bndl_create(args), 0)
+
+                with zipfile.ZipFile(file_out.name) as zip:
+                    self.assertEqual(['testing/bundle.conf', 'testing/runtime-config.sh', 'testing/lib/app.jar'],
+                                     zip.namelist())
+                    self.assertEqual(b'export MY_ENV=hello\nexport "ENV1=123"', zip.read('testing/runtime-config.sh'))
+                    self.assertEqual(b'app', zip.read('testing/lib/app.jar'))
+
+                    for info in zip.infolist():
+                        self.assertEqual(time.localtime(1500000000)[:6], info.date_time)
+
+            for name, data in source_files.items():
+                path = os.path.join(temp_dir, name)
+
+                with open(path, 'rb') as file:
+                    self.assertEqual(data, file.read())
+
+                self.assertEqual(1600000000 if name == 'bundle.conf' else 1500000000, os.path.getmtime(path))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_bundle_dir_incremental(self):
+        temp_dir = tempfile.mkdtemp()
+
+        try:
+            source_dir = os.path.join(temp_dir, 'source')
+            os.mkdir(source_dir)
+
+            for name, data in [('bundle.conf', b'name = "testing"'), ('app.jar', b'app')]:
+                with open(os.path.join(source_dir, name), 'wb') as file:
+                    file.write(data)
+
+            outputs = []
+
+            for output_name in ['first', 'second']:
+                args = create_attributes_object({
+                    'name': None,
+                    'format': BndlFormat.BUNDLE,
+                    'source': source_dir,
+                    'output': os.path.join(temp_dir, output_name),
+                    'use_shazar': True,
+                    'incremental': True,
+                    'validation_excludes': ['required'],
+                    'with_defaults': None
+                })
+
+                with \
+                        patch('sys.stdin', MagicMock(**{'buffer': BytesIO(b'')})), \
+                        patch('conductr_cli.bndl_create.DEFAULT_BUILD_CACHE_DIR', os.path.join(temp_dir, 'cache')):
+                    self.assertEqual(bndl_create.bndl_create(args), 0)
+
+                with open(os.path.join(temp_dir, output_name), 'rb') as file:
+                    outputs.append(file.read())
+
+            self.assertEqual(outputs[0], outputs[1])
+
+            with zipfile.ZipFile(os.path.join(temp_dir, 'second')) as zip:
+                self.assertEqual(['testing/bundle.conf', 'testing/app.jar'], zip.namelist())
+                self.assertEqual(b'app', zip.read('testing/app.jar'))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_bundle_dir_symlinks(self):
+        temp_dir = tempfile.mkdtemp()
+
+        try:
+            shared_dir = os.path.join(temp_dir, 'shared')
+            os.makedirs(os.path.join(shared_dir, 'lib'))
+
+            with open(os.path.join(shared_dir, 'b.jar'), 'wb') as file:
+                file.write(b'b')
+
+            with open(os.path.join(shared_dir, 'lib', 'a.jar'), 'wb') as file:
+                file.write(b'a')
+
+            source_dir = os.path.join(temp_dir, 'source')
+            os.mkdir(source_dir)
+
+            with open(os.path.join(source_dir, 'bundle.conf'), 'wb') as file:
+                file.write(b'name = "testing"')
+
+            os.symlink(os.path.join('..', 'shared', 'b.jar'), os.path.join(source_dir, 'b.jar'))
+            os.symlink(os.path.join('..', 'shared', 'lib'), os.path.join(source_dir, 'lib'))
+
+            for use_shazar in [True, False]:
+                output_path = os.path.join(temp_dir, 'output')
+
+                args = create_attributes_object({
+                    'name': None,
+                    'format': BndlFormat.BUNDLE,
+                    'source': source_dir,
+                    'output': output_path,
+                    'use_shazar': use_shazar,
+                    'validation_excludes': ['required'],
+                    'with_defaults': None
+                })
+
+                with patch('sys.stdin', MagicMock(**{'buffer': BytesIO(b'')})):
+                    self.assertEqual(bndl_create.bndl_create(args), 0)
+
+                if use_shazar:
+                    with zipfile.ZipFile(output_path) as zip:
+                        self.assertEqual(['testing/b.jar', 'testing/bundle.conf', 'testing/lib/a.jar'],
+                                         sorted(zip.namelist()))
+                        self.assertEqual(b'b', zip.read('testing/b.jar'))
+                        self.assertEqual(b'a', zip.read('testing/lib/a.jar'))
+                else:
+                    with tarfile.open(output_path, 'r') as tar:
+                        self.assertEqual(['testing/b.jar', 'testing/bundle.conf', 'testing/lib/a.jar'],
+                                         sorted(tar.getnames()))
+                        self.assertTrue(all(member.isreg() for member in tar.getmembers()))
+                        self.assertEqual(b'b', tar.extractfile('testing/b.jar').read())
+                        self.assertEqual(b'a', tar.extractfile('testing/lib/a.jar').read())
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_bundle_zip_source(self):
+        temp_dir = tempfile.mkdtemp()
+
+        try:
+            source_path = os.path.join(temp_dir, 'source.zip')
+
+            with zipfile.ZipFile(source_path, 'w', zipfile.ZIP_DEFLATED) as zip:
+                zip.writestr('testing/bundle.conf', b'name = "testing"')
+                zip.writestr(zipfile.ZipInfo('testing/runtime-config.sh', (2017, 1, 1, 0, 0, 0)), b'export MY_ENV=hello')
+                app_zinfo = zipfile.ZipInfo('testing/lib/app.jar', (2017, 1, 1, 0, 0, 0))
+                app_zinfo.compress_type = zipfile.ZIP_DEFLATED
+                zip.writestr(app_zinfo, b'app' * 1000)
+
+            for use_shazar in [True, False]:
+                output_path = os.path.join(temp_dir, 'output')
+
+                args = create_attributes_object({
+                    'name': 'retagged',
+                    'format': BndlFormat.BUNDLE,
+                    'source': source_path,
+                    'output': output_path,
+                    'use_shazar': use_shazar,
+                    'envs': ['ENV1=123'],
+                    'validation_excludes': ['required'],
+                    'with_defaults': None
+                })
+
+                with patch('sys.stdin', MagicMock(**{'buffer': BytesIO(b'')})):
+                    self.assertEqual(bndl_create.bndl_create(args), 0)
+
+                if use_shazar:
+                    with zipfile.ZipFile(output_path) as zip:
+                        self.assertEqual(
+                            ['retagged/bundle.conf', 'retagged/runtime-config.sh', 'retagged/lib/app.jar'],
+                            zip.namelist()
+                        )
+                        self.assertEqual(b'name = "retagged"', zip.read('retagged/bundle.conf'))
+                        self.assertEqual(b'export MY_ENV=hello\nexport "ENV1=123"',
+                                         zip.read('retagged/runtime-config.sh'))
+                        self.assertEqual(b'app' * 1000, zip.read('retagged/lib/app.jar'))
+
+                        # the data of the unchanged entry is copied without being decompressed
+                        self.assertEqual(zipfile.ZIP_DEFLATED, zip.getinfo('retagged/lib/app.jar').compress_type)
+                        self.assertEqual((2017, 1, 1, 0, 0, 0), zip.getinfo('retagged/lib/app.jar').date_time)
+                else:
+                    with tarfile.open(output_path, 'r') as tar:
+                        self.assertEqual(
+                            ['retagged/bundle.conf', 'retagged/runtime-config.sh', 'retagged/lib/app.jar'],
+                            tar.getnames()
+                        )
+                        self.assertEqual(b'app' * 1000, tar.extractfile('retagged/lib/app.jar').read())
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_oci_env(self):
         stdout_mock = MagicMock()
         tmpdir = tempfile.mkdtemp()
@@ -1,6 +1,8 @@
 from conductr_cli import bndl_docker
 from conductr_cli.test.cli_test_case import CliTestCase
 from io import BytesIO
+import gzip
+import hashlib
 import json
 import os
 import shutil
@@ -236,3 +238,152 @@ class TestBndlDocker(CliTestCase):
         finally:
             shutil.rmtree(tmpdir)
             shutil.rmtree(dest_tmpdir)
+
+    def test_docker_unpack_tar(self):
+        tmpdir = tempfile.mkdtemp()
+
+        try:
+            image_file = os.path.join(tmpdir, 'image.tar')
+            layers = self.write_docker_image(image_file)
+
+            with tarfile.open(image_file, mode='r|') as tar:
+                self.assertEqual('test', bndl_docker.docker_unpack(os.path.join(tmpdir, 'oci'), tar, False, None, None))
+
+            self.assert_oci_image(os.path.join(tmpdir, 'oci'), layers)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_docker_unpack_dir(self):
+        tmpdir = tempfile.mkdtemp()
+
+        try:
+            image_file = os.path.join(tmpdir, 'image.tar')
+            image_dir = os.path.join(tmpdir, 'image')
+            layers = self.write_docker_image(image_file)
+
+            with tarfile.open(image_file) as tar:
+                tar.extractall(image_dir)
+
+            image_dir_files = self.read_files(image_dir)
+
+            name = bndl_docker.docker_unpack(os.path.join(tmpdir, 'oci'), image_dir, True, None, None)
+            self.assertEqual('test', name)
+
+            self.assert_oci_image(os.path.join(tmpdir, 'oci'), layers)
+
+            # the same blobs are written as for the tar, and the image dir isn't modified
+            with tarfile.open(image_file) as tar:
+                bndl_docker.docker_unpack(os.path.join(tmpdir, 'oci-tar'), tar, False, None, None)
+
+            self.assertEqual(self.read_files(os.path.join(tmpdir, 'oci-tar')),
+                             self.read_files(os.path.join(tmpdir, 'oci')))
+            self.assertEqual(image_dir_files, self.read_files(image_dir))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_docker_unpack_dir_wrong_tag(self):
+        tmpdir = tempfile.mkdtemp()
+
+        try:
+            image_file = os.path.join(tmpdir, 'image.tar')
+            self.write_docker_image(image_file)
+
+            with tarfile.open(image_file) as tar:
+                tar.extractall(os.path.join(tmpdir, 'image'))
+
+            self.assertIsNone(bndl_docker.docker_unpack(os.path.join(tmpdir, 'oci'), os.path.join(tmpdir, 'image'),
+                                                        True, None, 'other'))
+            self.assertEqual([], os.listdir(os.path.join(tmpdir, 'oci', 'blobs', 'sha256')))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_docker_layer_to_blob_interrupted(self):
+        tmpdir = tempfile.mkdtemp()
+
+        class InterruptedReader(object):
+            def read(self, size=-1):
+                raise KeyboardInterrupt()
+
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                bndl_docker.docker_layer_to_blob(tmpdir, InterruptedReader())
+
+            self.assertEqual([], os.listdir(tmpdir))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def write_docker_image(self, path):
+        """
+        Writes an image in the format of `docker save`, where the last layer is a symlink to the first one.
+        :return: the data of the layers
+        """
+        layers = [b'first' * 1000, b'second' * 1000]
+        layer_names = []
+
+        with tarfile.open(path, mode='w') as tar:
+            def add_file(name, data):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, BytesIO(data))
+
+            for layer in layers:
+                layer_name = '{}/layer.tar'.format(hashlib.sha256(layer).hexdigest())
+                layer_names.append(layer_name)
+
+                add_file(os.path.dirname(layer_name) + '/VERSION', b'1.0')
+                add_file(layer_name, layer)
+
+            symlink = tarfile.TarInfo('{}/layer.tar'.format('0' * 64))
+            symlink.type = tarfile.SYMTYPE
+            symlink.linkname = '../{}'.format(layer_names[0])
+            tar.addfile(symlink)
+            layer_names.append(symlink.name)
+
+            add_file('config.json', json.dumps({
+                'created': '2017-01-13T22:50:55.903893599Z',
+                'architecture': 'amd64',
+                'os': 'linux',
+                'config': {},
+                'rootfs': {'type': 'layers', 'diff_ids': []},
+                'history': []
+            }).encode('UTF-8'))
+
+            add_file('manifest.json', json.dumps([{
+                'Config': 'config.json',
+                'RepoTags': ['lightbend/test:latest'],
+                'Layers': layer_names
+            }]).encode('UTF-8'))
+
+        return layers + [layers[0]]
+
+    def assert_oci_image(self, oci_dir, layers):
+        blobs_dir = os.path.join(oci_dir, 'blobs', 'sha256')
+
+        with open(os.path.join(oci_dir, 'refs', 'latest'), 'rb') as refs_file:
+            manifest_digest = json.loads(refs_file.read().decode('UTF-8'))['digest'][len('sha256:'):]
+
+        with open(os.path.join(blobs_dir, manifest_digest), 'rb') as manifest_file:
+            manifest = json.loads(manifest_file.read().decode('UTF-8'))
+
+        self.assertEqual(len(layers), len(manifest['layers']))
+
+        for layer, manifest_layer in zip(layers, manifest['layers']):
+            with open(os.path.join(blobs_dir, manifest_layer['digest'][len('sha256:'):]), 'rb') as blob_file:
+                blob = blob_file.read()
+
+            self.assertEqual(manifest_layer['digest'], 'sha256:{}'.format(hashlib.sha256(blob).hexdigest()))
+            self.assertEqual(manifest_layer['size'], len(blob))
+            self.assertEqual(layer, gzip.decompress(blob))
+
+        # 2 layers, the config and the manifest, and no temp files
+        self.assertEqual(4, len(os.listdir(blobs_dir)))
+
+    def read_files(self, dir):
+        files = {}
+
+        for base, dirs, file_names in os.walk(dir):
+            for file_name in file_names:
+                with open(os.path.join(base, file_name), 'rb') as file:
+                    files[os.path.relpath(os.path.join(base, file_name), dir)] = file.read()
+
+        return files
@@ -217,6 +217,19 @@ class TestBndl(CliTestCase):
 
         self.assertEqual(args.func.__name__, 'bndl')
         self.assertTrue(args.use_shazar)
+        self.assertFalse(args.compress)
+
+    def test_parser_compress(self):
+        parser = bndl_main.build_parser()
+        args = parser.parse_args(['--compress'])
+
+        self.assertTrue(args.compress)
+
+    def test_parser_incremental(self):
+        parser = bndl_main.build_parser()
+
+        self.assertFalse(parser.parse_args([]).incremental)
+        self.assertTrue(parser.parse_args(['--incremental']).incremental)
 
     def test_run_dash_rewrite(self):
         bndl_mock = MagicMock()
@@ -2,6 +2,7 @@ from conductr_cli import bndl_oci
 from conductr_cli.bndl_utils import ApplicationType, BndlFormat
 from conductr_cli.test.cli_test_case import CliTestCase, create_attributes_object, strip_margin
 from io import BytesIO
+from unittest.mock import patch, MagicMock
 import os
 import shutil
 import tarfile
@@ -103,6 +104,60 @@ class TestBndlOci(CliTestCase):
             shutil.rmtree(tmpdir)
             shutil.rmtree(dest_tmpdir)
 
+    def test_oci_image_unpack_dir_links_blobs(self):
+        tmpdir = tempfile.mkdtemp()
+        dest_tmpdir = tempfile.mkdtemp()
+
+        try:
+            os.makedirs(os.path.join(tmpdir, 'image', 'blobs', 'sha256'))
+            os.makedirs(os.path.join(tmpdir, 'image', 'refs'))
+
+            for name, data in [('oci-layout', b'{}'), ('refs/latest', b'refs'), ('blobs/sha256/abc', b'layer')]:
+                with open(os.path.join(tmpdir, 'image', name), 'wb') as file:
+                    file.write(data)
+
+            self.assertTrue(bndl_oci.oci_image_unpack(dest_tmpdir, tmpdir, is_dir=True))
+
+            def same_file(name):
+                with open(os.path.join(dest_tmpdir, name), 'rb') as dest, \
+                        open(os.path.join(tmpdir, 'image', name), 'rb') as src:
+                    self.assertEqual(src.read(), dest.read())
+
+                return os.path.samefile(os.path.join(dest_tmpdir, name), os.path.join(tmpdir, 'image', name))
+
+            self.assertTrue(same_file('blobs/sha256/abc'))
+            self.assertFalse(same_file('oci-layout'))
+            self.assertFalse(same_file('refs/latest'))
+        finally:
+            shutil.rmtree(tmpdir)
+            shutil.rmtree(dest_tmpdir)
+
+    def test_oci_image_unpack_nested_tar_extracted_within_destination(self):
+        file = tempfile.NamedTemporaryFile()
+        dest_tmpdir = tempfile.mkdtemp()
+
+        try:
+            with tarfile.open(fileobj=file, mode='w') as tar:
+                tar.addfile(tarfile.TarInfo('image/oci-layout'), BytesIO(b'hello'))
+                blob = tarfile.TarInfo('image/blobs/sha256/abc')
+                blob.size = 5
+                tar.addfile(blob, BytesIO(b'layer'))
+
+            file.seek(0)
+
+            mkdtemp_mock = MagicMock(side_effect=tempfile.mkdtemp)
+
+            with tarfile.open(fileobj=file, mode='r|') as tar, patch('tempfile.mkdtemp', mkdtemp_mock):
+                self.assertTrue(bndl_oci.oci_image_unpack(dest_tmpdir, tar, is_dir=False))
+
+            self.assertEqual(dest_tmpdir, mkdtemp_mock.call_args[1]['dir'])
+            self.assertEqual(['blobs', 'oci-layout'], sorted(os.listdir(dest_tmpdir)))
+
+            with open(os.path.join(dest_tmpdir, 'blobs', 'sha256', 'abc'), 'rb') as blob_file:
+                self.assertEqual(b'layer', blob_file.read())
+        finally:
+            shutil.rmtree(dest_tmpdir)
+
     def test_oci_image_bundle_conf(self):
         base_args = create_attributes_object({
             'format': BndlFormat.OCI_IMAGE,
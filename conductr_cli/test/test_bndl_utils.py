@@ -4,9 +4,13 @@ from conductr_cli.endpoint import Endpoint
 from conductr_cli.test.cli_test_case import CliTestCase, create_attributes_object, strip_margin
 from io import BytesIO
 from pyhocon import ConfigFactory
+from unittest.mock import patch, MagicMock
 import os
 import shutil
+import tarfile
 import tempfile
+import time
+import zipfile
 
 
 class TestBndlUtils(CliTestCase):
@@ -61,6 +65,23 @@ class TestBndlUtils(CliTestCase):
         # zips are bundles
         self.assertEqual(bndl_utils.detect_format_stream(b'PK\x03\x04'), BndlFormat.BUNDLE)
 
+        # tars are bundles
+        self.assertEqual(bndl_utils.detect_format_stream(b'\x00' * 257 + b'ustar\x0000'), BndlFormat.BUNDLE)
+
+        # gzip streams can't be detected
+        self.assertEqual(bndl_utils.detect_format_stream(b'\x1f\x8b\x08\x00'), None)
+
+    def test_detect_format_stream_binary_not_parsed(self):
+        parse_string_mock = MagicMock()
+
+        with patch('conductr_cli.hocon_utils.parse_string', parse_string_mock):
+            self.assertEqual(bndl_utils.detect_format_stream(b'PK\x03\x04'), BndlFormat.BUNDLE)
+            self.assertEqual(bndl_utils.detect_format_stream(b'\x1f\x8b\x08\x00'), None)
+            self.assertEqual(bndl_utils.detect_format_stream(b'\x00' * 257 + b'ustar\x0000'), BndlFormat.BUNDLE)
+            self.assertEqual(bndl_utils.detect_format_stream(b'name\x01= "test"'), None)
+
+        parse_string_mock.assert_not_called()
+
     def test_detect_format_dir(self):
         docker_dir = tempfile.mkdtemp()
         oci_image_dir = tempfile.mkdtemp()
@@ -84,6 +105,11 @@ class TestBndlUtils(CliTestCase):
             self.assertEqual(bndl_utils.detect_format_dir(nothing_dir), BndlFormat.BUNDLE)
             self.assertEqual(bndl_utils.detect_format_dir(bundle_dir), BndlFormat.BUNDLE)
             self.assertEqual(bndl_utils.detect_format_dir(bundle_conf_dir), BndlFormat.BUNDLE)
+
+            # the format is detected again once the dir changes
+            os.remove(os.path.join(docker_dir, 'repositories'))
+            os.utime(docker_dir, ns=(0, 0))
+            self.assertEqual(bndl_utils.detect_format_dir(docker_dir), BndlFormat.BUNDLE)
         finally:
             shutil.rmtree(docker_dir)
             shutil.rmtree(oci_image_dir)
@@ -91,6 +117,61 @@ class TestBndlUtils(CliTestCase):
             shutil.rmtree(bundle_conf_dir)
             shutil.rmtree(nothing_dir)
 
+    def test_detect_format_dir_cached(self):
+        bundle_dir = tempfile.mkdtemp()
+
+        try:
+            isfile_mock = MagicMock(side_effect=os.path.isfile)
+
+            with patch('os.path.isfile', isfile_mock):
+                self.assertEqual(bndl_utils.detect_format_dir(bundle_dir), BndlFormat.BUNDLE)
+                call_count = isfile_mock.call_count
+                self.assertEqual(bndl_utils.detect_format_dir(bundle_dir), BndlFormat.BUNDLE)
+
+            self.assertEqual(call_count, isfile_mock.call_count)
+        finally:
+            shutil.rmtree(bundle_dir)
+
+    def test_file_link_or_copy(self):
+        tmpdir = tempfile.mkdtemp()
+
+        try:
+            src = os.path.join(tmpdir, 'src')
+
+            with open(src, 'wb') as file:
+                file.write(b'data')
+
+            os.utime(src, (1500000000, 1500000000))
+
+            bndl_utils.file_link_or_copy(src, os.path.join(tmpdir, 'linked'))
+            self.assertTrue(os.path.samefile(src, os.path.join(tmpdir, 'linked')))
+
+            with patch('os.link', MagicMock(side_effect=OSError('test'))), \
+                    patch('conductr_cli.bndl_utils.file_clone', MagicMock(return_value=False)):
+                bndl_utils.file_link_or_copy(src, os.path.join(tmpdir, 'copied'))
+
+            self.assertFalse(os.path.samefile(src, os.path.join(tmpdir, 'copied')))
+            self.assertEqual(1500000000, os.path.getmtime(os.path.join(tmpdir, 'copied')))
+
+            with open(os.path.join(tmpdir, 'copied'), 'rb') as file:
+                self.assertEqual(b'data', file.read())
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_file_clone_unsupported(self):
+        tmpdir = tempfile.mkdtemp()
+
+        try:
+            src = os.path.join(tmpdir, 'src')
+            open(src, 'wb').close()
+
+            with patch('fcntl.ioctl', MagicMock(side_effect=OSError('test'))):
+                self.assertFalse(bndl_utils.file_clone(src, os.path.join(tmpdir, 'cloned')))
+
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, 'cloned')))
+        finally:
+            shutil.rmtree(tmpdir)
+
     def test_digest_reader_writer(self):
         data = b'some data'
         digest = '1307990e6ba5ca145eb35e99182a9bec46531bc54ddf656a602c780fa0240dee'
@@ -124,6 +205,68 @@ class TestBndlUtils(CliTestCase):
         finally:
             shutil.rmtree(tmpdir)
 
+    def create_zip(self):
+        data = BytesIO()
+
+        with zipfile.ZipFile(data, 'w') as zip_file:
+            zip_file.writestr('other.txt', b'other')
+
+            for name, compress_type, date_time in [('app/bundle.conf', zipfile.ZIP_STORED, (2017, 1, 1, 0, 0, 0)),
+                                                   ('app/lib/app.jar', zipfile.ZIP_DEFLATED, (2017, 2, 1, 0, 0, 0)),
+                                                   ('app/bin/app', zipfile.ZIP_DEFLATED, (2017, 3, 1, 0, 0, 0))]:
+                zinfo = zipfile.ZipInfo(name, date_time)
+                zinfo.compress_type = compress_type
+                zinfo.external_attr = 0o100755 << 16
+                zip_file.writestr(zinfo, name.encode('UTF-8') * 100)
+
+        data.seek(0)
+
+        return zipfile.ZipFile(data)
+
+    def test_zip_find_bundle_conf_dir(self):
+        with self.create_zip() as zip_file:
+            self.assertEqual('app/', bndl_utils.zip_find_bundle_conf_dir(zip_file))
+
+    def test_zip_first_mtime(self):
+        with self.create_zip() as zip_file:
+            self.assertEqual(time.mktime((2017, 2, 1, 0, 0, 0, 0, 0, -1)),
+                             bndl_utils.zip_first_mtime(zip_file, 'app/', excludes=['bundle.conf']))
+            self.assertEqual(1234, bndl_utils.zip_first_mtime(zip_file, 'none/', 1234))
+
+    def test_zip_to_zip(self):
+        data = BytesIO()
+
+        with self.create_zip() as source_zip_file, zipfile.ZipFile(data, 'w') as zip_file:
+            bndl_utils.zip_to_zip(source_zip_file, 'app/', zip_file, 'renamed', 1500000000, ['bundle.conf'])
+
+        with self.create_zip() as source_zip_file, zipfile.ZipFile(data) as zip_file:
+            self.assertEqual(['renamed/lib/app.jar', 'renamed/bin/app'], zip_file.namelist())
+            self.assertIsNone(zip_file.testzip())
+
+            for name in ['lib/app.jar', 'bin/app']:
+                source_info = source_zip_file.getinfo('app/' + name)
+                info = zip_file.getinfo('renamed/' + name)
+
+                self.assertEqual(source_zip_file.read(source_info), zip_file.read(info))
+                self.assertEqual(source_info.compress_type, info.compress_type)
+                self.assertEqual(source_info.compress_size, info.compress_size)
+                self.assertEqual(time.localtime(1500000000)[:6], info.date_time)
+                self.assertEqual(0o100755, info.external_attr >> 16)
+
+    def test_zip_to_tar(self):
+        data = BytesIO()
+
+        with self.create_zip() as source_zip_file, tarfile.open(fileobj=data, mode='w') as tar:
+            bndl_utils.zip_to_tar(source_zip_file, 'app/', tar, 'renamed', 1500000000, ['bundle.conf'])
+
+        data.seek(0)
+
+        with tarfile.open(fileobj=data, mode='r') as tar:
+            self.assertEqual(['renamed/lib/app.jar', 'renamed/bin/app'], tar.getnames())
+            self.assertEqual(b'app/bin/app' * 100, tar.extractfile('renamed/bin/app').read())
+            self.assertEqual(0o755, tar.getmember('renamed/bin/app').mode)
+            self.assertEqual(1500000000, tar.getmember('renamed/bin/app').mtime)
+
     def test_load_bundle_args_into_conf_with_empty_lists(self):
         simple_config = ConfigFactory.parse_string('')
         args = create_attributes_object({
@@ -0,0 +1,119 @@
+from conductr_cli.test.cli_test_case import SettingsFileTestCase, create_temp_bundle, strip_margin
+from conductr_cli import bundle_index, bundle_utils
+from unittest.mock import patch, MagicMock
+import hashlib
+import os
+import shutil
+
+
+class TestBundleIndex(SettingsFileTestCase):
+    settings_module = bundle_index
+    settings_file_name = 'bundle-index.json'
+
+    bundle_conf = strip_margin("""|name = "test-bundle"
+                                  |compatibilityVersion = 1
+                                  |roles = ["web", "backend"]
+                                  |""")
+
+    def setUp(self):  # noqa
+        self.bundle_dir, self.bundle_file = create_temp_bundle(self.bundle_conf)
+
+        with open(self.bundle_file, 'rb') as file:
+            data = file.read()
+
+        self.bundle_length = len(data)
+        self.bundle_digest = hashlib.sha256(data).hexdigest()
+
+        with open(self.bundle_file, 'ab') as file:
+            file.write('\nsha-256/{}'.format(self.bundle_digest).encode('UTF-8'))
+
+        super().setUp()
+
+        # Files within the temp dir aren't indexed, so the temp dir is elsewhere than the bundle
+        temp_dir_patch = patch('tempfile.tempdir', os.path.join(self.tmpdir, 'temp'))
+        temp_dir_patch.start()
+        self.addCleanup(temp_dir_patch.stop)
+
+    def tearDown(self):  # noqa
+        super().tearDown()
+        shutil.rmtree(self.bundle_dir)
+
+    def test_metadata(self):
+        entry = bundle_index.metadata(self.bundle_file)
+
+        self.assertEqual(self.bundle_conf, entry['conf'])
+        self.assertEqual(['sha-256', self.bundle_digest], entry['digest'])
+        self.assertEqual(self.bundle_length, entry['length'])
+
+        self.assertEqual({os.path.realpath(self.bundle_file): entry}, self.read_settings_file()['bundles'])
+
+    def test_metadata_reused(self):
+        bundle_index.metadata(self.bundle_file)
+
+        # A new invocation of the CLI reads the index from the settings dir
+        bundle_index.configure(self.settings_dir)
+
+        conf_mock = MagicMock()
+        with patch('conductr_cli.bundle_utils.conf', conf_mock):
+            self.assertEqual(self.bundle_conf, bundle_index.conf(self.bundle_file))
+
+        conf_mock.assert_not_called()
+
+    def test_metadata_modified_file(self):
+        bundle_index.metadata(self.bundle_file)
+
+        stat = os.stat(self.bundle_file)
+        os.utime(self.bundle_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+        conf_mock = MagicMock(return_value='name = "modified"')
+        with patch('conductr_cli.bundle_utils.conf', conf_mock):
+            self.assertEqual('name = "modified"', bundle_index.metadata(self.bundle_file)['conf'])
+
+        conf_mock.assert_called_once_with(os.path.realpath(self.bundle_file))
+
+    def test_disabled(self):
+        bundle_index.configure(None)
+
+        conf_mock = MagicMock(return_value='mock bundle.conf')
+        with patch('conductr_cli.bundle_utils.conf', conf_mock):
+            self.assertEqual('mock bundle.conf', bundle_index.conf(self.bundle_file))
+
+        self.assertIsNone(bundle_index.metadata(self.bundle_file))
+        self.assertFalse(os.path.exists(self.settings_dir))
+
+    def test_temp_file(self):
+        with patch('tempfile.tempdir', self.bundle_dir):
+            conf_mock = MagicMock(return_value='mock bundle.conf')
+            with patch('conductr_cli.bundle_utils.conf', conf_mock):
+                self.assertEqual('mock bundle.conf', bundle_index.conf(self.bundle_file))
+
+            self.assertIsNone(bundle_index.metadata(self.bundle_file))
+
+        self.assertFalse(os.path.exists(self.settings_file))
+
+    def test_digest_extract_and_open(self):
+        bundle_index.metadata(self.bundle_file)
+
+        digest_extract_mock = MagicMock()
+        with patch('conductr_cli.bundle_utils.digest_extract', digest_extract_mock):
+            open_file, digest = bundle_index.digest_extract_and_open(self.bundle_file)
+
+        with open_file:
+            self.assertIsInstance(open_file, bundle_utils.FileWindow)
+            self.assertEqual(('sha-256', self.bundle_digest), digest)
+            self.assertEqual(self.bundle_length, len(open_file.read()))
+
+        digest_extract_mock.assert_not_called()
+
+    def test_remove(self):
+        bundle_index.metadata(self.bundle_file)
+        bundle_index.remove([self.bundle_file])
+
+        bundle_index.configure(self.settings_dir)
+
+        self.assertEqual({}, self.read_settings_file()['bundles'])
+
+    def test_unwritable_index(self):
+        bundle_index.configure(os.path.join(self.bundle_file, 'not-a-dir'))
+
+        self.assertEqual(self.bundle_conf, bundle_index.metadata(self.bundle_file)['conf'])
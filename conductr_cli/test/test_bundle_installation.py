@@ -569,6 +569,116 @@ class TestWaitForInstallation(CliTestCase):
         ])
 
 
+class TestWaitForInstallations(CliTestCase):
+
+    conductr_auth = ('username', 'password')
+    server_verification_file = MagicMock(name='server_verification_file')
+
+    def test_count_all_installations(self):
+        bundles_endpoint_reply = """
+            [{
+                "bundleId": "a101449418187d92c789d1adc240b6d6",
+                "bundleInstallations": [{}, {}]
+            }, {
+                "bundleId": "e7e1f4ac7a1b41abbe9b98d8e3e6b2e7",
+                "bundleInstallations": []
+            }]
+        """
+        http_method = self.respond_with(text=bundles_endpoint_reply)
+        args = MagicMock(**{
+            'dcos_mode': False,
+            'scheme': 'http',
+            'host': '127.0.0.1',
+            'port': 9005,
+            'base_path': '/',
+            'api_version': '2',
+            'conductr_auth': self.conductr_auth,
+            'server_verification_file': self.server_verification_file
+        })
+        with patch('requests.get', http_method):
+            result = bundle_installation.count_all_installations(args)
+
+        self.assertEqual({
+            'a101449418187d92c789d1adc240b6d6': 2,
+            'e7e1f4ac7a1b41abbe9b98d8e3e6b2e7': 0
+        }, result)
+        http_method.assert_called_once_with('http://127.0.0.1:9005/v2/bundles', auth=self.conductr_auth,
+                                            verify=self.server_verification_file, headers={'Host': '127.0.0.1'})
+
+    def test_wait_for_installations(self):
+        bundle_a = 'a101449418187d92c789d1adc240b6d6'
+        bundle_b = 'e7e1f4ac7a1b41abbe9b98d8e3e6b2e7'
+        count_all_installations_mock = MagicMock(side_effect=[
+            {},
+            {bundle_a: 1},
+            {bundle_a: 1, bundle_b: 1}
+        ])
+        url_mock = MagicMock(return_value='/bundle-events/endpoint')
+        conductr_host = '10.0.0.1'
+        conductr_host_mock = MagicMock(return_value=conductr_host)
+        get_events_mock = MagicMock(return_value=[
+            create_heartbeat_event(),
+            create_test_event('bundleInstallationAdded'),
+            create_test_event('bundleInstallationAdded')
+        ])
+
+        stdout = MagicMock()
+
+        dcos_mode = False
+        args = MagicMock(**{
+            'dcos_mode': dcos_mode,
+            'wait_timeout': 10,
+            'conductr_auth': self.conductr_auth,
+            'server_verification_file': self.server_verification_file
+        })
+        with patch('conductr_cli.conduct_url.url', url_mock), \
+                patch('conductr_cli.conduct_url.conductr_host', conductr_host_mock), \
+                patch('conductr_cli.bundle_installation.count_all_installations', count_all_installations_mock), \
+                patch('conductr_cli.sse_client.get_events', get_events_mock):
+            logging_setup.configure_logging(args, stdout)
+            bundle_installation.wait_for_installations([bundle_a, bundle_b], args)
+
+        self.assertEqual(count_all_installations_mock.call_args_list, [call(args), call(args), call(args)])
+
+        get_events_mock.assert_called_once_with(dcos_mode, conductr_host, '/bundle-events/endpoint',
+                                                auth=self.conductr_auth, verify=self.server_verification_file)
+
+        self.assertEqual(strip_margin("""|2 bundle(s) waiting to be installed
+                                         |Bundle a101449418187d92c789d1adc240b6d6 installed
+                                         |Bundle e7e1f4ac7a1b41abbe9b98d8e3e6b2e7 installed
+                                         |"""), self.output(stdout))
+
+    def test_wait_timeout(self):
+        bundle_a = 'a101449418187d92c789d1adc240b6d6'
+        bundle_b = 'e7e1f4ac7a1b41abbe9b98d8e3e6b2e7'
+        count_all_installations_mock = MagicMock(return_value={bundle_a: 1})
+        url_mock = MagicMock(return_value='/bundle-events/endpoint')
+        conductr_host_mock = MagicMock(return_value='10.0.0.1')
+        get_events_mock = MagicMock(return_value=[
+            create_test_event('bundleInstallationAdded')
+        ])
+
+        stdout = MagicMock()
+
+        args = MagicMock(**{
+            'dcos_mode': False,
+            'conductr_auth': self.conductr_auth,
+            'server_verification_file': self.server_verification_file,
+            # Purposely set no timeout to invoke the error
+            'wait_timeout': -1
+        })
+        with patch('conductr_cli.conduct_url.url', url_mock), \
+                patch('conductr_cli.conduct_url.conductr_host', conductr_host_mock), \
+                patch('conductr_cli.bundle_installation.count_all_installations', count_all_installations_mock), \
+                patch('conductr_cli.sse_client.get_events', get_events_mock):
+            logging_setup.configure_logging(args, stdout)
+            self.assertRaises(WaitTimeoutError, bundle_installation.wait_for_installations, [bundle_a, bundle_b],
+                              args)
+
+        self.assertEqual(strip_margin("""|1 bundle(s) waiting to be installed
+                                         |"""), self.output(stdout))
+
+
 class TestWaitForUninstallation(CliTestCase):
 
     conductr_auth = ('username', 'password')
@@ -1,6 +1,9 @@
 from unittest import TestCase
 from conductr_cli import bundle_utils, constants
+from conductr_cli.exceptions import MalformedBundleError
 from conductr_cli.test.cli_test_case import create_temp_bundle_with_contents
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+import hashlib
 import shutil
 import tempfile
 
@@ -157,3 +160,107 @@ class Digest(TestCase):
                 reader.digest,
                 ('sha-256', '6ae881d57578a07900c4eb37e21afa4c2095beb8e852fb6ed8d0c9f343bc7fa8')
             )
+
+
+class DigestExtractAndOpen(TestCase):
+    digest_value = '6ae881d57578a07900c4eb37e21afa4c2095beb8e852fb6ed8d0c9f343bc7fa8'
+
+    def test_with_digest(self):
+        some_raw_test_data = b'abc' * 1000
+        digest_value = hashlib.sha256(some_raw_test_data).hexdigest()
+
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(some_raw_test_data + b'\nsha-256/' + digest_value.encode('UTF-8'))
+            file.flush()
+
+            open_file, digest = bundle_utils.digest_extract_and_open(file.name)
+
+            with open_file:
+                self.assertIsInstance(open_file, bundle_utils.FileWindow)
+                self.assertEqual(digest, ('sha-256', digest_value))
+                self.assertEqual(open_file.len, len(some_raw_test_data))
+                self.assertEqual(open_file.read(128), some_raw_test_data[:128])
+                self.assertEqual(open_file.len, len(some_raw_test_data) - 128)
+                self.assertEqual(open_file.read(), some_raw_test_data[128:])
+                self.assertEqual(open_file.read(), b'')
+                self.assertEqual(open_file.len, 0)
+
+                open_file.seek(0)
+                self.assertEqual(open_file.read(), some_raw_test_data)
+
+    def test_without_digest(self):
+        some_test_data = b'this is a test file\nwithout a digest'
+
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(some_test_data)
+            file.flush()
+
+            open_file, digest = bundle_utils.digest_extract_and_open(file.name)
+
+            with open_file:
+                self.assertEqual(digest, None)
+                self.assertEqual(open_file.read(), some_test_data)
+
+    def test_multipart_length(self):
+        some_raw_test_data = b'abc' * 1000
+        digest_value = hashlib.sha256(some_raw_test_data).hexdigest()
+
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(some_raw_test_data + b'\nsha-256/' + digest_value.encode('UTF-8'))
+            file.flush()
+
+            open_file, digest = bundle_utils.digest_extract_and_open(file.name)
+
+            with open_file:
+                encoder = MultipartEncoder([('bundle', ('bundle.zip', open_file))])
+                data = encoder.read()
+
+            self.assertEqual(encoder.len, len(data))
+            self.assertIn(some_raw_test_data, data)
+            self.assertNotIn(b'sha-256/', data)
+
+    def test_digest_verified_while_reading(self):
+        some_raw_test_data = b'abc' * 1000
+        digest_value = hashlib.sha256(some_raw_test_data).hexdigest()
+
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(some_raw_test_data + b'\nsha-256/' + digest_value.encode('UTF-8'))
+            file.flush()
+
+            open_file, digest = bundle_utils.digest_extract_and_open(file.name)
+
+            with open_file:
+                data = b''.join(iter(lambda: open_file.read(128), b''))
+
+            self.assertEqual(data, some_raw_test_data)
+
+    def test_digest_mismatch_while_reading(self):
+        some_raw_test_data = b'abc' * 1000
+
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(some_raw_test_data + b'\nsha-256/' + self.digest_value.encode('UTF-8'))
+            file.flush()
+
+            open_file, digest = bundle_utils.digest_extract_and_open(file.name)
+
+            with open_file:
+                self.assertEqual(open_file.read(128), some_raw_test_data[:128])
+
+                with self.assertRaises(MalformedBundleError):
+                    open_file.read()
+
+    def test_digest_mismatch_aborts_multipart(self):
+        some_raw_test_data = b'abc' * 1000
+
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(some_raw_test_data + b'\nsha-256/' + self.digest_value.encode('UTF-8'))
+            file.flush()
+
+            open_file, digest = bundle_utils.digest_extract_and_open(file.name)
+
+            with open_file:
+                encoder = MultipartEncoder([('bundle', ('bundle.zip', open_file))])
+
+                with self.assertRaises(MalformedBundleError):
+                    while encoder.read(128):
+                        pass
@@ -0,0 +1,64 @@
+from conductr_cli.test.cli_test_case import CliTestCase, as_warn
+from conductr_cli import conduct_cache, logging_setup, resolve_cache
+from unittest.mock import MagicMock
+import os
+import shutil
+import tempfile
+
+
+class TestConductCacheCommand(CliTestCase):
+    def setUp(self):  # noqa
+        self.tmpdir = os.path.realpath(tempfile.mkdtemp())
+        self.bundle_dir = os.path.join(self.tmpdir, 'bundle')
+        self.configuration_dir = os.path.join(self.tmpdir, 'configuration')
+
+        os.makedirs(self.bundle_dir)
+        os.makedirs(self.configuration_dir)
+
+        self.default_args = {
+            'cli_settings_dir': os.path.join(self.tmpdir, 'settings'),
+            'bundle_resolve_cache_dir': self.bundle_dir,
+            'configuration_resolve_cache_dir': self.configuration_dir,
+            'cache_max_size': 1024 ** 3,
+            'verbose': False,
+            'quiet': False
+        }
+
+    def tearDown(self):  # noqa
+        resolve_cache.configure(None)
+        shutil.rmtree(self.tmpdir)
+
+    def run_cache(self, action):
+        stdout = MagicMock()
+
+        input_args = MagicMock(**dict(self.default_args, action=action))
+        logging_setup.configure_logging(input_args, stdout)
+        self.assertTrue(conduct_cache.cache(input_args))
+
+        return self.output(stdout)
+
+    def test_stats(self):
+        with open(os.path.join(self.bundle_dir, 'bundle.zip'), 'wb') as file:
+            file.write(b'1' * 2048)
+
+        stdout = self.run_cache('stats')
+
+        self.assertEqual([
+            ['CACHE', 'DIR', 'FILES', 'SIZE'],
+            [self.bundle_dir, '1', '2.0', 'KiB'],
+            [self.configuration_dir, '0', '0', 'Bytes'],
+            ['total', '1', '2.0', 'KiB', 'of', '1.0', 'GiB']
+        ], [line.split() for line in stdout.splitlines()])
+
+    def test_verify(self):
+        corrupt_blob = os.path.join(self.bundle_dir, 'docker-blob-sha256_{}'.format('0' * 64))
+
+        with open(corrupt_blob, 'wb') as file:
+            file.write(b'blob')
+
+        stdout = self.run_cache('verify')
+
+        self.assertTrue(stdout.startswith(as_warn('Warning: Removed corrupt file {}: expected digest {}'
+                                                  .format(corrupt_blob, '0' * 64))))
+        self.assertTrue(stdout.endswith('Verified 1 file(s), 1 corrupt\n'))
+        self.assertFalse(os.path.exists(corrupt_blob))
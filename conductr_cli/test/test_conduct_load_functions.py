@@ -1,6 +1,6 @@
 from unittest import TestCase
 from unittest.mock import call, patch, MagicMock
-from conductr_cli import conduct_load
+from conductr_cli import bundle_utils, conduct_load
 from requests_toolbelt.multipart.encoder import MultipartEncoder, MultipartEncoderMonitor
 
 import datetime
@@ -98,7 +98,7 @@ class TestCommonFunctions(TestCase):
                 patch('os.remove', remove_mock), \
                 patch('conductr_cli.conduct_load.is_same_path', is_same_path_mock):
             conduct_load.cleanup_old_bundles(cache_dir, 'reactive-maps-frontend-v1-recent.zip',
-                                             excluded=recently_loaded_bundle)
+                                             excluded=[recently_loaded_bundle])
 
         glob_mock.assert_called_with('{}/*.zip'.format(cache_dir))
         self.assertEqual(isfile_mock.call_args_list, [
@@ -182,3 +182,41 @@ class TestCommonFunctions(TestCase):
                 test_failed = False
 
         self.assertFalse(test_failed)
+
+    def test_find_loaded_bundle_id(self):
+        bundle_digest = '6ae881d57578a07900c4eb37e21afa4c2095beb8e852fb6ed8d0c9f343bc7fa8'
+        configuration_digest = 'd54620c7bc91897bbb2f25faaac25f46b11e029ed327f91c7a10931ec45bd792'
+        loaded_bundles = [
+            {'bundleId': '6ae881d57578a07900c4eb37e21afa4c', 'bundleDigest': bundle_digest},
+            {'bundleId': '6ae881d57578a07900c4eb37e21afa4c-d54620c7bc91897bbb2f25faaac25f46',
+             'bundleDigest': bundle_digest, 'configurationDigest': configuration_digest}
+        ]
+        args = MagicMock(force_upload=False)
+
+        def window(digest):
+            return bundle_utils.FileWindow(io.BytesIO(), 0, ('sha-256', digest))
+
+        bundle_files = [('bundleConf', ('bundle.conf', io.StringIO())),
+                        ('bundle', ('bundle.zip', window(bundle_digest)))]
+        configuration_files = bundle_files + [('configuration', ('config.zip', window(configuration_digest)))]
+
+        self.assertEqual('6ae881d57578a07900c4eb37e21afa4c',
+                         conduct_load.find_loaded_bundle_id(args, bundle_files, loaded_bundles))
+        self.assertEqual('6ae881d57578a07900c4eb37e21afa4c-d54620c7bc91897bbb2f25faaac25f46',
+                         conduct_load.find_loaded_bundle_id(args, configuration_files, loaded_bundles))
+        self.assertIsNone(conduct_load.find_loaded_bundle_id(
+            args, [('bundle', ('bundle.zip', window('other')))], loaded_bundles))
+        self.assertIsNone(conduct_load.find_loaded_bundle_id(
+            args, bundle_files + [('configuration', ('config.zip', io.BytesIO()))], loaded_bundles))
+        self.assertIsNone(conduct_load.find_loaded_bundle_id(
+            MagicMock(force_upload=True), bundle_files, loaded_bundles))
+
+    def test_find_loaded_bundle_id_no_digest(self):
+        get_bundles_mock = MagicMock()
+
+        with patch('conductr_cli.conduct_load.get_bundles', get_bundles_mock):
+            result = conduct_load.find_loaded_bundle_id(MagicMock(force_upload=False),
+                                                        [('bundle', ('bundle.zip', io.BytesIO()))])
+
+        self.assertIsNone(result)
+        get_bundles_mock.assert_not_called()
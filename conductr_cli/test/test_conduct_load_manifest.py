@@ -0,0 +1,255 @@
+from conductr_cli.test.cli_test_case import CliTestCase, strip_margin, as_error
+from conductr_cli import conduct_load, logging_setup
+from conductr_cli.exceptions import BundleResolutionError, WaitTimeoutError
+from unittest.mock import call, patch, MagicMock
+import io
+import os
+import shutil
+import tempfile
+
+
+class TestReadManifest(CliTestCase):
+    def setUp(self):  # noqa
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):  # noqa
+        shutil.rmtree(self.tmpdir)
+
+    def test_read_manifest(self):
+        manifest = os.path.join(self.tmpdir, 'bundles.txt')
+        with open(manifest, 'w') as f:
+            f.write(strip_margin("""|# Frontend
+                                    |visualizer
+                                    |
+                                    |eslite   eslite-config.zip
+                                    |  cassandra:3.0.9
+                                    |"""))
+
+        self.assertEqual([
+            ('visualizer', None),
+            ('eslite', 'eslite-config.zip'),
+            ('cassandra:3.0.9', None)
+        ], conduct_load.read_manifest(manifest))
+
+    def test_read_manifest_stdin(self):
+        stdin_mock = MagicMock(**{'read.return_value': 'visualizer\neslite eslite-config.zip\n'})
+
+        with patch('sys.stdin', stdin_mock):
+            result = conduct_load.read_manifest('-')
+
+        self.assertEqual([('visualizer', None), ('eslite', 'eslite-config.zip')], result)
+
+
+class TestLoadManifest(CliTestCase):
+    def __init__(self, method_name):
+        super().__init__(method_name)
+
+        self.default_args = {
+            'dcos_mode': False,
+            'scheme': 'http',
+            'host': '127.0.0.1',
+            'port': 9005,
+            'base_path': '/',
+            'api_version': '2',
+            'disable_instructions': False,
+            'verbose': False,
+            'quiet': False,
+            'no_wait': False,
+            'manifest': True,
+            'concurrency': 2,
+            'force_upload': True,
+            'long_ids': False,
+            'command': 'conduct',
+            'bundle_resolve_cache_dir': 'bundle-resolve-cache-dir',
+            'configuration_resolve_cache_dir': 'configuration-resolve-cache-dir',
+            'bundle': 'bundles.txt',
+            'configuration': None
+        }
+
+        self.bundle_a = '45e0c477d3e5ea92aa8d85c0d8f3e25c'
+        self.bundle_b = 'e7e1f4ac7a1b41abbe9b98d8e3e6b2e7'
+
+    def resolve_files(self, args, log):
+        if args.bundle == 'missing':
+            raise BundleResolutionError('Unable to resolve bundle missing', [], [])
+
+        return '{}.zip'.format(args.bundle), 'cache/{}.zip'.format(args.bundle), None, \
+            [('bundle', (args.bundle, io.BytesIO()))]
+
+    def upload_files(self, args, multipart, bundle_stream):
+        bundle = multipart.fields[0][1][0]
+        return {'bundleId': self.bundle_a if bundle == 'visualizer' else self.bundle_b}
+
+    def test_success(self):
+        read_manifest_mock = MagicMock(return_value=[('visualizer', None), ('eslite', 'eslite-config.zip')])
+        validate_cache_dir_permissions_mock = MagicMock()
+        resolve_files_mock = MagicMock(side_effect=self.resolve_files)
+        upload_files_mock = MagicMock(side_effect=self.upload_files)
+        cleanup_old_bundles_mock = MagicMock()
+        wait_for_installations_mock = MagicMock()
+
+        stdout = MagicMock()
+        input_args = MagicMock(**self.default_args)
+
+        with patch('conductr_cli.conduct_load.read_manifest', read_manifest_mock), \
+                patch('conductr_cli.conduct_load.validate_cache_dir_permissions',
+                      validate_cache_dir_permissions_mock), \
+                patch('conductr_cli.conduct_load.resolve_files', resolve_files_mock), \
+                patch('conductr_cli.conduct_load.upload_files', upload_files_mock), \
+                patch('conductr_cli.conduct_load.cleanup_old_bundles', cleanup_old_bundles_mock), \
+                patch('conductr_cli.bundle_installation.wait_for_installations', wait_for_installations_mock):
+            logging_setup.configure_logging(input_args, stdout)
+            result = conduct_load.load_manifest(input_args)
+            self.assertTrue(result)
+
+        read_manifest_mock.assert_called_once_with('bundles.txt')
+        self.assertEqual(2, resolve_files_mock.call_count)
+        manifest_bundle_files = ['cache/visualizer.zip', 'cache/eslite.zip']
+        self.assertEqual([call('bundle-resolve-cache-dir', 'visualizer.zip', excluded=manifest_bundle_files),
+                          call('bundle-resolve-cache-dir', 'eslite.zip', excluded=manifest_bundle_files)],
+                         cleanup_old_bundles_mock.call_args_list)
+        wait_for_installations_mock.assert_called_once_with([self.bundle_a, self.bundle_b], input_args)
+
+        self.assertEqual(strip_margin("""|Retrieving 2 bundle(s)..
+                                         |ID       BUNDLE      STATUS
+                                         |45e0c47  visualizer  installed
+                                         |e7e1f4a  eslite      installed
+                                         |"""), self.output(stdout))
+
+    def test_suppress_entry_output(self):
+        def resolve_files(args, log):
+            log.info('Retrieving {}..'.format(args.bundle))
+            log.progress('Retrieving {} 50%'.format(args.bundle), flush=True)
+            return self.resolve_files(args, log)
+
+        read_manifest_mock = MagicMock(return_value=[('visualizer', None), ('eslite', None)])
+
+        stdout = MagicMock()
+        input_args = MagicMock(**self.default_args)
+
+        with patch('conductr_cli.conduct_load.read_manifest', read_manifest_mock), \
+                patch('conductr_cli.conduct_load.validate_cache_dir_permissions', MagicMock()), \
+                patch('conductr_cli.conduct_load.resolve_files', MagicMock(side_effect=resolve_files)), \
+                patch('conductr_cli.conduct_load.upload_files', MagicMock(side_effect=self.upload_files)), \
+                patch('conductr_cli.conduct_load.cleanup_old_bundles', MagicMock()), \
+                patch('conductr_cli.bundle_installation.wait_for_installations', MagicMock()), \
+                patch('sys.stdout.isatty', MagicMock(return_value=True)):
+            logging_setup.configure_logging(input_args, stdout)
+            result = conduct_load.load_manifest(input_args)
+            self.assertTrue(result)
+
+        self.assertEqual(strip_margin("""|Retrieving 2 bundle(s)..
+                                         |ID       BUNDLE      STATUS
+                                         |45e0c47  visualizer  installed
+                                         |e7e1f4a  eslite      installed
+                                         |"""), self.output(stdout))
+
+    def test_cleanup_after_uploads(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+
+        # `visualizer` is a prefix of `visualizer-frontend`, whose bundle was cached before the older `visualizer`
+        bundle_mtimes = {
+            'visualizer-older': 0,
+            'visualizer-frontend-new': 500,
+            'visualizer-old': 1000,
+            'visualizer-new': 2000
+        }
+        bundle_files = {}
+        for name, mtime in bundle_mtimes.items():
+            bundle_files[name] = os.path.join(tmpdir, '{}.zip'.format(name))
+            with open(bundle_files[name], 'wb'):
+                pass
+            os.utime(bundle_files[name], (mtime, mtime))
+
+        def resolve_files(args, log):
+            name = '{}-new'.format(args.bundle)
+            return '{}.zip'.format(name), bundle_files[name], None, [('bundle', (args.bundle, io.BytesIO()))]
+
+        def upload_files(args, multipart, bundle_stream):
+            self.assertTrue(all(os.path.exists(file) for file in bundle_files.values()))
+            return {'bundleId': self.bundle_a if multipart.fields[0][1][0] == 'visualizer' else self.bundle_b}
+
+        read_manifest_mock = MagicMock(return_value=[('visualizer', None), ('visualizer-frontend', None)])
+
+        stdout = MagicMock()
+        input_args = MagicMock(**dict(self.default_args, bundle_resolve_cache_dir=tmpdir))
+
+        with patch('conductr_cli.conduct_load.read_manifest', read_manifest_mock), \
+                patch('conductr_cli.conduct_load.validate_cache_dir_permissions', MagicMock()), \
+                patch('conductr_cli.conduct_load.resolve_files', MagicMock(side_effect=resolve_files)), \
+                patch('conductr_cli.conduct_load.upload_files', MagicMock(side_effect=upload_files)), \
+                patch('conductr_cli.bundle_installation.wait_for_installations', MagicMock()):
+            logging_setup.configure_logging(input_args, stdout)
+            result = conduct_load.load_manifest(input_args)
+            self.assertTrue(result)
+
+        self.assertEqual(['visualizer-frontend-new.zip', 'visualizer-new.zip', 'visualizer-old.zip'],
+                         sorted(os.listdir(tmpdir)))
+
+    def test_failure_resolution(self):
+        read_manifest_mock = MagicMock(return_value=[('visualizer', None), ('missing', None)])
+        resolve_files_mock = MagicMock(side_effect=self.resolve_files)
+        upload_files_mock = MagicMock(side_effect=self.upload_files)
+        wait_for_installations_mock = MagicMock()
+
+        stdout = MagicMock()
+        input_args = MagicMock(**self.default_args)
+
+        with patch('conductr_cli.conduct_load.read_manifest', read_manifest_mock), \
+                patch('conductr_cli.conduct_load.validate_cache_dir_permissions', MagicMock()), \
+                patch('conductr_cli.conduct_load.resolve_files', resolve_files_mock), \
+                patch('conductr_cli.conduct_load.upload_files', upload_files_mock), \
+                patch('conductr_cli.conduct_load.cleanup_old_bundles', MagicMock()), \
+                patch('conductr_cli.bundle_installation.wait_for_installations', wait_for_installations_mock):
+            logging_setup.configure_logging(input_args, stdout)
+            result = conduct_load.load_manifest(input_args)
+            self.assertFalse(result)
+
+        self.assertEqual(1, upload_files_mock.call_count)
+        wait_for_installations_mock.assert_called_once_with([self.bundle_a], input_args)
+
+        self.assertEqual(strip_margin("""|Retrieving 2 bundle(s)..
+                                         |ID       BUNDLE      STATUS
+                                         |45e0c47  visualizer  installed
+                                         |         missing     resolution failed: Unable to resolve bundle missing
+                                         |"""), self.output(stdout))
+
+    def test_failure_installation_timeout(self):
+        read_manifest_mock = MagicMock(return_value=[('visualizer', None), ('eslite', None)])
+        wait_for_installations_mock = MagicMock(side_effect=WaitTimeoutError('test timeout'))
+        count_all_installations_mock = MagicMock(return_value={self.bundle_a: 1})
+
+        stdout = MagicMock()
+        input_args = MagicMock(**self.default_args)
+
+        with patch('conductr_cli.conduct_load.read_manifest', read_manifest_mock), \
+                patch('conductr_cli.conduct_load.validate_cache_dir_permissions', MagicMock()), \
+                patch('conductr_cli.conduct_load.resolve_files', MagicMock(side_effect=self.resolve_files)), \
+                patch('conductr_cli.conduct_load.upload_files', MagicMock(side_effect=self.upload_files)), \
+                patch('conductr_cli.conduct_load.cleanup_old_bundles', MagicMock()), \
+                patch('conductr_cli.bundle_installation.wait_for_installations', wait_for_installations_mock), \
+                patch('conductr_cli.bundle_installation.count_all_installations', count_all_installations_mock):
+            logging_setup.configure_logging(input_args, stdout)
+            result = conduct_load.load_manifest(input_args)
+            self.assertFalse(result)
+
+        count_all_installations_mock.assert_called_once_with(input_args)
+
+        self.assertEqual(strip_margin("""|Retrieving 2 bundle(s)..
+                                         |ID       BUNDLE      STATUS
+                                         |45e0c47  visualizer  installed
+                                         |e7e1f4a  eslite      installation timed out
+                                         |"""), self.output(stdout))
+
+    def test_failure_api_version_1(self):
+        stdout = MagicMock()
+        stderr = MagicMock()
+        input_args = MagicMock(**dict(self.default_args, api_version='1'))
+
+        logging_setup.configure_logging(input_args, stdout, stderr)
+        result = conduct_load.load_manifest(input_args)
+        self.assertFalse(result)
+
+        self.assertEqual(as_error(strip_margin("""|Error: Loading a manifest of bundles requires ConductR API version 2
+                                                  |""")), self.output(stderr))
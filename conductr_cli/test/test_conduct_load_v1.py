@@ -1,7 +1,7 @@
 from conductr_cli.test.conduct_load_test_base import ConductLoadTestBase
 from conductr_cli.test.cli_test_case import create_temp_bundle, strip_margin, as_error, \
     create_temp_bundle_with_contents
-from conductr_cli import bundle_utils, conduct_load, logging_setup
+from conductr_cli import bundle_utils, conduct_load, logging_setup, timings
 from unittest.mock import call, patch, MagicMock, Mock
 import shutil
 
@@ -46,6 +46,8 @@ class TestConductLoadCommand(ConductLoadTestBase):
             'verbose': False,
             'quiet': False,
             'no_wait': False,
+            'manifest': False,
+            'force_upload': False,
             'offline_mode': False,
             'long_ids': False,
             'command': 'conduct',
@@ -74,6 +76,16 @@ class TestConductLoadCommand(ConductLoadTestBase):
     def test_success(self):
         self.base_test_success()
 
+    def test_success_timings(self):
+        timings.enable()
+        self.addCleanup(timings.recorded_phases.clear)
+        self.addCleanup(setattr, timings, 'enabled', False)
+
+        self.base_test_success()
+
+        self.assertEqual(['resolve bundle', 'upload', 'wait for installation'],
+                         [phase.name for phase in timings.recorded_phases])
+
     def test_success_dcos_mode(self):
         self.default_url = 'http://127.0.0.1/bundles'
         self.base_test_success_dcos_mode()
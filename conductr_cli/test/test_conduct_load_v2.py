@@ -1,8 +1,9 @@
 from conductr_cli.test.cli_test_case import create_temp_bundle, strip_margin, as_error, \
     create_temp_bundle_with_contents, create_attributes_object
 from conductr_cli.test.conduct_load_test_base import ConductLoadTestBase
-from conductr_cli import conduct_load, logging_setup
+from conductr_cli import bundle_utils, conduct_load, logging_setup
 from conductr_cli.bndl_utils import BndlFormat
+from conductr_cli.exceptions import RangeRequestsNotSupportedError
 from unittest import TestCase
 from unittest.mock import ANY, call, patch, MagicMock, Mock
 
@@ -56,7 +57,10 @@ class TestConductLoadCommand(ConductLoadTestBase):
             'verbose': False,
             'quiet': False,
             'no_wait': False,
+            'manifest': False,
+            'force_upload': False,
             'offline_mode': False,
+            'stream_bundle': False,
             'long_ids': False,
             'command': 'conduct',
             'cli_parameters': '',
@@ -137,6 +141,156 @@ class TestConductLoadCommand(ConductLoadTestBase):
         conf_mock.assert_called_with(self.bundle_file)
         string_io_mock.assert_called_with('mock bundle.conf')
 
+    def test_success_already_loaded(self):
+        resolve_bundle_mock = MagicMock(return_value=(self.bundle_file_name, self.bundle_file))
+        conf_mock = MagicMock(return_value='mock bundle.conf')
+        bundle_open_file_mock = MagicMock(spec=bundle_utils.FileWindow)
+        bundle_open_file_mock.digest = ('sha-256', '45e0c477d3e5ea92aa8d85c0d8f3e25c'
+                                                   'f0185008d7e57614a4a20c253a18fe28')
+        bundle_open_mock = MagicMock(return_value=(self.bundle_file_name, bundle_open_file_mock))
+        get_bundles_mock = MagicMock(return_value=[{
+            'bundleId': self.bundle_id,
+            'bundleDigest': '45e0c477d3e5ea92aa8d85c0d8f3e25cf0185008d7e57614a4a20c253a18fe28'
+        }])
+        http_method = self.respond_with(200, self.default_response)
+        stdout = MagicMock()
+        wait_for_installation_mock = MagicMock()
+        cleanup_old_bundles_mock = MagicMock()
+
+        input_args = MagicMock(**self.default_args)
+
+        with patch('conductr_cli.resolver.resolve_bundle', resolve_bundle_mock), \
+                patch('conductr_cli.bundle_utils.conf', conf_mock), \
+                patch('conductr_cli.conduct_load.is_bundle', lambda _: True), \
+                patch('conductr_cli.conduct_load.bndl_arguments_present', lambda _: False), \
+                patch('conductr_cli.conduct_load.open_bundle', bundle_open_mock), \
+                patch('conductr_cli.conduct_load.get_bundles', get_bundles_mock), \
+                patch('conductr_cli.conduct_load.cleanup_old_bundles', cleanup_old_bundles_mock), \
+                patch('requests.post', http_method), \
+                patch('conductr_cli.bundle_installation.wait_for_installation', wait_for_installation_mock):
+            logging_setup.configure_logging(input_args, stdout)
+            result = conduct_load.load(input_args)
+            self.assertTrue(result)
+
+        get_bundles_mock.assert_called_once_with(input_args)
+        http_method.assert_not_called()
+        bundle_open_file_mock.close.assert_called_once_with()
+        wait_for_installation_mock.assert_called_with(self.bundle_id, input_args)
+
+        self.assertEqual(self.default_output().replace('Loading bundle to ConductR..',
+                                                       'Bundle already loaded to ConductR, skipping upload..'),
+                         self.output(stdout))
+
+    def test_success_stream(self):
+        bundle_stream_mock = MagicMock()
+        bundle_stream_mock.cached_file = self.bundle_file
+        stream_bundle_mock = MagicMock(return_value=(self.bundle_file_name, bundle_stream_mock))
+        resolve_bundle_mock = MagicMock()
+        conf_mock = MagicMock(return_value='mock bundle.conf')
+        string_io_mock = MagicMock(return_value='mock bundle.conf - string i/o')
+        create_multipart_mock = MagicMock(return_value=self.multipart_mock)
+        http_method = self.respond_with(200, self.default_response)
+        stdout = MagicMock()
+        bundle_open_stream_mock = MagicMock(side_effect=lambda p1, p2, p3: (p1, 1))
+        wait_for_installation_mock = MagicMock()
+        cleanup_old_bundles_mock = MagicMock()
+
+        args = self.default_args.copy()
+        args.update({'stream_bundle': True})
+        input_args = MagicMock(**args)
+
+        with patch('conductr_cli.resolver.stream_bundle', stream_bundle_mock), \
+                patch('conductr_cli.resolver.resolve_bundle', resolve_bundle_mock), \
+                patch('zipfile.is_zipfile', lambda _: True), \
+                patch('conductr_cli.bundle_utils.conf', conf_mock), \
+                patch('conductr_cli.conduct_load.string_io', string_io_mock), \
+                patch('conductr_cli.conduct_load.bndl_arguments_present', lambda _: False), \
+                patch('conductr_cli.conduct_load.create_multipart', create_multipart_mock), \
+                patch('conductr_cli.conduct_load.cleanup_old_bundles', cleanup_old_bundles_mock), \
+                patch('requests.post', http_method), \
+                patch('conductr_cli.conduct_load.open_bundle_stream', bundle_open_stream_mock), \
+                patch('conductr_cli.bundle_installation.wait_for_installation', wait_for_installation_mock):
+            logging_setup.configure_logging(input_args, stdout)
+            result = conduct_load.load(input_args)
+            self.assertTrue(result)
+
+        stream_bundle_mock.assert_called_with(self.custom_settings, self.bundle_resolve_cache_dir,
+                                              self.bundle_file, self.offline_mode)
+        resolve_bundle_mock.assert_not_called()
+        conf_mock.assert_called_with(bundle_stream_mock)
+        bundle_open_stream_mock.assert_called_with(self.bundle_file_name, bundle_stream_mock, 'mock bundle.conf')
+        create_multipart_mock.assert_called_with(self.conduct_load_logger, self.default_files)
+        bundle_stream_mock.open_stream.assert_called_once_with()
+        bundle_stream_mock.commit.assert_called_once_with()
+        bundle_stream_mock.close.assert_called_once_with()
+        wait_for_installation_mock.assert_called_with(self.bundle_id, input_args)
+        cleanup_old_bundles_mock.assert_called_with(self.bundle_resolve_cache_dir, self.bundle_file_name,
+                                                    excluded=[self.bundle_file])
+
+        self.assertEqual(self.default_output(), self.output(stdout))
+
+    def test_failure_stream_not_committed(self):
+        bundle_stream_mock = MagicMock()
+        bundle_stream_mock.cached_file = self.bundle_file
+        stream_bundle_mock = MagicMock(return_value=(self.bundle_file_name, bundle_stream_mock))
+        conf_mock = MagicMock(return_value='mock bundle.conf')
+        http_method = self.respond_with(404)
+        stdout = MagicMock()
+        stderr = MagicMock()
+        bundle_open_stream_mock = MagicMock(side_effect=lambda p1, p2, p3: (p1, 1))
+
+        args = self.default_args.copy()
+        args.update({'stream_bundle': True})
+        input_args = MagicMock(**args)
+
+        with patch('conductr_cli.resolver.stream_bundle', stream_bundle_mock), \
+                patch('zipfile.is_zipfile', lambda _: True), \
+                patch('conductr_cli.bundle_utils.conf', conf_mock), \
+                patch('conductr_cli.conduct_load.bndl_arguments_present', lambda _: False), \
+                patch('conductr_cli.conduct_load.create_multipart', MagicMock(return_value=self.multipart_mock)), \
+                patch('requests.post', http_method), \
+                patch('conductr_cli.conduct_load.open_bundle_stream', bundle_open_stream_mock):
+            logging_setup.configure_logging(input_args, stdout, stderr)
+            result = conduct_load.load(input_args)
+            self.assertFalse(result)
+
+        bundle_stream_mock.commit.assert_not_called()
+        bundle_stream_mock.close.assert_called_once_with()
+
+    def test_stream_range_requests_not_supported(self):
+        bundle_stream_mock = MagicMock()
+        stream_bundle_mock = MagicMock(return_value=(self.bundle_file_name, bundle_stream_mock))
+        resolve_bundle_mock = MagicMock(return_value=(self.bundle_file_name, self.bundle_file))
+        is_zipfile_mock = MagicMock(side_effect=RangeRequestsNotSupportedError('test only'))
+        conf_mock = MagicMock(return_value='mock bundle.conf')
+        bundle_open_mock = MagicMock(side_effect=lambda p1, p2, p3: (p1, 1))
+        http_method = self.respond_with(200, self.default_response)
+        stdout = MagicMock()
+
+        args = self.default_args.copy()
+        args.update({'stream_bundle': True, 'no_wait': True})
+        input_args = MagicMock(**args)
+
+        with patch('conductr_cli.resolver.stream_bundle', stream_bundle_mock), \
+                patch('conductr_cli.resolver.resolve_bundle', resolve_bundle_mock), \
+                patch('zipfile.is_zipfile', is_zipfile_mock), \
+                patch('conductr_cli.bundle_utils.conf', conf_mock), \
+                patch('conductr_cli.conduct_load.is_bundle', lambda _: True), \
+                patch('conductr_cli.conduct_load.bndl_arguments_present', lambda _: False), \
+                patch('conductr_cli.conduct_load.create_multipart', MagicMock(return_value=self.multipart_mock)), \
+                patch('conductr_cli.conduct_load.cleanup_old_bundles', MagicMock()), \
+                patch('conductr_cli.conduct_load.open_bundle', bundle_open_mock), \
+                patch('requests.post', http_method):
+            logging_setup.configure_logging(input_args, stdout)
+            result = conduct_load.load(input_args)
+            self.assertTrue(result)
+
+        # The bundle is downloaded instead of being streamed
+        resolve_bundle_mock.assert_called_with(self.custom_settings, self.bundle_resolve_cache_dir,
+                                               self.bundle_file, self.offline_mode)
+        bundle_open_mock.assert_called_with(self.bundle_file_name, self.bundle_file, 'mock bundle.conf')
+        bundle_stream_mock.open_stream.assert_not_called()
+
     def test_success_custom_ip_port(self):
         conf_mock = MagicMock(return_value='mock bundle.conf')
         string_io_mock = MagicMock(return_value='mock bundle.conf - string i/o')
@@ -1,7 +1,7 @@
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 from conductr_cli.conduct_main import build_parser, get_cli_parameters
-from conductr_cli.constants import DEFAULT_LICENSE_DOWNLOAD_URL
+from conductr_cli.constants import DEFAULT_LICENSE_DOWNLOAD_URL, DEFAULT_RESOLVE_CACHE_MAX_SIZE
 from argparse import Namespace
 import os
 
@@ -98,6 +98,27 @@ class TestConduct(TestCase):
         self.assertEqual(args.wait_timeout, 60)
         self.assertEqual(args.bundle, 'path-to-bundle')
         self.assertEqual(args.configuration, 'path-to-conf')
+        self.assertEqual(args.manifest, False)
+        self.assertEqual(args.concurrency, 4)
+        self.assertEqual(args.force_upload, False)
+        self.assertEqual(args.timings, False)
+        self.assertEqual(args.timings_format, 'table')
+
+    def test_parser_load_timings(self):
+        args = self.parser.parse_args('load --timings --timings-format json path-to-bundle'.split())
+
+        self.assertEqual(args.timings, True)
+        self.assertEqual(args.timings_format, 'json')
+        self.assertEqual(args.bundle, 'path-to-bundle')
+
+    def test_parser_load_manifest(self):
+        args = self.parser.parse_args('load --manifest --concurrency 8 bundles.txt'.split())
+
+        self.assertEqual(args.func.__name__, 'load')
+        self.assertEqual(args.manifest, True)
+        self.assertEqual(args.concurrency, 8)
+        self.assertEqual(args.bundle, 'bundles.txt')
+        self.assertEqual(args.configuration, None)
 
     def test_parser_load_stdin_explicit(self):
         args = self.parser.parse_args('load - path-to-conf'.split())
@@ -410,3 +431,21 @@ class TestConduct(TestCase):
         self.assertEqual(args.custom_plugins_dir, '{}/.conductr/plugins'.format(os.path.expanduser('~')))
         self.assertEqual(args.local_connection, True)
         self.assertEqual(args.backup, '-')
+
+    def test_parser_cache(self):
+        for action in ['stats', 'prune', 'verify']:
+            args = self.parser.parse_args('cache {}'.format(action).split())
+
+            self.assertEqual(args.func.__name__, 'cache')
+            self.assertEqual(args.action, action)
+            self.assertEqual(args.cache_max_size, DEFAULT_RESOLVE_CACHE_MAX_SIZE)
+            self.assertEqual(args.cli_settings_dir, '{}/.conductr'.format(os.path.expanduser('~')))
+            self.assertEqual(args.bundle_resolve_cache_dir, '{}/.conductr/cache/bundle'.format(os.path.expanduser('~')))
+            self.assertEqual(args.configuration_resolve_cache_dir,
+                             '{}/.conductr/cache/configuration'.format(os.path.expanduser('~')))
+
+    def test_parser_cache_max_size(self):
+        args = self.parser.parse_args('cache prune --max-size 1048576'.split())
+
+        self.assertEqual(args.action, 'prune')
+        self.assertEqual(args.cache_max_size, 1048576)
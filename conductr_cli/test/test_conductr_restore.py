@@ -44,20 +44,20 @@ class TestConductrRestore(CliTestCase):
 
     @patch('conductr_cli.control_protocol.load_bundle')
     @patch('conductr_cli.conduct_load.create_multipart')
+    @patch('conductr_cli.bundle_utils.digest_extract_and_open')
     @patch('conductr_cli.bundle_utils.conf')
-    def test_process_bundle(self, mock_conf, mock_multipart, mock_load_bundle):
+    def test_process_bundle(self, mock_conf, mock_extract_open, mock_multipart, mock_load_bundle):
         mock_args = MagicMock()
         mock_conf.return_value = 'hello'
+        mock_extract_open.return_value = (MagicMock(), None)
         mock_multipart.return_value = MagicMock()
         bundle_info = BundleCoreInfo('1', 'b_name', '1234', '5678')
-        open_mock = mock.mock_open()
 
-        with patch('builtins.open', open_mock):
-            process_bundle(mock_args, 'yolo', bundle_info)
+        process_bundle(mock_args, 'yolo', bundle_info)
 
-        calls = [call(os.path.join('yolo', 'b_name-1234.zip'), 'rb'),
-                 call(os.path.join('yolo', 'b_name-5678.zip'), 'rb')]
-        open_mock.assert_has_calls(calls)
+        calls = [call(os.path.join('yolo', 'b_name-1234.zip')),
+                 call(os.path.join('yolo', 'b_name-5678.zip'))]
+        mock_extract_open.assert_has_calls(calls)
 
         conf_calls = [call(os.path.join('yolo', 'b_name-1234.zip')),
                       call(os.path.join('yolo', 'b_name-5678.zip'))]
@@ -66,18 +66,19 @@ class TestConductrRestore(CliTestCase):
 
     @patch('conductr_cli.control_protocol.load_bundle')
     @patch('conductr_cli.conduct_load.create_multipart')
+    @patch('conductr_cli.bundle_utils.digest_extract_and_open')
     @patch('conductr_cli.bundle_utils.conf')
-    def test_process_bundle_with_no_configuration(self, mock_conf, mock_multipart, mock_load_bundle):
+    def test_process_bundle_with_no_configuration(self, mock_conf, mock_extract_open, mock_multipart,
+                                                  mock_load_bundle):
         mock_args = MagicMock()
         mock_conf.return_value = 'hello'
+        mock_extract_open.return_value = (MagicMock(), None)
         mock_multipart.return_value = MagicMock()
         bundle_info = BundleCoreInfo('1', 'b_name', '1234', '')
-        open_mock = mock.mock_open()
 
-        with patch('builtins.open', open_mock):
-            process_bundle(mock_args, 'yolo', bundle_info)
+        process_bundle(mock_args, 'yolo', bundle_info)
 
-        open_mock.assert_called_once_with(os.path.join('yolo', 'b_name-1234.zip'), 'rb')
+        mock_extract_open.assert_called_once_with(os.path.join('yolo', 'b_name-1234.zip'))
         mock_conf.assert_called_once_with(os.path.join('yolo', 'b_name-1234.zip'))
 
         mock_load_bundle.assert_called_once_with(mock_args, mock_multipart.return_value)
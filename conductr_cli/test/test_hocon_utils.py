@@ -0,0 +1,44 @@
+from conductr_cli import hocon_utils
+from pyhocon import ConfigFactory
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+
+
+class TestParseString(TestCase):
+    def setUp(self):  # noqa
+        hocon_utils.parse_cache.clear()
+
+    def test_parse(self):
+        config = hocon_utils.parse_string('name = "test"\nroles = ["web"]')
+
+        self.assertEqual('test', config['name'])
+        self.assertEqual(['web'], config['roles'])
+
+    def test_memoized(self):
+        parse_string_mock = MagicMock(side_effect=ConfigFactory.parse_string)
+
+        with patch('pyhocon.ConfigFactory.parse_string', parse_string_mock):
+            first = hocon_utils.parse_string('name = "test"')
+            second = hocon_utils.parse_string('name = "test"')
+            hocon_utils.parse_string('name = "other"')
+
+        self.assertEqual(first, second)
+        self.assertEqual(2, parse_string_mock.call_count)
+
+    def test_returns_copies(self):
+        config = hocon_utils.parse_string('components { test { roles = ["web"] } }')
+        config.put('name', 'modified')
+        config['components']['test']['roles'].append('backend')
+
+        self.assertEqual(ConfigFactory.parse_string('components { test { roles = ["web"] } }'),
+                         hocon_utils.parse_string('components { test { roles = ["web"] } }'))
+
+    def test_bounded(self):
+        with patch('conductr_cli.hocon_utils.HOCON_PARSE_CACHE_SIZE', 2):
+            hocon_utils.parse_string('a = 1')
+            hocon_utils.parse_string('b = 1')
+            hocon_utils.parse_string('a = 1')
+            hocon_utils.parse_string('c = 1')
+
+        self.assertEqual([ConfigFactory.parse_string('a = 1'), ConfigFactory.parse_string('c = 1')],
+                         list(hocon_utils.parse_cache.values()))
@@ -0,0 +1,172 @@
+from conductr_cli import zip_utils
+from conductr_cli.incremental_build import IncrementalBuild
+from conductr_cli.shazar_main import dir_to_zip, write_zip_with_digest
+from functools import partial
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+
+class TestIncrementalBuild(TestCase):
+    def setUp(self):  # noqa
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, 'cache')
+        self.source_dir = os.path.join(self.tmpdir, 'source')
+
+        os.makedirs(os.path.join(self.source_dir, 'lib'))
+
+        for name, data in [('one.txt', b'one' * 1000), ('lib/two.jar', b'two' * 1000), ('lib/three.jar', b'three')]:
+            self.write_source_file(name, data, 1500000000)
+
+    def tearDown(self):  # noqa
+        shutil.rmtree(self.tmpdir)
+
+    def write_source_file(self, name, data, mtime):
+        path = os.path.join(self.source_dir, name)
+
+        with open(path, 'wb') as file:
+            file.write(data)
+
+        os.utime(path, (mtime, mtime))
+
+    def build(self, inputs=None):
+        incremental_build = IncrementalBuild(self.cache_dir, 'test', self.source_dir,
+                                             {'compress': True} if inputs is None else inputs)
+        output = io.BytesIO()
+
+        def write_entries(zip_file):
+            dir_to_zip(self.source_dir, zip_file, 'test', compress=True, incremental_build=incremental_build)
+
+        hex_digest = incremental_build.build(output, partial(write_zip_with_digest, write_entries=write_entries))
+
+        return output.getvalue(), hex_digest
+
+    def read_entries(self, data):
+        with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+
+            return {name: zip_file.read(name) for name in zip_file.namelist()}
+
+    def test_first_build(self):
+        data, hex_digest = self.build()
+
+        self.assertTrue(data.endswith('\nsha-256/{}'.format(hex_digest).encode('UTF-8')))
+        self.assertEqual({
+            'test/one.txt': b'one' * 1000,
+            'test/lib/two.jar': b'two' * 1000,
+            'test/lib/three.jar': b'three'
+        }, self.read_entries(data))
+
+    def test_unchanged(self):
+        data, hex_digest = self.build()
+
+        write_zip_with_digest_mock = MagicMock()
+
+        with patch('conductr_cli.test.test_incremental_build.write_zip_with_digest', write_zip_with_digest_mock):
+            self.assertEqual((data, hex_digest), self.build())
+
+        write_zip_with_digest_mock.assert_not_called()
+
+    def test_changed_file(self):
+        self.build()
+
+        self.write_source_file('lib/two.jar', b'changed', 1600000000)
+
+        write_file_mock = MagicMock(side_effect=zip_utils.write_file_with_header_sizes)
+
+        with patch('conductr_cli.zip_utils.write_file_with_header_sizes', write_file_mock):
+            data, hex_digest = self.build()
+
+        self.assertEqual(['test/lib/two.jar'], [args[0][1].filename for args in write_file_mock.call_args_list])
+        self.assertEqual({
+            'test/one.txt': b'one' * 1000,
+            'test/lib/two.jar': b'changed',
+            'test/lib/three.jar': b'three'
+        }, self.read_entries(data))
+
+        # The archive is the same as that of a build without a previous build
+        shutil.rmtree(self.cache_dir)
+        self.assertEqual((data, hex_digest), self.build())
+
+    def test_touched_file(self):
+        data, hex_digest = self.build()
+
+        os.utime(os.path.join(self.source_dir, 'one.txt'), (1500000002, 1500000002))
+
+        write_file_mock = MagicMock(side_effect=zip_utils.write_file_with_header_sizes)
+
+        with patch('conductr_cli.zip_utils.write_file_with_header_sizes', write_file_mock):
+            touched_data, touched_hex_digest = self.build()
+
+        write_file_mock.assert_not_called()
+        self.assertNotEqual(hex_digest, touched_hex_digest)
+        self.assertEqual(self.read_entries(data), self.read_entries(touched_data))
+
+    def test_removed_file(self):
+        self.build()
+
+        os.remove(os.path.join(self.source_dir, 'lib/three.jar'))
+
+        data, hex_digest = self.build()
+
+        self.assertEqual(['test/one.txt', 'test/lib/two.jar'], sorted(self.read_entries(data), reverse=True))
+
+    def test_changed_inputs(self):
+        self.build()
+
+        write_zip_with_digest_mock = MagicMock(side_effect=write_zip_with_digest)
+        write_file_mock = MagicMock(side_effect=zip_utils.write_file_with_header_sizes)
+
+        with \
+                patch('conductr_cli.test.test_incremental_build.write_zip_with_digest', write_zip_with_digest_mock), \
+                patch('conductr_cli.zip_utils.write_file_with_header_sizes', write_file_mock):
+            self.build({'compress': True, 'name': 'other'})
+
+        # The archive is rebuilt, but the files are unchanged so they're copied from the previous archive
+        self.assertEqual(1, write_zip_with_digest_mock.call_count)
+        write_file_mock.assert_not_called()
+
+    def test_unwritable_cache_dir(self):
+        open(self.cache_dir, 'w').close()
+
+        data, hex_digest = self.build()
+
+        self.assertEqual(3, len(self.read_entries(data)))
+
+    def test_changed_mode(self):
+        self.build()
+
+        path = os.path.join(self.source_dir, 'one.txt')
+        os.chmod(path, 0o755)
+
+        data, hex_digest = self.build()
+
+        with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+            self.assertEqual(0o755, (zip_file.getinfo('test/one.txt').external_attr >> 16) & 0o777)
+
+    def test_corrupt_previous_archive(self):
+        data, hex_digest = self.build()
+
+        # The build is unchanged, but its archive can't be read, so the archive is built again
+        write_zip_with_digest_mock = MagicMock(side_effect=write_zip_with_digest)
+
+        with patch('conductr_cli.incremental_build.open', MagicMock(side_effect=OSError('unreadable')), create=True), \
+                patch('conductr_cli.test.test_incremental_build.write_zip_with_digest', write_zip_with_digest_mock):
+            self.assertEqual((data, hex_digest), self.build())
+
+        self.assertEqual(1, write_zip_with_digest_mock.call_count)
+
+        # A changed build with a previous archive which isn't a zip file compresses all files again
+        archive_file = [os.path.join(dir_path, 'archive') for dir_path, dir_names, file_names in os.walk(self.cache_dir)
+                        if 'archive' in file_names][0]
+        with open(archive_file, 'wb') as file:
+            file.write(b'not a zip')
+
+        self.write_source_file('lib/two.jar', b'changed', 1600000000)
+        data, hex_digest = self.build()
+
+        self.assertEqual(b'one' * 1000, self.read_entries(data)['test/one.txt'])
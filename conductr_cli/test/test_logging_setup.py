@@ -142,3 +142,24 @@ class TestConductrCliLogger(CliTestCase):
         self.assertEqual(['1', '\r',
                           '*', '*', '\r',
                           'X', 'Y', 'Z', '\n'], char_output)
+
+    def test_suppress_thread_output(self):
+        stdout = MagicMock()
+        is_tty_mock = MagicMock(return_value=True)
+        stderr = MagicMock()
+        logging_setup.configure_logging(MagicMock(), stdout, stderr)
+
+        with patch('sys.stdout.isatty', is_tty_mock):
+            log = logging.getLogger('conductr_cli')
+            with logging_setup.suppress_thread_output():
+                log.info('this is suppressed info')
+                log.progress('this is suppressed progress', flush=True)
+                log.quiet('this is suppressed quiet')
+                log.warning('this is warning')
+                log.error('this is error')
+            log.info('this is info')
+
+        self.assertEqual(as_warn(strip_margin("""|Warning: this is warning
+                                                 |this is info
+                                                 |""")), self.output(stdout))
+        self.assertEqual(as_error('Error: this is error\n'), self.output(stderr))
@@ -0,0 +1,177 @@
+from conductr_cli import resolve_cache
+from conductr_cli.constants import RESOLVE_CACHE_EVICTION_GRACE
+from conductr_cli.test.cli_test_case import SettingsFileTestCase
+from unittest.mock import patch, MagicMock
+import hashlib
+import json
+import os
+import time
+
+
+class TestResolveCache(SettingsFileTestCase):
+    settings_file_name = 'resolve-cache.json'
+
+    def setUp(self):  # noqa
+        super().setUp()
+
+        self.cache_dir = os.path.join(self.tmpdir, 'cache')
+        os.makedirs(self.cache_dir)
+
+    def configure(self, settings_dir):
+        resolve_cache.configure(settings_dir, 1000)
+
+    def write_cache_file(self, name, data, age=None):
+        path = os.path.join(self.cache_dir, name)
+
+        with open(path, 'wb') as file:
+            file.write(data)
+
+        if age is not None:
+            mtime = time.time() - age
+            os.utime(path, (mtime, mtime))
+
+        return path
+
+    def test_accessed(self):
+        old_file = self.write_cache_file('old.zip', b'old', age=3600)
+        new_file = self.write_cache_file('new.zip', b'new')
+
+        resolve_cache.accessed(new_file)
+
+        records = self.read_settings_file()
+        self.assertEqual([self.cache_dir], records['dirs'])
+        self.assertEqual(['new.zip', 'old.zip'], sorted(os.path.basename(path) for path in records['files']))
+        self.assertGreater(records['files'][new_file]['accessedAt'], records['files'][old_file]['accessedAt'])
+
+    def test_accessed_evicts_least_recently_used(self):
+        oldest_file = self.write_cache_file('oldest.zip', b'1' * 400, age=3 * RESOLVE_CACHE_EVICTION_GRACE)
+        older_file = self.write_cache_file('older.zip', b'2' * 400, age=2 * RESOLVE_CACHE_EVICTION_GRACE)
+        self.write_cache_file('{}.validation'.format(oldest_file), b'{}')
+
+        new_file = self.write_cache_file('new.zip', b'3' * 400)
+        resolve_cache.accessed(new_file)
+
+        self.assertFalse(os.path.exists(oldest_file))
+        self.assertFalse(os.path.exists('{}.validation'.format(oldest_file)))
+        self.assertTrue(os.path.exists(older_file))
+        self.assertTrue(os.path.exists(new_file))
+        self.assertEqual(['new.zip', 'older.zip'], sorted(os.listdir(self.cache_dir)))
+        self.assertEqual(sorted([older_file, new_file]), sorted(self.read_settings_file()['files']))
+
+    def test_accessed_keeps_recently_used(self):
+        # Files used within the grace period may be about to be read by another CLI invocation
+        recent_file = self.write_cache_file('recent.zip', b'1' * 800, age=60)
+
+        new_file = self.write_cache_file('new.zip', b'2' * 800)
+        resolve_cache.accessed(new_file)
+
+        self.assertTrue(os.path.exists(recent_file))
+        self.assertTrue(os.path.exists(new_file))
+
+    def test_accessed_merges_other_invocations(self):
+        first_file = self.write_cache_file('first.zip', b'1' * 400, age=3 * RESOLVE_CACHE_EVICTION_GRACE)
+        second_file = self.write_cache_file('second.zip', b'2' * 400, age=2 * RESOLVE_CACHE_EVICTION_GRACE)
+        resolve_cache.stats([self.cache_dir])
+
+        # Another CLI invocation has used the least recently used file since its records were read
+        records = self.read_settings_file()
+        records['files'][first_file]['accessedAt'] = time.time() - RESOLVE_CACHE_EVICTION_GRACE - 1
+        with open(self.settings_file, 'w') as file:
+            json.dump(records, file)
+
+        new_file = self.write_cache_file('new.zip', b'3' * 400)
+        resolve_cache.accessed(new_file)
+
+        self.assertTrue(os.path.exists(first_file))
+        self.assertFalse(os.path.exists(second_file))
+
+    def test_accessed_only_stats_accessed_files(self):
+        self.write_cache_file('old.zip', b'old', age=3600)
+        resolve_cache.stats([self.cache_dir])
+
+        new_file = self.write_cache_file('new.zip', b'new')
+
+        with patch('os.path.isfile', MagicMock(side_effect=AssertionError('isfile called'))):
+            resolve_cache.accessed(new_file)
+
+        self.assertEqual(['new.zip', 'old.zip'],
+                         sorted(os.path.basename(path) for path in self.read_settings_file()['files']))
+
+    def test_accessed_unconfigured(self):
+        resolve_cache.configure(None)
+
+        resolve_cache.accessed(self.write_cache_file('new.zip', b'new'))
+
+        self.assertFalse(os.path.exists(self.settings_dir))
+
+    def test_remove(self):
+        old_file = self.write_cache_file('old.zip', b'old')
+        new_file = self.write_cache_file('new.zip', b'new')
+        resolve_cache.accessed(old_file, new_file)
+
+        resolve_cache.remove([old_file])
+
+        self.assertEqual(['new.zip'], os.listdir(self.cache_dir))
+        self.assertEqual([new_file], list(self.read_settings_file()['files']))
+
+    def test_stats(self):
+        self.write_cache_file('one.zip', b'1' * 100)
+        self.write_cache_file('docker-blob-sha256_{}'.format('0' * 64), b'2' * 200)
+        self.write_cache_file('partial.zip.tmp', b'3' * 300)
+
+        self.assertEqual([{'dir': self.cache_dir, 'files': 2, 'size': 300}], resolve_cache.stats([self.cache_dir]))
+
+    def test_stats_drops_removed_files(self):
+        removed_file = self.write_cache_file('removed.zip', b'1' * 100)
+        kept_file = self.write_cache_file('kept.zip', b'2' * 200)
+        resolve_cache.accessed(removed_file, kept_file)
+
+        # Removed by another CLI invocation
+        os.remove(removed_file)
+
+        self.assertEqual([{'dir': self.cache_dir, 'files': 1, 'size': 200}], resolve_cache.stats([self.cache_dir]))
+        self.assertEqual([kept_file], list(self.read_settings_file()['files']))
+
+    def test_prune(self):
+        old_file = self.write_cache_file('old.zip', b'1' * 400, age=2 * RESOLVE_CACHE_EVICTION_GRACE)
+        new_file = self.write_cache_file('new.zip', b'2' * 400, age=RESOLVE_CACHE_EVICTION_GRACE + 1)
+        stale_temp_file = self.write_cache_file('stale.zip.tmp', b'3', age=resolve_cache.STALE_TEMP_FILE_AGE + 1)
+        temp_file = self.write_cache_file('docker-blob-sha256_{}.tmp'.format('0' * 64), b'4', age=3600)
+
+        removed, freed = resolve_cache.prune([self.cache_dir], 500)
+
+        self.assertEqual([old_file, stale_temp_file], removed)
+        self.assertEqual(401, freed)
+        self.assertTrue(os.path.exists(new_file))
+        self.assertTrue(os.path.exists(temp_file))
+
+    def test_scan_dir(self):
+        cache_file = self.write_cache_file('one.zip', b'1')
+        os.mkdir(os.path.join(self.cache_dir, 'dir.zip'))
+        os.symlink(cache_file, os.path.join(self.cache_dir, 'link.zip'))
+
+        self.assertEqual([('one.zip', cache_file, 1)],
+                         [(name, path, file_stat.st_size) for name, path, file_stat in
+                          resolve_cache.scan_dir(self.cache_dir)])
+        self.assertEqual([], resolve_cache.scan_dir(os.path.join(self.tmpdir, 'missing')))
+
+    def test_verify(self):
+        blob_data = b'blob'
+        valid_blob = self.write_cache_file(
+            'docker-blob-sha256_{}'.format(hashlib.sha256(blob_data).hexdigest()), blob_data)
+        corrupt_blob = self.write_cache_file('docker-blob-sha256_{}'.format('0' * 64), blob_data)
+
+        bundle_data = b'bundle'
+        valid_bundle = self.write_cache_file(
+            'valid.zip', bundle_data + '\nsha-256/{}'.format(hashlib.sha256(bundle_data).hexdigest()).encode('UTF-8'))
+        corrupt_bundle = self.write_cache_file(
+            'corrupt.zip', bundle_data + '\nsha-256/{}'.format('0' * 64).encode('UTF-8'))
+
+        verified, corrupt = resolve_cache.verify([self.cache_dir])
+
+        self.assertEqual(4, verified)
+        self.assertEqual([corrupt_bundle, corrupt_blob], [path for path, reason in corrupt])
+        self.assertTrue(os.path.exists(valid_blob))
+        self.assertTrue(os.path.exists(valid_bundle))
+        self.assertFalse(os.path.exists(corrupt_blob))
+        self.assertFalse(os.path.exists(corrupt_bundle))
@@ -0,0 +1,49 @@
+from conductr_cli import settings_utils
+from unittest import TestCase
+import json
+import os
+import shutil
+import stat
+import tempfile
+
+
+class TestJsonSettingsFile(TestCase):
+    def setUp(self):  # noqa
+        self.tmpdir = tempfile.mkdtemp()
+        self.settings_file = os.path.join(self.tmpdir, 'settings', 'test.json')
+
+    def tearDown(self):  # noqa
+        shutil.rmtree(self.tmpdir)
+
+    def test_write_and_read(self):
+        settings_utils.write_json_settings_file_atomically(self.settings_file, 1, {'entries': {'a': 1}}, 'test file')
+
+        self.assertEqual({'version': 1, 'entries': {'a': 1}}, settings_utils.read_json_settings_file(self.settings_file, 1))
+        self.assertEqual(['test.json'], os.listdir(os.path.dirname(self.settings_file)))
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.settings_file).st_mode))
+
+    def test_read_other_version(self):
+        settings_utils.write_json_settings_file_atomically(self.settings_file, 1, {'entries': {}}, 'test file')
+
+        self.assertIsNone(settings_utils.read_json_settings_file(self.settings_file, 2))
+
+    def test_read_unreadable(self):
+        self.assertIsNone(settings_utils.read_json_settings_file(self.settings_file, 1))
+
+        os.makedirs(os.path.dirname(self.settings_file))
+
+        for content in ['not json', json.dumps(['version', 1])]:
+            with open(self.settings_file, 'w') as file:
+                file.write(content)
+
+            self.assertIsNone(settings_utils.read_json_settings_file(self.settings_file, 1))
+
+    def test_write_unwritable(self):
+        not_a_dir = os.path.join(self.tmpdir, 'not-a-dir')
+
+        with open(not_a_dir, 'w') as file:
+            file.write('file')
+
+        settings_utils.write_json_settings_file_atomically(os.path.join(not_a_dir, 'test.json'), 1, {}, 'test file')
+
+        self.assertEqual(['not-a-dir'], os.listdir(self.tmpdir))
@@ -3,11 +3,17 @@ import shutil
 import sys
 import tempfile
 import os
+import hashlib
+import io
+import time
+import tarfile
+import zipfile
 from os import remove
-from conductr_cli import logging_setup
-from conductr_cli.shazar_main import build_parser, run, write_with_digest
+from conductr_cli import logging_setup, zip_utils
+from conductr_cli.shazar_main import build_parser, run, tar_to_zip, write_with_digest, write_zip_with_digest, \
+    DigestWriter
 from conductr_cli.test.cli_test_case import as_error, CliTestCase
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, ANY, MagicMock
 
 
 class TestShazar(TestCase):
@@ -33,6 +39,196 @@ class TestShazar(TestCase):
         self.assertEqual(args.source, 'source')
         self.assertTrue(args.tar)
         self.assertEqual(args.output, 'output-file')
+        self.assertFalse(args.compress)
+
+    def test_parser_compress(self):
+        parser = build_parser()
+        args = parser.parse_args('source --compress'.split())
+
+        self.assertTrue(args.compress)
+
+    def test_parser_incremental(self):
+        parser = build_parser()
+
+        self.assertFalse(parser.parse_args('source'.split()).incremental)
+        self.assertTrue(parser.parse_args('source --incremental'.split()).incremental)
+
+
+class TestWriteZipWithDigest(TestCase):
+    def write_entries(self, zip_file):
+        zip_file.writestr('test/', b'')
+        zip_file.writestr('test/a.txt', b'hello')
+
+        info = zipfile.ZipInfo('test/b.txt', date_time=time.localtime(1500000000)[:6])
+        info.file_size = 5
+        zip_utils.write_stream(zip_file, info, io.BytesIO(b'world'))
+
+    def assert_output(self, data, hex_digest):
+        zip_data, trailer = data.rsplit(b'\n', 1)
+
+        self.assertEqual(hashlib.sha256(zip_data).hexdigest(), hex_digest)
+        self.assertEqual('sha-256/{}'.format(hex_digest).encode('UTF-8'), trailer)
+
+        with zipfile.ZipFile(io.BytesIO(zip_data)) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(b'hello', zip_file.read('test/a.txt'))
+            self.assertEqual(b'world', zip_file.read('test/b.txt'))
+
+        self.assert_header_sizes(data)
+
+    def assert_header_sizes(self, data):
+        # Java's ZipInputStream rejects STORED entries with data descriptors
+        with zipfile.ZipFile(io.BytesIO(data.rsplit(b'\n', 1)[0])) as zip_file:
+            for zinfo in zip_file.infolist():
+                self.assertEqual(0, zinfo.flag_bits & zip_utils.ZIP_DATA_DESCRIPTOR_FLAG)
+
+    def test_single_pass(self):
+        output = MagicMock(**{'seekable.return_value': False})
+
+        hex_digest = write_zip_with_digest(output, self.write_entries)
+
+        self.assert_output(CliTestCase.output_bytes(output), hex_digest)
+
+    def test_prior_to_python_3_6(self):
+        output = MagicMock(**{'seekable.return_value': False})
+
+        with patch('sys.version_info', (3, 5, 0)):
+            hex_digest = write_zip_with_digest(output, self.write_entries)
+
+        self.assert_output(CliTestCase.output_bytes(output), hex_digest)
+
+    def test_regular_file_output(self):
+        with tempfile.TemporaryFile() as output:
+            output.write(b'prefix')
+
+            # The zip file is hashed as it's written rather than being read back
+            with patch.object(output, 'read', MagicMock(side_effect=AssertionError('read back'))):
+                hex_digest = write_zip_with_digest(output, self.write_entries)
+
+            output.seek(0)
+            data = output.read()
+
+        self.assertTrue(data.startswith(b'prefix'))
+        self.assert_output(data[len(b'prefix'):], hex_digest)
+
+    def test_prior_to_python_3_5(self):
+        output = io.BytesIO()
+
+        with patch('sys.version_info', (3, 4, 0)):
+            hex_digest = write_zip_with_digest(output, self.write_entries)
+
+        self.assert_output(output.getvalue(), hex_digest)
+
+
+class TestTarToZip(TestCase):
+    def create_tar(self):
+        data = io.BytesIO()
+
+        with tarfile.open(fileobj=data, mode='w') as tar:
+            dir_info = tarfile.TarInfo('app')
+            dir_info.type = tarfile.DIRTYPE
+            dir_info.mtime = 1500000000
+            tar.addfile(dir_info)
+
+            for name, content, mode in [('app/run', b'#!/bin/sh\nexit 0\n', 0o755), ('app/data', b'x' * 10000, 0o644)]:
+                file_info = tarfile.TarInfo(name)
+                file_info.size = len(content)
+                file_info.mode = mode
+                file_info.mtime = 1500000000
+                tar.addfile(file_info, io.BytesIO(content))
+
+        return data.getvalue()
+
+    def tar_to_zip_from_pipe(self, compression):
+        read_fd, write_fd = os.pipe()
+        tar_data = self.create_tar()
+        zip_data = io.BytesIO()
+
+        # The tar fits within the pipe buffer, so it can be written before being read
+        with os.fdopen(write_fd, 'wb') as pipe:
+            pipe.write(tar_data)
+
+        with os.fdopen(read_fd, 'rb') as pipe, \
+                tarfile.open(fileobj=pipe, mode='r|') as tar, \
+                zipfile.ZipFile(zip_data, 'w', compression) as zip_file:
+            tar_to_zip(tar, zip_file)
+
+        return zip_data.getvalue()
+
+    def assert_zip(self, data, compression):
+        with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(['app/', 'app/run', 'app/data'], zip_file.namelist())
+            self.assertEqual(b'#!/bin/sh\nexit 0\n', zip_file.read('app/run'))
+            self.assertEqual(b'x' * 10000, zip_file.read('app/data'))
+
+            # The mode of the tar entries isn't kept, so that the zip is identical to that of prior versions
+            run_info = zip_file.getinfo('app/run')
+            self.assertEqual(0o100600, run_info.external_attr >> 16)
+            self.assertEqual(0o100600, zip_file.getinfo('app/data').external_attr >> 16)
+            self.assertEqual(time.localtime(1500000000)[:6], run_info.date_time)
+            self.assertEqual(compression, run_info.compress_type)
+
+    def test_stored(self):
+        self.assert_zip(self.tar_to_zip_from_pipe(zipfile.ZIP_STORED), zipfile.ZIP_STORED)
+
+    def test_deflated(self):
+        self.assert_zip(self.tar_to_zip_from_pipe(zipfile.ZIP_DEFLATED), zipfile.ZIP_DEFLATED)
+
+    def test_header_sizes(self):
+        for compression in [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED]:
+            output = io.BytesIO()
+            digest_writer = DigestWriter(output)
+
+            with tarfile.open(fileobj=io.BytesIO(self.create_tar()), mode='r|') as tar, \
+                    zip_utils.HeaderSizesZipFile(digest_writer, 'w', compression) as zip_file:
+                tar_to_zip(tar, zip_file)
+
+            self.assert_zip(output.getvalue(), compression)
+
+            with zipfile.ZipFile(output) as zip_file:
+                for zinfo in zip_file.infolist():
+                    self.assertEqual(0, zinfo.flag_bits & zip_utils.ZIP_DATA_DESCRIPTOR_FLAG)
+
+    def test_prior_to_python_3_6(self):
+        for compression in [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED]:
+            expected = self.tar_to_zip_from_pipe(compression)
+
+            with patch('sys.version_info', (3, 5, 0)):
+                self.assertEqual(expected, self.tar_to_zip_from_pipe(compression))
+
+    def test_entry_names_as_temp_files(self):
+        data = io.BytesIO()
+
+        with tarfile.open(fileobj=data, mode='w') as tar:
+            for name in ['./bundle.conf', './sub/b.bin', '/abs/c.bin']:
+                file_info = tarfile.TarInfo(name)
+                file_info.size = 3
+                file_info.mode = 0o644
+                file_info.mtime = 1500000000
+                tar.addfile(file_info, io.BytesIO(b'abc'))
+
+        def write_entries(zip_file):
+            with tarfile.open(fileobj=io.BytesIO(data.getvalue()), mode='r|') as tar:
+                tar_to_zip(tar, zip_file)
+
+        # How entries were written prior to streaming them, by extracting each one to a temp file
+        def write_temp_file_entries(zip_file):
+            with tarfile.open(fileobj=io.BytesIO(data.getvalue()), mode='r|') as tar:
+                for entry in tar:
+                    with tempfile.NamedTemporaryFile() as entry_file:
+                        shutil.copyfileobj(tar.extractfile(entry), entry_file)
+                        entry_file.flush()
+                        os.utime(entry_file.name, (entry.mtime, entry.mtime))
+                        zip_file.write(entry_file.name, entry.name)
+
+        output = io.BytesIO()
+        hex_digest = write_zip_with_digest(output, write_entries)
+
+        with zipfile.ZipFile(io.BytesIO(output.getvalue())) as zip_file:
+            self.assertEqual(['bundle.conf', 'sub/b.bin', 'abs/c.bin'], zip_file.namelist())
+
+        self.assertEqual(write_zip_with_digest(io.BytesIO(), write_temp_file_entries), hex_digest)
 
 
 class TestIntegration(CliTestCase):
@@ -42,6 +238,12 @@ class TestIntegration(CliTestCase):
         self.tmpfile = tempfile.NamedTemporaryFile(mode='w+b', delete=False)
         self.tmpdir = tempfile.mkdtemp()
 
+    def assert_zip_file_called(self, zipfile_mock, output):
+        zipfile_mock.assert_called_once_with(ANY, 'w', zipfile.ZIP_STORED)
+        digest_writer = zipfile_mock.call_args[0][0]
+        self.assertIsInstance(digest_writer, DigestWriter)
+        self.assertEqual(output, digest_writer.output)
+
     def setUp(self):  # noqa
         self.tmpfile.write(b'test file data')
         self.tmpfile.close()
@@ -123,13 +325,13 @@ class TestIntegration(CliTestCase):
                 patch('sys.stdout.buffer.write', stdout), \
                 patch('sys.stdout.isatty', lambda: False), \
                 patch('sys.stdin.isatty', lambda: False), \
-                patch('zipfile.ZipFile', zipfile), \
+                patch('conductr_cli.zip_utils.HeaderSizesZipFile', zipfile), \
                 patch('tarfile.open', tarfile), \
                 patch('tempfile.NamedTemporaryFile', MagicMock(return_value=file)):
             run('')
 
         tarfile.assert_called_once_with(fileobj=sys.stdin.buffer, mode='r|')
-        zipfile.assert_called_once_with(file, 'w')
+        self.assert_zip_file_called(zipfile, sys.stdout.buffer)
         stdout.assert_called_once_with(b'\nsha-256/'
                                        b'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855')
 
@@ -144,13 +346,13 @@ class TestIntegration(CliTestCase):
                 patch('sys.stdout.buffer.write', stdout), \
                 patch('sys.stdout.isatty', lambda: False),\
                 patch('sys.stdin.isatty', lambda: False), \
-                patch('zipfile.ZipFile', zipfile),\
+                patch('conductr_cli.zip_utils.HeaderSizesZipFile', zipfile),\
                 patch('tarfile.open', tarfile), \
                 patch('tempfile.NamedTemporaryFile', MagicMock(return_value=file)):
             run(['--tar', 'testing.tar'])
 
         tarfile.assert_called_once_with('testing.tar', mode='r')
-        zipfile.assert_called_once_with(file, 'w')
+        self.assert_zip_file_called(zipfile, sys.stdout.buffer)
         stdout.assert_called_once_with(b'\nsha-256/'
                                        b'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855')
 
@@ -165,7 +367,7 @@ class TestIntegration(CliTestCase):
         with \
                 patch('sys.stdout.buffer.write', stdout), \
                 patch('sys.stdout.isatty', lambda: False), patch('sys.stdin.isatty', lambda: False), \
-                patch('zipfile.ZipFile', zipfile), patch('tarfile.open', tarfile), \
+                patch('conductr_cli.zip_utils.HeaderSizesZipFile', zipfile), patch('tarfile.open', tarfile), \
                 patch('shutil.move', move), \
                 patch('tempfile.NamedTemporaryFile', MagicMock(return_value=file)):
             run(['testing'])
@@ -176,7 +378,7 @@ class TestIntegration(CliTestCase):
         )
 
         tarfile.assert_not_called()
-        zipfile.assert_called_once_with(file, 'w')
+        self.assert_zip_file_called(zipfile, file)
         stdout.assert_called_once_with(
             b'./testing-e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855.zip\n'
         )
@@ -193,7 +395,7 @@ class TestIntegration(CliTestCase):
         with \
                 patch('sys.stdout.buffer.write', stdout), \
                 patch('sys.stdout.isatty', lambda: False), patch('sys.stdin.isatty', lambda: False), \
-                patch('zipfile.ZipFile', mock_zipfile), patch('tarfile.open', mock_tarfile), \
+                patch('conductr_cli.zip_utils.HeaderSizesZipFile', mock_zipfile), patch('tarfile.open', mock_tarfile), \
                 patch('builtins.open', mock_open), \
                 patch('shutil.move', mock_move), \
                 patch('tempfile.NamedTemporaryFile', MagicMock(return_value=file)):
@@ -203,7 +405,7 @@ class TestIntegration(CliTestCase):
             stdout.assert_not_called()
             mock_move.assert_not_called()
             mock_open.assert_called_once_with('test.zip', 'wb')
-            mock_zipfile.assert_called_once_with(file, 'w')
+            self.assert_zip_file_called(mock_zipfile, mock_open.return_value.__enter__.return_value)
 
     def test_output_dash(self):
         # tests that providing "-o -" goes through stdout
@@ -218,7 +420,7 @@ class TestIntegration(CliTestCase):
         with \
                 patch('sys.stdout.buffer.write', stdout), \
                 patch('sys.stdout.isatty', lambda: False), patch('sys.stdin.isatty', lambda: False), \
-                patch('zipfile.ZipFile', zipfile), patch('tarfile.open', tarfile), \
+                patch('conductr_cli.zip_utils.HeaderSizesZipFile', zipfile), patch('tarfile.open', tarfile), \
                 patch('shutil.move', move), \
                 patch('tempfile.NamedTemporaryFile', MagicMock(return_value=file)):
 
@@ -226,7 +428,7 @@ class TestIntegration(CliTestCase):
 
             tarfile.assert_called_once_with(fileobj=sys.stdin.buffer, mode='r|')
             move.assert_not_called()
-            zipfile.assert_called_once_with(file, 'w')
+            self.assert_zip_file_called(zipfile, sys.stdout.buffer)
             stdout.assert_called_once_with(b'\nsha-256/'
                                            b'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855')
 
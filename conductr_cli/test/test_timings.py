@@ -0,0 +1,80 @@
+from conductr_cli.test.cli_test_case import CliTestCase, strip_margin
+from conductr_cli import logging_setup, timings
+from unittest.mock import patch, MagicMock
+import json
+
+
+class TestTimings(CliTestCase):
+    def tearDown(self):  # noqa
+        timings.enabled = False
+        timings.recorded_phases.clear()
+
+    def record_phases(self):
+        perf_counter_mock = MagicMock(side_effect=[10.0, 12.0, 12.0, 12.5])
+
+        with patch('time.perf_counter', perf_counter_mock):
+            with timings.phase('resolve bundle') as resolve_phase:
+                resolve_phase.bytes = 2097152
+            with timings.phase('wait for installation'):
+                pass
+
+    def test_disabled(self):
+        self.record_phases()
+
+        self.assertEqual([], timings.recorded_phases)
+
+    def test_report_table(self):
+        timings.enable()
+        self.record_phases()
+
+        stdout = MagicMock()
+        logging_setup.configure_logging(MagicMock(), stdout)
+        timings.report('table')
+
+        self.assertEqual(strip_margin("""|PHASE                  DURATION    BYTES  THROUGHPUT
+                                         |resolve bundle           2.000s  2.0 MiB   1.0 MiB/s
+                                         |wait for installation    0.500s
+                                         |total                    2.500s
+                                         |"""), self.output(stdout))
+
+    def test_report_json(self):
+        timings.enable()
+        self.record_phases()
+
+        stdout = MagicMock()
+        logging_setup.configure_logging(MagicMock(), stdout)
+        timings.report('json')
+
+        self.assertEqual({
+            'phases': [
+                {'name': 'resolve bundle', 'durationSeconds': 2.0, 'bytes': 2097152, 'bytesPerSecond': 1048576},
+                {'name': 'wait for installation', 'durationSeconds': 0.5, 'bytes': None, 'bytesPerSecond': None}
+            ],
+            'totalSeconds': 2.5
+        }, json.loads(self.output(stdout)))
+
+    def test_report_concurrent_phases(self):
+        timings.enable()
+
+        upload_a = timings.Phase('upload')
+        upload_a.start_time, upload_a.end_time = 10.0, 13.0
+        upload_b = timings.Phase('upload')
+        upload_b.start_time, upload_b.end_time = 11.0, 14.0
+        timings.recorded_phases.extend([upload_a, upload_b])
+
+        stdout = MagicMock()
+        logging_setup.configure_logging(MagicMock(), stdout)
+        timings.report('json')
+
+        # The total is the elapsed wall time rather than the sum of the phases
+        self.assertEqual(4.0, json.loads(self.output(stdout))['totalSeconds'])
+
+    def test_phase_recorded_on_error(self):
+        timings.enable()
+
+        with self.assertRaises(ValueError):
+            with timings.phase('upload', 100):
+                raise ValueError('test')
+
+        self.assertEqual(['upload'], [phase.name for phase in timings.recorded_phases])
+        self.assertEqual(100, timings.recorded_phases[0].bytes)
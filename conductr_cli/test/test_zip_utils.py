@@ -0,0 +1,228 @@
+from conductr_cli import zip_utils
+from unittest import TestCase
+from unittest.mock import patch
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+
+
+class TestWriteDeflated(TestCase):
+    def setUp(self):  # noqa
+        self.tmpdir = tempfile.mkdtemp()
+        self.entries = []
+
+        for index, content in enumerate([b'', b'hello world', b'abcdefgh' * 100000, os.urandom(65536)]):
+            path = os.path.join(self.tmpdir, 'file-{}'.format(index))
+
+            with open(path, 'wb') as file:
+                file.write(content)
+
+            os.utime(path, (1000000000, 1000000000))
+            self.entries.append((path, 'test/file-{}'.format(index)))
+
+    def tearDown(self):  # noqa
+        shutil.rmtree(self.tmpdir)
+
+    def serial_zip(self):
+        data = io.BytesIO()
+
+        with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for path, name in self.entries:
+                zip_file.write(path, name)
+
+        return data.getvalue()
+
+    def parallel_zip(self):
+        data = io.BytesIO()
+
+        with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            zip_utils.write_deflated(zip_file, self.entries, max_workers=2)
+
+        return data.getvalue()
+
+    def test_identical_to_serial(self):
+        self.assertEqual(self.serial_zip(), self.parallel_zip())
+
+    def test_entries(self):
+        with zipfile.ZipFile(io.BytesIO(self.parallel_zip())) as zip_file:
+            self.assertEqual([name for _, name in self.entries], zip_file.namelist())
+            self.assertIsNone(zip_file.testzip())
+
+            for path, name in self.entries:
+                with open(path, 'rb') as file:
+                    self.assertEqual(file.read(), zip_file.read(name))
+
+    def test_large_files_in_process(self):
+        with \
+                patch('conductr_cli.zip_utils.DEFLATE_IN_PROCESS_SIZE', 1024), \
+                patch('conductr_cli.zip_utils.DEFLATE_PENDING_ENTRIES', 1):
+            self.assertEqual(self.serial_zip(), self.parallel_zip())
+
+
+class UnseekableOutput(io.RawIOBase):
+    def __init__(self):
+        self.data = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.data.write(data)
+
+    def tell(self):
+        return self.data.tell()
+
+
+class TestHeaderSizesZipFile(TestCase):
+    def setUp(self):  # noqa
+        self.tmpdir = tempfile.mkdtemp()
+        self.file = os.path.join(self.tmpdir, 'file')
+        self.dir = os.path.join(self.tmpdir, 'dir')
+
+        with open(self.file, 'wb') as file:
+            file.write(b'abcdefgh' * 1000)
+
+        os.mkdir(self.dir)
+
+    def tearDown(self):  # noqa
+        shutil.rmtree(self.tmpdir)
+
+    def write_entries(self, zip_file):
+        zip_file.write(self.file, 'test/stored', zipfile.ZIP_STORED)
+        zip_file.write(self.file, 'test/deflated', zipfile.ZIP_DEFLATED)
+        zip_file.write(self.dir, 'test/dir')
+        zip_file.writestr(zipfile.ZipInfo('test/hello', (2017, 1, 1, 0, 0, 0)), b'hello')
+
+    def test_identical_to_seekable(self):
+        seekable_data = io.BytesIO()
+
+        with zipfile.ZipFile(seekable_data, 'w') as zip_file:
+            self.write_entries(zip_file)
+
+        output = UnseekableOutput()
+
+        with zip_utils.HeaderSizesZipFile(output, 'w') as zip_file:
+            self.write_entries(zip_file)
+
+        self.assertEqual(seekable_data.getvalue(), output.data.getvalue())
+
+        with zipfile.ZipFile(output.data) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(['test/stored', 'test/deflated', 'test/dir/', 'test/hello'], zip_file.namelist())
+
+            for zinfo in zip_file.infolist():
+                self.assertEqual(0, zinfo.flag_bits & zip_utils.ZIP_DATA_DESCRIPTOR_FLAG)
+
+    def test_open_for_writing(self):
+        with zip_utils.HeaderSizesZipFile(io.BytesIO(), 'w') as zip_file:
+            self.assertRaises(ValueError, zip_file.open, 'test/hello', 'w')
+
+
+class TestCopyCompressed(TestCase):
+    def copy(self, source_data, name):
+        data = io.BytesIO()
+
+        with zipfile.ZipFile(io.BytesIO(source_data)) as source_zip_file, \
+                zipfile.ZipFile(data, 'w') as zip_file:
+            zip_utils.copy_compressed(zip_file, zipfile.ZipInfo('copy', (2017, 1, 1, 0, 0, 0)), source_zip_file,
+                                      source_zip_file.getinfo(name))
+
+        return data.getvalue()
+
+    def test_copied_as_is(self):
+        source_data = io.BytesIO()
+
+        with zipfile.ZipFile(source_data, 'w', zipfile.ZIP_DEFLATED) as source_zip_file:
+            source_zip_file.writestr('file', b'hello' * 1000)
+
+        with zipfile.ZipFile(io.BytesIO(self.copy(source_data.getvalue(), 'file'))) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(zipfile.ZIP_DEFLATED, zip_file.getinfo('copy').compress_type)
+            self.assertEqual(b'hello' * 1000, zip_file.read('copy'))
+
+    def test_other_compression_method(self):
+        source_data = io.BytesIO()
+
+        with zipfile.ZipFile(source_data, 'w', zipfile.ZIP_LZMA) as source_zip_file:
+            source_zip_file.writestr('file', b'hello' * 1000)
+
+        # An LZMA compressed entry needs flags which `write_compressed` doesn't write, so it's compressed with DEFLATE
+        with zipfile.ZipFile(io.BytesIO(self.copy(source_data.getvalue(), 'file'))) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(zipfile.ZIP_DEFLATED, zip_file.getinfo('copy').compress_type)
+            self.assertEqual(b'hello' * 1000, zip_file.read('copy'))
+
+    def test_encrypted(self):
+        source_data = io.BytesIO()
+
+        with zipfile.ZipFile(source_data, 'w') as source_zip_file:
+            source_zip_file.writestr('file', b'hello')
+
+        with zipfile.ZipFile(io.BytesIO(source_data.getvalue())) as source_zip_file, \
+                zipfile.ZipFile(io.BytesIO(), 'w') as zip_file:
+            source_zinfo = source_zip_file.getinfo('file')
+            source_zinfo.flag_bits |= zip_utils.ZIP_ENCRYPTED_FLAG
+
+            with self.assertRaises(RuntimeError):
+                zip_utils.copy_compressed(zip_file, zipfile.ZipInfo('copy'), source_zip_file, source_zinfo)
+
+    def test_write_compressed_unsupported_method(self):
+        zinfo = zipfile.ZipInfo('file')
+        zinfo.compress_type = zipfile.ZIP_BZIP2
+
+        with zipfile.ZipFile(io.BytesIO(), 'w') as zip_file:
+            self.assertRaises(NotImplementedError, zip_utils.write_compressed, zip_file, zinfo, [b'data'])
+
+
+class ZipFilePriorToPython35(object):
+    """
+    Wraps a `ZipFile` without the members which were added in Python 3.5, keeping its file positioned after its last
+    entry as a `ZipFile` did prior to Python 3.5.
+    """
+
+    def __init__(self, zip_file):
+        object.__setattr__(self, 'zip_file', zip_file)
+
+    def __getattr__(self, name):
+        if name in ['_lock', '_seekable', 'start_dir']:
+            raise AttributeError(name)
+
+        return getattr(self.zip_file, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.zip_file, name, value)
+
+
+class TestPriorToPython35(TestCase):
+    def test_write_compressed(self):
+        data = io.BytesIO()
+
+        with zipfile.ZipFile(data, 'w') as zip_file:
+            zip_file.writestr('first', b'hello')
+
+            zinfo = zipfile.ZipInfo('second', (2017, 1, 1, 0, 0, 0))
+            zinfo.CRC = zlib.crc32(b'world')
+            zinfo.file_size = zinfo.compress_size = 5
+            zip_utils.write_compressed(ZipFilePriorToPython35(zip_file), zinfo, [b'world'])
+
+        with zipfile.ZipFile(io.BytesIO(data.getvalue())) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(b'hello', zip_file.read('first'))
+            self.assertEqual(b'world', zip_file.read('second'))
+
+    def test_write_stream(self):
+        data = io.BytesIO()
+
+        with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            zinfo = zipfile.ZipInfo('file', (2017, 1, 1, 0, 0, 0))
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            zinfo.file_size = 5000
+            zip_utils.write_stream_prior_to_3_6(ZipFilePriorToPython35(zip_file), zinfo, io.BytesIO(b'hello' * 1000))
+
+        with zipfile.ZipFile(io.BytesIO(data.getvalue())) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(0, zip_file.getinfo('file').flag_bits & zip_utils.ZIP_DATA_DESCRIPTOR_FLAG)
+            self.assertEqual(b'hello' * 1000, zip_file.read('file'))
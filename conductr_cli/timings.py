@@ -0,0 +1,117 @@
+from conductr_cli import screen_utils
+from conductr_cli.bytes_util import natural_size
+from conductr_cli.conduct_info_common import DISPLAY_PADDING
+from contextlib import contextmanager
+import json
+import logging
+import os
+import threading
+import time
+
+# Phases are only recorded once `enable` is called, i.e. when `--timings` is specified
+enabled = False
+recorded_phases = []
+recorded_phases_lock = threading.Lock()
+
+
+class Phase(object):
+    def __init__(self, name):
+        self.name = name
+        self.start_time = None
+        self.end_time = None
+        self.bytes = None
+
+    @property
+    def duration(self):
+        return self.end_time - self.start_time if self.end_time is not None else 0.0
+
+    @property
+    def throughput(self):
+        return self.bytes / self.duration if self.bytes is not None and self.duration > 0 else None
+
+
+def enable():
+    global enabled
+
+    with recorded_phases_lock:
+        enabled = True
+        recorded_phases.clear()
+
+
+@contextmanager
+def phase(name, size=None):
+    """
+    Times the enclosed block as the phase `name`, e.g. `with timings.phase('upload') as upload_phase:`.
+    The number of bytes moved by the phase may be given upfront or set on the yielded phase.
+    """
+    current_phase = Phase(name)
+    current_phase.bytes = size
+    current_phase.start_time = time.perf_counter()
+
+    try:
+        yield current_phase
+    finally:
+        current_phase.end_time = time.perf_counter()
+
+        if enabled:
+            with recorded_phases_lock:
+                recorded_phases.append(current_phase)
+
+
+def file_size(path):
+    return os.path.getsize(path) if path is not None and os.path.isfile(path) else None
+
+
+def total_duration(phases):
+    """
+    :return: the wall time from the start of the first phase to the end of the last, as phases may run concurrently
+    """
+    if phases:
+        return max(p.end_time for p in phases) - min(p.start_time for p in phases)
+    else:
+        return 0.0
+
+
+def report(output_format):
+    """
+    Reports the recorded phases either as a table or, if `output_format` is `json`, as a JSON object.
+    """
+    log = logging.getLogger(__name__)
+
+    with recorded_phases_lock:
+        phases = list(recorded_phases)
+
+    total = total_duration(phases)
+
+    if output_format == 'json':
+        log.screen(json.dumps({
+            'phases': [
+                {
+                    'name': p.name,
+                    'durationSeconds': round(p.duration, 6),
+                    'bytes': p.bytes,
+                    'bytesPerSecond': None if p.throughput is None else round(p.throughput)
+                } for p in phases
+            ],
+            'totalSeconds': round(total, 6)
+        }, indent=2))
+    else:
+        data = [
+            {
+                'phase': p.name,
+                'duration': '{:.3f}s'.format(p.duration),
+                'bytes': '' if p.bytes is None else natural_size(p.bytes, binary=True),
+                'throughput': '' if p.throughput is None else '{}/s'.format(natural_size(p.throughput, binary=True))
+            } for p in phases
+        ]
+        data.insert(0, {'phase': 'PHASE', 'duration': 'DURATION', 'bytes': 'BYTES', 'throughput': 'THROUGHPUT'})
+        data.append({'phase': 'total', 'duration': '{:.3f}s'.format(total),
+                     'bytes': '', 'throughput': ''})
+
+        column_widths = dict(screen_utils.calc_column_widths(data), **{'padding': ' ' * DISPLAY_PADDING})
+        for row in data:
+            log.screen('''\
+{phase: <{phase_width}}{padding}\
+{duration: >{duration_width}}{padding}\
+{bytes: >{bytes_width}}{padding}\
+{throughput: >{throughput_width}}'''.format(**dict(row, **column_widths)).rstrip())
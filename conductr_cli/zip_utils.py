@@ -0,0 +1,394 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from conductr_cli.constants import DEFLATE_IN_PROCESS_SIZE, DEFLATE_PENDING_ENTRIES, IO_CHUNK_SIZE
+from functools import partial
+import contextlib
+import io
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+
+ZIP_ENCRYPTED_FLAG = 0x01
+ZIP_DATA_DESCRIPTOR_FLAG = 0x08
+
+# The compression methods of entries which are written by `write_compressed`
+WRITE_COMPRESSED_TYPES = [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED]
+ZIP_DATA_DESCRIPTOR_SIGNATURE = 0x08074b50
+
+
+class HeaderSizesZipFile(zipfile.ZipFile):
+    """
+    A `ZipFile` that writes the CRC-32 and compressed size of each entry in its local header, also when the file it
+    writes to can't seek. A plain `ZipFile` writes a data descriptor for each entry instead, which e.g. Java's
+    `ZipInputStream` rejects for STORED entries.
+
+    Entries are written with `write`, `writestr` and the functions of this module. Opening an entry for writing isn't
+    supported, as its sizes aren't known when its header is written.
+    """
+
+    def write(self, filename, arcname=None, compress_type=None, *args, **kwargs):
+        zinfo = create_zip_info(filename, entry_name(filename if arcname is None else arcname))
+
+        if os.path.isdir(filename):
+            zinfo.filename += '/'
+            zinfo.external_attr |= 0x10
+            self.writestr(zinfo, b'', zipfile.ZIP_STORED)
+        else:
+            zinfo.compress_type = self.compression if compress_type is None else compress_type
+            write_file_with_header_sizes(self, zinfo, filename)
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, *args, **kwargs):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        # Same defaults as `ZipFile.writestr`
+        if isinstance(zinfo_or_arcname, zipfile.ZipInfo):
+            zinfo = zinfo_or_arcname
+        else:
+            zinfo = zipfile.ZipInfo(zinfo_or_arcname, time.localtime(time.time())[:6])
+            zinfo.compress_type = self.compression
+            zinfo.external_attr = ((0o40775 << 16) | 0x10) if zinfo.filename.endswith('/') else (0o600 << 16)
+
+        if not zinfo.external_attr:
+            zinfo.external_attr = 0o600 << 16
+
+        if compress_type is not None:
+            zinfo.compress_type = compress_type
+
+        zinfo.file_size = len(data)
+
+        write_stream_with_header_sizes(self, zinfo, io.BytesIO(data))
+
+    def open(self, name, mode='r', *args, **kwargs):
+        if mode == 'w':
+            raise ValueError('Entries of a HeaderSizesZipFile can\'t be opened for writing')
+
+        return super().open(name, mode, *args, **kwargs)
+
+
+def write_deflated(zip_file, entries, mtime=None, max_workers=None):
+    """
+    Writes files to `zip_file` as DEFLATE compressed entries. Files are compressed on a pool of processes across all
+    cores, and their entries are written in the order of `entries`. The compression is identical to that of
+    `ZipFile.write` with `ZIP_DEFLATED`, so the archive is reproducible for identical inputs.
+
+    Files larger than `DEFLATE_IN_PROCESS_SIZE` are compressed in this process as they're written, so that their
+    compressed data isn't held in memory.
+
+    :param zip_file: the `ZipFile` to write to
+    :param entries: list of tuples of the path of a file and its name within the archive
+    :param mtime: the modification time of the entries, defaults to that of the files
+    :param max_workers: the number of processes, defaults to the number of cores
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+
+        def write_next():
+            path, name, future = pending.popleft()
+
+            if future is None:
+                write_file(zip_file, path, name, zipfile.ZIP_DEFLATED, mtime)
+            else:
+                zinfo = create_zip_info(path, name, mtime)
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                zinfo.CRC, data = future.result()
+                zinfo.compress_size = len(data)
+                write_compressed(zip_file, zinfo, [data])
+
+        for path, name in entries:
+            future = None if os.path.getsize(path) > DEFLATE_IN_PROCESS_SIZE else executor.submit(deflate_file, path)
+            pending.append((path, name, future))
+
+            if len(pending) > DEFLATE_PENDING_ENTRIES:
+                write_next()
+
+        while pending:
+            write_next()
+
+
+def deflate_file(path):
+    """
+    Compresses a file in the same way as `ZipFile` does for `ZIP_DEFLATED` entries.
+
+    :return: tuple of the CRC-32 of the file and its compressed data
+    """
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    crc = 0
+    chunks = []
+
+    with open(path, 'rb') as file:
+        for chunk in iter(partial(file.read, IO_CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+            chunks.append(compressor.compress(chunk))
+
+    chunks.append(compressor.flush())
+
+    return crc, b''.join(chunks)
+
+
+def write_file(zip_file, path, name, compress_type, mtime=None):
+    """
+    Same as `ZipFile.write`, except that the modification time of the entry may be given rather than taken from the
+    file, so that the file itself needn't be modified.
+    """
+    zinfo = create_zip_info(path, name, mtime)
+    zinfo.compress_type = compress_type
+
+    if isinstance(zip_file, HeaderSizesZipFile):
+        write_file_with_header_sizes(zip_file, zinfo, path)
+    else:
+        with open(path, 'rb') as file:
+            write_stream(zip_file, zinfo, file)
+
+
+def write_file_with_header_sizes(zip_file, zinfo, path):
+    """
+    Writes a file as the entry `zinfo` of `zip_file`, where the CRC-32 and compressed size of the entry are computed
+    before its header is written, see `write_stream_with_header_sizes`.
+    """
+    with open(path, 'rb') as file:
+        write_stream_with_header_sizes(zip_file, zinfo, file)
+
+
+def write_stream_with_header_sizes(zip_file, zinfo, fileobj):
+    """
+    Writes the contents of `fileobj` as the entry `zinfo` of `zip_file`, where the CRC-32 and compressed size of the
+    entry are computed before its header is written. Unlike `write_stream`, the entry has no data descriptor if
+    `zip_file` can't seek, so the entry is written the same way as by `copy_compressed`. `fileobj` is read twice, and
+    so must be seekable, unless the entry is DEFLATE compressed.
+    """
+    if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+        with tempfile.SpooledTemporaryFile(DEFLATE_IN_PROCESS_SIZE) as compressed:
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+            zinfo.CRC = 0
+
+            for chunk in iter(partial(fileobj.read, IO_CHUNK_SIZE), b''):
+                zinfo.CRC = zlib.crc32(chunk, zinfo.CRC)
+                compressed.write(compressor.compress(chunk))
+
+            compressed.write(compressor.flush())
+
+            zinfo.compress_size = compressed.tell()
+            compressed.seek(0)
+
+            write_compressed(zip_file, zinfo, iter(partial(compressed.read, IO_CHUNK_SIZE), b''))
+    else:
+        start = fileobj.tell()
+        zinfo.CRC = 0
+
+        for chunk in iter(partial(fileobj.read, IO_CHUNK_SIZE), b''):
+            zinfo.CRC = zlib.crc32(chunk, zinfo.CRC)
+
+        zinfo.compress_size = zinfo.file_size
+        fileobj.seek(start)
+
+        write_compressed(zip_file, zinfo, iter(partial(fileobj.read, IO_CHUNK_SIZE), b''))
+
+
+def entry_name(name):
+    # Same name conversion as `ZipInfo.from_file`
+    name = os.path.normpath(os.path.splitdrive(name)[1])
+    while name[0] in (os.sep, os.altsep):
+        name = name[1:]
+
+    return name
+
+
+def create_zip_info(path, name, mtime=None):
+    # Same as `ZipInfo.from_file`, which isn't available prior to Python 3.6
+    stat = os.stat(path)
+    zinfo = zipfile.ZipInfo(name, time.localtime(stat.st_mtime if mtime is None else mtime)[0:6])
+    zinfo.external_attr = (stat.st_mode & 0xFFFF) << 16
+    zinfo.file_size = stat.st_size
+
+    return zinfo
+
+
+def copy_compressed(zip_file, zinfo, source_zip_file, source_zinfo):
+    """
+    Copies the entry `source_zinfo` of `source_zip_file` to `zip_file` as the entry `zinfo`, e.g. to rename the entry
+    or to change its modification time. The compressed data is copied as is, without decompressing it, unless it's
+    compressed with a method other than DEFLATE, in which case it's decompressed and compressed again with DEFLATE.
+
+    Encrypted entries can't be copied, and raise a `RuntimeError`.
+    """
+    if source_zinfo.flag_bits & ZIP_ENCRYPTED_FLAG:
+        raise RuntimeError('{} is encrypted, which is not supported'.format(source_zinfo.filename))
+
+    if source_zinfo.compress_type not in WRITE_COMPRESSED_TYPES:
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.file_size = source_zinfo.file_size
+
+        # The entry is only read once as it's compressed, so it needn't be spooled
+        with source_zip_file.open(source_zinfo) as source:
+            write_stream_with_header_sizes(zip_file, zinfo, source)
+
+        return
+
+    zinfo.compress_type = source_zinfo.compress_type
+    zinfo.CRC = source_zinfo.CRC
+    zinfo.file_size = source_zinfo.file_size
+    zinfo.compress_size = source_zinfo.compress_size
+
+    write_compressed(zip_file, zinfo, read_compressed(source_zip_file, source_zinfo))
+
+
+def read_compressed(zip_file, zinfo):
+    """
+    Yields the compressed data of the entry `zinfo` of `zip_file` in chunks, without decompressing it.
+    """
+    zip_file.fp.seek(zinfo.header_offset)
+
+    header = struct.unpack(zipfile.structFileHeader, zip_file.fp.read(zipfile.sizeFileHeader))
+
+    if header[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile('Bad magic number for file header of {}'.format(zinfo.filename))
+
+    zip_file.fp.seek(header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+
+    remaining = zinfo.compress_size
+
+    while remaining > 0:
+        chunk = zip_file.fp.read(min(remaining, IO_CHUNK_SIZE))
+
+        if not chunk:
+            raise zipfile.BadZipFile('Truncated data of {}'.format(zinfo.filename))
+
+        remaining -= len(chunk)
+
+        yield chunk
+
+
+def write_compressed(zip_file, zinfo, chunks):
+    """
+    Writes `chunks` as is as an entry of `zip_file`, where the data is already compressed according to `zinfo`, and
+    `zinfo` holds the CRC-32, size and compressed size of the entry.
+
+    `ZipFile` has no public API to write compressed data, so this writes the entry in the same way that
+    `ZipFile.write` writes a directory entry, followed by the data. Only STORED and DEFLATE compressed entries are
+    supported, as other compression methods require flags in the header of the entry.
+
+    This relies on `ZipFile._writecheck` and `ZipFile._didModify`, which are available on all supported versions of
+    Python. The members which were added in Python 3.5 are only used if they're available, see `entries_lock` and
+    `seek_end_of_entries`.
+    """
+    if zinfo.compress_type not in WRITE_COMPRESSED_TYPES:
+        raise NotImplementedError('Compression method {} of {} is not supported'
+                                  .format(zinfo.compress_type, zinfo.filename))
+
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+
+    with entries_lock(zip_file):
+        seek_end_of_entries(zip_file)
+
+        zinfo.header_offset = zip_file.fp.tell()
+        zinfo.flag_bits = 0x00
+
+        zip_file._writecheck(zinfo)
+        zip_file._didModify = True
+
+        zip_file.fp.write(zinfo.FileHeader(zip64))
+        for chunk in chunks:
+            zip_file.fp.write(chunk)
+        zip_file.start_dir = zip_file.fp.tell()
+
+        zip_file.filelist.append(zinfo)
+        zip_file.NameToInfo[zinfo.filename] = zinfo
+
+
+def write_stream(zip_file, zinfo, fileobj):
+    """
+    Writes the contents of `fileobj` as an entry of `zip_file` without an intermediate file. `fileobj` is read
+    sequentially, so it may be a pipe, e.g. a member of a tar file that is read from stdin. `zinfo.file_size` must be
+    the size of the contents.
+
+    A STORED entry of a `HeaderSizesZipFile` is spooled to a temporary file first, so that its CRC-32 is known before
+    its header is written. A DEFLATE compressed entry is compressed before its header is written in any case.
+    """
+    if isinstance(zip_file, HeaderSizesZipFile) and zinfo.compress_type == zipfile.ZIP_DEFLATED:
+        write_stream_with_header_sizes(zip_file, zinfo, fileobj)
+    elif isinstance(zip_file, HeaderSizesZipFile):
+        with tempfile.SpooledTemporaryFile(DEFLATE_IN_PROCESS_SIZE) as spooled:
+            shutil.copyfileobj(fileobj, spooled, IO_CHUNK_SIZE)
+            spooled.seek(0)
+
+            write_stream_with_header_sizes(zip_file, zinfo, spooled)
+    elif sys.version_info >= (3, 6):
+        with zip_file.open(zinfo, 'w') as dest:
+            shutil.copyfileobj(fileobj, dest, IO_CHUNK_SIZE)
+    else:
+        write_stream_prior_to_3_6(zip_file, zinfo, fileobj)
+
+
+def write_stream_prior_to_3_6(zip_file, zinfo, fileobj):
+    # Same as `ZipFile.open(zinfo, 'w')`, which isn't available prior to Python 3.6: once the CRC-32 and compressed
+    # size are known, the header is rewritten or, if `zip_file` can't seek, a data descriptor is written
+    zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15) \
+        if zinfo.compress_type == zipfile.ZIP_DEFLATED else None
+    seekable = is_seekable(zip_file)
+
+    with entries_lock(zip_file):
+        seek_end_of_entries(zip_file)
+
+        zinfo.header_offset = zip_file.fp.tell()
+        zinfo.flag_bits = 0x00 if seekable else ZIP_DATA_DESCRIPTOR_FLAG
+        zinfo.CRC = 0
+        zinfo.compress_size = 0
+
+        zip_file._writecheck(zinfo)
+        zip_file._didModify = True
+
+        zip_file.fp.write(zinfo.FileHeader(zip64))
+
+        for chunk in iter(partial(fileobj.read, IO_CHUNK_SIZE), b''):
+            zinfo.CRC = zlib.crc32(chunk, zinfo.CRC)
+
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+
+            zinfo.compress_size += len(chunk)
+            zip_file.fp.write(chunk)
+
+        if compressor is not None:
+            chunk = compressor.flush()
+            zinfo.compress_size += len(chunk)
+            zip_file.fp.write(chunk)
+
+        if seekable:
+            end = zip_file.fp.tell()
+            zip_file.fp.seek(zinfo.header_offset)
+            zip_file.fp.write(zinfo.FileHeader(zip64))
+            zip_file.fp.seek(end)
+            zip_file.start_dir = end
+        else:
+            zip_file.fp.write(struct.pack('<LLQQ' if zip64 else '<LLLL', ZIP_DATA_DESCRIPTOR_SIGNATURE, zinfo.CRC,
+                                          zinfo.compress_size, zinfo.file_size))
+            zip_file.start_dir = zip_file.fp.tell()
+
+        zip_file.filelist.append(zinfo)
+        zip_file.NameToInfo[zinfo.filename] = zinfo
+
+
+def is_seekable(zip_file):
+    # `ZipFile._seekable` isn't available prior to Python 3.5, when a `ZipFile` could only be written to a seekable file
+    return getattr(zip_file, '_seekable', True)
+
+
+def seek_end_of_entries(zip_file):
+    """
+    Positions the file of `zip_file` after its last entry, where the next entry is written. Prior to Python 3.5,
+    `ZipFile` has no `start_dir` while writing, and its file is always positioned after its last entry.
+    """
+    if hasattr(zip_file, '_seekable') and zip_file._seekable:
+        zip_file.fp.seek(zip_file.start_dir)
+
+
+def entries_lock(zip_file):
+    # `ZipFile._lock` isn't available prior to Python 3.5, when a `ZipFile` couldn't be written from several threads
+    return zip_file._lock if hasattr(zip_file, '_lock') else contextlib.ExitStack()